@@ -0,0 +1,79 @@
+-- SSL证书管理器数据库迁移脚本
+-- 版本: 005
+-- 描述: 为客户端批量同步(INSERT ... ON DUPLICATE KEY UPDATE)添加唯一键
+-- 数据库: MySQL 8.0.19+ (批量写入使用 VALUES ... AS new 行别名语法)
+
+-- 添加唯一键前合并已有的重复数据，可用以下查询预先查看:
+-- SELECT server_id, domain, COUNT(*) FROM certificates GROUP BY server_id, domain HAVING COUNT(*) > 1;
+-- SELECT certificate_id, deploy_type, deploy_target, COUNT(*) FROM certificate_deployments
+--     GROUP BY certificate_id, deploy_type, deploy_target HAVING COUNT(*) > 1;
+
+START TRANSACTION;
+
+-- 同一服务器上的重复域名保留ID最大(最近同步)的证书，其余证书的关联记录改指向保留的证书
+CREATE TEMPORARY TABLE certificate_duplicates (
+    duplicate_id INT NOT NULL PRIMARY KEY,
+    keep_id INT NOT NULL
+);
+
+INSERT INTO certificate_duplicates (duplicate_id, keep_id)
+SELECT c.id, k.keep_id
+FROM certificates c
+JOIN (
+    SELECT server_id, domain, MAX(id) AS keep_id
+    FROM certificates
+    GROUP BY server_id, domain
+    HAVING COUNT(*) > 1
+) k ON c.server_id = k.server_id AND c.domain = k.domain AND c.id <> k.keep_id;
+
+UPDATE alerts a
+JOIN certificate_duplicates d ON a.certificate_id = d.duplicate_id
+SET a.certificate_id = d.keep_id;
+
+UPDATE domain_monitoring_history h
+JOIN certificate_duplicates d ON h.certificate_id = d.duplicate_id
+SET h.certificate_id = d.keep_id;
+
+UPDATE port_monitoring_history h
+JOIN certificate_duplicates d ON h.certificate_id = d.duplicate_id
+SET h.certificate_id = d.keep_id;
+
+UPDATE certificate_operations o
+JOIN certificate_duplicates d ON o.certificate_id = d.duplicate_id
+SET o.certificate_id = d.keep_id;
+
+UPDATE certificate_deployments dep
+JOIN certificate_duplicates d ON dep.certificate_id = d.duplicate_id
+SET dep.certificate_id = d.keep_id;
+
+-- 每个证书只有一条监控/安全配置：保留的证书没有配置时才转移，其余随重复证书级联删除
+UPDATE IGNORE domain_monitoring_config m
+JOIN certificate_duplicates d ON m.certificate_id = d.duplicate_id
+SET m.certificate_id = d.keep_id;
+
+UPDATE IGNORE ssl_security_config s
+JOIN certificate_duplicates d ON s.certificate_id = d.duplicate_id
+SET s.certificate_id = d.keep_id;
+
+DELETE c FROM certificates c
+JOIN certificate_duplicates d ON c.id = d.duplicate_id;
+
+DROP TEMPORARY TABLE certificate_duplicates;
+
+-- 清理重复的部署记录(包括上面合并后产生的)，保留每组中ID最大的一条
+DELETE d1 FROM certificate_deployments d1
+JOIN certificate_deployments d2
+    ON d1.certificate_id = d2.certificate_id
+    AND d1.deploy_type = d2.deploy_type
+    AND d1.deploy_target = d2.deploy_target
+    AND d1.id < d2.id;
+
+COMMIT;
+
+-- 证书表：同一服务器上的域名唯一
+ALTER TABLE certificates
+    ADD UNIQUE KEY uk_certificates_server_domain (server_id, domain);
+
+-- 部署记录表：同一证书的同一部署目标唯一
+ALTER TABLE certificate_deployments
+    ADD UNIQUE KEY uk_certificate_deployments_target (certificate_id, deploy_type, deploy_target);
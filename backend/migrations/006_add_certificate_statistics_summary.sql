@@ -0,0 +1,335 @@
+-- SSL证书管理器数据库迁移脚本
+-- 版本: 006
+-- 描述: 证书统计汇总表及增量维护触发器
+-- 数据库: MySQL 8.0.19+ (触发器使用 VALUES ... AS delta 行别名语法)
+--
+-- 说明:
+--   汇总表按(维度, 分桶)保存证书数量和数值合计，由certificates表的触发器增量维护，
+--   仪表盘统计只读取汇总表。开启binlog时创建触发器需要SUPER权限或
+--   log_bin_trust_function_creators=1，未安装触发器时应用自动退回单次扫描的实时统计。
+--   响应时间和握手时间几乎每次检查都会变化，不由触发器维护，读取统计时按需聚合。
+--   本脚本中的触发器和重建语句与 models/certificate_statistics.py 生成的一致
+--   (tests/backend/test_certificate_statistics.py 校验两者相同)。
+--   应用启动时只在触发器缺失或定义摘要(settings表 certificate_statistics_trigger_signature)
+--   变化时重新安装并重建汇总数据；需要时可用 scripts/rebuild_statistics_summary.py 手动重建。
+
+-- 最近检查统计使用的索引
+ALTER TABLE certificates
+    ADD INDEX idx_certificates_last_dns_check (last_dns_check),
+    ADD INDEX idx_certificates_last_reachability_check (last_reachability_check);
+
+-- 统计汇总表
+CREATE TABLE IF NOT EXISTS certificate_statistics_summary (
+    dimension VARCHAR(64) NOT NULL,
+    bucket VARCHAR(100) NOT NULL DEFAULT '',
+    cert_count BIGINT NOT NULL DEFAULT 0,
+    value_sum DOUBLE NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (dimension, bucket)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+DROP TRIGGER IF EXISTS trg_certificates_stats_insert;
+DROP TRIGGER IF EXISTS trg_certificates_stats_update;
+DROP TRIGGER IF EXISTS trg_certificates_stats_delete;
+
+DELIMITER //
+
+CREATE TRIGGER `trg_certificates_stats_insert` AFTER INSERT ON `certificates` FOR EACH ROW
+BEGIN
+    INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+    VALUES ('total', '', 1, 0) AS delta
+    ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+    VALUES ('status', NEW.status, 1, 0) AS delta
+    ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+    VALUES ('type', NEW.type, 1, 0) AS delta
+    ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    IF NEW.status = 'valid' THEN
+        INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+        VALUES ('valid_expiry_date', CAST(DATE(NEW.expires_at) AS CHAR), 1, 0) AS delta
+        ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    END IF;
+    IF NEW.monitoring_enabled = 1 THEN
+        INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+        VALUES ('monitoring_enabled', '', 1, 0) AS delta
+        ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    END IF;
+    IF NEW.alert_enabled = 1 THEN
+        INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+        VALUES ('alert_enabled', '', 1, 0) AS delta
+        ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    END IF;
+    IF NEW.monitoring_frequency IS NOT NULL THEN
+        INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+        VALUES ('monitoring_frequency', '', 1, NEW.monitoring_frequency) AS delta
+        ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    END IF;
+    IF NEW.monitoring_enabled = 1 AND NEW.monitoring_frequency IS NOT NULL THEN
+        INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+        VALUES ('monitoring_frequency_distribution', CAST(NEW.monitoring_frequency AS CHAR), 1, 0) AS delta
+        ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    END IF;
+    IF NEW.dns_status IS NOT NULL THEN
+        INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+        VALUES ('dns_status', NEW.dns_status, 1, 0) AS delta
+        ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    END IF;
+    IF NEW.domain_reachable IS NOT NULL THEN
+        INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+        VALUES ('domain_reachable', CAST(NEW.domain_reachable AS CHAR), 1, 0) AS delta
+        ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    END IF;
+    IF NEW.tls_version IS NOT NULL THEN
+        INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+        VALUES ('tls_version', NEW.tls_version, 1, 0) AS delta
+        ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    END IF;
+    IF NEW.certificate_chain_valid IS NOT NULL THEN
+        INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+        VALUES ('certificate_chain_valid', CAST(NEW.certificate_chain_valid AS CHAR), 1, 0) AS delta
+        ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    END IF;
+    IF NEW.http_redirect_status IS NOT NULL THEN
+        INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+        VALUES ('http_redirect_status', NEW.http_redirect_status, 1, 0) AS delta
+        ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    END IF;
+END //
+
+CREATE TRIGGER `trg_certificates_stats_update` AFTER UPDATE ON `certificates` FOR EACH ROW
+BEGIN
+    IF NOT (OLD.`status` <=> NEW.`status`) THEN
+        INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+        VALUES ('status', OLD.status, -1, 0) AS delta
+        ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+        INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+        VALUES ('status', NEW.status, 1, 0) AS delta
+        ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    END IF;
+    IF NOT (OLD.`type` <=> NEW.`type`) THEN
+        INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+        VALUES ('type', OLD.type, -1, 0) AS delta
+        ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+        INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+        VALUES ('type', NEW.type, 1, 0) AS delta
+        ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    END IF;
+    IF NOT (OLD.`status` <=> NEW.`status` AND OLD.`expires_at` <=> NEW.`expires_at`) THEN
+        IF OLD.status = 'valid' THEN
+            INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+            VALUES ('valid_expiry_date', CAST(DATE(OLD.expires_at) AS CHAR), -1, 0) AS delta
+            ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+        END IF;
+        IF NEW.status = 'valid' THEN
+            INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+            VALUES ('valid_expiry_date', CAST(DATE(NEW.expires_at) AS CHAR), 1, 0) AS delta
+            ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+        END IF;
+    END IF;
+    IF NOT (OLD.`monitoring_enabled` <=> NEW.`monitoring_enabled`) THEN
+        IF OLD.monitoring_enabled = 1 THEN
+            INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+            VALUES ('monitoring_enabled', '', -1, 0) AS delta
+            ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+        END IF;
+        IF NEW.monitoring_enabled = 1 THEN
+            INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+            VALUES ('monitoring_enabled', '', 1, 0) AS delta
+            ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+        END IF;
+    END IF;
+    IF NOT (OLD.`alert_enabled` <=> NEW.`alert_enabled`) THEN
+        IF OLD.alert_enabled = 1 THEN
+            INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+            VALUES ('alert_enabled', '', -1, 0) AS delta
+            ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+        END IF;
+        IF NEW.alert_enabled = 1 THEN
+            INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+            VALUES ('alert_enabled', '', 1, 0) AS delta
+            ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+        END IF;
+    END IF;
+    IF NOT (OLD.`monitoring_frequency` <=> NEW.`monitoring_frequency`) THEN
+        IF OLD.monitoring_frequency IS NOT NULL THEN
+            INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+            VALUES ('monitoring_frequency', '', -1, -OLD.monitoring_frequency) AS delta
+            ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+        END IF;
+        IF NEW.monitoring_frequency IS NOT NULL THEN
+            INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+            VALUES ('monitoring_frequency', '', 1, NEW.monitoring_frequency) AS delta
+            ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+        END IF;
+    END IF;
+    IF NOT (OLD.`monitoring_enabled` <=> NEW.`monitoring_enabled` AND OLD.`monitoring_frequency` <=> NEW.`monitoring_frequency`) THEN
+        IF OLD.monitoring_enabled = 1 AND OLD.monitoring_frequency IS NOT NULL THEN
+            INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+            VALUES ('monitoring_frequency_distribution', CAST(OLD.monitoring_frequency AS CHAR), -1, 0) AS delta
+            ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+        END IF;
+        IF NEW.monitoring_enabled = 1 AND NEW.monitoring_frequency IS NOT NULL THEN
+            INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+            VALUES ('monitoring_frequency_distribution', CAST(NEW.monitoring_frequency AS CHAR), 1, 0) AS delta
+            ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+        END IF;
+    END IF;
+    IF NOT (OLD.`dns_status` <=> NEW.`dns_status`) THEN
+        IF OLD.dns_status IS NOT NULL THEN
+            INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+            VALUES ('dns_status', OLD.dns_status, -1, 0) AS delta
+            ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+        END IF;
+        IF NEW.dns_status IS NOT NULL THEN
+            INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+            VALUES ('dns_status', NEW.dns_status, 1, 0) AS delta
+            ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+        END IF;
+    END IF;
+    IF NOT (OLD.`domain_reachable` <=> NEW.`domain_reachable`) THEN
+        IF OLD.domain_reachable IS NOT NULL THEN
+            INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+            VALUES ('domain_reachable', CAST(OLD.domain_reachable AS CHAR), -1, 0) AS delta
+            ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+        END IF;
+        IF NEW.domain_reachable IS NOT NULL THEN
+            INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+            VALUES ('domain_reachable', CAST(NEW.domain_reachable AS CHAR), 1, 0) AS delta
+            ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+        END IF;
+    END IF;
+    IF NOT (OLD.`tls_version` <=> NEW.`tls_version`) THEN
+        IF OLD.tls_version IS NOT NULL THEN
+            INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+            VALUES ('tls_version', OLD.tls_version, -1, 0) AS delta
+            ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+        END IF;
+        IF NEW.tls_version IS NOT NULL THEN
+            INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+            VALUES ('tls_version', NEW.tls_version, 1, 0) AS delta
+            ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+        END IF;
+    END IF;
+    IF NOT (OLD.`certificate_chain_valid` <=> NEW.`certificate_chain_valid`) THEN
+        IF OLD.certificate_chain_valid IS NOT NULL THEN
+            INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+            VALUES ('certificate_chain_valid', CAST(OLD.certificate_chain_valid AS CHAR), -1, 0) AS delta
+            ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+        END IF;
+        IF NEW.certificate_chain_valid IS NOT NULL THEN
+            INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+            VALUES ('certificate_chain_valid', CAST(NEW.certificate_chain_valid AS CHAR), 1, 0) AS delta
+            ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+        END IF;
+    END IF;
+    IF NOT (OLD.`http_redirect_status` <=> NEW.`http_redirect_status`) THEN
+        IF OLD.http_redirect_status IS NOT NULL THEN
+            INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+            VALUES ('http_redirect_status', OLD.http_redirect_status, -1, 0) AS delta
+            ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+        END IF;
+        IF NEW.http_redirect_status IS NOT NULL THEN
+            INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+            VALUES ('http_redirect_status', NEW.http_redirect_status, 1, 0) AS delta
+            ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+        END IF;
+    END IF;
+END //
+
+CREATE TRIGGER `trg_certificates_stats_delete` AFTER DELETE ON `certificates` FOR EACH ROW
+BEGIN
+    INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+    VALUES ('total', '', -1, 0) AS delta
+    ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+    VALUES ('status', OLD.status, -1, 0) AS delta
+    ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+    VALUES ('type', OLD.type, -1, 0) AS delta
+    ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    IF OLD.status = 'valid' THEN
+        INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+        VALUES ('valid_expiry_date', CAST(DATE(OLD.expires_at) AS CHAR), -1, 0) AS delta
+        ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    END IF;
+    IF OLD.monitoring_enabled = 1 THEN
+        INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+        VALUES ('monitoring_enabled', '', -1, 0) AS delta
+        ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    END IF;
+    IF OLD.alert_enabled = 1 THEN
+        INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+        VALUES ('alert_enabled', '', -1, 0) AS delta
+        ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    END IF;
+    IF OLD.monitoring_frequency IS NOT NULL THEN
+        INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+        VALUES ('monitoring_frequency', '', -1, -OLD.monitoring_frequency) AS delta
+        ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    END IF;
+    IF OLD.monitoring_enabled = 1 AND OLD.monitoring_frequency IS NOT NULL THEN
+        INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+        VALUES ('monitoring_frequency_distribution', CAST(OLD.monitoring_frequency AS CHAR), -1, 0) AS delta
+        ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    END IF;
+    IF OLD.dns_status IS NOT NULL THEN
+        INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+        VALUES ('dns_status', OLD.dns_status, -1, 0) AS delta
+        ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    END IF;
+    IF OLD.domain_reachable IS NOT NULL THEN
+        INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+        VALUES ('domain_reachable', CAST(OLD.domain_reachable AS CHAR), -1, 0) AS delta
+        ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    END IF;
+    IF OLD.tls_version IS NOT NULL THEN
+        INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+        VALUES ('tls_version', OLD.tls_version, -1, 0) AS delta
+        ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    END IF;
+    IF OLD.certificate_chain_valid IS NOT NULL THEN
+        INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+        VALUES ('certificate_chain_valid', CAST(OLD.certificate_chain_valid AS CHAR), -1, 0) AS delta
+        ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    END IF;
+    IF OLD.http_redirect_status IS NOT NULL THEN
+        INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`)
+        VALUES ('http_redirect_status', OLD.http_redirect_status, -1, 0) AS delta
+        ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, `value_sum` = `value_sum` + delta.`value_sum`;
+    END IF;
+END //
+
+DELIMITER ;
+
+-- 根据现有数据重建汇总
+DELETE FROM `certificate_statistics_summary`;
+
+INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`) SELECT 'total', '', COUNT(*), COALESCE(SUM(0), 0) FROM certificates WHERE 1 = 1 GROUP BY '';
+
+INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`) SELECT 'status', status, COUNT(*), COALESCE(SUM(0), 0) FROM certificates WHERE 1 = 1 GROUP BY status;
+
+INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`) SELECT 'type', type, COUNT(*), COALESCE(SUM(0), 0) FROM certificates WHERE 1 = 1 GROUP BY type;
+
+INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`) SELECT 'valid_expiry_date', CAST(DATE(expires_at) AS CHAR), COUNT(*), COALESCE(SUM(0), 0) FROM certificates WHERE status = 'valid' GROUP BY CAST(DATE(expires_at) AS CHAR);
+
+INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`) SELECT 'monitoring_enabled', '', COUNT(*), COALESCE(SUM(0), 0) FROM certificates WHERE monitoring_enabled = 1 GROUP BY '';
+
+INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`) SELECT 'alert_enabled', '', COUNT(*), COALESCE(SUM(0), 0) FROM certificates WHERE alert_enabled = 1 GROUP BY '';
+
+INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`) SELECT 'monitoring_frequency', '', COUNT(*), COALESCE(SUM(monitoring_frequency), 0) FROM certificates WHERE monitoring_frequency IS NOT NULL GROUP BY '';
+
+INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`) SELECT 'monitoring_frequency_distribution', CAST(monitoring_frequency AS CHAR), COUNT(*), COALESCE(SUM(0), 0) FROM certificates WHERE monitoring_enabled = 1 AND monitoring_frequency IS NOT NULL GROUP BY CAST(monitoring_frequency AS CHAR);
+
+INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`) SELECT 'dns_status', dns_status, COUNT(*), COALESCE(SUM(0), 0) FROM certificates WHERE dns_status IS NOT NULL GROUP BY dns_status;
+
+INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`) SELECT 'domain_reachable', CAST(domain_reachable AS CHAR), COUNT(*), COALESCE(SUM(0), 0) FROM certificates WHERE domain_reachable IS NOT NULL GROUP BY CAST(domain_reachable AS CHAR);
+
+INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`) SELECT 'tls_version', tls_version, COUNT(*), COALESCE(SUM(0), 0) FROM certificates WHERE tls_version IS NOT NULL GROUP BY tls_version;
+
+INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`) SELECT 'certificate_chain_valid', CAST(certificate_chain_valid AS CHAR), COUNT(*), COALESCE(SUM(0), 0) FROM certificates WHERE certificate_chain_valid IS NOT NULL GROUP BY CAST(certificate_chain_valid AS CHAR);
+
+INSERT INTO `certificate_statistics_summary` (`dimension`, `bucket`, `cert_count`, `value_sum`) SELECT 'http_redirect_status', http_redirect_status, COUNT(*), COALESCE(SUM(0), 0) FROM certificates WHERE http_redirect_status IS NOT NULL GROUP BY http_redirect_status;
+
+INSERT INTO settings (`key`, `value`) VALUES ('certificate_statistics_trigger_signature', 'f931c478db788f61') AS new
+ON DUPLICATE KEY UPDATE `value` = new.`value`;
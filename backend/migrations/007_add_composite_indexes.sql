@@ -0,0 +1,58 @@
+-- SSL证书管理器数据库迁移脚本
+-- 版本: 007
+-- 描述: 为高频查询条件添加组合(覆盖)索引，并移除被组合索引前缀覆盖的单列索引
+-- 数据库: MySQL 8.0+
+--
+-- 对应查询:
+--   客户端任务 get_client_tasks      server_id = ? AND status = 'valid' AND expires_at <= ?  (返回 id, domain, ca_type)
+--   即将过期 get_expiring / 统计      status = 'valid' AND expires_at <= ?
+--   监控调度器                       monitoring_enabled = 1 AND last_dns_check <= ? ORDER BY last_dns_check
+--   监控历史                         certificate_id = ? ORDER BY created_at DESC, id DESC
+--   活跃告警查询                     certificate_id = ? AND type = ? AND status = 'active' ORDER BY created_at DESC
+--
+-- InnoDB二级索引隐含主键列，(certificate_id, created_at) 可直接满足 ORDER BY created_at DESC, id DESC。
+-- 外键要求的 server_id / certificate_id 索引由组合索引的最左前缀提供。
+-- 大表上可使用 ALGORITHM=INPLACE, LOCK=NONE 在线执行；效果可用 backend/scripts/benchmark_indexes.py 验证。
+
+-- 证书表
+ALTER TABLE certificates
+    ADD INDEX idx_certificates_server_status_expires (server_id, status, expires_at, domain, ca_type),
+    ADD INDEX idx_certificates_status_expires (status, expires_at),
+    ADD INDEX idx_certificates_monitoring_last_dns_check (monitoring_enabled, last_dns_check),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE certificates
+    DROP INDEX idx_certificates_server_id,
+    DROP INDEX idx_certificates_status,
+    DROP INDEX idx_certificates_monitoring_enabled,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- 告警表
+ALTER TABLE alerts
+    ADD INDEX idx_alerts_certificate_status_type (certificate_id, status, type, created_at),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE alerts
+    DROP INDEX idx_alerts_certificate_id,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- 域名监控历史表
+ALTER TABLE domain_monitoring_history
+    ADD INDEX idx_domain_monitoring_history_certificate_created (certificate_id, created_at),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE domain_monitoring_history
+    DROP INDEX idx_domain_monitoring_history_certificate_id,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- 端口监控历史表
+ALTER TABLE port_monitoring_history
+    ADD INDEX idx_port_monitoring_history_certificate_created (certificate_id, created_at),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE port_monitoring_history
+    DROP INDEX idx_port_monitoring_history_certificate_id,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- 更新统计信息
+ANALYZE TABLE certificates, alerts, domain_monitoring_history, port_monitoring_history;
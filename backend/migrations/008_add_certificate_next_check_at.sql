@@ -0,0 +1,33 @@
+-- SSL证书管理器数据库迁移脚本
+-- 版本: 008
+-- 描述: 为证书添加预先计算的下次域名检查时间 next_check_at，监控调度器按索引范围扫描领取到期证书
+-- 数据库: MySQL 8.0+
+--
+-- 对应查询(Certificate.claim_due_for_check):
+--   monitoring_enabled = 1 AND (next_check_at IS NULL OR next_check_at <= CURRENT_TIMESTAMP)
+--   ORDER BY next_check_at LIMIT ? FOR UPDATE SKIP LOCKED
+--
+-- next_check_at 为空表示尚未检查(立即到期，按升序排在最前)。检查完成、调度器领取任务
+-- 以及修改监控频率时维护该字段。
+
+-- 证书表
+ALTER TABLE certificates
+    ADD COLUMN next_check_at TIMESTAMP NULL AFTER last_renewal_attempt,
+    ALGORITHM=INSTANT;
+
+-- 按上次检查时间和监控频率回填
+UPDATE certificates
+SET next_check_at = last_dns_check + INTERVAL COALESCE(monitoring_frequency, 3600) SECOND
+WHERE last_dns_check IS NOT NULL;
+
+ALTER TABLE certificates
+    ADD INDEX idx_certificates_monitoring_next_check (monitoring_enabled, next_check_at),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- 调度器不再按 last_dns_check 排序，移除迁移007添加的索引
+ALTER TABLE certificates
+    DROP INDEX idx_certificates_monitoring_last_dns_check,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- 更新统计信息
+ANALYZE TABLE certificates;
@@ -0,0 +1,84 @@
+-- SSL证书管理器数据库迁移脚本
+-- 版本: 009
+-- 描述: 监控历史表按 created_at 按月RANGE分区，新增小时/天汇总表
+-- 数据库: MySQL 8.0+
+--
+-- 过期数据由维护任务(MonitoringHistory.run_maintenance)整个分区 DROP PARTITION，
+-- 不再逐行DELETE；超过2天的历史查询读取汇总表。
+--
+-- 分区表的主键/唯一键必须包含分区列，主键改为 (id, created_at)；
+-- 分区表不支持外键，删除外键后已删除证书的历史记录随分区过期清理。
+-- 重新分区需要复制整张表，请在维护窗口执行。
+
+-- 域名监控历史表
+ALTER TABLE domain_monitoring_history
+    DROP FOREIGN KEY domain_monitoring_history_ibfk_1;
+
+ALTER TABLE domain_monitoring_history
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (id, created_at);
+
+ALTER TABLE domain_monitoring_history
+    PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)) (
+        PARTITION p_history VALUES LESS THAN (UNIX_TIMESTAMP('2026-10-01 00:00:00')),
+        PARTITION p202610 VALUES LESS THAN (UNIX_TIMESTAMP('2026-11-01 00:00:00')),
+        PARTITION p202611 VALUES LESS THAN (UNIX_TIMESTAMP('2026-12-01 00:00:00')),
+        PARTITION p202612 VALUES LESS THAN (UNIX_TIMESTAMP('2027-01-01 00:00:00')),
+        PARTITION p202701 VALUES LESS THAN (UNIX_TIMESTAMP('2027-02-01 00:00:00')),
+        PARTITION pmax VALUES LESS THAN MAXVALUE
+    );
+
+-- 端口监控历史表
+ALTER TABLE port_monitoring_history
+    DROP FOREIGN KEY port_monitoring_history_ibfk_1;
+
+ALTER TABLE port_monitoring_history
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (id, created_at);
+
+ALTER TABLE port_monitoring_history
+    PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)) (
+        PARTITION p_history VALUES LESS THAN (UNIX_TIMESTAMP('2026-10-01 00:00:00')),
+        PARTITION p202610 VALUES LESS THAN (UNIX_TIMESTAMP('2026-11-01 00:00:00')),
+        PARTITION p202611 VALUES LESS THAN (UNIX_TIMESTAMP('2026-12-01 00:00:00')),
+        PARTITION p202612 VALUES LESS THAN (UNIX_TIMESTAMP('2027-01-01 00:00:00')),
+        PARTITION p202701 VALUES LESS THAN (UNIX_TIMESTAMP('2027-02-01 00:00:00')),
+        PARTITION pmax VALUES LESS THAN MAXVALUE
+    );
+
+-- 监控历史汇总表(域名检查 port = 0)
+CREATE TABLE IF NOT EXISTS monitoring_rollups_hourly (
+    source VARCHAR(10) NOT NULL,
+    certificate_id INT NOT NULL,
+    port INT NOT NULL DEFAULT 0,
+    bucket_start DATETIME NOT NULL,
+    check_count INT NOT NULL,
+    success_count INT NOT NULL,
+    response_time_avg INT NULL,
+    response_time_p50 INT NULL,
+    response_time_p95 INT NULL,
+    handshake_time_avg INT NULL,
+    handshake_time_p50 INT NULL,
+    handshake_time_p95 INT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (source, certificate_id, port, bucket_start),
+    INDEX idx_monitoring_rollups_hourly_bucket_start (bucket_start)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS monitoring_rollups_daily (
+    source VARCHAR(10) NOT NULL,
+    certificate_id INT NOT NULL,
+    port INT NOT NULL DEFAULT 0,
+    bucket_start DATETIME NOT NULL,
+    check_count INT NOT NULL,
+    success_count INT NOT NULL,
+    response_time_avg INT NULL,
+    response_time_p50 INT NULL,
+    response_time_p95 INT NULL,
+    handshake_time_avg INT NULL,
+    handshake_time_p50 INT NULL,
+    handshake_time_p95 INT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (source, certificate_id, port, bucket_start),
+    INDEX idx_monitoring_rollups_daily_bucket_start (bucket_start)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
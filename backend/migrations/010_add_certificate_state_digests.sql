@@ -0,0 +1,12 @@
+-- SSL证书管理器数据库迁移脚本
+-- 版本: 010
+-- 描述: 为证书添加域名/端口检查状态摘要，检查结果不变时只更新心跳时间，不重写监控列
+-- 数据库: MySQL 8.0+
+--
+-- 摘要为空表示尚未按摘要比较过，下一次检查会写入全部监控列并记录历史。
+
+-- 证书表
+ALTER TABLE certificates
+    ADD COLUMN domain_state_digest CHAR(16) NULL AFTER next_check_at,
+    ADD COLUMN port_state_digest CHAR(16) NULL AFTER domain_state_digest,
+    ALGORITHM=INSTANT;
@@ -0,0 +1,28 @@
+-- SSL证书管理器数据库迁移脚本
+-- 版本: 011
+-- 描述: 为域名搜索添加反转域名索引(后缀/顶级域查询)和ngram全文索引(子串查询)
+-- 数据库: MySQL 8.0+
+--
+-- 对应查询(models/domain_search.py):
+--   后缀: domain_reversed = 'moc.elpmaxe' OR domain_reversed LIKE 'moc.elpmaxe.%'
+--   子串: MATCH(domain) AGAINST('+"shop"' IN BOOLEAN MODE) AND domain LIKE '%shop%'
+
+-- 证书表：反转域名虚拟生成列及索引
+ALTER TABLE certificates
+    ADD COLUMN domain_reversed VARCHAR(255) GENERATED ALWAYS AS (REVERSE(domain)) VIRTUAL,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE certificates
+    ADD INDEX idx_certificates_domain_reversed (domain_reversed),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- 默认停用词表包含 'a'、'com' 等，ngram索引会丢弃包含停用词的词元，建索引前关闭停用词
+SET SESSION innodb_ft_enable_stopword = OFF;
+
+ALTER TABLE certificates
+    ADD FULLTEXT INDEX ft_certificates_domain (domain) WITH PARSER ngram;
+
+ALTER TABLE servers
+    ADD FULLTEXT INDEX ft_servers_name (name) WITH PARSER ngram;
+
+SET SESSION innodb_ft_enable_stopword = ON;
@@ -0,0 +1,28 @@
+-- SSL证书管理器数据库迁移脚本
+-- 版本: 012
+-- 描述: 添加规范化的证书标签表，按标签筛选证书时读取标签表主键而不是解析certificates.tags
+-- 数据库: MySQL 8.0+
+--
+-- 对应查询(models/certificate_tags.py):
+--   c.id IN (SELECT certificate_id FROM certificate_tags WHERE tag = ?)
+-- 负责人/业务单元筛选使用已有的 idx_certificates_owner / idx_certificates_business_unit。
+-- 标签统一为去除空白的小写形式，Certificate.save() 在同一事务中维护标签表。
+
+CREATE TABLE IF NOT EXISTS certificate_tags (
+    tag VARCHAR(64) NOT NULL,
+    certificate_id INT NOT NULL,
+    PRIMARY KEY (tag, certificate_id),
+    INDEX idx_certificate_tags_certificate_id (certificate_id),
+    FOREIGN KEY (certificate_id) REFERENCES certificates(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 从JSON数组格式的tags列回填(非数组或无效JSON按空数组处理，逗号分隔的旧数据在下次保存时同步)
+INSERT IGNORE INTO certificate_tags (tag, certificate_id)
+SELECT LEFT(LOWER(TRIM(jt.tag)), 64), c.id
+FROM certificates c,
+     JSON_TABLE(
+         IF(JSON_VALID(c.tags), IF(JSON_TYPE(c.tags) = 'ARRAY', c.tags, '[]'), '[]'),
+         '$[*]' COLUMNS (tag VARCHAR(255) PATH '$')
+     ) AS jt
+WHERE c.tags IS NOT NULL
+  AND TRIM(jt.tag) <> '';
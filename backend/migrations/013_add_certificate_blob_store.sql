@@ -0,0 +1,18 @@
+-- SSL证书管理器数据库迁移脚本
+-- 版本: 013
+-- 描述: 添加按内容寻址的证书存储表，证书链按DER的SHA-256拆分保存，证书行只保存摘要列表
+-- 数据库: MySQL 8.0+
+--
+-- certificates.chain_digests: 叶子证书在前、按链顺序逗号分隔的SHA-256摘要(最多10个)，
+-- 不为空时 certificates.certificate 为空字符串，读取时由 models/chain_store.py 重新拼接PEM。
+-- 同一个中间证书/根证书在 certificate_blobs 中只保存一份。
+-- 已有证书的转换: python backend/scripts/migrate_certificate_chains.py
+
+ALTER TABLE certificates
+    ADD COLUMN chain_digests VARCHAR(650) CHARACTER SET ascii NULL AFTER port_state_digest;
+
+CREATE TABLE IF NOT EXISTS certificate_blobs (
+    sha256 CHAR(64) NOT NULL PRIMARY KEY,
+    der BLOB NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,18 @@
+-- SSL证书管理器数据库迁移脚本
+-- 版本: 014
+-- 描述: 添加服务器令牌SHA-256摘要列及唯一索引，客户端认证按摘要查询
+-- 数据库: MySQL 8.0+
+--
+-- 对应查询(models/server.py):
+--   SELECT * FROM servers WHERE token_hash = ?
+-- 摘要为小写十六进制，与Python的 hashlib.sha256(token).hexdigest() 一致。
+-- 应用进程按摘要缓存令牌(models/token_cache.py)，令牌重新生成、服务器更新或删除时
+-- 递增 settings 表中的 server_token_cache_version，其他进程据此丢弃缓存。
+
+ALTER TABLE servers
+    ADD COLUMN token_hash CHAR(64) CHARACTER SET ascii NULL AFTER token;
+
+UPDATE servers SET token_hash = SHA2(token, 256) WHERE token_hash IS NULL;
+
+ALTER TABLE servers
+    ADD UNIQUE KEY uk_servers_token_hash (token_hash);
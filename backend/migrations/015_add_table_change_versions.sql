@@ -0,0 +1,102 @@
+-- SSL证书管理器数据库迁移脚本
+-- 版本: 015
+-- 描述: 添加表变更版本及维护触发器，证书/服务器列表和监控统计接口据此生成ETag
+-- 数据库: MySQL 8.0.19+ (使用 VALUES ... AS new 行别名语法)
+--
+-- certificates / servers 插入、删除或列表可见的列变化时，触发器递增对应版本
+-- (models/change_versions.py，本脚本中的触发器与 build_trigger_statements() 的输出一致，
+-- tests/backend/test_conditional_get.py 校验两者相同)。版本按连接ID分散到多行("表名#分片")，
+-- 读取时按表求和。接口收到匹配的 If-None-Match 时直接返回304，不执行列表查询。
+-- 开启binlog且账号没有SUPER权限时需要 log_bin_trust_function_creators = 1 才能创建触发器；
+-- 没有触发器时请不要保留版本行(DELETE FROM table_versions)，否则接口会一直返回304。
+-- 应用启动时只在触发器缺失或定义摘要(settings表 change_version_trigger_signature)变化时重新安装。
+
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name VARCHAR(64) NOT NULL PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+DROP TRIGGER IF EXISTS trg_change_version_certificates_insert;
+DROP TRIGGER IF EXISTS trg_change_version_certificates_update;
+DROP TRIGGER IF EXISTS trg_change_version_certificates_delete;
+DROP TRIGGER IF EXISTS trg_change_version_servers_insert;
+DROP TRIGGER IF EXISTS trg_change_version_servers_update;
+DROP TRIGGER IF EXISTS trg_change_version_servers_delete;
+
+DELIMITER //
+
+CREATE TRIGGER `trg_change_version_certificates_insert` AFTER INSERT ON `certificates` FOR EACH ROW
+INSERT INTO `table_versions` (`table_name`, `version`) VALUES (CONCAT('certificates#', CONNECTION_ID() % 64), 1)
+ON DUPLICATE KEY UPDATE `version` = `version` + 1 //
+
+CREATE TRIGGER `trg_change_version_certificates_update` AFTER UPDATE ON `certificates` FOR EACH ROW
+BEGIN
+    IF NOT (OLD.`domain` <=> NEW.`domain`
+        AND OLD.`type` <=> NEW.`type`
+        AND OLD.`status` <=> NEW.`status`
+        AND OLD.`expires_at` <=> NEW.`expires_at`
+        AND OLD.`server_id` <=> NEW.`server_id`
+        AND OLD.`ca_type` <=> NEW.`ca_type`
+        AND OLD.`monitoring_enabled` <=> NEW.`monitoring_enabled`
+        AND OLD.`monitoring_frequency` <=> NEW.`monitoring_frequency`
+        AND OLD.`alert_enabled` <=> NEW.`alert_enabled`
+        AND OLD.`notes` <=> NEW.`notes`
+        AND OLD.`tags` <=> NEW.`tags`
+        AND OLD.`owner` <=> NEW.`owner`
+        AND OLD.`business_unit` <=> NEW.`business_unit`
+        AND OLD.`dns_status` <=> NEW.`dns_status`
+        AND OLD.`domain_reachable` <=> NEW.`domain_reachable`
+        AND OLD.`http_status_code` <=> NEW.`http_status_code`
+        AND OLD.`monitored_ports` <=> NEW.`monitored_ports`
+        AND OLD.`tls_version` <=> NEW.`tls_version`
+        AND OLD.`cipher_suite` <=> NEW.`cipher_suite`
+        AND OLD.`certificate_chain_valid` <=> NEW.`certificate_chain_valid`
+        AND OLD.`http_redirect_status` <=> NEW.`http_redirect_status`
+        AND OLD.`check_in_progress` <=> NEW.`check_in_progress`
+        AND OLD.`renewal_status` <=> NEW.`renewal_status`
+        AND OLD.`auto_renewal_enabled` <=> NEW.`auto_renewal_enabled`
+        AND OLD.`renewal_days_before` <=> NEW.`renewal_days_before`
+        AND OLD.`import_source` <=> NEW.`import_source`
+        AND OLD.`last_renewal_attempt` <=> NEW.`last_renewal_attempt`) THEN
+        INSERT INTO `table_versions` (`table_name`, `version`) VALUES (CONCAT('certificates#', CONNECTION_ID() % 64), 1)
+        ON DUPLICATE KEY UPDATE `version` = `version` + 1;
+    END IF;
+END //
+
+CREATE TRIGGER `trg_change_version_certificates_delete` AFTER DELETE ON `certificates` FOR EACH ROW
+INSERT INTO `table_versions` (`table_name`, `version`) VALUES (CONCAT('certificates#', CONNECTION_ID() % 64), 1)
+ON DUPLICATE KEY UPDATE `version` = `version` + 1 //
+
+CREATE TRIGGER `trg_change_version_servers_insert` AFTER INSERT ON `servers` FOR EACH ROW
+INSERT INTO `table_versions` (`table_name`, `version`) VALUES (CONCAT('servers#', CONNECTION_ID() % 64), 1)
+ON DUPLICATE KEY UPDATE `version` = `version` + 1 //
+
+CREATE TRIGGER `trg_change_version_servers_update` AFTER UPDATE ON `servers` FOR EACH ROW
+BEGIN
+    IF NOT (OLD.`name` <=> NEW.`name`
+        AND OLD.`ip` <=> NEW.`ip`
+        AND OLD.`os_type` <=> NEW.`os_type`
+        AND OLD.`version` <=> NEW.`version`
+        AND OLD.`auto_renew` <=> NEW.`auto_renew`
+        AND OLD.`user_id` <=> NEW.`user_id`
+        AND OLD.`server_type` <=> NEW.`server_type`
+        AND OLD.`description` <=> NEW.`description`
+        AND OLD.`status` <=> NEW.`status`) THEN
+        INSERT INTO `table_versions` (`table_name`, `version`) VALUES (CONCAT('servers#', CONNECTION_ID() % 64), 1)
+        ON DUPLICATE KEY UPDATE `version` = `version` + 1;
+    END IF;
+END //
+
+CREATE TRIGGER `trg_change_version_servers_delete` AFTER DELETE ON `servers` FOR EACH ROW
+INSERT INTO `table_versions` (`table_name`, `version`) VALUES (CONCAT('servers#', CONNECTION_ID() % 64), 1)
+ON DUPLICATE KEY UPDATE `version` = `version` + 1 //
+
+DELIMITER ;
+
+-- 触发器删除和重建之间的写入没有递增版本，安装后统一递增
+INSERT INTO table_versions (table_name, version) VALUES ('certificates', 1), ('servers', 1) AS new
+ON DUPLICATE KEY UPDATE version = table_versions.version + 1;
+
+INSERT INTO settings (`key`, `value`) VALUES ('change_version_trigger_signature', '6e7da09804995418') AS new
+ON DUPLICATE KEY UPDATE `value` = new.`value`;
@@ -0,0 +1,15 @@
+-- SSL证书管理器数据库迁移脚本
+-- 版本: 016
+-- 描述: 清除服务器明文令牌，数据库只保存令牌的SHA-256摘要
+-- 数据库: MySQL 8.0+
+--
+-- 014 添加 token_hash 后客户端认证只按摘要查询(models/server.py)，应用不再写入 token 列，
+-- 明文令牌只在创建服务器或重新生成令牌时返回一次。
+-- 本脚本先补齐摘要再清空明文。token 列暂时保留为可空列，回滚到上一版本的进程仍可插入服务器；
+-- 确认不再回滚后由后续迁移删除该列及其索引。
+
+UPDATE servers SET token_hash = SHA2(token, 256) WHERE token_hash IS NULL AND token IS NOT NULL;
+
+ALTER TABLE servers MODIFY COLUMN token VARCHAR(255) NULL;
+
+UPDATE servers SET token = NULL;
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+组合索引基准测试脚本
+在独立的基准数据库中生成合成数据(默认50万证书)，分别在迁移前的单列索引和
+迁移007/008的组合索引下执行高频查询，输出执行计划和延迟对比
+
+用法:
+    python backend/scripts/benchmark_indexes.py --certificates 500000 --iterations 200
+    python backend/scripts/benchmark_indexes.py --skip-load --json results.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import datetime
+import statistics
+from typing import Dict, List, Any, Callable, Tuple
+
+import pymysql
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from models.database import Database, DatabaseConfig
+from models.certificate_statistics import TRIGGER_PREFIX
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# 迁移007之前的单列索引: (表, 索引名, 列)
+BASELINE_INDEXES = [
+    ('certificates', 'idx_certificates_server_id', ('server_id',)),
+    ('certificates', 'idx_certificates_status', ('status',)),
+    ('certificates', 'idx_certificates_monitoring_enabled', ('monitoring_enabled',)),
+    ('alerts', 'idx_alerts_certificate_id', ('certificate_id',)),
+    ('domain_monitoring_history', 'idx_domain_monitoring_history_certificate_id', ('certificate_id',)),
+    ('port_monitoring_history', 'idx_port_monitoring_history_certificate_id', ('certificate_id',)),
+]
+
+# 迁移007/008的组合索引
+COMPOSITE_INDEXES = [
+    ('certificates', 'idx_certificates_server_status_expires', ('server_id', 'status', 'expires_at', 'domain', 'ca_type')),
+    ('certificates', 'idx_certificates_status_expires', ('status', 'expires_at')),
+    ('certificates', 'idx_certificates_monitoring_next_check', ('monitoring_enabled', 'next_check_at')),
+    ('alerts', 'idx_alerts_certificate_status_type', ('certificate_id', 'status', 'type', 'created_at')),
+    ('domain_monitoring_history', 'idx_domain_monitoring_history_certificate_created', ('certificate_id', 'created_at')),
+    ('port_monitoring_history', 'idx_port_monitoring_history_certificate_created', ('certificate_id', 'created_at')),
+]
+
+STATUSES = ['valid'] * 7 + ['expired', 'pending', 'revoked']
+ALERT_TYPES = ['expiry', 'dns_error', 'domain_unreachable', 'port_error']
+
+
+class IndexBenchmark:
+    """组合索引基准测试器"""
+
+    def __init__(self, config: DatabaseConfig, servers: int, certificates: int,
+                 history_per_certificate: int, alert_ratio: float, iterations: int, seed: int):
+        """初始化基准测试器"""
+        self.config = config
+        self.db = Database(config)
+        self.servers = servers
+        self.certificates = certificates
+        self.history_per_certificate = history_per_certificate
+        self.alert_ratio = alert_ratio
+        self.iterations = iterations
+        self.random = random.Random(seed)
+        self.now = datetime.datetime.now().replace(microsecond=0)
+
+    def prepare_database(self) -> None:
+        """创建基准数据库和表结构(不安装统计触发器，避免影响数据加载)"""
+        conn = pymysql.connect(host=self.config.host, port=self.config.port,
+                               user=self.config.username, password=self.config.password,
+                               charset=self.config.charset)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{self.config.database}` "
+                               f"DEFAULT CHARSET utf8mb4 COLLATE utf8mb4_unicode_ci")
+        finally:
+            conn.close()
+
+        self.db.connect()
+        self.db.create_tables()
+        self.db.init_default_data()
+        for event in ('insert', 'update', 'delete'):
+            self.db.execute(f"DROP TRIGGER IF EXISTS `{TRIGGER_PREFIX}_{event}`")
+        self.db.commit()
+
+    def _insert_chunks(self, table: str, columns: List[str], rows, chunk_size: int = 5000) -> None:
+        """分批插入数据"""
+        sql = f"INSERT INTO `{table}` ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})"
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                self.db.executemany(sql, chunk)
+                self.db.commit()
+                chunk = []
+        if chunk:
+            self.db.executemany(sql, chunk)
+            self.db.commit()
+
+    def load_data(self, reload: bool = False) -> None:
+        """生成合成数据"""
+        existing = self.db.fetchone("SELECT COUNT(*) as count FROM certificates")['count']
+        if existing >= self.certificates and not reload:
+            logger.info(f"基准数据已存在({existing}条证书)，跳过数据加载")
+            return
+
+        logger.info("清空基准数据...")
+        for table in ('port_monitoring_history', 'domain_monitoring_history', 'alerts',
+                      'certificate_deployments', 'certificates', 'servers'):
+            self.db.execute(f"DELETE FROM `{table}`")
+        self.db.commit()
+
+        user_id = self.db.fetchone("SELECT id FROM users ORDER BY id LIMIT 1")['id']
+        started = time.perf_counter()
+
+        logger.info(f"生成 {self.servers} 台服务器...")
+        self._insert_chunks('servers', ['name', 'token', 'user_id', 'status'], (
+            (f'bench-server-{index}', f'bench-token-{index:08d}', user_id, 'online')
+            for index in range(self.servers)
+        ))
+        server_ids = [row['id'] for row in self.db.fetchall("SELECT id FROM servers")]
+
+        logger.info(f"生成 {self.certificates} 条证书...")
+
+        def certificates():
+            for index in range(self.certificates):
+                expires_at = self.now + datetime.timedelta(days=self.random.randint(-60, 400),
+                                                           seconds=self.random.randint(0, 86399))
+                monitoring_enabled = self.random.random() < 0.8
+                last_dns_check = next_check_at = None
+                if monitoring_enabled and self.random.random() < 0.95:
+                    last_dns_check = self.now - datetime.timedelta(seconds=self.random.randint(0, 7200))
+                    next_check_at = last_dns_check + datetime.timedelta(seconds=3600)
+                yield (
+                    f'host{index}.bench{index % 997}.example.com',
+                    self.random.choice(['single', 'single', 'wildcard', 'multi']),
+                    self.random.choice(STATUSES),
+                    expires_at,
+                    self.random.choice(server_ids),
+                    'letsencrypt', '', '',
+                    monitoring_enabled,
+                    last_dns_check,
+                    next_check_at
+                )
+
+        self._insert_chunks('certificates', [
+            'domain', 'type', 'status', 'expires_at', 'server_id', 'ca_type',
+            'private_key', 'certificate', 'monitoring_enabled', 'last_dns_check', 'next_check_at'
+        ], certificates())
+
+        bounds = self.db.fetchone("SELECT MIN(id) as min_id, MAX(id) as max_id FROM certificates")
+        self.certificate_range = (bounds['min_id'], bounds['max_id'])
+
+        history_rows = self.certificates * self.history_per_certificate
+        logger.info(f"生成 {history_rows} 条域名监控历史和端口监控历史...")
+
+        def history(port: bool):
+            for _ in range(history_rows):
+                certificate_id = self.random.randint(*self.certificate_range)
+                created_at = self.now - datetime.timedelta(seconds=self.random.randint(0, 90 * 86400))
+                status = 'success' if self.random.random() < 0.9 else 'failed'
+                if port:
+                    yield (certificate_id, 443, 'ssl', status, created_at)
+                else:
+                    yield (certificate_id, 'dns', status, created_at)
+
+        self._insert_chunks('domain_monitoring_history',
+                            ['certificate_id', 'check_type', 'status', 'created_at'], history(False))
+        self._insert_chunks('port_monitoring_history',
+                            ['certificate_id', 'port', 'check_type', 'status', 'created_at'], history(True))
+
+        alert_rows = int(self.certificates * self.alert_ratio)
+        logger.info(f"生成 {alert_rows} 条告警...")
+        self._insert_chunks('alerts', ['type', 'message', 'status', 'certificate_id', 'created_at'], (
+            (
+                self.random.choice(ALERT_TYPES), 'benchmark alert',
+                'active' if self.random.random() < 0.3 else 'resolved',
+                self.random.randint(*self.certificate_range),
+                self.now - datetime.timedelta(seconds=self.random.randint(0, 30 * 86400))
+            )
+            for _ in range(alert_rows)
+        ))
+
+        logger.info(f"数据加载完成，耗时 {time.perf_counter() - started:.1f}s")
+
+    def _existing_indexes(self, table: str) -> set:
+        """获取表上已有的索引名"""
+        rows = self.db.fetchall(
+            """SELECT DISTINCT INDEX_NAME as name FROM information_schema.STATISTICS
+               WHERE TABLE_SCHEMA = ? AND TABLE_NAME = ?""",
+            (self.config.database, table)
+        )
+        return {row['name'] for row in rows}
+
+    def apply_index_set(self, add: List[Tuple[str, str, Tuple[str, ...]]],
+                        drop: List[Tuple[str, str, Tuple[str, ...]]]) -> None:
+        """切换索引集合(先建后删，保证外键始终有可用索引)"""
+        for table, name, columns in add:
+            if name not in self._existing_indexes(table):
+                logger.info(f"创建索引 {table}.{name}")
+                self.db.execute(f"ALTER TABLE `{table}` ADD INDEX `{name}` ({', '.join(columns)})")
+        for table, name, _ in drop:
+            if name in self._existing_indexes(table):
+                logger.info(f"删除索引 {table}.{name}")
+                self.db.execute(f"ALTER TABLE `{table}` DROP INDEX `{name}`")
+        for table in sorted({table for table, _, _ in add + drop}):
+            self.db.fetchall(f"ANALYZE TABLE `{table}`")
+
+    def queries(self) -> List[Tuple[str, str, Callable[[], tuple]]]:
+        """高频查询: (名称, SQL, 参数生成函数)"""
+        if not hasattr(self, 'certificate_range'):
+            bounds = self.db.fetchone("SELECT MIN(id) as min_id, MAX(id) as max_id FROM certificates")
+            self.certificate_range = (bounds['min_id'], bounds['max_id'])
+        server_bounds = self.db.fetchone("SELECT MIN(id) as min_id, MAX(id) as max_id FROM servers")
+        server_range = (server_bounds['min_id'], server_bounds['max_id'])
+        renew_date = self.now + datetime.timedelta(days=15)
+
+        return [
+            ('client_tasks',
+             "SELECT id, domain, ca_type FROM certificates "
+             "WHERE server_id = ? AND status = 'valid' AND expires_at <= ?",
+             lambda: (self.random.randint(*server_range), renew_date)),
+            ('expiring_list',
+             "SELECT c.*, s.name as server_name FROM certificates c LEFT JOIN servers s ON c.server_id = s.id "
+             "WHERE c.status = 'valid' AND c.expires_at <= ? ORDER BY c.expires_at ASC LIMIT 10",
+             lambda: (renew_date,)),
+            ('expiring_count',
+             "SELECT COUNT(*) as count FROM certificates WHERE status = 'valid' AND expires_at <= ?",
+             lambda: (renew_date,)),
+            ('scheduler_due',
+             "SELECT id, domain, monitoring_frequency, last_dns_check FROM certificates "
+             "WHERE monitoring_enabled = 1 AND (next_check_at IS NULL OR next_check_at <= ?) "
+             "ORDER BY next_check_at ASC LIMIT 50",
+             lambda: (self.now,)),
+            ('domain_history',
+             "SELECT * FROM domain_monitoring_history WHERE certificate_id = ? "
+             "ORDER BY created_at DESC, id DESC LIMIT 20",
+             lambda: (self.random.randint(*self.certificate_range),)),
+            ('port_history',
+             "SELECT * FROM port_monitoring_history WHERE certificate_id = ? "
+             "ORDER BY created_at DESC, id DESC LIMIT 20",
+             lambda: (self.random.randint(*self.certificate_range),)),
+            ('active_alert',
+             "SELECT id, type, message, status, created_at FROM alerts "
+             "WHERE certificate_id = ? AND type = ? AND status = 'active' ORDER BY created_at DESC LIMIT 1",
+             lambda: (self.random.randint(*self.certificate_range), self.random.choice(ALERT_TYPES))),
+        ]
+
+    def measure(self) -> Dict[str, Dict[str, Any]]:
+        """执行查询并收集执行计划和延迟"""
+        results = {}
+        for name, sql, make_params in self.queries():
+            plan = self.db.fetchall(f"EXPLAIN {sql}", make_params())
+            # 预热
+            for _ in range(min(5, self.iterations)):
+                self.db.fetchall(sql, make_params())
+
+            latencies = []
+            for _ in range(self.iterations):
+                params = make_params()
+                started = time.perf_counter()
+                self.db.fetchall(sql, params)
+                latencies.append((time.perf_counter() - started) * 1000)
+            latencies.sort()
+
+            results[name] = {
+                'plan': [
+                    {key: row.get(key) for key in ('table', 'type', 'key', 'rows', 'filtered', 'Extra')}
+                    for row in plan
+                ],
+                'p50_ms': round(statistics.median(latencies), 3),
+                'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1], 3),
+                'max_ms': round(latencies[-1], 3)
+            }
+        return results
+
+    def run(self, skip_load: bool = False, reload: bool = False) -> Dict[str, Any]:
+        """运行完整基准测试"""
+        self.prepare_database()
+        if not skip_load:
+            self.load_data(reload)
+
+        logger.info("切换到迁移前的单列索引...")
+        self.apply_index_set(BASELINE_INDEXES, COMPOSITE_INDEXES)
+        before = self.measure()
+
+        logger.info("切换到组合索引...")
+        self.apply_index_set(COMPOSITE_INDEXES, BASELINE_INDEXES)
+        after = self.measure()
+
+        self.db.close()
+        return {'before': before, 'after': after}
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    """打印对比报告"""
+    print()
+    print(f"{'查询':<16}{'索引(前)':<48}{'p50前(ms)':>12}{'p95前(ms)':>12}"
+          f"{'索引(后)':<52}{'p50后(ms)':>12}{'p95后(ms)':>12}")
+    for name, before in results['before'].items():
+        after = results['after'][name]
+        before_keys = ','.join(str(row['key']) for row in before['plan'])
+        after_keys = ','.join(str(row['key']) for row in after['plan'])
+        print(f"{name:<16}{before_keys:<48}{before['p50_ms']:>12}{before['p95_ms']:>12}  "
+              f"{after_keys:<50}{after['p50_ms']:>12}{after['p95_ms']:>12}")
+    print()
+    for phase in ('before', 'after'):
+        print(f"== 执行计划 ({phase}) ==")
+        for name, result in results[phase].items():
+            for row in result['plan']:
+                print(f"  {name:<16} table={row['table']} type={row['type']} key={row['key']} "
+                      f"rows={row['rows']} filtered={row['filtered']} extra={row['Extra']}")
+        print()
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='组合索引基准测试')
+    parser.add_argument('--database', default=os.getenv('MYSQL_BENCH_DATABASE', 'ssl_manager_bench'),
+                        help='基准数据库名(会被清空和重建数据，不要指向生产库)')
+    parser.add_argument('--servers', type=int, default=2000, help='服务器数量')
+    parser.add_argument('--certificates', type=int, default=500000, help='证书数量')
+    parser.add_argument('--history-per-certificate', type=int, default=2, help='每个证书的监控历史条数')
+    parser.add_argument('--alert-ratio', type=float, default=0.2, help='告警数量与证书数量的比例')
+    parser.add_argument('--iterations', type=int, default=200, help='每个查询的执行次数')
+    parser.add_argument('--seed', type=int, default=42, help='随机数种子')
+    parser.add_argument('--skip-load', action='store_true', help='跳过数据生成，使用已有数据')
+    parser.add_argument('--reload', action='store_true', help='强制重新生成数据')
+    parser.add_argument('--json', dest='json_file', help='将结果写入JSON文件')
+    args = parser.parse_args()
+
+    config = DatabaseConfig()
+    if args.database == config.database:
+        parser.error("基准数据库不能与应用数据库相同")
+    config.database = args.database
+
+    benchmark = IndexBenchmark(config, args.servers, args.certificates, args.history_per_certificate,
+                               args.alert_ratio, args.iterations, args.seed)
+    results = benchmark.run(skip_load=args.skip_load, reload=args.reload)
+    print_report(results)
+
+    if args.json_file:
+        with open(args.json_file, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2, default=str)
+        logger.info(f"结果已写入 {args.json_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+证书模型行对象微基准测试
+对比关键字参数构造、字典实例和槽位直接填充三种方式的单行创建/序列化耗时和内存占用(不需要数据库)
+
+用法:
+    python backend/scripts/benchmark_model_hydration.py --rows 100000
+"""
+
+import os
+import sys
+import gc
+import time
+import types
+import argparse
+import datetime
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from models.certificate import Certificate
+
+
+def make_rows(count: int) -> List[Dict[str, Any]]:
+    """生成与列表查询结果相同形状的DictCursor行"""
+    now = datetime.datetime.now().replace(microsecond=0)
+    rows = []
+    for index in range(count):
+        row = {column: None for column in Certificate.SUMMARY_COLUMNS}
+        row.update({
+            'id': index + 1,
+            'domain': f'host{index}.example.com',
+            'type': 'single',
+            'status': 'valid',
+            'created_at': now,
+            'expires_at': now + datetime.timedelta(days=index % 365),
+            'server_id': index % 100 + 1,
+            'ca_type': 'letsencrypt',
+            'updated_at': now,
+            'monitoring_enabled': 1,
+            'monitoring_frequency': 3600,
+            'alert_enabled': 1,
+            'last_dns_check': now,
+            'next_check_at': now + datetime.timedelta(hours=1),
+            'server_name': f'server-{index % 100 + 1}'
+        })
+        rows.append(row)
+    return rows
+
+
+def keyword_init(row: Dict[str, Any]) -> Certificate:
+    """原有方式: 弹出关联列后 cls(**row)"""
+    row = dict(row)
+    server_name = row.pop('server_name', None)
+    cert = Certificate(**row)
+    cert.server_name = server_name
+    return cert
+
+
+def namespace_record(row: Dict[str, Any]) -> types.SimpleNamespace:
+    """对照: 带实例字典的通用对象"""
+    return types.SimpleNamespace(**row)
+
+
+def measure_time(rows: List[Dict[str, Any]], build: Callable[[Dict[str, Any]], Any],
+                 serialize: bool, repeat: int) -> float:
+    """返回最快一轮的单行耗时(微秒)"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        if serialize:
+            for row in rows:
+                build(row).to_dict()
+        else:
+            for row in rows:
+                build(row)
+        best = min(best, time.perf_counter() - started)
+    return best / len(rows) * 1e6
+
+
+def measure_memory(rows: List[Dict[str, Any]], build: Callable[[Dict[str, Any]], Any]) -> float:
+    """返回保留所有对象时的单行内存占用(字节，不含共享的列值)"""
+    gc.collect()
+    tracemalloc.start()
+    objects = [build(row) for row in rows]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return size / len(rows)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='证书模型行对象微基准测试')
+    parser.add_argument('--rows', type=int, default=100000, help='行数')
+    parser.add_argument('--repeat', type=int, default=5, help='重复轮数(取最快一轮)')
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    cases = [
+        ('cls(**row)', keyword_init),
+        ('Certificate.from_row', Certificate.from_row),
+    ]
+
+    print(f"行数: {args.rows}, 列数: {len(Certificate.SUMMARY_COLUMNS)}")
+    print(f"{'方式':<24}{'创建(us/行)':>14}{'创建+to_dict(us/行)':>22}{'内存(B/行)':>14}")
+    for name, build in cases:
+        hydrate = measure_time(rows, build, False, args.repeat)
+        total = measure_time(rows, build, True, args.repeat)
+        memory = measure_memory(rows, build)
+        print(f"{name:<24}{hydrate:>14.2f}{total:>22.2f}{memory:>14.0f}")
+
+    hydrate = measure_time(rows, namespace_record, False, args.repeat)
+    memory = measure_memory(rows, namespace_record)
+    print(f"{'SimpleNamespace(对照)':<24}{hydrate:>14.2f}{'-':>22}{memory:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+证书链存储迁移工具
+把certificates.certificate中的PEM证书链转换为证书存储(certificate_blobs)中的摘要引用，
+并可清理没有证书行引用的证书。不是纯证书PEM的内容保持原样。
+
+用法:
+    python backend/scripts/migrate_certificate_chains.py --batch-size 500
+    python backend/scripts/migrate_certificate_chains.py --dry-run
+    python backend/scripts/migrate_certificate_chains.py --gc
+"""
+
+import os
+import sys
+import logging
+import argparse
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from models.database import db
+from models.chain_store import chain_store, split_pem_chain, CHAIN_COLUMN
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def migrate(batch_size: int, dry_run: bool = False) -> dict:
+    """按id顺序分批转换尚未引用证书存储的证书行，每批一个事务"""
+    stats = {'scanned': 0, 'converted': 0, 'skipped': 0, 'bytes_before': 0}
+    last_id = 0
+
+    while True:
+        rows = db.fetchall(
+            f"""SELECT id, certificate FROM certificates
+                WHERE id > ? AND {CHAIN_COLUMN} IS NULL AND certificate <> ''
+                ORDER BY id LIMIT ?""",
+            (last_id, batch_size)
+        )
+        if not rows:
+            break
+        last_id = rows[-1]['id']
+        stats['scanned'] += len(rows)
+
+        convertible = [row for row in rows if split_pem_chain(row['certificate']) is not None]
+        stats['skipped'] += len(rows) - len(convertible)
+        stats['bytes_before'] += sum(len(row['certificate']) for row in convertible)
+        if dry_run or not convertible:
+            stats['converted'] += len(convertible)
+            continue
+
+        with db.transaction():
+            references = chain_store.store_many(db, [row['certificate'] for row in convertible])
+            for row, reference in zip(convertible, references):
+                db.update('certificates', {'certificate': '', CHAIN_COLUMN: reference}, 'id = ?', (row['id'],))
+        stats['converted'] += len(convertible)
+        logger.info(f"已转换到证书ID {last_id}，累计 {stats['converted']} 条")
+
+    return stats
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='证书链存储迁移工具')
+    parser.add_argument('--batch-size', type=int, default=500, help='每批转换的证书数量')
+    parser.add_argument('--dry-run', action='store_true', help='只统计可转换的证书，不写入数据库')
+    parser.add_argument('--gc', action='store_true', help='清理没有证书行引用的证书')
+    parser.add_argument('--grace-hours', type=int, default=24, help='清理时保留最近创建的证书(小时)')
+    args = parser.parse_args()
+
+    db.connect()
+    try:
+        stats = migrate(args.batch_size, args.dry_run)
+        logger.info(f"扫描 {stats['scanned']} 条，{'可转换' if args.dry_run else '已转换'} {stats['converted']} 条，"
+                    f"保持原样 {stats['skipped']} 条，原证书链文本 {stats['bytes_before']} 字节")
+
+        if args.gc and not args.dry_run:
+            with db.transaction():
+                deleted = chain_store.collect_garbage(db, args.grace_hours)
+            logger.info(f"已清理未引用的证书 {deleted} 个")
+
+        row = db.fetchone("SELECT COUNT(*) AS blobs, COALESCE(SUM(LENGTH(der)), 0) AS bytes FROM certificate_blobs")
+        logger.info(f"证书存储: {row['blobs']} 个证书，{row['bytes']} 字节")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
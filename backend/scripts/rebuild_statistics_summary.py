@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+证书统计汇总表重建工具
+触发器正常安装时汇总表由触发器增量维护，应用启动时不再重建；
+手工修改过证书数据(关闭触发器导入、直接改库等)或统计出现偏差时用本工具根据证书表全量重建。
+
+用法:
+    python backend/scripts/rebuild_statistics_summary.py
+    python backend/scripts/rebuild_statistics_summary.py --reinstall
+"""
+
+import os
+import sys
+import logging
+import argparse
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from models.database import db
+from models.certificate_statistics import SUMMARY_TABLE, install_statistics_summary, rebuild_summary
+from models.trigger_install import signature_key
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='证书统计汇总表重建工具')
+    parser.add_argument('--reinstall', action='store_true', help='重新创建维护触发器(同时重建汇总数据)')
+    args = parser.parse_args()
+
+    db.connect()
+    try:
+        with db.use_primary():
+            if args.reinstall:
+                # 清除定义摘要，安装时视为定义已变化
+                with db.transaction():
+                    db.execute("DELETE FROM `settings` WHERE `key` = ?",
+                               (signature_key('certificate_statistics'),)).close()
+                if not install_statistics_summary(db):
+                    logger.error("统计汇总触发器安装失败")
+                    sys.exit(1)
+            else:
+                with db.transaction():
+                    rebuild_summary(db)
+
+            row = db.fetchone(f"SELECT COUNT(*) AS buckets FROM `{SUMMARY_TABLE}`")
+            logger.info(f"统计汇总表已重建，共 {row['buckets']} 个分桶")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,7 @@ import datetime
 import secrets
 import jwt
 from typing import Dict, List, Any, Optional
-from flask import Flask, request, jsonify, g
+from flask import Flask, request, jsonify, g, stream_with_context
 from functools import wraps
 
 # 导入模型
@@ -15,7 +15,17 @@ from models.database import db, init_db, DatabaseConfig
 from models.user import User
 from models.server import Server
 from models.certificate import Certificate
+from models.principal_cache import principal_cache
+from models.token_cache import server_token_cache
+from models.change_versions import ChangeVersions
 from models.alert import Alert
+from models.pagination import KeysetPaginator, InvalidCursorError, count_cache
+from models.query_metrics import query_metrics
+from models.identity_map import identity_map
+from models.certificate_tags import parse_tag_args
+from models.monitoring_history import (
+    MonitoringHistory, HISTORY_SOURCES, InvalidHistoryRangeError, choose_granularity
+)
 
 # 导入安全模块
 from utils.validators import InputValidator, DataSanitizer, validate_request_data, sanitize_request_data
@@ -37,6 +47,8 @@ from utils.error_handler import (
 # 导入配置和日志模块
 from utils.config_manager import get_config, get_security_config, get_logging_config
 from utils.logging_config import setup_logging, init_logging_middleware, get_logger
+from utils.http_cache import conditional_get
+from utils.streaming import stream_json, streaming_requested, wants_ndjson
 
 # 导入服务模块
 from services.certificate_service import certificate_service
@@ -93,6 +105,36 @@ except Exception as e:
     logger.error(f"MySQL数据库初始化失败: {e}")
     raise
 
+@app.before_request
+def begin_query_tracking():
+    """开始统计本次请求的数据库查询，并开启请求级标识映射"""
+    query_metrics.begin_request()
+    identity_map.begin()
+
+@app.after_request
+def report_query_count(response):
+    """在响应头中返回本次请求的查询次数，查询过多时记录日志(便于发现N+1查询)"""
+    summary = query_metrics.current_request()
+    if summary is not None:
+        response.headers['X-DB-Query-Count'] = str(summary['queries'])
+        response.headers['X-DB-Query-Time'] = f"{summary['duration'] * 1000:.1f}ms"
+        if query_metrics.request_query_warning and summary['queries'] > query_metrics.request_query_warning:
+            get_logger('database.request_queries').performance(
+                f"请求 {request.method} {request.path} 执行了 {summary['queries']} 条SQL",
+                summary['duration'],
+                request_id=getattr(g, 'request_id', None),
+                endpoint=request.endpoint,
+                queries=summary['queries']
+            )
+    return response
+
+@app.teardown_appcontext
+def release_db_connection(exception=None):
+    """请求结束时将当前作用域的数据库连接归还连接池"""
+    query_metrics.end_request()
+    identity_map.end()
+    db.end_request()
+
 # 初始化安全模块
 init_csrf_protection(app)
 init_rate_limiter(app)
@@ -139,7 +181,7 @@ def login_required(f):
                 'data': None
             }), 401
         
-        user = User.get_by_id(payload['user_id'])
+        user = User.get_principal(payload['user_id'])
         if not user:
             return jsonify({
                 'code': 401,
@@ -188,6 +230,146 @@ def server_token_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def use_cursor_pagination() -> bool:
+    """请求是否使用游标分页(传入cursor参数或pagination=cursor)"""
+    return 'cursor' in request.args or request.args.get('pagination') == 'cursor'
+
+def include_total_requested() -> bool:
+    """游标分页时是否返回(缓存的)总数"""
+    return request.args.get('include_total', 'false').lower() in ('true', '1')
+
+def server_list_items(servers: List[Server]) -> List[Dict[str, Any]]:
+    """服务器列表项，所有服务器的证书数量通过一次分组查询获取"""
+    counts = Server.get_certificate_counts([server.id for server in servers])
+    items = []
+    for server in servers:
+        item = server.to_dict()
+        item['certificates_count'] = counts.get(server.id, 0)
+        items.append(item)
+    return items
+
+def invalid_cursor_response(error: ValueError):
+    """无效游标或查询范围响应"""
+    return jsonify({
+        'code': 400,
+        'message': str(error),
+        'data': None
+    }), 400
+
+def ownership_filter_args() -> Dict[str, Any]:
+    """读取标签/负责人/业务单元筛选参数(tag可重复或逗号分隔)"""
+    filters = {}
+    tags = parse_tag_args(request.args.getlist('tag'))
+    if tags:
+        filters['tags'] = tags
+    for name in ('owner', 'business_unit'):
+        if request.args.get(name):
+            filters[name] = request.args.get(name)
+    return filters
+
+def search_filter_args() -> Dict[str, Any]:
+    """读取域名搜索模式参数(search_mode=fragment 时关键词按域名片段查询)"""
+    if request.args.get('search_mode') == 'fragment':
+        return {'search_mode': 'fragment'}
+    return {}
+
+# 监控历史按(created_at, id)倒序游标分页
+history_paginator = KeysetPaginator([('created_at', 'created_at'), ('id', 'id')], descending=True)
+
+# 监控历史分区维护、汇总查询
+monitoring_history = MonitoringHistory(db)
+
+# 轮询接口的ETag按证书表和服务器表的变更版本生成
+change_versions = ChangeVersions(db, float(os.getenv('ETAG_VERSION_CHECK_INTERVAL', 1)))
+LIST_ETAG_TABLES = ('certificates', 'servers')
+
+def parse_history_time(name: str) -> Optional[datetime.datetime]:
+    """解析ISO格式的时间参数，带时区的转换为本地时间(与created_at一致)"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise InvalidHistoryRangeError(f"{name} 不是有效的ISO时间: {value}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+def query_monitoring_history(source: str, certificate_id: int, conditions: List[str], params: List[Any],
+                             port: int = None) -> Dict[str, Any]:
+    """查询监控历史
+
+    指定 start_time/end_time 时按时间范围查询，granularity 为 auto(默认)时
+    2天以内读取原始记录，更长的范围读取小时/天汇总(不分页，不区分check_type)。
+    原始记录支持游标分页和页码分页。
+    """
+    start_time = parse_history_time('start_time')
+    end_time = parse_history_time('end_time')
+    granularity = request.args.get('granularity', 'auto')
+    if granularity not in ('auto', 'raw', 'hour', 'day'):
+        raise InvalidHistoryRangeError(f"不支持的汇总粒度: {granularity}")
+
+    if start_time or end_time:
+        end_time = end_time or datetime.datetime.now()
+        start_time = start_time or end_time - datetime.timedelta(days=1)
+        if start_time >= end_time:
+            raise InvalidHistoryRangeError("start_time 必须早于 end_time")
+        if granularity == 'auto':
+            granularity = choose_granularity(start_time, end_time)
+
+        if granularity != 'raw':
+            return {
+                'granularity': granularity,
+                'start_time': start_time.isoformat(),
+                'end_time': end_time.isoformat(),
+                'rollups': monitoring_history.query_rollups(
+                    source, certificate_id, start_time, end_time, granularity, port=port
+                )
+            }
+
+        conditions = conditions + ['created_at >= ?', 'created_at < ?']
+        params = params + [start_time, end_time]
+    elif granularity not in ('auto', 'raw'):
+        raise InvalidHistoryRangeError("按汇总粒度查询需要指定 start_time 或 end_time")
+
+    table = HISTORY_SOURCES[source].table
+    per_page = min(request.args.get('per_page', request.args.get('limit', 20, type=int), type=int), 100)
+    where_clause = ' AND '.join(conditions)
+    count_query = f"SELECT COUNT(*) as count FROM {table} WHERE {where_clause}"
+
+    db.connect()
+    try:
+        if use_cursor_pagination():
+            history_records, pagination = history_paginator.paginate(
+                db, f"SELECT * FROM {table}", conditions, params,
+                request.args.get('cursor') or None, per_page
+            )
+            if include_total_requested():
+                pagination['total'] = count_cache.get_count(db, count_query, tuple(params))
+            return {'history': history_records, 'pagination': pagination}
+
+        page = request.args.get('page', 1, type=int)
+        total_result = db.fetchone(count_query, tuple(params))
+        total = total_result['count'] if total_result else 0
+
+        offset = (page - 1) * per_page
+        history_records = db.fetchall(
+            f"SELECT * FROM {table} WHERE {where_clause} ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+            tuple(params + [per_page, offset])
+        )
+        return {
+            'history': history_records,
+            'pagination': {
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': (total + per_page - 1) // per_page
+            }
+        }
+    finally:
+        db.close()
+
 # 路由
 @app.route('/api/v1/auth/login', methods=['POST'])
 @strict_rate_limit  # 严格限流：每分钟5次，每小时20次
@@ -444,6 +626,7 @@ def delete_user(user_id):
 
 @app.route('/api/v1/servers', methods=['GET'])
 @login_required
+@conditional_get(change_versions, *LIST_ETAG_TABLES)
 def get_servers():
     """获取服务器列表"""
     page = int(request.args.get('page', 1))
@@ -453,6 +636,21 @@ def get_servers():
     # 管理员可以查看所有服务器，普通用户只能查看自己的服务器
     user_id = None if g.user.is_admin() else g.user.id
     
+    if use_cursor_pagination():
+        try:
+            servers, pagination = Server.get_page(request.args.get('cursor') or None, limit, keyword,
+                                                  user_id, include_total_requested())
+        except InvalidCursorError as e:
+            return invalid_cursor_response(e)
+        return jsonify({
+            'code': 200,
+            'message': 'success',
+            'data': {
+                'items': server_list_items(servers),
+                'pagination': pagination
+            }
+        })
+    
     servers, total = Server.get_all(page, limit, keyword, user_id)
     
     return jsonify({
@@ -462,7 +660,7 @@ def get_servers():
             'total': total,
             'page': page,
             'limit': limit,
-            'items': [server.to_dict() for server in servers]
+            'items': server_list_items(servers)
         }
     })
 
@@ -704,6 +902,7 @@ def server_heartbeat():
 
 @app.route('/api/v1/certificates', methods=['GET'])
 @login_required
+@conditional_get(change_versions, *LIST_ETAG_TABLES)
 def get_certificates():
     """获取证书列表"""
     page = int(request.args.get('page', 1))
@@ -724,7 +923,31 @@ def get_certificates():
                     'data': None
                 }), 403
     
-    certificates, total = Certificate.get_all(page, limit, keyword, status, server_id)
+    filters = {**ownership_filter_args(), **search_filter_args()}
+    if streaming_requested():
+        # 流式输出全部匹配的证书(不分页)
+        return stream_json(
+            Certificate.iter_all(keyword, status, server_id, **filters),
+            serialize=lambda cert: cert.to_dict()
+        )
+    
+    if use_cursor_pagination():
+        try:
+            certificates, pagination = Certificate.get_page(request.args.get('cursor') or None, limit, keyword,
+                                                            status, server_id, include_total_requested(),
+                                                            **filters)
+        except InvalidCursorError as e:
+            return invalid_cursor_response(e)
+        return jsonify({
+            'code': 200,
+            'message': 'success',
+            'data': {
+                'items': [cert.to_dict() for cert in certificates],
+                'pagination': pagination
+            }
+        })
+    
+    certificates, total = Certificate.get_all(page, limit, keyword, status, server_id, **filters)
     
     return jsonify({
         'code': 200,
@@ -890,8 +1113,8 @@ def update_certificate(cert_id):
     
     # 只允许更新特定字段
     if 'auto_renew' in data:
-        # 这里假设证书表中有auto_renew字段，实际可能需要修改数据库设计
-        cert.auto_renew = data['auto_renew']
+        # 对应证书表的auto_renewal_enabled字段
+        cert.auto_renewal_enabled = bool(data['auto_renew'])
     
     cert.save()
     
@@ -901,7 +1124,7 @@ def update_certificate(cert_id):
         'data': {
             'id': cert.id,
             'domain': cert.domain,
-            'auto_renew': getattr(cert, 'auto_renew', None),
+            'auto_renew': cert.auto_renewal_enabled,
             'updated_at': cert.updated_at
         }
     })
@@ -1600,6 +1823,9 @@ def get_monitoring_history(monitoring_id):
                 'data': None
             }), 403
 
+        if streaming_requested():
+            return stream_json(domain_monitoring_service.iter_monitoring_history(monitoring_id))
+
         # 获取监控历史
         result = domain_monitoring_service.get_monitoring_history(
             monitoring_id, page, limit
@@ -1926,6 +2152,20 @@ def resolve_alert(alert_id):
             'data': None
         }), 500
 
+def alert_history_item(alert) -> Dict[str, Any]:
+    """告警历史列表项"""
+    return {
+        'id': alert.id,
+        'rule_id': alert.rule_id,
+        'alert_type': alert.alert_type.value,
+        'severity': alert.severity.value,
+        'title': alert.title,
+        'description': alert.description,
+        'status': alert.status,
+        'created_at': alert.created_at.isoformat() if alert.created_at else None,
+        'resolved_at': alert.resolved_at.isoformat() if alert.resolved_at else None
+    }
+
 @app.route('/api/v1/alerts/history', methods=['GET'])
 @login_required
 @admin_required
@@ -1935,24 +2175,14 @@ def get_alert_history():
         limit = request.args.get('limit', 100, type=int)
         alerts = alert_manager.get_alert_history(limit)
 
+        if streaming_requested():
+            return stream_json(alerts, key='alerts', serialize=alert_history_item)
+
         return jsonify({
             'code': 200,
             'message': 'success',
             'data': {
-                'alerts': [
-                    {
-                        'id': alert.id,
-                        'rule_id': alert.rule_id,
-                        'alert_type': alert.alert_type.value,
-                        'severity': alert.severity.value,
-                        'title': alert.title,
-                        'description': alert.description,
-                        'status': alert.status,
-                        'created_at': alert.created_at.isoformat() if alert.created_at else None,
-                        'resolved_at': alert.resolved_at.isoformat() if alert.resolved_at else None
-                    }
-                    for alert in alerts
-                ]
+                'alerts': [alert_history_item(alert) for alert in alerts]
             }
         })
 
@@ -2105,74 +2335,13 @@ def sync_certificates():
             'data': None
         }), 400
     
-    server = g.server
-    certificates = data['certificates']
-    
-    synced = 0
-    new_certs = 0
-    updated_certs = 0
-    
-    for cert_data in certificates:
-        domain = cert_data.get('domain')
-        if not domain:
-            continue
-        
-        # 查找现有证书
-        cert = Certificate.get_by_domain(domain, server.id)
-        
-        if cert:
-            # 更新现有证书
-            cert.type = cert_data.get('type', cert.type)
-            cert.expires_at = cert_data.get('expires_at', cert.expires_at)
-            
-            # 如果提供了证书内容，也更新
-            if 'certificate' in cert_data:
-                cert.certificate = cert_data['certificate']
-            if 'private_key' in cert_data:
-                cert.private_key = cert_data['private_key']
-            
-            # 更新状态
-            if cert.is_expired():
-                cert.status = 'expired'
-            else:
-                cert.status = 'valid'
-            
-            cert.save()
-            updated_certs += 1
-        else:
-            # 创建新证书
-            cert = Certificate.create(
-                domain=domain,
-                type=cert_data.get('type', 'single'),
-                server_id=server.id,
-                ca_type=cert_data.get('ca_type', 'letsencrypt'),
-                status='valid',
-                expires_at=cert_data.get('expires_at')
-            )
-            
-            # 如果提供了证书内容，也更新
-            if 'certificate' in cert_data:
-                cert.certificate = cert_data['certificate']
-            if 'private_key' in cert_data:
-                cert.private_key = cert_data['private_key']
-            
-            cert.save()
-            new_certs += 1
-        
-        # 添加部署记录
-        if 'path' in cert_data:
-            cert.add_deployment('nginx', cert_data['path'])
-        
-        synced += 1
+    # 批量写入：整个同步只需少量数据库往返
+    result = Certificate.sync_from_client(g.server.id, data['certificates'])
     
     return jsonify({
         'code': 200,
         'message': 'success',
-        'data': {
-            'synced': synced,
-            'new': new_certs,
-            'updated': updated_certs
-        }
+        'data': result
     })
 
 @app.route('/api/v1/alerts', methods=['GET'])
@@ -2184,6 +2353,21 @@ def get_alerts():
     status = request.args.get('status')
     alert_type = request.args.get('type')
     
+    if use_cursor_pagination():
+        try:
+            alerts, pagination = Alert.get_page(request.args.get('cursor') or None, limit, status,
+                                                alert_type, include_total_requested())
+        except InvalidCursorError as e:
+            return invalid_cursor_response(e)
+        return jsonify({
+            'code': 200,
+            'message': 'success',
+            'data': {
+                'items': [alert.to_dict() for alert in alerts],
+                'pagination': pagination
+            }
+        })
+    
     alerts, total = Alert.get_all(page, limit, status, alert_type)
     
     return jsonify({
@@ -2401,28 +2585,31 @@ def update_client_task(task_id):
     status = data['status']
     result = data.get('result', {})
     
-    # 如果任务完成并成功，更新证书信息
-    if status == 'completed' and result.get('success') and 'certificate' in result:
-        cert_data = result['certificate']
-        cert_id = cert_data.get('id')
+    # 如果任务完成并成功，更新证书信息(支持单个certificate或批量certificates)
+    if status == 'completed' and result.get('success'):
+        certs_data = result.get('certificates') or ([result['certificate']] if 'certificate' in result else [])
+        certs_data = [cert_data for cert_data in certs_data if cert_data.get('id')]
+        certificates = Certificate.get_many([cert_data['id'] for cert_data in certs_data])
         
-        if cert_id:
-            cert = Certificate.get_by_id(cert_id)
-            if cert and cert.server_id == g.server.id:
-                cert.status = 'valid'
-                cert.expires_at = cert_data.get('expires_at', cert.expires_at)
-                
-                # 如果提供了证书内容，也更新
-                if 'certificate' in cert_data:
-                    cert.certificate = cert_data['certificate']
-                if 'private_key' in cert_data:
-                    cert.private_key = cert_data['private_key']
-                
-                cert.save()
-                
-                # 添加部署记录
-                if 'path' in cert_data:
-                    cert.add_deployment('nginx', cert_data['path'])
+        for cert_data in certs_data:
+            cert = certificates.get(cert_data['id'])
+            if not cert or cert.server_id != g.server.id:
+                continue
+            
+            cert.status = 'valid'
+            cert.expires_at = cert_data.get('expires_at', cert.expires_at)
+            
+            # 如果提供了证书内容，也更新
+            if 'certificate' in cert_data:
+                cert.certificate = cert_data['certificate']
+            if 'private_key' in cert_data:
+                cert.private_key = cert_data['private_key']
+            
+            cert.save()
+            
+            # 添加部署记录
+            if 'path' in cert_data:
+                cert.add_deployment('nginx', cert_data['path'])
     
     return jsonify({
         'code': 200,
@@ -2501,6 +2688,7 @@ def health_check():
             'notification_manager': notification_status,
             'certificate_service': cert_service_status
         },
+        'database_pool': db.get_pool_stats(),
         'system': system_status
     }
 
@@ -2558,6 +2746,31 @@ def readiness_check():
             }
         }), 503
 
+@app.route('/api/v1/system/top-queries', methods=['GET'])
+@login_required
+@admin_required
+def get_top_queries():
+    """获取按指纹聚合的热点SQL查询"""
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    order_by = request.args.get('order_by', 'total_time')
+    if order_by not in ('total_time', 'avg_time', 'max_time', 'calls', 'errors'):
+        return jsonify({
+            'code': 400,
+            'message': '不支持的排序字段',
+            'data': None
+        }), 400
+
+    return jsonify({
+        'code': 200,
+        'message': 'success',
+        'data': {
+            'queries': db.get_top_queries(limit, order_by),
+            'statement_cache': db.get_statement_cache_stats(),
+            'principal_cache': principal_cache.get_stats(),
+            'server_token_cache': server_token_cache.get_stats()
+        }
+    })
+
 # SSL证书监控配置API端点
 @app.route('/api/v1/certificates/<int:certificate_id>/monitoring', methods=['GET'])
 @login_required
@@ -2686,6 +2899,7 @@ def batch_update_monitoring_config():
 
 @app.route('/api/v1/monitoring/statistics', methods=['GET'])
 @login_required
+@conditional_get(change_versions, *LIST_ETAG_TABLES)
 def get_monitoring_statistics():
     """获取监控统计信息"""
     try:
@@ -2859,6 +3073,7 @@ def batch_check_certificate_domains():
 
 @app.route('/api/v1/domain-monitoring/statistics', methods=['GET'])
 @login_required
+@conditional_get(change_versions, *LIST_ETAG_TABLES)
 def get_domain_monitoring_statistics():
     """获取域名监控统计信息"""
     try:
@@ -2890,8 +3105,6 @@ def get_domain_monitoring_statistics():
 def get_certificate_domain_history(certificate_id):
     """获取证书域名监控历史"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = min(request.args.get('per_page', 20, type=int), 100)
         check_type = request.args.get('check_type', None)
 
         # 构建查询条件
@@ -2902,58 +3115,14 @@ def get_certificate_domain_history(certificate_id):
             where_conditions.append('check_type = ?')
             params.append(check_type)
 
-        where_clause = ' AND '.join(where_conditions)
-
-        # 获取总数
-        count_query = f"SELECT COUNT(*) as count FROM domain_monitoring_history WHERE {where_clause}"
-        db = Database()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute(count_query, params)
-        total = cursor.fetchone()[0]
-
-        # 获取分页数据
-        offset = (page - 1) * per_page
-        data_query = f"""
-            SELECT * FROM domain_monitoring_history
-            WHERE {where_clause}
-            ORDER BY created_at DESC
-            LIMIT ? OFFSET ?
-        """
-        params.extend([per_page, offset])
-
-        cursor.execute(data_query, params)
-        history_records = []
-
-        for row in cursor.fetchall():
-            history_records.append({
-                'id': row[0],
-                'certificate_id': row[1],
-                'check_type': row[2],
-                'status': row[3],
-                'response_time': row[4],
-                'details': row[5],
-                'error_message': row[6],
-                'created_at': row[7]
-            })
-
-        conn.close()
-
         return jsonify({
             'code': 200,
             'message': 'success',
-            'data': {
-                'history': history_records,
-                'pagination': {
-                    'page': page,
-                    'per_page': per_page,
-                    'total': total,
-                    'pages': (total + per_page - 1) // per_page
-                }
-            }
+            'data': query_monitoring_history('domain', certificate_id, where_conditions, params)
         })
 
+    except (InvalidCursorError, InvalidHistoryRangeError) as e:
+        return invalid_cursor_response(e)
     except Exception as e:
         logger.error(f"获取域名监控历史失败: {str(e)}")
         return jsonify({
@@ -2961,9 +3130,7 @@ def get_certificate_domain_history(certificate_id):
             'message': '服务器内部错误',
             'data': None
         }), 500
-    finally:
-        if 'conn' in locals():
-            conn.close()
+
 
 # SSL证书端口监控API端点
 @app.route('/api/v1/certificates/<int:certificate_id>/port-status', methods=['GET'])
@@ -3161,6 +3328,7 @@ def batch_check_certificate_ports():
 
 @app.route('/api/v1/port-monitoring/statistics', methods=['GET'])
 @login_required
+@conditional_get(change_versions, *LIST_ETAG_TABLES)
 def get_port_monitoring_statistics():
     """获取端口监控统计信息"""
     try:
@@ -3192,8 +3360,6 @@ def get_port_monitoring_statistics():
 def get_certificate_port_history(certificate_id):
     """获取证书端口监控历史"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = min(request.args.get('per_page', 20, type=int), 100)
         port = request.args.get('port', type=int)
         check_type = request.args.get('check_type', None)
 
@@ -3209,62 +3375,14 @@ def get_certificate_port_history(certificate_id):
             where_conditions.append('check_type = ?')
             params.append(check_type)
 
-        where_clause = ' AND '.join(where_conditions)
-
-        # 获取总数
-        count_query = f"SELECT COUNT(*) as count FROM port_monitoring_history WHERE {where_clause}"
-        db = Database()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute(count_query, params)
-        total = cursor.fetchone()[0]
-
-        # 获取分页数据
-        offset = (page - 1) * per_page
-        data_query = f"""
-            SELECT * FROM port_monitoring_history
-            WHERE {where_clause}
-            ORDER BY created_at DESC
-            LIMIT ? OFFSET ?
-        """
-        params.extend([per_page, offset])
-
-        cursor.execute(data_query, params)
-        history_records = []
-
-        for row in cursor.fetchall():
-            history_records.append({
-                'id': row[0],
-                'certificate_id': row[1],
-                'port': row[2],
-                'check_type': row[3],
-                'status': row[4],
-                'handshake_time': row[5],
-                'tls_version': row[6],
-                'cipher_suite': row[7],
-                'security_grade': row[8],
-                'details': row[9],
-                'error_message': row[10],
-                'created_at': row[11]
-            })
-
-        conn.close()
-
         return jsonify({
             'code': 200,
             'message': 'success',
-            'data': {
-                'history': history_records,
-                'pagination': {
-                    'page': page,
-                    'per_page': per_page,
-                    'total': total,
-                    'pages': (total + per_page - 1) // per_page
-                }
-            }
+            'data': query_monitoring_history('port', certificate_id, where_conditions, params, port=port or None)
         })
 
+    except (InvalidCursorError, InvalidHistoryRangeError) as e:
+        return invalid_cursor_response(e)
     except Exception as e:
         logger.error(f"获取端口监控历史失败: {str(e)}")
         return jsonify({
@@ -3272,9 +3390,7 @@ def get_certificate_port_history(certificate_id):
             'message': '服务器内部错误',
             'data': None
         }), 500
-    finally:
-        if 'conn' in locals():
-            conn.close()
+
 
 # SSL证书操作API端点
 @app.route('/api/v1/certificates/<int:certificate_id>/manual-check', methods=['POST'])
@@ -3434,22 +3550,23 @@ def export_certificates():
             filters['expires_before'] = request.args.get('expires_before')
         if request.args.get('domain_pattern'):
             filters['domain_pattern'] = request.args.get('domain_pattern')
-
-        result = certificate_operations_service.export_certificates_to_csv(filters)
-
-        if result['success']:
-            # 创建响应
-            response = make_response(result['csv_content'])
-            response.headers['Content-Type'] = 'text/csv; charset=utf-8-sig'
-            response.headers['Content-Disposition'] = f'attachment; filename="{result["filename"]}"'
-
-            return response
-        else:
-            return jsonify({
-                'code': 500,
-                'message': result['error'],
-                'data': None
-            }), 500
+        filters.update(ownership_filter_args())
+
+        if request.args.get('format') == 'json' or wants_ndjson():
+            # JSON/NDJSON格式流式导出
+            return stream_json(certificate_operations_service.iter_export_rows(filters))
+
+        # CSV分块流式导出，gzip=true时输出.csv.gz
+        compress = request.args.get('gzip', 'false').lower() in ('true', '1')
+        chunks = certificate_operations_service.export_certificates_to_csv(filters, compress=compress)
+        response = app.response_class(
+            stream_with_context(chunks),
+            mimetype='application/gzip' if compress else 'text/csv'
+        )
+        filename = certificate_operations_service.export_filename(compress)
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
 
     except Exception as e:
         logger.error(f"证书导出失败: {str(e)}")
@@ -3544,6 +3661,9 @@ def get_certificate_operation_history(certificate_id):
             'data': None
         }), 500
 
+# 按筛选条件批量操作时单次最多选择的证书数
+BATCH_FILTER_LIMIT = 5000
+
 @app.route('/api/v1/certificates/batch-operations', methods=['POST'])
 @login_required
 @admin_required
@@ -3556,24 +3676,62 @@ def get_certificate_operation_history(certificate_id):
         'allowed_values': ['check', 'renew', 'delete']
     },
     'certificate_ids': {
-        'required': True,
+        'required': False,
         'type': list,
         'min_length': 1,
         'max_length': 50
     },
+    'filters': {
+        'required': False,
+        'type': dict
+    },
     'options': {
         'required': False,
         'type': dict
     }
 })
 def batch_operations():
-    """批量操作"""
+    """批量操作
+
+    指定certificate_ids，或按filters(tags/owner/business_unit/status/server_id)选择证书，
+    筛选条件走标签表和负责人/业务单元索引。
+    """
     try:
         data = request.get_json()
         operation_type = data['operation_type']
-        certificate_ids = data['certificate_ids']
+        certificate_ids = data.get('certificate_ids')
         options = data.get('options', {})
 
+        if not certificate_ids:
+            filters = data.get('filters') or {}
+            selection = {
+                'tags': parse_tag_args([filters['tags']] if isinstance(filters.get('tags'), str)
+                                       else [str(tag) for tag in filters.get('tags') or []]),
+                'owner': filters.get('owner'),
+                'business_unit': filters.get('business_unit'),
+                'status': filters.get('status'),
+                'server_id': filters.get('server_id')
+            }
+            if not any(selection.values()):
+                return jsonify({
+                    'code': 400,
+                    'message': '请指定certificate_ids或筛选条件',
+                    'data': None
+                }), 400
+            certificate_ids = Certificate.find_ids(limit=BATCH_FILTER_LIMIT + 1, **selection)
+            if len(certificate_ids) > BATCH_FILTER_LIMIT:
+                return jsonify({
+                    'code': 400,
+                    'message': f'筛选结果超过{BATCH_FILTER_LIMIT}个证书，请缩小筛选范围',
+                    'data': None
+                }), 400
+            if not certificate_ids:
+                return jsonify({
+                    'code': 400,
+                    'message': '没有符合筛选条件的证书',
+                    'data': None
+                }), 400
+
         result = certificate_operations_service.batch_operations(operation_type, certificate_ids, options)
 
         if result['success']:
@@ -3664,9 +3822,10 @@ def metrics():
         # 获取基本统计信息
         total_users = User.count()
         total_servers = Server.count()
-        total_certificates = Certificate.count()
-        active_certificates = Certificate.count_by_status('valid')
-        expired_certificates = Certificate.count_by_status('expired')
+        certificate_stats = Certificate.get_statistics()
+        total_certificates = certificate_stats['total']
+        active_certificates = certificate_stats['valid']
+        expired_certificates = certificate_stats['expired']
 
         # 获取系统指标
         try:
@@ -3687,6 +3846,17 @@ def metrics():
         metrics_data.append(f'ssl_manager_certificates_active {active_certificates}')
         metrics_data.append(f'ssl_manager_certificates_expired {expired_certificates}')
 
+        # 数据库连接池指标
+        pool_stats = db.get_pool_stats()
+        metrics_data.append(f'ssl_manager_db_pool_size {pool_stats["pool_size"]}')
+        metrics_data.append(f'ssl_manager_db_pool_in_use {pool_stats["in_use"]}')
+        metrics_data.append(f'ssl_manager_db_pool_idle {pool_stats["idle"]}')
+        metrics_data.append(f'ssl_manager_db_pool_overflow {pool_stats["overflow"]}')
+        metrics_data.append(f'ssl_manager_db_pool_checkouts_total {pool_stats["checkouts"]}')
+        metrics_data.append(f'ssl_manager_db_pool_waits_total {pool_stats["waits"]}')
+        metrics_data.append(f'ssl_manager_db_pool_wait_seconds_total {pool_stats["wait_time_total"]}')
+        metrics_data.append(f'ssl_manager_db_pool_timeouts_total {pool_stats["timeouts"]}')
+
         # 系统指标
         if cpu_percent is not None:
             metrics_data.append(f'ssl_manager_cpu_percent {cpu_percent}')
@@ -3704,6 +3874,9 @@ def metrics():
         timestamp = int(time.time() * 1000)
         metrics_data = [f'{metric} {timestamp}' for metric in metrics_data]
 
+        # 数据库查询指标(直方图和按指纹的热点语句)
+        metrics_data.extend(query_metrics.render_prometheus())
+
         return '\n'.join(metrics_data) + '\n', 200, {'Content-Type': 'text/plain; charset=utf-8'}
 
     except Exception as e:
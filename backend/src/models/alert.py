@@ -4,10 +4,14 @@
 import datetime
 from typing import Dict, List, Any, Optional, Tuple
 from .database import db
+from .pagination import KeysetPaginator, count_cache
 
 class Alert:
     """告警模型类"""
     
+    # 列表按创建时间倒序，id保证排序键唯一
+    _paginator = KeysetPaginator([('a.created_at', 'created_at'), ('a.id', 'id')], descending=True)
+    
     def __init__(self, id: int = None, type: str = None, message: str = None, 
                  status: str = None, certificate_id: int = None,
                  created_at: str = None, updated_at: str = None):
@@ -85,6 +89,52 @@ class Alert:
         
         return alerts, total
     
+    @classmethod
+    def get_page(cls, cursor: str = None, limit: int = 20, status: str = None,
+                 type: str = None, include_total: bool = False) -> Tuple[List['Alert'], Dict[str, Any]]:
+        """按(created_at, id)游标分页获取告警"""
+        conditions = []
+        params = []
+        
+        if status:
+            conditions.append("a.status = ?")
+            params.append(status)
+        
+        if type:
+            conditions.append("a.type = ?")
+            params.append(type)
+        
+        db.connect()
+        try:
+            alerts_data, page_info = cls._paginator.paginate(
+                db,
+                """SELECT a.*, c.domain as certificate_domain, c.expires_at as certificate_expires_at
+                   FROM alerts a
+                   LEFT JOIN certificates c ON a.certificate_id = c.id""",
+                conditions, params, cursor, limit
+            )
+            
+            if include_total:
+                where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+                page_info['total'] = count_cache.get_count(
+                    db, f"SELECT COUNT(*) as total FROM alerts a{where_clause}", tuple(params)
+                )
+        finally:
+            db.close()
+        
+        alerts = []
+        for alert_data in alerts_data:
+            # 提取证书信息
+            certificate_domain = alert_data.pop('certificate_domain', None)
+            certificate_expires_at = alert_data.pop('certificate_expires_at', None)
+            
+            alert = cls(**alert_data)
+            alert.certificate_domain = certificate_domain
+            alert.certificate_expires_at = certificate_expires_at
+            alerts.append(alert)
+        
+        return alerts, page_info
+    
     @classmethod
     def get_recent(cls, limit: int = 10) -> List['Alert']:
         """获取最近的告警"""
@@ -0,0 +1,221 @@
+"""
+异步数据库模块 - 基于aiomysql的asyncio数据库访问
+供告警评估、通知发送等async服务使用，查询期间不阻塞事件循环
+"""
+import os
+import ssl
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, List, Any, Optional
+
+from .database import DatabaseConfig
+from .statement_cache import statement_cache
+from .query_metrics import query_metrics
+
+try:
+    import aiomysql
+except ImportError:
+    aiomysql = None
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDatabase:
+    """异步MySQL数据库操作类
+
+    接口与同步的Database一致(fetchone/fetchall/insert/update/delete)，
+    SQL同样使用?占位符并经过语句缓存转换和查询指标统计。
+    连接池绑定到创建它的事件循环，在其他事件循环中使用时会重新创建。
+
+    连接池中的连接固定为自动提交：aiomysql会关闭归还时仍处于事务中的连接，
+    每条语句单独提交可以让连接在语句之间立即归还给其他协程复用。
+    """
+
+    def __init__(self, config: DatabaseConfig = None):
+        """初始化异步数据库(连接池在首次使用时创建)"""
+        self.config = config or DatabaseConfig()
+        self.minsize = int(os.getenv('MYSQL_ASYNC_POOL_MINSIZE', 1))
+        self.maxsize = int(os.getenv('MYSQL_ASYNC_POOL_MAXSIZE', 50))
+        self._pool = None
+        self._loop = None
+        self._creating: Optional[asyncio.Task] = None
+
+    def get_connection_params(self) -> Dict[str, Any]:
+        """获取aiomysql连接参数"""
+        config = self.config
+        params = {
+            'host': config.host,
+            'port': config.port,
+            'user': config.username,
+            'password': config.password,
+            'db': config.database,
+            'charset': config.charset,
+            'autocommit': True,
+            'connect_timeout': config.connect_timeout,
+            'pool_recycle': config.pool_recycle,
+            'sql_mode': config.sql_mode,
+            'init_command': config.init_command,
+        }
+
+        # 复用同步连接的SSL配置
+        ssl_config = config.get_connection_params().get('ssl')
+        if ssl_config:
+            context = ssl.create_default_context(cafile=ssl_config.get('ca'))
+            if ssl_config.get('cert'):
+                context.load_cert_chain(ssl_config['cert'], ssl_config.get('key'))
+            context.check_hostname = bool(ssl_config.get('check_hostname'))
+            context.verify_mode = ssl.VerifyMode(ssl_config.get('verify_mode', ssl.CERT_REQUIRED))
+            params['ssl'] = context
+
+        return params
+
+    async def _create_pool(self):
+        """创建aiomysql连接池"""
+        if aiomysql is None:
+            raise RuntimeError("异步数据库访问需要安装 aiomysql")
+
+        return await aiomysql.create_pool(
+            minsize=self.minsize,
+            maxsize=self.maxsize,
+            cursorclass=aiomysql.DictCursor,
+            **self.get_connection_params()
+        )
+
+    async def get_pool(self):
+        """获取当前事件循环的连接池(并发调用时只创建一次)"""
+        loop = asyncio.get_running_loop()
+        if self._pool is not None and self._loop is loop:
+            return self._pool
+
+        if self._loop is not loop:
+            # 连接池不能跨事件循环使用，丢弃旧循环的连接池
+            self._discard_pool()
+            self._loop = loop
+
+        if self._creating is None:
+            self._creating = loop.create_task(self._create_pool())
+        creating = self._creating
+        try:
+            pool = await asyncio.shield(creating)
+        except Exception:
+            # 创建失败时允许下次调用重试
+            if self._creating is creating:
+                self._creating = None
+            raise
+
+        if self._pool is None and self._creating is creating:
+            self._pool = pool
+            self._creating = None
+            logger.info(f"异步数据库连接池已创建: {self.minsize}-{self.maxsize}")
+        return self._pool
+
+    def _discard_pool(self):
+        """丢弃绑定到其他事件循环的连接池"""
+        if self._pool is not None:
+            self._pool.close()
+        self._pool = None
+        self._creating = None
+
+    @asynccontextmanager
+    async def acquire(self):
+        """从连接池获取连接，退出时归还"""
+        pool = await self.get_pool()
+        started = time.perf_counter()
+        conn = await pool.acquire()
+        query_metrics.record_acquire(time.perf_counter() - started)
+        try:
+            yield conn
+        finally:
+            pool.release(conn)
+
+    async def _execute(self, sql: str, params: tuple = (), fetch: Optional[str] = None):
+        """执行SQL语句，返回 (查询结果, 影响行数, 自增ID)"""
+        # 从语句缓存获取转换后的SQL(?占位符 -> %s)
+        statement = statement_cache.compile(sql)
+
+        async with self.acquire() as conn:
+            started = time.perf_counter()
+            try:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(statement.sql, params)
+                    if fetch == 'one':
+                        result = await cursor.fetchone()
+                    elif fetch == 'all':
+                        result = await cursor.fetchall()
+                    else:
+                        result = None
+                    rowcount, lastrowid = cursor.rowcount, cursor.lastrowid
+                query_metrics.record(statement, time.perf_counter() - started, rowcount, params)
+                return result, rowcount, lastrowid
+            except Exception as e:
+                query_metrics.record(statement, time.perf_counter() - started, params=params, error=True)
+                logger.error(f"异步SQL执行失败: {statement.sql}, 参数: {params}, 错误: {e}")
+                raise
+
+    async def execute(self, sql: str, params: tuple = ()) -> int:
+        """执行SQL语句，返回影响行数"""
+        _, rowcount, _ = await self._execute(sql, params)
+        return rowcount
+
+    async def fetchone(self, sql: str, params: tuple = ()) -> Optional[Dict[str, Any]]:
+        """查询单条记录"""
+        result, _, _ = await self._execute(sql, params, fetch='one')
+        return result
+
+    async def fetchall(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        """查询多条记录"""
+        result, _, _ = await self._execute(sql, params, fetch='all')
+        return list(result or [])
+
+    async def insert(self, table: str, data: Dict[str, Any]) -> int:
+        """插入数据，返回自增ID"""
+        columns = ', '.join([f"`{k}`" for k in data.keys()])
+        placeholders = ', '.join(['%s' for _ in data])
+        sql = f"INSERT INTO `{table}` ({columns}) VALUES ({placeholders})"
+
+        _, _, insert_id = await self._execute(sql, tuple(data.values()))
+        return insert_id
+
+    async def update(self, table: str, data: Dict[str, Any], condition: str, params: tuple = ()) -> int:
+        """更新数据，返回影响行数"""
+        set_clause = ', '.join([f"`{k}` = %s" for k in data.keys()])
+        # 条件中的?占位符由语句缓存统一转换
+        sql = f"UPDATE `{table}` SET {set_clause} WHERE {condition}"
+
+        return await self.execute(sql, tuple(data.values()) + params)
+
+    async def delete(self, table: str, condition: str, params: tuple = ()) -> int:
+        """删除数据，返回影响行数"""
+        # 条件中的?占位符由语句缓存统一转换
+        sql = f"DELETE FROM `{table}` WHERE {condition}"
+
+        return await self.execute(sql, params)
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """获取连接池统计信息"""
+        pool = self._pool
+        if pool is None:
+            return {'created': False, 'minsize': self.minsize, 'maxsize': self.maxsize}
+        return {
+            'created': True,
+            'minsize': pool.minsize,
+            'maxsize': pool.maxsize,
+            'size': pool.size,
+            'free': pool.freesize,
+            'in_use': pool.size - pool.freesize
+        }
+
+    async def close(self):
+        """关闭连接池并等待连接释放"""
+        pool, self._pool = self._pool, None
+        self._loop = None
+        self._creating = None
+        if pool is not None:
+            pool.close()
+            await pool.wait_closed()
+
+
+# 全局异步数据库实例
+async_db = AsyncDatabase()
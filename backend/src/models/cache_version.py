@@ -0,0 +1,62 @@
+"""
+缓存版本戳模块 - 通过settings表中的计数器在多个worker之间失效进程内缓存
+"""
+import time
+import threading
+from typing import Optional, Tuple
+
+
+class VersionStamp:
+    """跨worker的缓存版本戳
+
+    数据变更时递增settings表中的计数器；读取方最多每check_interval秒按主键读取一次，
+    其余调用直接返回上次读取的值，不访问数据库。
+    """
+
+    def __init__(self, key: str, check_interval: float):
+        """初始化版本戳"""
+        self.key = key
+        self.check_interval = check_interval
+        self._version: Optional[str] = None
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def current(self, database) -> Tuple[Optional[str], bool]:
+        """返回 (当前版本, 与上次读取相比是否变化)，超过检查间隔时重新读取"""
+        now = time.monotonic()
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return self._version, False
+
+        database.connect()
+        try:
+            row = database.fetchone("SELECT `value` FROM `settings` WHERE `key` = ?", (self.key,))
+        finally:
+            database.close()
+        version = row['value'] if row else None
+
+        with self._lock:
+            changed = version != self._version
+            self._version = version
+            self._checked_at = now
+            return version, changed
+
+    def bump(self, database) -> None:
+        """递增版本(提交后其他worker在下次检查时看到变化)，本进程下次调用current()时重新读取"""
+        database.execute(
+            "INSERT INTO `settings` (`key`, `value`) VALUES (?, '1') "
+            "ON DUPLICATE KEY UPDATE `value` = CAST(`value` AS UNSIGNED) + 1",
+            (self.key,)
+        ).close()
+        database.commit()
+        self.expire()
+
+    def expire(self) -> None:
+        """下次调用current()时重新读取版本"""
+        with self._lock:
+            self._checked_at = None
+
+    @property
+    def version(self) -> Optional[str]:
+        """上次读取的版本"""
+        return self._version
@@ -3,16 +3,66 @@
 """
 import datetime
 import json
-from typing import Dict, List, Any, Optional, Tuple
+import operator
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 from .database import db
+from .pagination import KeysetPaginator, count_cache
+from .certificate_statistics import CertificateStatistics
+from .domain_search import domain_search_condition
+from .certificate_tags import ownership_conditions, sync_tags
+from .chain_store import chain_store, CHAIN_COLUMN
+from .records import compile_hydrator
+from .identity_map import identity_map
+
+# 未加载的延迟字段
+_DEFERRED = object()
 
 class Certificate:
     """证书模型类"""
     
+    # 列表按过期时间升序，id保证排序键唯一
+    _paginator = KeysetPaginator([('c.expires_at', 'expires_at'), ('c.id', 'id')])
+    
+    # 证书链和私钥(PEM文本)默认不查询，首次访问时按需加载；
+    # 证书链保存为证书存储中的摘要列表(chain_digests)，读取时重新拼接
+    CONTENT_COLUMNS = ('private_key', 'certificate')
+    
+    # 接口返回的列
+    PUBLIC_COLUMNS = (
+        'id', 'domain', 'type', 'status', 'created_at', 'expires_at', 'server_id', 'ca_type',
+        'updated_at', 'monitoring_enabled', 'monitoring_frequency', 'alert_enabled',
+        'notes', 'tags', 'owner', 'business_unit',
+        'dns_status', 'dns_response_time', 'domain_reachable', 'http_status_code',
+        'last_dns_check', 'last_reachability_check',
+        'monitored_ports', 'ssl_handshake_time', 'tls_version', 'cipher_suite',
+        'certificate_chain_valid', 'http_redirect_status', 'last_port_check',
+        'last_manual_check', 'check_in_progress', 'renewal_status', 'auto_renewal_enabled',
+        'renewal_days_before', 'import_source', 'last_renewal_attempt'
+    )
+    
+    # 调度和结果合并使用的内部列，不在接口中返回
+    INTERNAL_COLUMNS = ('next_check_at', 'domain_state_digest', 'port_state_digest')
+    
+    # 证书表除内容列外的所有列
+    SUMMARY_COLUMNS = PUBLIC_COLUMNS + INTERNAL_COLUMNS
+    
+    # 行中缺少列时的缺省值(与__init__一致，其余为None)
+    _FIELD_DEFAULTS = {'monitoring_enabled': True, 'monitoring_frequency': 3600, 'alert_enabled': True}
+    
+    # 新建证书时未设置的字段写入的缺省值(create和客户端批量同步共用)
+    INSERT_DEFAULTS = {
+        'monitoring_enabled': True, 'monitoring_frequency': 3600, 'alert_enabled': True,
+        'monitored_ports': '["80", "443"]', 'check_in_progress': 0, 'renewal_status': 'pending',
+        'auto_renewal_enabled': 0, 'renewal_days_before': 30, 'import_source': 'manual'
+    }
+    
+    # 列表和监控扫描会创建大量实例，使用槽位代替实例字典
+    __slots__ = SUMMARY_COLUMNS + ('_private_key', '_certificate', 'server_name')
+    
     def __init__(self, id: int = None, domain: str = None, type: str = None,
                  status: str = None, created_at: str = None, expires_at: str = None,
                  server_id: int = None, ca_type: str = None,
-                 private_key: str = None, certificate: str = None,
+                 private_key: str = _DEFERRED, certificate: str = _DEFERRED,
                  updated_at: str = None, monitoring_enabled: bool = True,
                  monitoring_frequency: int = 3600, alert_enabled: bool = True,
                  notes: str = None, tags: str = None, owner: str = None,
@@ -26,7 +76,8 @@ class Certificate:
                  last_manual_check: str = None, check_in_progress: bool = None,
                  renewal_status: str = None, auto_renewal_enabled: bool = None,
                  renewal_days_before: int = None, import_source: str = None,
-                 last_renewal_attempt: str = None):
+                 last_renewal_attempt: str = None, next_check_at: str = None,
+                 domain_state_digest: str = None, port_state_digest: str = None):
         """初始化证书对象"""
         self.id = id
         self.domain = domain
@@ -36,8 +87,8 @@ class Certificate:
         self.expires_at = expires_at
         self.server_id = server_id
         self.ca_type = ca_type
-        self.private_key = private_key
-        self.certificate = certificate
+        self._private_key = private_key
+        self._certificate = certificate
         self.updated_at = updated_at
         # 监控控制字段
         self.monitoring_enabled = monitoring_enabled
@@ -71,32 +122,192 @@ class Certificate:
         self.renewal_days_before = renewal_days_before
         self.import_source = import_source
         self.last_renewal_attempt = last_renewal_attempt
+        # 下次域名检查时间(为空表示尚未检查，立即到期)
+        self.next_check_at = next_check_at
+        # 最近一次域名/端口检查状态的摘要，结果不变时不重写监控列
+        self.domain_state_digest = domain_state_digest
+        self.port_state_digest = port_state_digest
+    
+    @property
+    def private_key(self) -> Optional[str]:
+        """私钥内容(延迟加载)"""
+        if self._private_key is _DEFERRED:
+            self.load_content()
+        return self._private_key
+    
+    @private_key.setter
+    def private_key(self, value: Optional[str]) -> None:
+        self._private_key = value
+    
+    @property
+    def certificate(self) -> Optional[str]:
+        """证书链内容(延迟加载)"""
+        if self._certificate is _DEFERRED:
+            self.load_content()
+        return self._certificate
+    
+    @certificate.setter
+    def certificate(self, value: Optional[str]) -> None:
+        self._certificate = value
+    
+    @property
+    def content_loaded(self) -> bool:
+        """证书内容和私钥是否已加载"""
+        return self._private_key is not _DEFERRED and self._certificate is not _DEFERRED
+    
+    def load_content(self) -> None:
+        """从数据库加载证书内容和私钥(已赋值的字段不会被覆盖)"""
+        content = None
+        if self.id:
+            db.connect()
+            try:
+                content = db.fetchone(
+                    f"SELECT private_key, certificate, {CHAIN_COLUMN} FROM certificates WHERE id = ?", (self.id,)
+                )
+                if content:
+                    _attach_chains([content])
+            finally:
+                db.close()
+        
+        if self._private_key is _DEFERRED:
+            self._private_key = content['private_key'] if content else None
+        if self._certificate is _DEFERRED:
+            self._certificate = content['certificate'] if content else None
+    
+    @classmethod
+    def columns(cls, prefix: str = '', with_content: bool = False) -> str:
+        """证书查询的列投影，默认不包含证书内容和私钥"""
+        names = cls.SUMMARY_COLUMNS + (CHAIN_COLUMN,) + cls.CONTENT_COLUMNS if with_content else cls.SUMMARY_COLUMNS
+        return ', '.join(f"{prefix}{name}" for name in names)
     
     @classmethod
-    def get_by_id(cls, cert_id: int) -> Optional['Certificate']:
-        """根据ID获取证书"""
+    def load_contents(cls, certificates: List['Certificate'], chunk_size: int = 500) -> None:
+        """批量加载多个证书的内容和私钥(IN查询)"""
+        pending = {cert.id: cert for cert in certificates if cert.id and not cert.content_loaded}
+        ids = list(pending)
+        if not ids:
+            return
+        
         db.connect()
-        cert_data = db.fetchone("SELECT * FROM certificates WHERE id = ?", (cert_id,))
-        db.close()
+        try:
+            for start in range(0, len(ids), chunk_size):
+                chunk = ids[start:start + chunk_size]
+                placeholders = ', '.join(['?'] * len(chunk))
+                rows = db.fetchall(
+                    f"SELECT id, private_key, certificate, {CHAIN_COLUMN} FROM certificates "
+                    f"WHERE id IN ({placeholders})",
+                    tuple(chunk)
+                )
+                _attach_chains(rows)
+                for content in rows:
+                    cert = pending[content['id']]
+                    if cert._private_key is _DEFERRED:
+                        cert._private_key = content['private_key']
+                    if cert._certificate is _DEFERRED:
+                        cert._certificate = content['certificate']
+        finally:
+            db.close()
+        
+        # 已被删除的证书没有内容
+        for cert in pending.values():
+            if cert._private_key is _DEFERRED:
+                cert._private_key = None
+            if cert._certificate is _DEFERRED:
+                cert._certificate = None
+    
+    @classmethod
+    def _track(cls, cert_data: Dict[str, Any]) -> 'Certificate':
+        """由查询结果创建证书对象并登记到标识映射，已登记时返回已有对象(补充其未加载的内容)"""
+        cert = cls.from_row(cert_data)
+        tracked = identity_map.add(cls, cert.id, cert)
+        if tracked is not cert:
+            if tracked._private_key is _DEFERRED:
+                tracked._private_key = cert._private_key
+            if tracked._certificate is _DEFERRED:
+                tracked._certificate = cert._certificate
+        return tracked
+    
+    @classmethod
+    def get_by_id(cls, cert_id: int, with_content: bool = False) -> Optional['Certificate']:
+        """根据ID获取证书(同一请求内重复查找直接返回已加载的对象)"""
+        cert = identity_map.get(cls, cert_id)
+        if cert is None:
+            db.connect()
+            cert_data = db.fetchone(
+                f"SELECT {cls.columns(with_content=with_content)} FROM certificates WHERE id = ?", (cert_id,)
+            )
+            db.close()
+            
+            if not cert_data:
+                return None
+            
+            cert = cls._track(cert_data)
         
-        if not cert_data:
-            return None
+        if with_content and not cert.content_loaded:
+            cert.load_content()
+        return cert
+    
+    @classmethod
+    def get_many(cls, cert_ids: List[int], with_content: bool = False,
+                 chunk_size: int = 500) -> Dict[int, 'Certificate']:
+        """按ID批量获取证书，返回 {证书ID: 证书}，不存在的ID不出现在结果中"""
+        certificates, missing = identity_map.get_many(cls, cert_ids)
         
-        return cls(**cert_data)
+        if missing:
+            db.connect()
+            try:
+                for start in range(0, len(missing), chunk_size):
+                    chunk = missing[start:start + chunk_size]
+                    placeholders = ', '.join(['?'] * len(chunk))
+                    rows = db.fetchall(
+                        f"SELECT {cls.columns(with_content=with_content)} FROM certificates "
+                        f"WHERE id IN ({placeholders})",
+                        tuple(chunk)
+                    )
+                    _attach_chains(rows)
+                    for cert_data in rows:
+                        cert = cls._track(cert_data)
+                        certificates[cert.id] = cert
+            finally:
+                db.close()
+        
+        if with_content:
+            cls.load_contents(list(certificates.values()), chunk_size)
+        return certificates
     
     @classmethod
-    def get_by_domain(cls, domain: str, server_id: int = None) -> Optional['Certificate']:
+    def get_by_domains(cls, server_id: int, domains: List[str], with_content: bool = False,
+                       chunk_size: int = 500) -> Dict[str, 'Certificate']:
+        """批量获取服务器上指定域名的证书，返回 {小写域名: 证书}"""
+        if not domains:
+            return {}
+        
+        db.connect()
+        try:
+            rows = cls._fetch_rows_by_domains(
+                server_id, list(dict.fromkeys(domains)), cls.columns(with_content=with_content), chunk_size
+            )
+            _attach_chains(rows.values())
+        finally:
+            db.close()
+        
+        return {domain: cls._track(cert_data) for domain, cert_data in rows.items()}
+    
+    @classmethod
+    def get_by_domain(cls, domain: str, server_id: int = None,
+                      with_content: bool = False) -> Optional['Certificate']:
         """根据域名获取证书"""
         db.connect()
+        columns = cls.columns(with_content=with_content)
         
         if server_id:
             cert_data = db.fetchone(
-                "SELECT * FROM certificates WHERE domain = ? AND server_id = ?", 
+                f"SELECT {columns} FROM certificates WHERE domain = ? AND server_id = ?", 
                 (domain, server_id)
             )
         else:
             cert_data = db.fetchone(
-                "SELECT * FROM certificates WHERE domain = ? ORDER BY expires_at DESC LIMIT 1", 
+                f"SELECT {columns} FROM certificates WHERE domain = ? ORDER BY expires_at DESC LIMIT 1", 
                 (domain,)
             )
         
@@ -105,30 +316,57 @@ class Certificate:
         if not cert_data:
             return None
         
-        return cls(**cert_data)
+        return cls._track(cert_data)
     
-    @classmethod
-    def get_all(cls, page: int = 1, limit: int = 20, keyword: str = None, 
-                status: str = None, server_id: int = None) -> Tuple[List['Certificate'], int]:
-        """获取所有证书"""
-        db.connect()
-        
-        # 构建查询条件
+    @staticmethod
+    def _build_filters(keyword: str = None, status: str = None, server_id: int = None,
+                       prefix: str = '', tags: List[str] = None, owner: str = None,
+                       business_unit: str = None, search_mode: str = 'domain') -> Tuple[List[str], List[Any]]:
+        """构建证书列表查询条件"""
         conditions = []
         params = []
         
         if keyword:
-            conditions.append("domain LIKE ?")
-            params.append(f"%{keyword}%")
+            # 后缀查询走反转域名索引，子串和片段查询走全文索引
+            condition, keyword_params = domain_search_condition(keyword, prefix, search_mode)
+            conditions.append(condition)
+            params.extend(keyword_params)
         
         if status:
-            conditions.append("status = ?")
+            conditions.append(f"{prefix}status = ?")
             params.append(status)
         
         if server_id:
-            conditions.append("server_id = ?")
+            conditions.append(f"{prefix}server_id = ?")
             params.append(server_id)
         
+        # 标签走标签表主键，负责人/业务单元走各自的索引
+        ownership, ownership_params = ownership_conditions(tags, owner, business_unit, prefix)
+        conditions.extend(ownership)
+        params.extend(ownership_params)
+        
+        return conditions, params
+    
+    @classmethod
+    def from_row(cls, cert_data: Dict[str, Any]) -> 'Certificate':
+        """由查询结果行直接填充槽位创建证书对象(可包含关联查询的server_name)"""
+        if cert_data.get(CHAIN_COLUMN):
+            _attach_chains([cert_data])
+        cert = cls.__new__(cls)
+        _hydrate(cert, cert_data)
+        if 'server_name' in cert_data:
+            cert.server_name = cert_data['server_name']
+        return cert
+    
+    @classmethod
+    def get_all(cls, page: int = 1, limit: int = 20, keyword: str = None, 
+                status: str = None, server_id: int = None,
+                with_content: bool = False, **ownership) -> Tuple[List['Certificate'], int]:
+        """获取所有证书(ownership: tags/owner/business_unit筛选和search_mode)"""
+        db.connect()
+        
+        # 构建查询条件
+        conditions, params = cls._build_filters(keyword, status, server_id, **ownership)
         where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
         
         # 计算总数
@@ -137,9 +375,11 @@ class Certificate:
         total = count_result['total'] if count_result else 0
         
         # 分页查询
+        conditions, params = cls._build_filters(keyword, status, server_id, prefix='c.', **ownership)
+        where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
         offset = (page - 1) * limit
         sql = f"""
-            SELECT c.*, s.name as server_name 
+            SELECT {cls.columns('c.', with_content)}, s.name as server_name 
             FROM certificates c
             LEFT JOIN servers s ON c.server_id = s.id
             {where_clause} 
@@ -149,20 +389,82 @@ class Certificate:
         params.extend([limit, offset])
         
         certs_data = db.fetchall(sql, tuple(params))
+        _attach_chains(certs_data)
         db.close()
         
-        certificates = []
-        for cert_data in certs_data:
-            # 提取服务器名称
-            server_name = cert_data.pop('server_name', None)
-            cert = cls(**cert_data)
-            cert.server_name = server_name
-            certificates.append(cert)
-        
+        certificates = [cls.from_row(cert_data) for cert_data in certs_data]
         return certificates, total
     
     @classmethod
-    def get_expiring(cls, days: int = 15, limit: int = 10) -> List['Certificate']:
+    def get_page(cls, cursor: str = None, limit: int = 20, keyword: str = None,
+                 status: str = None, server_id: int = None, include_total: bool = False,
+                 with_content: bool = False, **ownership) -> Tuple[List['Certificate'], Dict[str, Any]]:
+        """按(expires_at, id)游标分页获取证书(ownership: tags/owner/business_unit筛选和search_mode)"""
+        db.connect()
+        try:
+            conditions, params = cls._build_filters(keyword, status, server_id, prefix='c.', **ownership)
+            certs_data, page_info = cls._paginator.paginate(
+                db,
+                f"""SELECT {cls.columns('c.', with_content)}, s.name as server_name
+                   FROM certificates c
+                   LEFT JOIN servers s ON c.server_id = s.id""",
+                conditions, params, cursor, limit
+            )
+            _attach_chains(certs_data)
+            
+            if include_total:
+                conditions, params = cls._build_filters(keyword, status, server_id, **ownership)
+                where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+                page_info['total'] = count_cache.get_count(
+                    db, f"SELECT COUNT(*) as total FROM certificates{where_clause}", tuple(params)
+                )
+        finally:
+            db.close()
+        
+        return [cls.from_row(cert_data) for cert_data in certs_data], page_info
+    
+    @classmethod
+    def iter_all(cls, keyword: str = None, status: str = None, server_id: int = None,
+                 **ownership) -> Iterator['Certificate']:
+        """按筛选条件流式读取全部证书摘要(服务端游标，不分页，不进入标识映射)"""
+        conditions, params = cls._build_filters(keyword, status, server_id, prefix='c.', **ownership)
+        where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+        rows = db.stream(
+            f"""SELECT {cls.columns('c.')}, s.name as server_name
+               FROM certificates c
+               LEFT JOIN servers s ON c.server_id = s.id
+               {where_clause}
+               ORDER BY c.expires_at ASC, c.id ASC""",
+            tuple(params)
+        )
+        try:
+            for cert_data in rows:
+                yield cls.from_row(cert_data)
+        finally:
+            rows.close()
+    
+    @classmethod
+    def find_ids(cls, status: str = None, server_id: int = None, tags: List[str] = None,
+                 owner: str = None, business_unit: str = None, limit: int = None) -> List[int]:
+        """按筛选条件查找证书ID(批量操作用，只读索引不加载证书行)"""
+        conditions, params = cls._build_filters(None, status, server_id, tags=tags, owner=owner,
+                                                business_unit=business_unit)
+        where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+        sql = f"SELECT id FROM certificates{where_clause} ORDER BY id"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        
+        db.connect()
+        try:
+            rows = db.fetchall(sql, tuple(params))
+        finally:
+            db.close()
+        return [row['id'] for row in rows]
+    
+    @classmethod
+    def get_expiring(cls, days: int = 15, limit: int = 10,
+                     with_content: bool = False) -> List['Certificate']:
         """获取即将过期的证书"""
         db.connect()
         
@@ -170,8 +472,8 @@ class Certificate:
         now = datetime.datetime.now()
         expiry_date = (now + datetime.timedelta(days=days)).isoformat()
         
-        sql = """
-            SELECT c.*, s.name as server_name 
+        sql = f"""
+            SELECT {cls.columns('c.', with_content)}, s.name as server_name 
             FROM certificates c
             LEFT JOIN servers s ON c.server_id = s.id
             WHERE c.status = 'valid' AND c.expires_at <= ? 
@@ -180,126 +482,263 @@ class Certificate:
         """
         
         certs_data = db.fetchall(sql, (expiry_date, limit))
+        _attach_chains(certs_data)
         db.close()
         
-        certificates = []
-        for cert_data in certs_data:
-            # 提取服务器名称
-            server_name = cert_data.pop('server_name', None)
-            cert = cls(**cert_data)
-            cert.server_name = server_name
-            certificates.append(cert)
-        
-        return certificates
+        return [cls.from_row(cert_data) for cert_data in certs_data]
     
-    def save(self) -> int:
-        """保存证书信息"""
+    @classmethod
+    def claim_due_for_check(cls, limit: int = 50) -> List[Dict[str, Any]]:
+        """领取到期的域名检查任务
+
+        按 (monitoring_enabled, next_check_at) 索引范围扫描，未检查过的证书(next_check_at为空)
+        排在最前。领取时按监控频率推迟next_check_at，检查失败的证书不会在每个周期被重复领取；
+        SKIP LOCKED保证多个调度进程不会领取同一证书。
+        """
         db.connect()
-        now = datetime.datetime.now().isoformat()
-        
-        if self.id:
-            # 更新现有证书
-            data = {
-                'domain': self.domain,
-                'type': self.type,
-                'status': self.status,
-                'expires_at': self.expires_at,
-                'server_id': self.server_id,
-                'ca_type': self.ca_type,
-                'updated_at': now,
-                # 监控控制字段
-                'monitoring_enabled': getattr(self, 'monitoring_enabled', True),
-                'monitoring_frequency': getattr(self, 'monitoring_frequency', 3600),
-                'alert_enabled': getattr(self, 'alert_enabled', True),
-                # 备注信息字段
-                'notes': getattr(self, 'notes', None),
-                'tags': getattr(self, 'tags', None),
-                'owner': getattr(self, 'owner', None),
-                'business_unit': getattr(self, 'business_unit', None),
-                # 域名监控字段
-                'dns_status': getattr(self, 'dns_status', None),
-                'dns_response_time': getattr(self, 'dns_response_time', None),
-                'domain_reachable': getattr(self, 'domain_reachable', None),
-                'http_status_code': getattr(self, 'http_status_code', None),
-                'last_dns_check': getattr(self, 'last_dns_check', None),
-                'last_reachability_check': getattr(self, 'last_reachability_check', None),
-                # 端口监控字段
-                'monitored_ports': getattr(self, 'monitored_ports', None),
-                'ssl_handshake_time': getattr(self, 'ssl_handshake_time', None),
-                'tls_version': getattr(self, 'tls_version', None),
-                'cipher_suite': getattr(self, 'cipher_suite', None),
-                'certificate_chain_valid': getattr(self, 'certificate_chain_valid', None),
-                'http_redirect_status': getattr(self, 'http_redirect_status', None),
-                'last_port_check': getattr(self, 'last_port_check', None),
-                # 证书操作字段
-                'last_manual_check': getattr(self, 'last_manual_check', None),
-                'check_in_progress': getattr(self, 'check_in_progress', None),
-                'renewal_status': getattr(self, 'renewal_status', None),
-                'auto_renewal_enabled': getattr(self, 'auto_renewal_enabled', None),
-                'renewal_days_before': getattr(self, 'renewal_days_before', None),
-                'import_source': getattr(self, 'import_source', None),
-                'last_renewal_attempt': getattr(self, 'last_renewal_attempt', None)
-            }
+        try:
+            certs_data = db.fetchall("""
+                SELECT id, domain, monitoring_frequency, last_dns_check, last_reachability_check
+                FROM certificates
+                WHERE monitoring_enabled = 1
+                AND (next_check_at IS NULL OR next_check_at <= CURRENT_TIMESTAMP)
+                ORDER BY next_check_at ASC
+                LIMIT ?
+                FOR UPDATE SKIP LOCKED
+            """, (limit,))
+            
+            if certs_data:
+                placeholders = ', '.join(['?'] * len(certs_data))
+                db.execute(
+                    f"""UPDATE certificates
+                        SET next_check_at = CURRENT_TIMESTAMP + INTERVAL COALESCE(monitoring_frequency, 3600) SECOND
+                        WHERE id IN ({placeholders})""",
+                    tuple(cert_data['id'] for cert_data in certs_data)
+                )
+            db.commit()
+            return certs_data
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    
+    @classmethod
+    def _fetch_rows_by_domains(cls, server_id: int, domains: List[str], columns: str,
+                               chunk_size: int = 500) -> Dict[str, Dict[str, Any]]:
+        """按域名分批查询服务器上的证书，返回 {小写域名: 行数据}"""
+        rows = {}
+        for start in range(0, len(domains), chunk_size):
+            chunk = domains[start:start + chunk_size]
+            placeholders = ', '.join(['?'] * len(chunk))
+            for row in db.fetchall(
+                f"SELECT {columns} FROM certificates WHERE server_id = ? AND domain IN ({placeholders})",
+                (server_id, *chunk)
+            ):
+                rows[row['domain'].lower()] = row
+        return rows
 
-            # 如果有私钥和证书内容，也更新
-            if self.private_key:
-                data['private_key'] = self.private_key
-            if self.certificate:
-                data['certificate'] = self.certificate
+    @classmethod
+    def sync_from_client(cls, server_id: int, certificates: List[Dict[str, Any]],
+                         chunk_size: int = 500) -> Dict[str, int]:
+        """批量同步客户端上报的证书和部署记录
+
+        证书按(server_id, domain)批量插入或更新，部署记录按
+        (certificate_id, deploy_type, deploy_target)批量插入或更新，
+        全部在一个工作单元事务中完成。
+        """
+        result = {'synced': 0, 'new': 0, 'updated': 0}
+
+        # 按域名去重，后上报的数据覆盖先上报的
+        reported = {}
+        for cert_data in certificates:
+            domain = cert_data.get('domain')
+            if domain:
+                reported[domain] = cert_data
+        if not reported:
+            return result
+
+        now = datetime.datetime.now()
+        now_str = now.isoformat()
+        default_expires_at = (now + datetime.timedelta(days=90)).isoformat()
+
+        with db.transaction():
+            # 工作单元内的读取走主库，读取后立即写回
+            existing = cls._fetch_rows_by_domains(
+                server_id, list(reported.keys()), 'id, domain, type, expires_at', chunk_size
+            )
+
+            # 上报的证书链写入证书存储(一条多行INSERT IGNORE)
+            chain_refs = dict(zip(reported, chain_store.store_many(
+                db, [cert_data.get('certificate') for cert_data in reported.values()], chunk_size
+            )))
+
+            # 按上报的证书内容字段分组，未上报的内容字段不覆盖已有数据
+            groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+            for domain, cert_data in reported.items():
+                current = existing.get(domain.lower())
+                if current:
+                    expires_at = cert_data.get('expires_at', current['expires_at'])
+                    if isinstance(expires_at, datetime.datetime):
+                        expires_at = expires_at.isoformat()
+                    cert_type = cert_data.get('type', current['type'])
+                    status = 'expired' if cls(expires_at=expires_at).is_expired() else 'valid'
+                else:
+                    expires_at = cert_data.get('expires_at') or default_expires_at
+                    cert_type = cert_data.get('type', 'single')
+                    status = 'valid'
+
+                content_columns = tuple(
+                    column for column in ('certificate', 'private_key') if column in cert_data
+                )
+                if 'certificate' in content_columns:
+                    content_columns += (CHAIN_COLUMN,)
+                # 插入的新行与create使用相同的缺省值，已存在的行只更新update_columns
+                row = cls(
+                    domain=domain,
+                    type=cert_type,
+                    status=status,
+                    server_id=server_id,
+                    ca_type=cert_data.get('ca_type', 'letsencrypt'),
+                    expires_at=expires_at
+                )._insert_values(now_str)
+                row.update({
+                    'private_key': cert_data.get('private_key', ''),
+                    'certificate': '' if chain_refs[domain] else cert_data.get('certificate', ''),
+                    CHAIN_COLUMN: chain_refs[domain]
+                })
+                groups.setdefault(content_columns, []).append(row)
+
+            for content_columns, rows in groups.items():
+                counts = db.bulk_upsert(
+                    'certificates', rows,
+                    key_columns=['server_id', 'domain'],
+                    update_columns=['type', 'status', 'expires_at', 'updated_at', *content_columns],
+                    chunk_size=chunk_size
+                )
+                result['new'] += counts['inserted']
+                result['updated'] += counts['updated']
+
+            # 部署记录
+            deployed_domains = [domain for domain, cert_data in reported.items() if 'path' in cert_data]
+            if deployed_domains:
+                cert_ids = cls._fetch_rows_by_domains(server_id, deployed_domains, 'id, domain', chunk_size)
+                deployments = [
+                    {
+                        'certificate_id': cert_ids[domain.lower()]['id'],
+                        'deploy_type': 'nginx',
+                        'deploy_target': reported[domain]['path'],
+                        'status': 'success',
+                        'created_at': now_str,
+                        'updated_at': now_str
+                    }
+                    for domain in deployed_domains if domain.lower() in cert_ids
+                ]
+                db.bulk_upsert(
+                    'certificate_deployments', deployments,
+                    key_columns=['certificate_id', 'deploy_type', 'deploy_target'],
+                    update_columns=['status', 'updated_at'],
+                    chunk_size=chunk_size
+                )
+
+        result['synced'] = len(reported)
+        return result
+
+    def compute_next_check_at(self) -> Optional[datetime.datetime]:
+        """根据上次域名检查时间和监控频率计算下次检查时间，未检查过时返回None(立即到期)"""
+        last_check = getattr(self, 'last_dns_check', None)
+        if not last_check:
+            return None
+        if isinstance(last_check, str):
+            try:
+                last_check = datetime.datetime.fromisoformat(last_check)
+            except ValueError:
+                return None
+        frequency = getattr(self, 'monitoring_frequency', None) or 3600
+        return last_check + datetime.timedelta(seconds=int(frequency))
+    
+    def _insert_values(self, now: str) -> Dict[str, Any]:
+        """新建证书行除内容列外的列值，未设置的字段使用INSERT_DEFAULTS"""
+        values = {column: getattr(self, column) for column in self.SUMMARY_COLUMNS
+                  if column not in ('id', 'domain_state_digest', 'port_state_digest')}
+        for column, default in self.INSERT_DEFAULTS.items():
+            if values[column] is None:
+                values[column] = default
+        values['created_at'] = values['updated_at'] = now
+        return values
+    
+    def save(self) -> int:
+        """保存证书信息(证书行和标签表在同一事务中写入)"""
+        with db.transaction():
+            now = datetime.datetime.now().isoformat()
+            # 监控频率或检查时间变化后重新计算下次检查时间
+            self.next_check_at = self.compute_next_check_at()
+        
+            if self.id:
+                # 更新现有证书
+                data = {
+                    'domain': self.domain,
+                    'type': self.type,
+                    'status': self.status,
+                    'expires_at': self.expires_at,
+                    'server_id': self.server_id,
+                    'ca_type': self.ca_type,
+                    'updated_at': now,
+                    # 监控控制字段
+                    'monitoring_enabled': getattr(self, 'monitoring_enabled', True),
+                    'monitoring_frequency': getattr(self, 'monitoring_frequency', 3600),
+                    'alert_enabled': getattr(self, 'alert_enabled', True),
+                    # 备注信息字段
+                    'notes': getattr(self, 'notes', None),
+                    'tags': getattr(self, 'tags', None),
+                    'owner': getattr(self, 'owner', None),
+                    'business_unit': getattr(self, 'business_unit', None),
+                    # 域名监控字段
+                    'dns_status': getattr(self, 'dns_status', None),
+                    'dns_response_time': getattr(self, 'dns_response_time', None),
+                    'domain_reachable': getattr(self, 'domain_reachable', None),
+                    'http_status_code': getattr(self, 'http_status_code', None),
+                    'last_dns_check': getattr(self, 'last_dns_check', None),
+                    'last_reachability_check': getattr(self, 'last_reachability_check', None),
+                    # 端口监控字段
+                    'monitored_ports': getattr(self, 'monitored_ports', None),
+                    'ssl_handshake_time': getattr(self, 'ssl_handshake_time', None),
+                    'tls_version': getattr(self, 'tls_version', None),
+                    'cipher_suite': getattr(self, 'cipher_suite', None),
+                    'certificate_chain_valid': getattr(self, 'certificate_chain_valid', None),
+                    'http_redirect_status': getattr(self, 'http_redirect_status', None),
+                    'last_port_check': getattr(self, 'last_port_check', None),
+                    # 证书操作字段
+                    'last_manual_check': getattr(self, 'last_manual_check', None),
+                    'check_in_progress': getattr(self, 'check_in_progress', None),
+                    'renewal_status': getattr(self, 'renewal_status', None),
+                    'auto_renewal_enabled': getattr(self, 'auto_renewal_enabled', None),
+                    'renewal_days_before': getattr(self, 'renewal_days_before', None),
+                    'import_source': getattr(self, 'import_source', None),
+                    'last_renewal_attempt': getattr(self, 'last_renewal_attempt', None),
+                    'next_check_at': self.next_check_at
+                }
+
+                # 如果有私钥和证书内容，也更新(未加载的内容保持不变)
+                if self._private_key is not _DEFERRED and self._private_key:
+                    data['private_key'] = self._private_key
+                if self._certificate is not _DEFERRED and self._certificate:
+                    data.update(_chain_values(self._certificate))
             
-            db.update('certificates', data, 'id = ?', (self.id,))
-            cert_id = self.id
-        else:
-            # 创建新证书
-            data = {
-                'domain': self.domain,
-                'type': self.type,
-                'status': self.status,
-                'created_at': now,
-                'expires_at': self.expires_at,
-                'server_id': self.server_id,
-                'ca_type': self.ca_type,
-                'private_key': self.private_key,
-                'certificate': self.certificate,
-                'updated_at': now,
-                # 监控控制字段
-                'monitoring_enabled': getattr(self, 'monitoring_enabled', True),
-                'monitoring_frequency': getattr(self, 'monitoring_frequency', 3600),
-                'alert_enabled': getattr(self, 'alert_enabled', True),
-                # 备注信息字段
-                'notes': getattr(self, 'notes', None),
-                'tags': getattr(self, 'tags', None),
-                'owner': getattr(self, 'owner', None),
-                'business_unit': getattr(self, 'business_unit', None),
-                # 域名监控字段
-                'dns_status': getattr(self, 'dns_status', None),
-                'dns_response_time': getattr(self, 'dns_response_time', None),
-                'domain_reachable': getattr(self, 'domain_reachable', None),
-                'http_status_code': getattr(self, 'http_status_code', None),
-                'last_dns_check': getattr(self, 'last_dns_check', None),
-                'last_reachability_check': getattr(self, 'last_reachability_check', None),
-                # 端口监控字段
-                'monitored_ports': getattr(self, 'monitored_ports', '["80", "443"]'),
-                'ssl_handshake_time': getattr(self, 'ssl_handshake_time', None),
-                'tls_version': getattr(self, 'tls_version', None),
-                'cipher_suite': getattr(self, 'cipher_suite', None),
-                'certificate_chain_valid': getattr(self, 'certificate_chain_valid', None),
-                'http_redirect_status': getattr(self, 'http_redirect_status', None),
-                'last_port_check': getattr(self, 'last_port_check', None),
-                # 证书操作字段
-                'last_manual_check': getattr(self, 'last_manual_check', None),
-                'check_in_progress': getattr(self, 'check_in_progress', 0),
-                'renewal_status': getattr(self, 'renewal_status', 'pending'),
-                'auto_renewal_enabled': getattr(self, 'auto_renewal_enabled', 0),
-                'renewal_days_before': getattr(self, 'renewal_days_before', 30),
-                'import_source': getattr(self, 'import_source', 'manual'),
-                'last_renewal_attempt': getattr(self, 'last_renewal_attempt', None)
-            }
-            cert_id = db.insert('certificates', data)
-            self.id = cert_id
-        
-        db.commit()
-        db.close()
+                db.update('certificates', data, 'id = ?', (self.id,))
+                cert_id = self.id
+            else:
+                # 创建新证书
+                data = {
+                    **self._insert_values(now),
+                    'private_key': self.private_key,
+                    **_chain_values(self.certificate)
+                }
+                cert_id = db.insert('certificates', data)
+                self.id = cert_id
+        
+            sync_tags(db, cert_id, getattr(self, 'tags', None))
+        
         return cert_id
     
     def delete(self) -> bool:
@@ -307,58 +746,19 @@ class Certificate:
         if not self.id:
             return False
         
-        db.connect()
-        result = db.delete('certificates', 'id = ?', (self.id,))
-        db.commit()
-        db.close()
+        with db.transaction():
+            # 监控历史表按月分区不支持外键级联删除，与证书在同一事务中删除
+            for table in ('domain_monitoring_history', 'port_monitoring_history',
+                          'monitoring_rollups_hourly', 'monitoring_rollups_daily'):
+                db.delete(table, 'certificate_id = ?', (self.id,))
+            result = db.delete('certificates', 'id = ?', (self.id,))
+        identity_map.discard(Certificate, self.id)
         
         return result > 0
     
     def to_dict(self, include_content: bool = False) -> Dict[str, Any]:
         """将证书对象转换为字典"""
-        cert_dict = {
-            'id': self.id,
-            'domain': self.domain,
-            'type': self.type,
-            'status': self.status,
-            'created_at': self.created_at,
-            'expires_at': self.expires_at,
-            'server_id': self.server_id,
-            'ca_type': self.ca_type,
-            'updated_at': self.updated_at,
-            # 监控控制字段
-            'monitoring_enabled': getattr(self, 'monitoring_enabled', True),
-            'monitoring_frequency': getattr(self, 'monitoring_frequency', 3600),
-            'alert_enabled': getattr(self, 'alert_enabled', True),
-            # 备注信息字段
-            'notes': getattr(self, 'notes', None),
-            'tags': getattr(self, 'tags', None),
-            'owner': getattr(self, 'owner', None),
-            'business_unit': getattr(self, 'business_unit', None),
-            # 域名监控字段
-            'dns_status': getattr(self, 'dns_status', None),
-            'dns_response_time': getattr(self, 'dns_response_time', None),
-            'domain_reachable': getattr(self, 'domain_reachable', None),
-            'http_status_code': getattr(self, 'http_status_code', None),
-            'last_dns_check': getattr(self, 'last_dns_check', None),
-            'last_reachability_check': getattr(self, 'last_reachability_check', None),
-            # 端口监控字段
-            'monitored_ports': getattr(self, 'monitored_ports', None),
-            'ssl_handshake_time': getattr(self, 'ssl_handshake_time', None),
-            'tls_version': getattr(self, 'tls_version', None),
-            'cipher_suite': getattr(self, 'cipher_suite', None),
-            'certificate_chain_valid': getattr(self, 'certificate_chain_valid', None),
-            'http_redirect_status': getattr(self, 'http_redirect_status', None),
-            'last_port_check': getattr(self, 'last_port_check', None),
-            # 证书操作字段
-            'last_manual_check': getattr(self, 'last_manual_check', None),
-            'check_in_progress': getattr(self, 'check_in_progress', None),
-            'renewal_status': getattr(self, 'renewal_status', None),
-            'auto_renewal_enabled': getattr(self, 'auto_renewal_enabled', None),
-            'renewal_days_before': getattr(self, 'renewal_days_before', None),
-            'import_source': getattr(self, 'import_source', None),
-            'last_renewal_attempt': getattr(self, 'last_renewal_attempt', None)
-        }
+        cert_dict = dict(zip(self.PUBLIC_COLUMNS, _public_values(self)))
         
         # 添加服务器名称（如果有）
         if hasattr(self, 'server_name'):
@@ -367,7 +767,9 @@ class Certificate:
         # 计算剩余天数
         if self.expires_at:
             try:
-                expires_at = datetime.datetime.fromisoformat(self.expires_at)
+                expires_at = self.expires_at
+                if not isinstance(expires_at, datetime.datetime):
+                    expires_at = datetime.datetime.fromisoformat(expires_at)
                 now = datetime.datetime.now()
                 days_left = (expires_at - now).days
                 cert_dict['days_left'] = max(0, days_left)
@@ -396,25 +798,30 @@ class Certificate:
         return deployments
     
     def add_deployment(self, deploy_type: str, deploy_target: str, status: str = 'success') -> int:
-        """添加证书部署记录"""
+        """添加证书部署记录
+        
+        同一证书的同一部署目标只有一条记录(uk_certificate_deployments_target)，
+        重复部署(如每次续期)时更新状态和时间，返回已有记录的ID。
+        """
         if not self.id:
             return 0
         
-        db.connect()
         now = datetime.datetime.now().isoformat()
-        
-        data = {
-            'certificate_id': self.id,
-            'deploy_type': deploy_type,
-            'deploy_target': deploy_target,
-            'status': status,
-            'created_at': now,
-            'updated_at': now
-        }
-        
-        deployment_id = db.insert('certificate_deployments', data)
-        db.commit()
-        db.close()
+        db.connect()
+        try:
+            # id = LAST_INSERT_ID(id) 使更新已有记录时lastrowid返回该记录的ID
+            cursor = db.execute(
+                "INSERT INTO certificate_deployments "
+                "(certificate_id, deploy_type, deploy_target, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) AS new "
+                "ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id), status = new.status, updated_at = new.updated_at",
+                (self.id, deploy_type, deploy_target, status, now, now)
+            )
+            deployment_id = cursor.lastrowid
+            cursor.close()
+            db.commit()
+        finally:
+            db.close()
         
         return deployment_id
     
@@ -475,38 +882,35 @@ class Certificate:
     @classmethod
     def get_statistics(cls) -> Dict[str, int]:
         """获取证书统计信息"""
-        db.connect()
-        
-        # 总数
-        total_result = db.fetchone("SELECT COUNT(*) as count FROM certificates")
-        total = total_result['count'] if total_result else 0
-        
-        # 有效证书
-        valid_result = db.fetchone("SELECT COUNT(*) as count FROM certificates WHERE status = 'valid'")
-        valid = valid_result['count'] if valid_result else 0
-        
-        # 即将过期证书
-        now = datetime.datetime.now()
-        expiry_date = (now + datetime.timedelta(days=15)).isoformat()
-        expiring_result = db.fetchone(
-            "SELECT COUNT(*) as count FROM certificates WHERE status = 'valid' AND expires_at <= ?",
-            (expiry_date,)
-        )
-        expiring = expiring_result['count'] if expiring_result else 0
-        
-        # 已过期证书
-        expired_result = db.fetchone("SELECT COUNT(*) as count FROM certificates WHERE status = 'expired'")
-        expired = expired_result['count'] if expired_result else 0
-        
-        # 证书类型分布
-        type_distribution = db.fetchall("SELECT type, COUNT(*) as count FROM certificates GROUP BY type")
-        
-        db.close()
-        
-        return {
-            'total': total,
-            'valid': valid,
-            'expiring': expiring,
-            'expired': expired,
-            'type_distribution': type_distribution
-        }
+        return certificate_statistics.certificate_statistics()
+
+
+# 查询结果行到槽位的填充函数
+_hydrate = compile_hydrator(
+    [(name, name, Certificate._FIELD_DEFAULTS.get(name)) for name in Certificate.SUMMARY_COLUMNS]
+    + [('_private_key', 'private_key', _DEFERRED), ('_certificate', 'certificate', _DEFERRED)],
+    name='hydrate_certificate'
+)
+
+# 一次取出接口返回的所有摘要列的值
+_public_values = operator.attrgetter(*Certificate.PUBLIC_COLUMNS)
+
+
+def _attach_chains(rows) -> None:
+    """把行中的证书链摘要列表替换为拼接后的PEM证书链(缺失的证书批量查询一次)"""
+    rows = [row for row in rows if row.get(CHAIN_COLUMN)]
+    if not rows:
+        return
+    chains = chain_store.assemble_many(db, [row[CHAIN_COLUMN] for row in rows])
+    for row in rows:
+        row['certificate'] = chains[row.pop(CHAIN_COLUMN)]
+
+
+def _chain_values(certificate: Optional[str]) -> Dict[str, Any]:
+    """证书链写入证书存储后的列值；不是纯证书PEM的内容按原文保存"""
+    reference = chain_store.store(db, certificate)
+    return {'certificate': '' if reference else certificate, CHAIN_COLUMN: reference}
+
+
+# 证书统计引擎
+certificate_statistics = CertificateStatistics(db)
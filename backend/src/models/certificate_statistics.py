@@ -0,0 +1,437 @@
+"""
+证书统计模块 - 单次扫描的条件聚合统计和增量维护的统计汇总表
+"""
+import time
+import logging
+import datetime
+import threading
+from typing import Dict, List, Any, NamedTuple, Tuple
+
+from .trigger_install import ensure_triggers
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_TABLE = 'certificate_statistics_summary'
+TRIGGER_PREFIX = 'trg_certificates_stats'
+
+
+class Contribution(NamedTuple):
+    """单个证书对某个统计维度的贡献
+
+    bucket/condition/value 为SQL表达式模板，{row} 会被替换为列前缀
+    (实时统计为空，触发器中为 NEW. 或 OLD.)。
+    summarized 为False的维度不由触发器维护，读取时按需聚合。
+    """
+    dimension: str
+    bucket: str
+    condition: str
+    value: str
+    columns: Tuple[str, ...]
+    summarized: bool = True
+
+
+# 统计维度定义：实时统计、汇总表重建和触发器共用同一份定义
+CONTRIBUTIONS: List[Contribution] = [
+    Contribution('total', "''", "1 = 1", "0", ()),
+    Contribution('status', "{row}status", "1 = 1", "0", ('status',)),
+    Contribution('type', "{row}type", "1 = 1", "0", ('type',)),
+    Contribution('valid_expiry_date', "CAST(DATE({row}expires_at) AS CHAR)",
+                 "{row}status = 'valid'", "0", ('status', 'expires_at')),
+    Contribution('monitoring_enabled', "''", "{row}monitoring_enabled = 1", "0", ('monitoring_enabled',)),
+    Contribution('alert_enabled', "''", "{row}alert_enabled = 1", "0", ('alert_enabled',)),
+    Contribution('monitoring_frequency', "''", "{row}monitoring_frequency IS NOT NULL",
+                 "{row}monitoring_frequency", ('monitoring_frequency',)),
+    Contribution('monitoring_frequency_distribution', "CAST({row}monitoring_frequency AS CHAR)",
+                 "{row}monitoring_enabled = 1 AND {row}monitoring_frequency IS NOT NULL", "0",
+                 ('monitoring_enabled', 'monitoring_frequency')),
+    Contribution('dns_status', "{row}dns_status", "{row}dns_status IS NOT NULL", "0", ('dns_status',)),
+    Contribution('domain_reachable', "CAST({row}domain_reachable AS CHAR)",
+                 "{row}domain_reachable IS NOT NULL", "0", ('domain_reachable',)),
+    # 响应时间/握手时间几乎每次检查都会变化，由触发器维护会让所有监控写入竞争同一汇总行
+    Contribution('dns_response_time', "''", "{row}dns_response_time IS NOT NULL",
+                 "{row}dns_response_time", ('dns_response_time',), False),
+    Contribution('dns_success_response_time', "''",
+                 "{row}dns_response_time IS NOT NULL AND {row}http_status_code BETWEEN 200 AND 299",
+                 "{row}dns_response_time", ('dns_response_time', 'http_status_code'), False),
+    Contribution('tls_version', "{row}tls_version", "{row}tls_version IS NOT NULL", "0", ('tls_version',)),
+    Contribution('certificate_chain_valid', "CAST({row}certificate_chain_valid AS CHAR)",
+                 "{row}certificate_chain_valid IS NOT NULL", "0", ('certificate_chain_valid',)),
+    Contribution('ssl_handshake_time', "''", "{row}ssl_handshake_time IS NOT NULL",
+                 "{row}ssl_handshake_time", ('ssl_handshake_time',), False),
+    Contribution('slow_handshake', "''", "{row}ssl_handshake_time > 1000", "0", ('ssl_handshake_time',), False),
+    Contribution('http_redirect_status', "{row}http_redirect_status",
+                 "{row}http_redirect_status IS NOT NULL", "0", ('http_redirect_status',)),
+]
+
+# 由触发器维护的维度和读取时按需聚合的维度
+SUMMARY_CONTRIBUTIONS = [contribution for contribution in CONTRIBUTIONS if contribution.summarized]
+VOLATILE_CONTRIBUTIONS = [contribution for contribution in CONTRIBUTIONS if not contribution.summarized]
+
+# 实时统计时不参与分组的维度(按日期分桶会使分组数随证书数增长)
+_LIVE_EXCLUDED = {'valid_expiry_date'}
+
+# 统计快照: {维度: {分桶: [数量, 数值合计]}}
+Snapshot = Dict[str, Dict[str, List[float]]]
+
+
+def _render(template: str, row: str = '') -> str:
+    """填充列前缀"""
+    return template.format(row=row)
+
+
+def build_live_query() -> str:
+    """生成单次扫描的条件聚合查询
+
+    分桶维度作为分组列，无分桶维度作为条件求和列，即将过期数量单独按截止时间求和，
+    整张表只扫描一次，结果行数只与各维度取值组合数有关。
+    """
+    group_columns = []
+    select_columns = []
+    for index, contribution in enumerate(CONTRIBUTIONS):
+        if contribution.dimension in _LIVE_EXCLUDED:
+            continue
+        condition = _render(contribution.condition)
+        if contribution.bucket == "''":
+            select_columns.append(f"SUM(CASE WHEN {condition} THEN 1 ELSE 0 END) AS c{index}")
+            select_columns.append(f"SUM(CASE WHEN {condition} THEN {_render(contribution.value)} ELSE 0 END) AS v{index}")
+        else:
+            group_columns.append(f"b{index}")
+            select_columns.append(f"CASE WHEN {condition} THEN {_render(contribution.bucket)} END AS b{index}")
+
+    select_columns.append("COUNT(*) AS group_count")
+    select_columns.append("SUM(CASE WHEN status = 'valid' AND expires_at <= ? THEN 1 ELSE 0 END) AS expiring")
+    return (f"SELECT {', '.join(select_columns)} FROM certificates "
+            f"GROUP BY {', '.join(group_columns)}")
+
+
+def build_volatile_query() -> str:
+    """生成按需聚合易变维度的查询(只有条件求和列，结果只有一行)"""
+    select_columns = []
+    for index, contribution in enumerate(VOLATILE_CONTRIBUTIONS):
+        condition = _render(contribution.condition)
+        select_columns.append(f"SUM(CASE WHEN {condition} THEN 1 ELSE 0 END) AS c{index}")
+        select_columns.append(f"SUM(CASE WHEN {condition} THEN {_render(contribution.value)} ELSE 0 END) AS v{index}")
+    return f"SELECT {', '.join(select_columns)} FROM certificates"
+
+
+def fold_live_rows(rows: List[Dict[str, Any]]) -> Snapshot:
+    """将分组结果折叠为统计快照"""
+    snapshot: Snapshot = {}
+    expiring = 0
+    for row in rows:
+        group_count = row['group_count'] or 0
+        expiring += row['expiring'] or 0
+        for index, contribution in enumerate(CONTRIBUTIONS):
+            if contribution.dimension in _LIVE_EXCLUDED:
+                continue
+            if contribution.bucket == "''":
+                count, value = row[f'c{index}'] or 0, row[f'v{index}'] or 0
+                bucket = ''
+            else:
+                bucket = row[f'b{index}']
+                if bucket is None:
+                    continue
+                count, value = group_count, 0
+            if not count:
+                continue
+            entry = snapshot.setdefault(contribution.dimension, {}).setdefault(str(bucket), [0, 0.0])
+            entry[0] += int(count)
+            entry[1] += float(value)
+    snapshot['expiring'] = {'': [expiring, 0.0]}
+    return snapshot
+
+
+def _summary_delta(contribution: Contribution, row: str, sign: int, indent: str) -> str:
+    """生成按单行证书增减汇总表计数的语句"""
+    value = _render(contribution.value, row)
+    if value != '0':
+        value = value if sign > 0 else f"-{value}"
+    statement = (
+        f"INSERT INTO `{SUMMARY_TABLE}` (`dimension`, `bucket`, `cert_count`, `value_sum`)\n"
+        f"{indent}VALUES ('{contribution.dimension}', {_render(contribution.bucket, row)}, {sign}, {value}) AS delta\n"
+        f"{indent}ON DUPLICATE KEY UPDATE `cert_count` = `cert_count` + delta.`cert_count`, "
+        f"`value_sum` = `value_sum` + delta.`value_sum`;"
+    )
+    if contribution.condition == '1 = 1':
+        return statement
+    return (f"IF {_render(contribution.condition, row)} THEN\n"
+            f"{indent}    {statement.replace(chr(10) + indent, chr(10) + indent + '    ')}\n"
+            f"{indent}END IF;")
+
+
+def build_trigger_statements() -> List[str]:
+    """生成维护汇总表的INSERT/UPDATE/DELETE触发器"""
+    inserts = [_summary_delta(contribution, 'NEW.', 1, '    ') for contribution in SUMMARY_CONTRIBUTIONS]
+    deletes = [_summary_delta(contribution, 'OLD.', -1, '    ') for contribution in SUMMARY_CONTRIBUTIONS]
+
+    # 更新时只处理相关列发生变化的维度
+    updates = []
+    for contribution in SUMMARY_CONTRIBUTIONS:
+        if not contribution.columns:
+            continue
+        unchanged = ' AND '.join(f"OLD.`{column}` <=> NEW.`{column}`" for column in contribution.columns)
+        updates.append(
+            f"IF NOT ({unchanged}) THEN\n"
+            f"        {_summary_delta(contribution, 'OLD.', -1, '        ')}\n"
+            f"        {_summary_delta(contribution, 'NEW.', 1, '        ')}\n"
+            f"    END IF;"
+        )
+
+    def trigger(event: str, statements: List[str]) -> str:
+        body = '\n    '.join(statements)
+        return (f"CREATE TRIGGER `{TRIGGER_PREFIX}_{event.lower()}` AFTER {event} ON `certificates` FOR EACH ROW\n"
+                f"BEGIN\n    {body}\nEND")
+
+    return [trigger('INSERT', inserts), trigger('UPDATE', updates), trigger('DELETE', deletes)]
+
+
+def trigger_names() -> List[str]:
+    """汇总触发器名称"""
+    return [f"{TRIGGER_PREFIX}_{event}" for event in ('insert', 'update', 'delete')]
+
+
+def build_rebuild_statements() -> List[str]:
+    """生成根据证书表全量重建汇总表的语句"""
+    statements = [f"DELETE FROM `{SUMMARY_TABLE}`"]
+    for contribution in SUMMARY_CONTRIBUTIONS:
+        statements.append(
+            f"INSERT INTO `{SUMMARY_TABLE}` (`dimension`, `bucket`, `cert_count`, `value_sum`) "
+            f"SELECT '{contribution.dimension}', {_render(contribution.bucket)}, COUNT(*), "
+            f"COALESCE(SUM({_render(contribution.value)}), 0) "
+            f"FROM certificates WHERE {_render(contribution.condition)} "
+            f"GROUP BY {_render(contribution.bucket)}"
+        )
+    return statements
+
+
+def rebuild_summary(database) -> None:
+    """根据证书表全量重建汇总表(调用方负责事务提交)"""
+    for statement in build_rebuild_statements():
+        database.execute(statement).close()
+
+
+def install_statistics_summary(database) -> bool:
+    """创建汇总表，触发器缺失或定义变化时安装触发器并重建汇总数据
+
+    触发器已是当前定义时不执行DDL也不重建(需要时用 scripts/rebuild_statistics_summary.py 手动重建)。
+    开启binlog且账号没有SUPER权限时MySQL可能拒绝创建触发器，
+    此时统计自动退回单次扫描的实时计算。
+    """
+    database.execute(f'''
+    CREATE TABLE IF NOT EXISTS `{SUMMARY_TABLE}` (
+        `dimension` VARCHAR(64) NOT NULL,
+        `bucket` VARCHAR(100) NOT NULL DEFAULT '',
+        `cert_count` BIGINT NOT NULL DEFAULT 0,
+        `value_sum` DOUBLE NOT NULL DEFAULT 0,
+        `updated_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (`dimension`, `bucket`)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    ''')
+
+    try:
+        return ensure_triggers(database, 'certificate_statistics', trigger_names(),
+                               build_trigger_statements(), after_install=rebuild_summary)
+    except Exception as e:
+        database.rollback()
+        logger.warning(f"证书统计汇总触发器创建失败，统计将使用实时计算: {e}")
+        return False
+
+
+class CertificateStatistics:
+    """证书统计引擎
+
+    汇总表及触发器可用时只读取汇总表(行数与证书数量无关)，
+    否则用一次条件聚合扫描计算全部统计。
+    响应时间等易变维度只在域名/端口监控统计中按需聚合，结果短时间缓存。
+    """
+
+    def __init__(self, database, summary_check_interval: float = 300, volatile_ttl: float = 60):
+        """初始化统计引擎"""
+        self.database = database
+        self.summary_check_interval = summary_check_interval
+        self.volatile_ttl = volatile_ttl
+        self._summary_available = None
+        self._summary_checked_at = 0.0
+        self._volatile = None
+        self._volatile_at = 0.0
+        self._lock = threading.Lock()
+
+    def summary_available(self) -> bool:
+        """检查汇总触发器是否已安装(结果按间隔缓存)"""
+        now = time.monotonic()
+        with self._lock:
+            if self._summary_available is not None and now - self._summary_checked_at < self.summary_check_interval:
+                return self._summary_available
+
+        result = self.database.fetchone(
+            """SELECT COUNT(*) as count FROM information_schema.TRIGGERS
+               WHERE TRIGGER_SCHEMA = DATABASE() AND EVENT_OBJECT_TABLE = 'certificates'
+               AND TRIGGER_NAME LIKE ?""",
+            (f'{TRIGGER_PREFIX}%',)
+        )
+        available = bool(result) and result['count'] == 3
+
+        with self._lock:
+            self._summary_available = available
+            self._summary_checked_at = now
+        return available
+
+    def compute_live(self, expiring_days: int = 15) -> Snapshot:
+        """单次扫描实时计算统计快照"""
+        cutoff = datetime.datetime.now() + datetime.timedelta(days=expiring_days)
+        rows = self.database.fetchall(build_live_query(), (cutoff,))
+        return fold_live_rows(rows)
+
+    def read_volatile(self) -> Snapshot:
+        """按需聚合不在汇总表中维护的易变维度"""
+        snapshot: Snapshot = {}
+        row = self.database.fetchone(build_volatile_query()) or {}
+        for index, contribution in enumerate(VOLATILE_CONTRIBUTIONS):
+            count = row.get(f'c{index}') or 0
+            if count:
+                snapshot[contribution.dimension] = {'': [int(count), float(row.get(f'v{index}') or 0)]}
+        return snapshot
+
+    def volatile_snapshot(self) -> Snapshot:
+        """获取易变维度(结果按volatile_ttl缓存)"""
+        now = time.monotonic()
+        with self._lock:
+            if self._volatile is not None and now - self._volatile_at < self.volatile_ttl:
+                return self._volatile
+
+        self.database.connect()
+        try:
+            volatile = self.read_volatile()
+        finally:
+            self.database.close()
+
+        with self._lock:
+            self._volatile = volatile
+            self._volatile_at = now
+        return volatile
+
+    def with_volatile(self, snapshot: Snapshot) -> Snapshot:
+        """补充易变维度(实时统计的快照已包含，汇总表快照不包含)"""
+        if any(contribution.dimension in snapshot for contribution in VOLATILE_CONTRIBUTIONS):
+            return snapshot
+        return {**snapshot, **self.volatile_snapshot()}
+
+    def read_summary(self, expiring_days: int = 15) -> Snapshot:
+        """从汇总表读取统计快照(不含易变维度)"""
+        snapshot: Snapshot = {}
+        expiring = 0
+        cutoff = (datetime.date.today() + datetime.timedelta(days=expiring_days)).isoformat()
+        rows = self.database.fetchall(
+            f"SELECT `dimension`, `bucket`, `cert_count`, `value_sum` FROM `{SUMMARY_TABLE}` WHERE `cert_count` > 0"
+        )
+        for row in rows:
+            if row['dimension'] == 'valid_expiry_date':
+                # 按天分桶，截止日当天到期的证书计入即将过期
+                if row['bucket'] <= cutoff:
+                    expiring += row['cert_count']
+                continue
+            snapshot.setdefault(row['dimension'], {})[row['bucket']] = [int(row['cert_count']), float(row['value_sum'])]
+        snapshot['expiring'] = {'': [expiring, 0.0]}
+        return snapshot
+
+    def snapshot(self, expiring_days: int = 15) -> Snapshot:
+        """获取统计快照，优先使用汇总表"""
+        self.database.connect()
+        try:
+            try:
+                if self.summary_available():
+                    return self.read_summary(expiring_days)
+            except Exception as e:
+                logger.warning(f"读取证书统计汇总表失败，使用实时计算: {e}")
+            return self.compute_live(expiring_days)
+        finally:
+            self.database.close()
+
+    def recent_checks(self) -> Dict[str, int]:
+        """统计最近一小时的域名检查次数(依赖检查时间索引)"""
+        since = datetime.datetime.now() - datetime.timedelta(hours=1)
+        self.database.connect()
+        try:
+            result = self.database.fetchone(
+                """SELECT
+                       (SELECT COUNT(*) FROM certificates WHERE last_dns_check > ?) as recent_dns_checks,
+                       (SELECT COUNT(*) FROM certificates WHERE last_reachability_check > ?) as recent_reachability_checks""",
+                (since, since)
+            )
+        finally:
+            self.database.close()
+        return {
+            'dns_checks_last_hour': result['recent_dns_checks'] if result else 0,
+            'reachability_checks_last_hour': result['recent_reachability_checks'] if result else 0
+        }
+
+    @staticmethod
+    def count(snapshot: Snapshot, dimension: str, bucket: str = '') -> int:
+        """获取维度分桶的数量"""
+        return int(snapshot.get(dimension, {}).get(bucket, [0, 0.0])[0])
+
+    @staticmethod
+    def average(snapshot: Snapshot, dimension: str) -> float:
+        """获取无分桶维度的平均值"""
+        count, value_sum = snapshot.get(dimension, {}).get('', [0, 0.0])
+        return value_sum / count if count else 0.0
+
+    @staticmethod
+    def distribution(snapshot: Snapshot, dimension: str) -> Dict[str, int]:
+        """获取维度的分布"""
+        return {bucket: int(entry[0]) for bucket, entry in snapshot.get(dimension, {}).items()}
+
+    def certificate_statistics(self, snapshot: Snapshot = None) -> Dict[str, Any]:
+        """证书概览统计"""
+        snapshot = snapshot if snapshot is not None else self.snapshot()
+        return {
+            'total': self.count(snapshot, 'total'),
+            'valid': self.count(snapshot, 'status', 'valid'),
+            'expiring': self.count(snapshot, 'expiring'),
+            'expired': self.count(snapshot, 'status', 'expired'),
+            'type_distribution': [
+                {'type': cert_type, 'count': count}
+                for cert_type, count in self.distribution(snapshot, 'type').items()
+            ]
+        }
+
+    def monitoring_statistics(self, snapshot: Snapshot = None) -> Dict[str, Any]:
+        """监控配置统计"""
+        snapshot = snapshot if snapshot is not None else self.snapshot()
+        frequencies = self.distribution(snapshot, 'monitoring_frequency_distribution')
+        return {
+            'total_certificates': self.count(snapshot, 'total'),
+            'monitoring_enabled_count': self.count(snapshot, 'monitoring_enabled'),
+            'alert_enabled_count': self.count(snapshot, 'alert_enabled'),
+            'average_frequency': round(self.average(snapshot, 'monitoring_frequency') or 3600, 2),
+            'frequency_distribution': [
+                {'frequency': int(frequency), 'count': frequencies[frequency]}
+                for frequency in sorted(frequencies, key=int)
+            ]
+        }
+
+    def domain_monitoring_statistics(self, snapshot: Snapshot = None) -> Dict[str, Any]:
+        """域名监控统计"""
+        snapshot = self.with_volatile(snapshot if snapshot is not None else self.snapshot())
+        return {
+            'dns_status_distribution': self.distribution(snapshot, 'dns_status'),
+            'reachability_distribution': {
+                'reachable': self.count(snapshot, 'domain_reachable', '1'),
+                'unreachable': self.count(snapshot, 'domain_reachable', '0')
+            },
+            'average_dns_response_time': round(self.average(snapshot, 'dns_response_time'), 2),
+            'average_success_response_time': round(self.average(snapshot, 'dns_success_response_time'), 2),
+            'recent_checks': self.recent_checks()
+        }
+
+    def port_monitoring_statistics(self, snapshot: Snapshot = None) -> Dict[str, Any]:
+        """端口监控统计"""
+        snapshot = self.with_volatile(snapshot if snapshot is not None else self.snapshot())
+        return {
+            'tls_version_distribution': self.distribution(snapshot, 'tls_version'),
+            'certificate_chain_valid_count': self.count(snapshot, 'certificate_chain_valid', '1'),
+            'certificate_chain_invalid_count': self.count(snapshot, 'certificate_chain_valid', '0'),
+            'average_handshake_time': round(self.average(snapshot, 'ssl_handshake_time'), 2),
+            'slow_handshakes_count': self.count(snapshot, 'slow_handshake'),
+            'http_redirect_distribution': self.distribution(snapshot, 'http_redirect_status')
+        }
@@ -0,0 +1,105 @@
+"""
+证书标签模块 - 规范化的标签表，按标签/负责人/业务单元筛选证书时走索引
+"""
+import json
+import logging
+from typing import Any, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TAG_TABLE = 'certificate_tags'
+MAX_TAG_LENGTH = 64
+
+
+def normalize_tags(value: Any) -> List[str]:
+    """将标签值规范化为去重的小写标签列表
+
+    接受JSON数组字符串(certificates.tags的存储格式)、逗号分隔的字符串或列表。
+    """
+    if value is None or value == '':
+        return []
+    if isinstance(value, str):
+        try:
+            parsed = json.loads(value)
+        except ValueError:
+            parsed = value.split(',')
+        value = parsed if isinstance(parsed, list) else [parsed]
+    elif not isinstance(value, (list, tuple, set)):
+        value = [value]
+
+    tags = []
+    for item in value:
+        tag = str(item).strip().lower()[:MAX_TAG_LENGTH]
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags
+
+
+def build_tag_table() -> str:
+    """标签表建表语句：主键(tag, certificate_id)使按标签查证书只读索引"""
+    return f'''
+    CREATE TABLE IF NOT EXISTS `{TAG_TABLE}` (
+        `tag` VARCHAR({MAX_TAG_LENGTH}) NOT NULL,
+        `certificate_id` INT NOT NULL,
+        PRIMARY KEY (`tag`, `certificate_id`),
+        INDEX `idx_certificate_tags_certificate_id` (`certificate_id`),
+        FOREIGN KEY (`certificate_id`) REFERENCES `certificates`(`id`) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    '''
+
+
+def sync_tags(database, certificate_id: int, tags: Any) -> List[str]:
+    """用证书当前的标签替换标签表中的记录(不提交，随调用方的事务提交)"""
+    normalized = normalize_tags(tags)
+    database.execute(f"DELETE FROM `{TAG_TABLE}` WHERE certificate_id = ?", (certificate_id,)).close()
+    if normalized:
+        placeholders = ', '.join(['(?, ?)'] * len(normalized))
+        params = tuple(value for tag in normalized for value in (tag, certificate_id))
+        database.execute(
+            f"INSERT INTO `{TAG_TABLE}` (`tag`, `certificate_id`) VALUES {placeholders}", params
+        ).close()
+    return normalized
+
+
+def ownership_conditions(tags: Any = None, owner: Optional[str] = None, business_unit: Optional[str] = None,
+                         prefix: str = '') -> Tuple[List[str], List[Any]]:
+    """标签/负责人/业务单元筛选条件
+
+    多个标签需同时具备；标签条件为对标签表主键的半连接子查询，
+    负责人和业务单元为等值条件，分别走 idx_certificates_owner / idx_certificates_business_unit。
+    """
+    conditions = []
+    params = []
+
+    normalized = normalize_tags(tags)
+    if len(normalized) == 1:
+        conditions.append(f"{prefix}id IN (SELECT certificate_id FROM `{TAG_TABLE}` WHERE tag = ?)")
+        params.append(normalized[0])
+    elif normalized:
+        placeholders = ', '.join(['?'] * len(normalized))
+        conditions.append(
+            f"{prefix}id IN (SELECT certificate_id FROM `{TAG_TABLE}` WHERE tag IN ({placeholders}) "
+            f"GROUP BY certificate_id HAVING COUNT(*) = ?)"
+        )
+        params.extend(normalized)
+        params.append(len(normalized))
+
+    if owner:
+        conditions.append(f"{prefix}owner = ?")
+        params.append(owner.strip())
+
+    if business_unit:
+        conditions.append(f"{prefix}business_unit = ?")
+        params.append(business_unit.strip())
+
+    return conditions, params
+
+
+def parse_tag_args(values: Iterable[str]) -> List[str]:
+    """解析查询参数中的标签(支持重复的tag参数和逗号分隔)"""
+    tags = []
+    for value in values:
+        for tag in normalize_tags(value.split(',')):
+            if tag not in tags:
+                tags.append(tag)
+    return tags
@@ -0,0 +1,209 @@
+"""
+证书链存储模块 - 按DER内容SHA-256寻址的证书存储，同一个中间证书只保存一份
+"""
+import os
+import re
+import ssl
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BLOB_TABLE = 'certificate_blobs'
+# 证书行引用的摘要列，叶子证书在前，按链顺序逗号分隔
+CHAIN_COLUMN = 'chain_digests'
+# 单条证书链最多引用的证书数(chain_digests列为VARCHAR(650)：10个64位摘要加分隔符)
+MAX_CHAIN_LENGTH = 10
+
+_PEM_BLOCK_RE = re.compile(r'-----BEGIN ([A-Z0-9 ]+)-----(.*?)-----END \1-----', re.S)
+
+
+class ChainStoreError(ValueError):
+    """证书链引用了不存在的证书"""
+
+
+def split_pem_chain(pem: Optional[str]) -> Optional[List[bytes]]:
+    """把PEM证书链拆分为DER列表
+
+    只包含CERTIFICATE块时返回DER列表；为空、包含其他类型的块(如私钥)或无法解码时返回None，
+    调用方按原文保存。块之外的文本(如openssl输出的subject/issuer注释)不保留。
+    """
+    if not pem:
+        return None
+    blocks = _PEM_BLOCK_RE.findall(pem)
+    if not blocks or len(blocks) > MAX_CHAIN_LENGTH or any(kind != 'CERTIFICATE' for kind, _ in blocks):
+        return None
+    try:
+        ders = [ssl.PEM_cert_to_DER_cert(f"-----BEGIN CERTIFICATE-----{body}-----END CERTIFICATE-----")
+                for _, body in blocks]
+    except ValueError:
+        return None
+    # 证书的DER编码以SEQUENCE(0x30)开头，其他内容按原文保存
+    if any(der[:1] != b'\x30' for der in ders):
+        return None
+    return ders
+
+
+def blob_digest(der: bytes) -> str:
+    """证书DER内容的SHA-256(十六进制)"""
+    return hashlib.sha256(der).hexdigest()
+
+
+def build_blob_table() -> str:
+    """证书存储表建表语句"""
+    return f'''
+    CREATE TABLE IF NOT EXISTS `{BLOB_TABLE}` (
+        `sha256` CHAR(64) NOT NULL PRIMARY KEY,
+        `der` BLOB NOT NULL,
+        `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    '''
+
+
+class ChainStore:
+    """内容寻址的证书存储
+
+    写入时把证书链拆成单个证书，以DER的SHA-256为主键 INSERT IGNORE，
+    证书行只保存摘要列表；读取时按摘要重新拼接PEM证书链。
+    已读取的证书按摘要缓存在进程内LRU中，大量证书共用的中间证书通常直接命中缓存。
+    缓存只在读取数据库后填充，回滚的写入不会让缓存引用数据库中不存在的证书。
+    """
+
+    def __init__(self, maxsize: int = None):
+        """初始化证书存储"""
+        if maxsize is None:
+            maxsize = int(os.getenv('CERT_BLOB_CACHE_SIZE', 2048))
+        self.maxsize = maxsize
+        self._cache: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def store_many(self, database, pems: Iterable[Optional[str]], chunk_size: int = 500) -> List[Optional[str]]:
+        """保存多条证书链中的证书(多行INSERT IGNORE)，按输入顺序返回摘要列表
+
+        不是纯证书PEM的内容对应None，调用方按原文保存。不提交，随调用方的事务提交。
+        """
+        references = []
+        blobs: 'OrderedDict[str, bytes]' = OrderedDict()
+        for pem in pems:
+            ders = split_pem_chain(pem)
+            if ders is None:
+                references.append(None)
+                continue
+            digests = [blob_digest(der) for der in ders]
+            blobs.update(zip(digests, ders))
+            references.append(','.join(digests))
+
+        items = list(blobs.items())
+        for start in range(0, len(items), chunk_size):
+            chunk = items[start:start + chunk_size]
+            placeholders = ', '.join(['(?, ?)'] * len(chunk))
+            params = tuple(value for item in chunk for value in item)
+            database.execute(
+                f"INSERT IGNORE INTO `{BLOB_TABLE}` (`sha256`, `der`) VALUES {placeholders}", params
+            ).close()
+        return references
+
+    def store(self, database, pem: Optional[str]) -> Optional[str]:
+        """保存一条证书链，返回摘要列表；不是纯证书PEM时返回None(按原文保存)"""
+        return self.store_many(database, [pem])[0]
+
+    def _cached(self, digest: str) -> Optional[str]:
+        """读取缓存中的PEM"""
+        with self._lock:
+            pem = self._cache.get(digest)
+            if pem is not None:
+                self._cache.move_to_end(digest)
+                self._hits += 1
+            else:
+                self._misses += 1
+            return pem
+
+    def _remember(self, digest: str, pem: str) -> None:
+        """缓存PEM，超出容量时淘汰最久未使用的证书"""
+        with self._lock:
+            self._cache[digest] = pem
+            self._cache.move_to_end(digest)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+    def fetch(self, database, digests: Iterable[str], chunk_size: int = 500) -> Dict[str, str]:
+        """按摘要获取PEM，缓存未命中的证书批量查询"""
+        found = {}
+        missing = []
+        for digest in dict.fromkeys(digests):
+            pem = self._cached(digest)
+            if pem is None:
+                missing.append(digest)
+            else:
+                found[digest] = pem
+
+        for start in range(0, len(missing), chunk_size):
+            chunk = missing[start:start + chunk_size]
+            placeholders = ', '.join(['?'] * len(chunk))
+            for row in database.fetchall(
+                f"SELECT sha256, der FROM `{BLOB_TABLE}` WHERE sha256 IN ({placeholders})", tuple(chunk)
+            ):
+                pem = ssl.DER_cert_to_PEM_cert(bytes(row['der']))
+                self._remember(row['sha256'], pem)
+                found[row['sha256']] = pem
+        return found
+
+    def assemble_many(self, database, references: Iterable[str]) -> Dict[str, str]:
+        """批量拼接证书链，返回 {摘要列表: PEM证书链}"""
+        references = [reference for reference in dict.fromkeys(references) if reference]
+        chains = {reference: reference.split(',') for reference in references}
+        blobs = self.fetch(database, (digest for digests in chains.values() for digest in digests))
+
+        assembled = {}
+        for reference, digests in chains.items():
+            missing = [digest for digest in digests if digest not in blobs]
+            if missing:
+                raise ChainStoreError(f"证书链引用的证书不存在: {', '.join(missing)}")
+            assembled[reference] = ''.join(blobs[digest] for digest in digests)
+        return assembled
+
+    def assemble(self, database, reference: str) -> str:
+        """按摘要列表拼接PEM证书链"""
+        return self.assemble_many(database, [reference])[reference]
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取缓存统计"""
+        with self._lock:
+            return {
+                'size': len(self._cache),
+                'maxsize': self.maxsize,
+                'hits': self._hits,
+                'misses': self._misses
+            }
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._cache.clear()
+
+    def collect_garbage(self, database, grace_hours: int = 24) -> int:
+        """删除没有证书行引用的证书
+
+        只删除创建超过grace_hours的证书，避免删除进行中事务刚写入、尚未被证书行引用的证书。
+        """
+        cursor = database.execute(
+            f"""DELETE b FROM `{BLOB_TABLE}` b
+                WHERE b.created_at < CURRENT_TIMESTAMP - INTERVAL ? HOUR
+                AND NOT EXISTS (
+                    SELECT 1 FROM certificates c
+                    WHERE c.{CHAIN_COLUMN} IS NOT NULL AND FIND_IN_SET(b.sha256, c.{CHAIN_COLUMN})
+                )""",
+            (grace_hours,)
+        )
+        deleted = cursor.rowcount
+        cursor.close()
+        return deleted
+
+
+# 全局证书链存储(缓存在进程内共享)
+chain_store = ChainStore()
@@ -0,0 +1,175 @@
+"""
+表变更版本模块 - 触发器在列表可见的数据变化时递增表版本，用于生成列表和统计接口的ETag
+"""
+import time
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+from .trigger_install import ensure_triggers
+
+logger = logging.getLogger(__name__)
+
+VERSION_TABLE = 'table_versions'
+TRIGGER_PREFIX = 'trg_change_version'
+
+# 维护变更版本的表(列表接口关联服务器名称和证书数量，两张表互相影响)
+TRACKED_TABLES = ('certificates', 'servers')
+
+# 列表和统计接口可见的列，UPDATE只有这些列变化时才递增版本。
+# 心跳时间、下次检查时间、状态摘要、检查时间戳和响应耗时每次检查都会变化，
+# 依赖它们的字段(在线状态、最近检查次数、平均耗时)由ETag的时间分桶定期刷新。
+VISIBLE_COLUMNS = {
+    'certificates': (
+        'domain', 'type', 'status', 'expires_at', 'server_id', 'ca_type',
+        'monitoring_enabled', 'monitoring_frequency', 'alert_enabled',
+        'notes', 'tags', 'owner', 'business_unit',
+        'dns_status', 'domain_reachable', 'http_status_code',
+        'monitored_ports', 'tls_version', 'cipher_suite', 'certificate_chain_valid', 'http_redirect_status',
+        'check_in_progress', 'renewal_status', 'auto_renewal_enabled', 'renewal_days_before',
+        'import_source', 'last_renewal_attempt'
+    ),
+    'servers': (
+        'name', 'ip', 'os_type', 'version', 'auto_renew', 'user_id', 'server_type', 'description', 'status'
+    ),
+}
+
+# 每张表的版本分散到多行(按连接ID取模)：长事务只锁住自己连接对应的版本行，
+# 不会让其他连接的写入排队；读取时按表求和，任一行递增都会使合计变化。
+VERSION_SHARDS = 64
+
+
+def build_version_table() -> str:
+    """表版本建表语句"""
+    return f'''
+    CREATE TABLE IF NOT EXISTS `{VERSION_TABLE}` (
+        `table_name` VARCHAR(64) NOT NULL PRIMARY KEY,
+        `version` BIGINT UNSIGNED NOT NULL DEFAULT 0,
+        `updated_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    '''
+
+
+def trigger_name(table: str, event: str) -> str:
+    """触发器名称"""
+    return f"{TRIGGER_PREFIX}_{table}_{event.lower()}"
+
+
+def trigger_names(tables: Iterable[str] = TRACKED_TABLES) -> List[str]:
+    """所有触发器名称"""
+    return [trigger_name(table, event) for table in tables for event in ('INSERT', 'UPDATE', 'DELETE')]
+
+
+def _bump_statement(table: str) -> str:
+    """递增当前连接对应版本行的语句"""
+    return (f"INSERT INTO `{VERSION_TABLE}` (`table_name`, `version`) "
+            f"VALUES (CONCAT('{table}#', CONNECTION_ID() % {VERSION_SHARDS}), 1)\n"
+            f"ON DUPLICATE KEY UPDATE `version` = `version` + 1")
+
+
+def build_trigger_statements(tables: Iterable[str] = TRACKED_TABLES) -> List[str]:
+    """生成递增表版本的INSERT/UPDATE/DELETE触发器(UPDATE只在可见列变化时递增)"""
+    statements = []
+    for table in tables:
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            head = f"CREATE TRIGGER `{trigger_name(table, event)}` AFTER {event} ON `{table}` FOR EACH ROW\n"
+            if event != 'UPDATE':
+                statements.append(head + _bump_statement(table))
+                continue
+            unchanged = '\n        AND '.join(
+                f"OLD.`{column}` <=> NEW.`{column}`" for column in VISIBLE_COLUMNS[table]
+            )
+            statements.append(
+                head +
+                f"BEGIN\n"
+                f"    IF NOT ({unchanged}) THEN\n"
+                f"        {_bump_statement(table).replace(chr(10), chr(10) + '        ')};\n"
+                f"    END IF;\n"
+                f"END"
+            )
+    return statements
+
+
+def _bump_all(database) -> None:
+    """递增所有表的版本：触发器删除和重建之间的写入没有递增版本，安装后统一使ETag失效"""
+    placeholders = ', '.join(["(?, 1)"] * len(TRACKED_TABLES))
+    database.execute(
+        f"INSERT INTO `{VERSION_TABLE}` (`table_name`, `version`) VALUES {placeholders} AS new "
+        f"ON DUPLICATE KEY UPDATE `version` = `{VERSION_TABLE}`.`version` + 1",
+        TRACKED_TABLES
+    ).close()
+
+
+def install_change_versions(database) -> bool:
+    """创建表版本和维护触发器(已是当前定义时不重建)
+
+    没有创建触发器的权限时清空版本行，接口不生成ETag(每次重新查询)，
+    避免版本不再变化导致客户端一直收到304。
+    """
+    database.execute(build_version_table())
+    try:
+        return ensure_triggers(database, 'change_version', trigger_names(), build_trigger_statements(),
+                               after_install=_bump_all)
+    except Exception as e:
+        database.rollback()
+        logger.warning(f"表变更版本触发器创建失败，列表和统计接口不使用ETag: {e}")
+        try:
+            database.execute(f"DELETE FROM `{VERSION_TABLE}`")
+            database.commit()
+        except Exception:
+            database.rollback()
+        return False
+
+
+class ChangeVersions:
+    """表变更版本读取
+
+    所有表的版本用一次主键查询读取，并在进程内缓存check_interval秒，
+    条件请求在缓存期内不访问数据库(期间的写入最多延迟check_interval秒反映到ETag)。
+    """
+
+    def __init__(self, database, check_interval: float = 1.0):
+        """初始化表版本读取"""
+        self.database = database
+        self.check_interval = check_interval
+        self._versions: Dict[str, int] = {}
+        self._read_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, int]:
+        """读取所有表的版本，版本表不可用时返回空字典"""
+        self.database.connect()
+        try:
+            rows = self.database.fetchall(f"SELECT `table_name`, `version` FROM `{VERSION_TABLE}`")
+        except Exception as e:
+            logger.debug(f"读取表变更版本失败: {e}")
+            rows = []
+        finally:
+            self.database.close()
+        # 分片行 "表名#分片" 与基础行 "表名" 按表求和
+        versions: Dict[str, int] = {}
+        for row in rows:
+            table = row['table_name'].split('#', 1)[0]
+            versions[table] = versions.get(table, 0) + int(row['version'])
+        return versions
+
+    def get(self, tables: Iterable[str]) -> Optional[Tuple[int, ...]]:
+        """返回指定表的版本，任一表没有版本时返回None(不生成ETag)"""
+        now = time.monotonic()
+        with self._lock:
+            fresh = self._read_at is not None and now - self._read_at < self.check_interval
+            versions = self._versions
+        if not fresh:
+            versions = self._read()
+            with self._lock:
+                self._versions = versions
+                self._read_at = now
+
+        try:
+            return tuple(versions[table] for table in tables)
+        except KeyError:
+            return None
+
+    def expire(self) -> None:
+        """下次调用get()时重新读取版本"""
+        with self._lock:
+            self._read_at = None
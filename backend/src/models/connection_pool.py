@@ -0,0 +1,219 @@
+"""
+MySQL连接池模块 - 为Database提供有界的连接复用
+"""
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, Callable, Optional
+
+import pymysql
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """连接池借出超时异常"""
+    pass
+
+
+class ConnectionPool:
+    """有界MySQL连接池
+
+    - 常驻连接数量为 pool_size，高峰期最多额外创建 max_overflow 个溢出连接
+    - 连接池耗尽时最多等待 pool_timeout 秒，超时抛出 PoolTimeoutError
+    - 借出前进行预检查(ping)，空闲超过 pool_recycle 秒的连接会被重建
+    - 溢出连接归还时直接关闭，常驻连接归还时回滚未提交的事务
+    """
+
+    def __init__(self, connection_params: Dict[str, Any], pool_size: int = 10,
+                 max_overflow: int = 20, pool_timeout: float = 30,
+                 pool_recycle: int = 3600, pre_ping: bool = True,
+                 creator: Callable[..., Any] = None):
+        """初始化连接池"""
+        self._connection_params = connection_params
+        self._creator = creator or pymysql.connect
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_timeout = pool_timeout
+        self.pool_recycle = pool_recycle
+        self.pre_ping = pre_ping
+
+        self._lock = threading.Condition(threading.Lock())
+        self._idle = deque()
+        self._created_at: Dict[int, float] = {}
+        self._total = 0
+        self._checked_out = 0
+
+        # 统计信息
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._timeouts = 0
+        self._connects = 0
+        self._recycled = 0
+        self._invalidated = 0
+
+    @property
+    def max_size(self) -> int:
+        """连接池允许的最大连接数"""
+        return self.pool_size + self.max_overflow
+
+    def _create_connection(self):
+        """创建新的物理连接"""
+        conn = self._creator(**self._connection_params)
+        self._created_at[id(conn)] = time.monotonic()
+        self._connects += 1
+        logger.debug("MySQL连接池创建新连接")
+        return conn
+
+    def _close_connection(self, conn) -> None:
+        """关闭物理连接"""
+        self._created_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception as e:
+            logger.debug(f"关闭连接池连接时出错: {e}")
+
+    def _is_stale(self, conn) -> bool:
+        """检查连接是否超过回收时间"""
+        if self.pool_recycle <= 0:
+            return False
+        created_at = self._created_at.get(id(conn))
+        return created_at is None or time.monotonic() - created_at >= self.pool_recycle
+
+    def _ping(self, conn) -> bool:
+        """预检查连接是否可用"""
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def checkout(self, timeout: float = None):
+        """从连接池借出连接"""
+        timeout = self.pool_timeout if timeout is None else timeout
+        deadline = None
+        waited = False
+        started = time.monotonic()
+
+        with self._lock:
+            while True:
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._total < self.max_size:
+                    conn = None
+                    self._total += 1
+                    break
+
+                if deadline is None:
+                    deadline = started + timeout
+                    waited = True
+                    self._waits += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    self._record_wait(time.monotonic() - started)
+                    raise PoolTimeoutError(
+                        f"连接池已耗尽 (pool_size={self.pool_size}, "
+                        f"max_overflow={self.max_overflow})，等待 {timeout} 秒后超时"
+                    )
+                self._lock.wait(remaining)
+
+            self._checked_out += 1
+            self._checkouts += 1
+            if waited:
+                self._record_wait(time.monotonic() - started)
+
+        try:
+            if conn is None:
+                conn = self._create_connection()
+            elif self._is_stale(conn):
+                self._recycled += 1
+                self._close_connection(conn)
+                conn = self._create_connection()
+            elif self.pre_ping and not self._ping(conn):
+                self._invalidated += 1
+                self._close_connection(conn)
+                conn = self._create_connection()
+        except Exception:
+            # 创建失败时释放占用的名额
+            with self._lock:
+                self._total -= 1
+                self._checked_out -= 1
+                self._lock.notify()
+            raise
+
+        return conn
+
+    def checkin(self, conn) -> None:
+        """归还连接到连接池"""
+        if conn is None:
+            return
+
+        reusable = getattr(conn, 'open', True)
+        if reusable:
+            try:
+                conn.rollback()
+            except Exception:
+                reusable = False
+
+        with self._lock:
+            self._checked_out -= 1
+            if reusable and len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                conn = None
+            else:
+                self._total -= 1
+            self._lock.notify()
+
+        if conn is not None:
+            self._close_connection(conn)
+
+    def invalidate(self, conn) -> None:
+        """丢弃已损坏的连接"""
+        if conn is None:
+            return
+        with self._lock:
+            self._checked_out -= 1
+            self._total -= 1
+            self._invalidated += 1
+            self._lock.notify()
+        self._close_connection(conn)
+
+    def dispose(self) -> None:
+        """关闭所有空闲连接"""
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._total -= len(idle)
+            self._lock.notify_all()
+        for conn in idle:
+            self._close_connection(conn)
+
+    def _record_wait(self, wait_time: float) -> None:
+        """记录等待时间(调用方需持有锁)"""
+        self._wait_time += wait_time
+        self._max_wait_time = max(self._max_wait_time, wait_time)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取连接池统计信息"""
+        with self._lock:
+            return {
+                'pool_size': self.pool_size,
+                'max_overflow': self.max_overflow,
+                'in_use': self._checked_out,
+                'idle': len(self._idle),
+                'total': self._total,
+                'overflow': max(0, self._total - self.pool_size),
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'wait_time_total': round(self._wait_time, 6),
+                'wait_time_max': round(self._max_wait_time, 6),
+                'timeouts': self._timeouts,
+                'connects': self._connects,
+                'recycled': self._recycled,
+                'invalidated': self._invalidated
+            }
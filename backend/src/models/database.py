@@ -2,12 +2,36 @@
 数据库模型定义模块 - MySQL 8.0.41 支持
 """
 import os
+import re
+import copy
 import logging
 import datetime
-from typing import Dict, List, Any, Optional, Tuple
+import threading
+import time
+import weakref
+from typing import Callable, Dict, Iterator, List, Any, Optional, Tuple
 import pymysql
-from pymysql.cursors import DictCursor
+from pymysql.cursors import DictCursor, SSDictCursor
 from contextlib import contextmanager
+from .connection_pool import ConnectionPool, PoolTimeoutError
+from .statement_cache import statement_cache
+from .query_metrics import query_metrics
+from .replica_router import ReplicaRouter, ReplicaState
+from .unit_of_work import UnitOfWork
+from .certificate_statistics import install_statistics_summary
+from .domain_search import install_domain_search
+from .change_versions import install_change_versions
+from .certificate_tags import build_tag_table
+from .chain_store import build_blob_table
+from .monitoring_history import (
+    build_partition_clause, build_rollup_table, HOURLY_ROLLUP_TABLE, DAILY_ROLLUP_TABLE
+)
+
+try:
+    # gevent.local按greenlet隔离，在原生线程中同样按线程隔离
+    from gevent.local import local as _ScopeLocal
+except ImportError:
+    from threading import local as _ScopeLocal
 
 logger = logging.getLogger(__name__)
 
@@ -31,11 +55,21 @@ class DatabaseConfig:
         self.pool_timeout = int(os.getenv('MYSQL_POOL_TIMEOUT', 30))
         self.pool_recycle = int(os.getenv('MYSQL_POOL_RECYCLE', 3600))
 
+        # 只读副本配置，格式: host1[:port],host2[:port]
+        self.replica_hosts = self._parse_hosts(os.getenv('MYSQL_REPLICA_HOSTS', ''))
+        self.replica_max_lag = float(os.getenv('MYSQL_REPLICA_MAX_LAG', 5))
+        self.replica_check_interval = float(os.getenv('MYSQL_REPLICA_CHECK_INTERVAL', 10))
+        self.replica_sticky_seconds = float(os.getenv('MYSQL_REPLICA_STICKY_SECONDS', 30))
+
         # 连接超时配置
         self.connect_timeout = int(os.getenv('MYSQL_CONNECT_TIMEOUT', 10))
         self.read_timeout = int(os.getenv('MYSQL_READ_TIMEOUT', 30))
         self.write_timeout = int(os.getenv('MYSQL_WRITE_TIMEOUT', 30))
 
+        # 流式查询配置：每批从服务端游标读取的行数，以及客户端读取较慢时服务端等待发送的时间
+        self.stream_batch_size = int(os.getenv('MYSQL_STREAM_BATCH_SIZE', 500))
+        self.stream_net_write_timeout = int(os.getenv('MYSQL_STREAM_NET_WRITE_TIMEOUT', 600))
+
         # SSL配置
         self.ssl_disabled = os.getenv('MYSQL_SSL_DISABLED', 'false').lower() == 'true'
         self.ssl_ca = os.getenv('MYSQL_SSL_CA', None)
@@ -51,6 +85,25 @@ class DatabaseConfig:
         # 验证配置
         self._validate_config()
 
+    def _parse_hosts(self, value: str) -> List[Tuple[str, int]]:
+        """解析逗号分隔的主机列表"""
+        hosts = []
+        for item in value.split(','):
+            item = item.strip()
+            if not item:
+                continue
+            host, _, port = item.partition(':')
+            hosts.append((host, int(port) if port else self.port))
+        return hosts
+
+    def replica_config(self, host: str, port: int) -> 'DatabaseConfig':
+        """生成只读副本的连接配置(复用主库的账号和其他参数)"""
+        config = copy.copy(self)
+        config.host = host
+        config.port = port
+        config.replica_hosts = []
+        return config
+
     def _validate_config(self):
         """验证配置参数"""
         if not self.host:
@@ -80,6 +133,9 @@ class DatabaseConfig:
         if self.pool_recycle < 0:
             raise ValueError(f"连接回收时间不能为负数，当前值: {self.pool_recycle}")
 
+        if self.replica_max_lag < 0:
+            raise ValueError(f"副本最大复制延迟不能为负数，当前值: {self.replica_max_lag}")
+
     def get_connection_params(self) -> Dict[str, Any]:
         """获取连接参数"""
         params = {
@@ -162,8 +218,77 @@ class DatabaseConfig:
             'pool_recycle': self.pool_recycle,
             'ssl_enabled': not self.ssl_disabled,
             'ssl_verify_cert': self.ssl_verify_cert,
-            'ssl_verify_identity': self.ssl_verify_identity
+            'ssl_verify_identity': self.ssl_verify_identity,
+            'replica_hosts': [f"{host}:{port}" for host, port in self.replica_hosts],
+            'replica_max_lag': self.replica_max_lag
+        }
+
+# 连接池注册表，相同连接目标的Database实例共享同一个连接池
+_pools: Dict[Tuple[Any, ...], ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+def get_shared_pool(config: DatabaseConfig) -> ConnectionPool:
+    """获取(或创建)指定配置对应的共享连接池"""
+    key = (config.host, config.port, config.username, config.database)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool_config = config.get_pool_config()
+            pool = ConnectionPool(
+                config.get_connection_params(),
+                pool_size=pool_config['pool_size'],
+                max_overflow=pool_config['max_overflow'],
+                pool_timeout=pool_config['pool_timeout'],
+                pool_recycle=pool_config['pool_recycle'],
+                pre_ping=pool_config['pool_pre_ping']
+            )
+            _pools[key] = pool
+        return pool
+
+# 副本路由注册表，相同主库配置的Database实例共享副本连接池和延迟检查结果
+_routers: Dict[Tuple[Any, ...], ReplicaRouter] = {}
+
+def get_shared_router(config: DatabaseConfig) -> Optional[ReplicaRouter]:
+    """获取(或创建)指定配置对应的共享副本路由器，未配置副本时返回None"""
+    if not config.replica_hosts:
+        return None
+    key = (config.host, config.port, config.username, config.database, tuple(config.replica_hosts))
+    with _pools_lock:
+        router = _routers.get(key)
+    if router is None:
+        replicas = {
+            f"{host}:{port}": get_shared_pool(config.replica_config(host, port))
+            for host, port in config.replica_hosts
         }
+        with _pools_lock:
+            router = _routers.setdefault(key, ReplicaRouter(
+                replicas, max_lag=config.replica_max_lag, check_interval=config.replica_check_interval
+            ))
+    return router
+
+# 只读语句(可以路由到副本)；带锁的读取必须在主库执行
+_READ_RE = re.compile(r'^\s*(select|show|with)\b', re.IGNORECASE)
+_LOCKING_READ_RE = re.compile(r'\bfor\s+(update|share)\b|\block\s+in\s+share\s+mode\b', re.IGNORECASE)
+
+# 读写分离路由状态，所有Database实例共享，按线程/greenlet隔离
+_routing = _ScopeLocal()
+
+class _ScopeGuard:
+    """保存在作用域数据中的哨兵对象，线程/greenlet结束时随作用域数据一起释放"""
+    __slots__ = ('__weakref__',)
+
+def _return_orphaned(held: Dict[str, Tuple[ConnectionPool, Any]]):
+    """归还线程/greenlet结束时仍未释放的连接(没有调用close()/release()的隐式连接)"""
+    for name, (pool, conn) in list(held.items()):
+        held.pop(name, None)
+        try:
+            pool.checkin(conn)
+        except Exception:
+            try:
+                pool.invalidate(conn)
+            except Exception as e:
+                logger.warning(f"归还结束作用域的数据库连接时出错: {e}")
+        logger.debug(f"已归还结束作用域遗留的数据库连接({name})")
 
 class Database:
     """MySQL数据库操作类"""
@@ -171,82 +296,353 @@ class Database:
     def __init__(self, config: DatabaseConfig = None):
         """初始化数据库连接"""
         self.config = config or DatabaseConfig()
-        self.conn = None
-        self._connection_pool = []
-        self._pool_size = 0
-        self._max_pool_size = self.config.pool_size + self.config.max_overflow
-
-    def connect(self):
-        """连接数据库"""
+        self._pool = None
+        self._router = None
+        self._scope = _ScopeLocal()
+
+    @property
+    def pool(self) -> ConnectionPool:
+        """获取连接池(首次使用时创建)"""
+        if self._pool is None:
+            self._pool = get_shared_pool(self.config)
+        return self._pool
+
+    @property
+    def router(self) -> Optional[ReplicaRouter]:
+        """获取只读副本路由器，未配置副本时为None"""
+        if self._router is None and self.config.replica_hosts:
+            self._router = get_shared_router(self.config)
+        return self._router
+
+    @property
+    def conn(self):
+        """当前线程/greenlet持有的连接"""
+        return getattr(self._scope, 'conn', None)
+
+    @conn.setter
+    def conn(self, value):
+        self._scope.conn = value
+
+    @property
+    def _depth(self) -> int:
+        """当前线程/greenlet的connect()嵌套层数"""
+        return getattr(self._scope, 'depth', 0)
+
+    @_depth.setter
+    def _depth(self, value: int):
+        self._scope.depth = value
+
+    @property
+    def unit(self) -> Optional[UnitOfWork]:
+        """当前线程/greenlet进行中的工作单元，不在transaction()内时为None"""
+        return getattr(self._scope, 'unit', None)
+
+    def _held(self) -> Dict[str, Tuple[ConnectionPool, Any]]:
+        """当前作用域持有的连接
+
+        execute()/fetchone()等在connect()/session()之外隐式获取的连接只在release()时归还，
+        线程/greenlet结束时作用域数据被丢弃，由哨兵对象的终结器归还连接池，避免连接池槽位泄漏。
+        """
+        held = getattr(self._scope, 'held', None)
+        if held is None:
+            held = {}
+            guard = _ScopeGuard()
+            self._scope.held = held
+            self._scope.guard = guard
+            weakref.finalize(guard, _return_orphaned, held)
+        return held
+
+    def _ensure_connection(self):
+        """确保当前作用域已持有连接"""
+        if self.conn:
+            return self.conn
         try:
-            self.conn = pymysql.connect(**self.config.get_connection_params())
+            started = time.perf_counter()
+            self.conn = self.pool.checkout()
+            self._held()['primary'] = (self.pool, self.conn)
+            query_metrics.record_acquire(time.perf_counter() - started)
             logger.debug("MySQL数据库连接成功")
             return self.conn
+        except PoolTimeoutError as e:
+            logger.error(f"获取MySQL连接超时: {e}")
+            raise
         except Exception as e:
             logger.error(f"MySQL数据库连接失败: {e}")
             raise
 
+    def connect(self):
+        """获取当前线程/greenlet的数据库连接
+
+        连接按线程(gevent下按greenlet)隔离，同一作用域内嵌套的
+        connect()/close()共享同一个连接，最外层close()时归还连接池。
+        """
+        conn = self._ensure_connection()
+        self._depth += 1
+        return conn
+
     def close(self):
-        """关闭数据库连接"""
+        """释放当前线程/greenlet的数据库连接"""
+        if self._depth > 1:
+            self._depth -= 1
+            return
+        self.release()
+
+    def release(self):
+        """无论嵌套层数，立即将当前作用域的连接归还连接池"""
+        self._depth = 0
+        self._release_replica()
         if self.conn:
+            self._held().pop('primary', None)
             try:
-                self.conn.close()
-                logger.debug("MySQL数据库连接已关闭")
+                self.pool.checkin(self.conn)
+                logger.debug("MySQL数据库连接已归还连接池")
             except Exception as e:
-                logger.warning(f"关闭数据库连接时出错: {e}")
+                logger.warning(f"归还数据库连接时出错: {e}")
             finally:
                 self.conn = None
 
+    def end_request(self):
+        """请求结束：归还连接并清除读写分离的主库粘滞状态"""
+        self.release()
+        _routing.primary_until = 0.0
+
+    @contextmanager
+    def use_primary(self):
+        """在上下文内强制所有读取走主库"""
+        _routing.force_primary = getattr(_routing, 'force_primary', 0) + 1
+        try:
+            yield self
+        finally:
+            _routing.force_primary -= 1
+
+    def _mark_write(self):
+        """写入后在粘滞时间内(请求内)的读取都走主库，保证读到自己的写入"""
+        if self.config.replica_hosts:
+            _routing.primary_until = time.monotonic() + self.config.replica_sticky_seconds
+
+    def _reads_from_primary(self, sql: str) -> bool:
+        """判断读取是否必须走主库"""
+        if getattr(_routing, 'force_primary', 0) > 0:
+            return True
+        if getattr(_routing, 'primary_until', 0.0) > time.monotonic():
+            return True
+        return bool(_LOCKING_READ_RE.search(sql))
+
+    def _replica_connection(self, sql: str):
+        """获取当前作用域的副本连接，不能或无需使用副本时返回None"""
+        router = self.router
+        if router is None or self._reads_from_primary(sql):
+            return None
+
+        conn = getattr(self._scope, 'replica_conn', None)
+        if conn is not None:
+            return conn
+
+        replica = router.choose()
+        if replica is None:
+            return None
+        try:
+            started = time.perf_counter()
+            conn = replica.pool.checkout(timeout=min(self.config.pool_timeout, 5))
+            query_metrics.record_acquire(time.perf_counter() - started)
+        except PoolTimeoutError:
+            # 副本连接池繁忙，本次读取回退主库
+            return None
+        except Exception as e:
+            router.mark_failed(replica, e)
+            return None
+        self._scope.replica_conn = conn
+        self._scope.replica = replica
+        self._held()['replica'] = (replica.pool, conn)
+        return conn
+
+    def _release_replica(self, invalidate: bool = False):
+        """归还当前作用域的副本连接"""
+        conn = getattr(self._scope, 'replica_conn', None)
+        if conn is None:
+            return
+        replica = self._scope.replica
+        self._scope.replica_conn = None
+        self._scope.replica = None
+        self._held().pop('replica', None)
+        try:
+            if invalidate:
+                replica.pool.invalidate(conn)
+            else:
+                replica.pool.checkin(conn)
+        except Exception as e:
+            logger.warning(f"归还副本连接时出错: {e}")
+
+    @contextmanager
+    def session(self):
+        """作用域会话上下文管理器
+
+        在当前线程/greenlet内复用同一个连接，最外层会话退出时
+        归还连接(包括内部未配对close()的连接)。
+        """
+        outermost = self._depth == 0
+        self.connect()
+        try:
+            yield self
+        finally:
+            if outermost:
+                self.release()
+            else:
+                self.close()
+
+    def run_scoped(self, func: Callable, *args, **kwargs):
+        """执行线程池任务或后台线程入口函数，结束时归还本线程的连接
+
+        不预先获取连接(任务中的网络检查不占用连接池)，任务内隐式获取的连接在结束时归还，
+        线程池线程不会长期占用连接或保留过期的事务快照。
+        """
+        outermost = self._depth == 0
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if outermost:
+                self.release()
+
+    @contextmanager
+    def transaction(self, chunk_size: int = 500):
+        """工作单元事务上下文管理器
+
+        上下文内的写入共用一个事务，退出时刷新缓冲的插入并只提交一次，出错时整体回滚。
+        事务内所有读取走主库。嵌套调用时创建保存点，内层出错只回滚到保存点。
+
+        用法:
+            with db.transaction() as unit:
+                db.update(...)                 # 不再单独提交
+                db.insert_deferred(...)        # 缓冲到提交前批量写入
+        """
+        unit = self.unit
+        if unit is not None:
+            with unit.savepoint():
+                yield unit
+            return
+
+        self.connect()
+        unit = UnitOfWork(self, chunk_size)
+        try:
+            self.conn.begin()
+            self._scope.unit = unit
+            with self.use_primary():
+                yield unit
+                unit.flush()
+            self._scope.unit = None
+            self.conn.commit()
+            if unit.flushed_rows:
+                logger.debug(f"工作单元提交: 批量写入 {unit.flushed_rows} 行, {unit.flushed_statements} 条语句")
+        except BaseException:
+            self._scope.unit = None
+            try:
+                self.conn.rollback()
+            except Exception as e:
+                logger.error(f"事务回滚失败: {e}")
+            raise
+        finally:
+            self._scope.unit = None
+            self.close()
+
     @contextmanager
     def get_connection(self):
         """获取数据库连接上下文管理器"""
-        conn = None
+        started = time.perf_counter()
+        conn = self.pool.checkout()
+        query_metrics.record_acquire(time.perf_counter() - started)
         try:
-            conn = pymysql.connect(**self.config.get_connection_params())
             yield conn
+        except pymysql.err.OperationalError as e:
+            # 连接级错误，丢弃该连接
+            self.pool.invalidate(conn)
+            conn = None
+            logger.error(f"数据库操作失败: {e}")
+            raise
         except Exception as e:
-            if conn:
-                conn.rollback()
+            # 归还时会回滚未提交的事务
             logger.error(f"数据库操作失败: {e}")
             raise
         finally:
             if conn:
-                conn.close()
+                self.pool.checkin(conn)
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """获取连接池统计信息(配置副本时包含副本路由统计)"""
+        stats = self.pool.get_stats()
+        if self.router is not None:
+            stats['replicas'] = self.router.get_stats()
+        return stats
+
+    def get_top_queries(self, limit: int = 20, order_by: str = 'total_time') -> List[Dict[str, Any]]:
+        """获取按指纹聚合的热点查询"""
+        return statement_cache.top_queries(limit, order_by)
+
+    def get_query_metrics(self) -> Dict[str, Any]:
+        """获取查询耗时、连接获取耗时和请求查询次数指标"""
+        return query_metrics.get_stats()
+
+    def get_statement_cache_stats(self) -> Dict[str, Any]:
+        """获取语句缓存命中统计"""
+        return statement_cache.get_stats()
+
+    def dispose(self):
+        """关闭连接池中的空闲连接"""
+        if self._pool is not None:
+            self._pool.dispose()
+        if self._router is not None:
+            self._router.dispose()
 
     def execute(self, sql: str, params: tuple = ()) -> pymysql.cursors.Cursor:
-        """执行SQL语句"""
-        if not self.conn:
-            self.connect()
-
-        # 将SQLite的?占位符转换为MySQL的%s占位符
-        mysql_sql = sql.replace('?', '%s')
+        """执行SQL语句(主库)"""
+        self._ensure_connection()
+        unit = self.unit
+        if unit is not None and unit.pending:
+            # 工作单元中缓冲的插入先于本语句写入
+            unit.flush()
+        if not _READ_RE.match(sql):
+            self._mark_write()
+        return self._execute_on(self.conn, sql, params)
+
+    def _execute_on(self, conn, sql: str, params: tuple = ()) -> pymysql.cursors.Cursor:
+        """在指定连接上执行SQL语句"""
+        # 从语句缓存获取转换后的SQL(?占位符 -> %s)
+        statement = statement_cache.compile(sql)
+        started = time.perf_counter()
 
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(mysql_sql, params)
+            cursor = conn.cursor()
+            cursor.execute(statement.sql, params)
+            query_metrics.record(statement, time.perf_counter() - started, cursor.rowcount, params)
             return cursor
         except Exception as e:
-            logger.error(f"SQL执行失败: {mysql_sql}, 参数: {params}, 错误: {e}")
+            query_metrics.record(statement, time.perf_counter() - started, params=params, error=True)
+            logger.error(f"SQL执行失败: {statement.sql}, 参数: {params}, 错误: {e}")
             raise
 
     def executemany(self, sql: str, params_list: List[tuple]) -> pymysql.cursors.Cursor:
         """执行多条SQL语句"""
-        if not self.conn:
-            self.connect()
+        self._ensure_connection()
+        self._mark_write()
 
-        # 将SQLite的?占位符转换为MySQL的%s占位符
-        mysql_sql = sql.replace('?', '%s')
+        # 从语句缓存获取转换后的SQL(?占位符 -> %s)
+        statement = statement_cache.compile(sql)
+        started = time.perf_counter()
 
         try:
             cursor = self.conn.cursor()
-            cursor.executemany(mysql_sql, params_list)
+            cursor.executemany(statement.sql, params_list)
+            query_metrics.record(statement, time.perf_counter() - started, cursor.rowcount,
+                                 params_list[0] if params_list else None)
             return cursor
         except Exception as e:
-            logger.error(f"批量SQL执行失败: {mysql_sql}, 错误: {e}")
+            query_metrics.record(statement, time.perf_counter() - started, error=True)
+            logger.error(f"批量SQL执行失败: {statement.sql}, 错误: {e}")
             raise
 
     def commit(self):
-        """提交事务"""
+        """提交事务(工作单元内由transaction()退出时统一提交，此处不提交)"""
+        if self.unit is not None:
+            return
         if self.conn:
             try:
                 self.conn.commit()
@@ -255,7 +651,10 @@ class Database:
                 raise
 
     def rollback(self):
-        """回滚事务"""
+        """回滚事务(工作单元内回滚到最近的保存点，没有保存点时回滚整个事务)"""
+        if self.unit is not None:
+            self.unit.rollback()
+            return
         if self.conn:
             try:
                 self.conn.rollback()
@@ -263,20 +662,97 @@ class Database:
                 logger.error(f"事务回滚失败: {e}")
                 raise
 
+    def _execute_read(self, sql: str, params: tuple = ()) -> pymysql.cursors.Cursor:
+        """执行查询：配置副本时路由到可用副本，副本失败时回退主库"""
+        conn = self._replica_connection(sql) if _READ_RE.match(sql) else None
+        if conn is not None:
+            try:
+                return self._execute_on(conn, sql, params)
+            except pymysql.err.OperationalError as e:
+                self.router.mark_failed(self._scope.replica, e)
+                self._release_replica(invalidate=True)
+        return self.execute(sql, params)
+
     def fetchone(self, sql: str, params: tuple = ()) -> Optional[Dict[str, Any]]:
         """查询单条记录"""
-        cursor = self.execute(sql, params)
+        cursor = self._execute_read(sql, params)
         result = cursor.fetchone()
         cursor.close()
         return result
 
     def fetchall(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
         """查询多条记录"""
-        cursor = self.execute(sql, params)
+        cursor = self._execute_read(sql, params)
         results = cursor.fetchall()
         cursor.close()
         return results or []
 
+    def _checkout_stream_connection(self, sql: str):
+        """为流式查询借出独立连接：优先使用只读副本，返回(连接, 所属连接池)"""
+        router = self.router
+        if router is not None and not self._reads_from_primary(sql):
+            replica = router.choose()
+            if replica is not None:
+                try:
+                    return replica.pool.checkout(timeout=min(self.config.pool_timeout, 5)), replica.pool
+                except PoolTimeoutError:
+                    pass
+                except Exception as e:
+                    router.mark_failed(replica, e)
+        return self.pool.checkout(), self.pool
+
+    def stream(self, sql: str, params: tuple = (), batch_size: int = None) -> Iterator[Dict[str, Any]]:
+        """流式查询：通过服务端游标(SSDictCursor)逐批读取，内存占用与结果集大小无关
+
+        未缓冲的结果集读完之前连接不能执行其他语句，因此使用独立于当前作用域的连接，
+        生成器结束时归还。调用方提前停止迭代(客户端断开)时未读完的结果集不再读取，
+        直接丢弃该连接。
+        """
+        batch_size = batch_size or self.config.stream_batch_size
+        statement = statement_cache.compile(sql)
+        started = time.perf_counter()
+        conn, pool = self._checkout_stream_connection(sql)
+        query_metrics.record_acquire(time.perf_counter() - started)
+
+        cursor = None
+        rows = 0
+        completed = False
+        try:
+            if self.config.stream_net_write_timeout > 0:
+                setup = conn.cursor()
+                setup.execute("SET SESSION net_write_timeout = %s", (self.config.stream_net_write_timeout,))
+                setup.close()
+
+            started = time.perf_counter()
+            cursor = conn.cursor(SSDictCursor)
+            cursor.execute(statement.sql, params)
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                rows += len(batch)
+                yield from batch
+            completed = True
+        except Exception as e:
+            query_metrics.record(statement, time.perf_counter() - started, rows, params, error=True)
+            logger.error(f"流式查询失败: {statement.sql}, 参数: {params}, 错误: {e}")
+            raise
+        finally:
+            if completed:
+                query_metrics.record(statement, time.perf_counter() - started, rows, params)
+                try:
+                    cursor.close()
+                    setup = conn.cursor()
+                    setup.execute("SET SESSION net_write_timeout = DEFAULT")
+                    setup.close()
+                    pool.checkin(conn)
+                except Exception as e:
+                    logger.warning(f"归还流式查询连接时出错: {e}")
+                    pool.invalidate(conn)
+            else:
+                # 结果集未读完，关闭连接比读完剩余行更快
+                pool.invalidate(conn)
+
     def insert(self, table: str, data: Dict[str, Any]) -> int:
         """插入数据"""
         columns = ', '.join([f"`{k}`" for k in data.keys()])
@@ -290,16 +766,28 @@ class Database:
             cursor.close()
             return insert_id
         except Exception as e:
-            self.rollback()
+            if self.unit is None:
+                self.rollback()
             logger.error(f"插入数据失败: {sql}, 数据: {data}, 错误: {e}")
             raise
 
+    def insert_deferred(self, table: str, data: Dict[str, Any]) -> None:
+        """插入不需要返回自增ID的数据
+
+        工作单元内缓冲到下一条语句执行前或提交前，与同表同列的其他行合并为多行INSERT；
+        不在工作单元内时立即插入并提交。
+        """
+        unit = self.unit
+        if unit is None:
+            self.insert(table, data)
+            return
+        unit.insert(table, data)
+
     def update(self, table: str, data: Dict[str, Any], condition: str, params: tuple = ()) -> int:
         """更新数据"""
         set_clause = ', '.join([f"`{k}` = %s" for k in data.keys()])
-        # 将条件中的?替换为%s
-        mysql_condition = condition.replace('?', '%s')
-        sql = f"UPDATE `{table}` SET {set_clause} WHERE {mysql_condition}"
+        # 条件中的?占位符由语句缓存统一转换
+        sql = f"UPDATE `{table}` SET {set_clause} WHERE {condition}"
 
         try:
             cursor = self.execute(sql, tuple(data.values()) + params)
@@ -308,15 +796,15 @@ class Database:
             cursor.close()
             return affected_rows
         except Exception as e:
-            self.rollback()
+            if self.unit is None:
+                self.rollback()
             logger.error(f"更新数据失败: {sql}, 数据: {data}, 条件参数: {params}, 错误: {e}")
             raise
 
     def delete(self, table: str, condition: str, params: tuple = ()) -> int:
         """删除数据"""
-        # 将条件中的?替换为%s
-        mysql_condition = condition.replace('?', '%s')
-        sql = f"DELETE FROM `{table}` WHERE {mysql_condition}"
+        # 条件中的?占位符由语句缓存统一转换
+        sql = f"DELETE FROM `{table}` WHERE {condition}"
 
         try:
             cursor = self.execute(sql, params)
@@ -325,10 +813,80 @@ class Database:
             cursor.close()
             return affected_rows
         except Exception as e:
-            self.rollback()
+            if self.unit is None:
+                self.rollback()
             logger.error(f"删除数据失败: {sql}, 条件参数: {params}, 错误: {e}")
             raise
 
+    def bulk_upsert(self, table: str, rows: List[Dict[str, Any]], key_columns: List[str],
+                    update_columns: List[str], chunk_size: int = 500,
+                    commit: bool = True) -> Dict[str, int]:
+        """批量插入或更新数据
+
+        按chunk_size分批生成多行 INSERT ... ON DUPLICATE KEY UPDATE 语句，
+        所有批次在同一个事务中执行。key_columns必须对应表上的唯一索引。
+        commit为False时由调用方负责提交，调用方需在connect()/session()内调用；
+        在transaction()内调用时不单独提交，随工作单元一起提交。
+
+        插入/更新数量由语句的影响行数推算(不预查询唯一键)：ON DUPLICATE KEY UPDATE
+        每插入一行计1，每更新一行计2，值未变化的行计0。update_columns应包含
+        updated_at等每次都会变化的列，否则值未变化的已存在行会被计为插入；
+        没有update_columns时已存在的行被跳过，不计入更新数量。
+
+        Returns:
+            {'inserted': 新插入行数, 'updated': 已存在并更新的行数}
+        """
+        result = {'inserted': 0, 'updated': 0}
+        if not rows:
+            return result
+
+        columns = list(rows[0].keys())
+
+        # 按唯一键去重，后出现的数据覆盖先出现的
+        unique_rows = {}
+        for row in rows:
+            unique_rows[tuple(row[column] for column in key_columns)] = row
+        rows = list(unique_rows.values())
+
+        column_list = ', '.join([f"`{column}`" for column in columns])
+        row_placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+        # 没有需要更新的列时，用唯一键自身赋值实现"存在则跳过"
+        update_clause = ', '.join([
+            f"`{column}` = new.`{column}`" for column in (update_columns or key_columns[:1])
+        ])
+
+        self.connect()
+        try:
+            with self.use_primary():
+                for start in range(0, len(rows), chunk_size):
+                    chunk = rows[start:start + chunk_size]
+
+                    sql = (
+                        f"INSERT INTO `{table}` ({column_list}) "
+                        f"VALUES {', '.join([row_placeholder] * len(chunk))} AS new "
+                        f"ON DUPLICATE KEY UPDATE {update_clause}"
+                    )
+                    values = tuple(row.get(column) for row in chunk for column in columns)
+                    cursor = self.execute(sql, values)
+                    affected = cursor.rowcount
+                    cursor.close()
+
+                    # 影响行数 = 插入行数 + 2 × 更新行数
+                    updated = max(affected - len(chunk), 0) if update_columns else 0
+                    result['updated'] += updated
+                    result['inserted'] += affected - 2 * updated
+
+            if commit:
+                self.commit()
+            return result
+        except Exception as e:
+            if self.unit is None:
+                self.rollback()
+            logger.error(f"批量写入数据失败: 表 {table}, 行数 {len(rows)}, 错误: {e}")
+            raise
+        finally:
+            self.close()
+
     def table_exists(self, table: str) -> bool:
         """检查表是否存在"""
         sql = "SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s"
@@ -361,7 +919,8 @@ class Database:
             `ip` VARCHAR(45),
             `os_type` VARCHAR(50),
             `version` VARCHAR(20),
-            `token` VARCHAR(255) NOT NULL UNIQUE,
+            `token` VARCHAR(255) NULL,
+            `token_hash` CHAR(64) CHARACTER SET ascii NULL,
             `auto_renew` BOOLEAN NOT NULL DEFAULT TRUE,
             `user_id` INT NOT NULL,
             `server_type` VARCHAR(50) DEFAULT 'nginx',
@@ -371,7 +930,7 @@ class Database:
             `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
             `updated_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
             INDEX `idx_servers_ip` (`ip`),
-            INDEX `idx_servers_token` (`token`),
+            UNIQUE KEY `uk_servers_token_hash` (`token_hash`),
             INDEX `idx_servers_user_id` (`user_id`),
             INDEX `idx_servers_status` (`status`),
             FOREIGN KEY (`user_id`) REFERENCES `users`(`id`) ON DELETE CASCADE
@@ -419,21 +978,36 @@ class Database:
             `renewal_days_before` INT DEFAULT 30,
             `import_source` VARCHAR(50) DEFAULT 'manual',
             `last_renewal_attempt` TIMESTAMP NULL,
+            `next_check_at` TIMESTAMP NULL,
+            `domain_state_digest` CHAR(16) NULL,
+            `port_state_digest` CHAR(16) NULL,
+            `chain_digests` VARCHAR(650) CHARACTER SET ascii NULL,
+            `domain_reversed` VARCHAR(255) GENERATED ALWAYS AS (REVERSE(`domain`)) VIRTUAL,
             INDEX `idx_certificates_domain` (`domain`),
+            INDEX `idx_certificates_domain_reversed` (`domain_reversed`),
             INDEX `idx_certificates_expires_at` (`expires_at`),
-            INDEX `idx_certificates_server_id` (`server_id`),
-            INDEX `idx_certificates_status` (`status`),
-            INDEX `idx_certificates_monitoring_enabled` (`monitoring_enabled`),
+            INDEX `idx_certificates_server_status_expires` (`server_id`, `status`, `expires_at`, `domain`, `ca_type`),
+            INDEX `idx_certificates_status_expires` (`status`, `expires_at`),
+            INDEX `idx_certificates_monitoring_next_check` (`monitoring_enabled`, `next_check_at`),
             INDEX `idx_certificates_owner` (`owner`),
             INDEX `idx_certificates_business_unit` (`business_unit`),
             INDEX `idx_certificates_dns_status` (`dns_status`),
             INDEX `idx_certificates_domain_reachable` (`domain_reachable`),
             INDEX `idx_certificates_renewal_status` (`renewal_status`),
             INDEX `idx_certificates_auto_renewal_enabled` (`auto_renewal_enabled`),
+            INDEX `idx_certificates_last_dns_check` (`last_dns_check`),
+            INDEX `idx_certificates_last_reachability_check` (`last_reachability_check`),
+            UNIQUE KEY `uk_certificates_server_domain` (`server_id`, `domain`),
             FOREIGN KEY (`server_id`) REFERENCES `servers`(`id`) ON DELETE CASCADE
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
         ''')
         
+        # 证书标签表(certificates.tags的规范化索引)
+        self.execute(build_tag_table())
+        
+        # 证书存储表(按DER内容SHA-256寻址，证书行通过chain_digests引用)
+        self.execute(build_blob_table())
+        
         # 告警表
         self.execute('''
         CREATE TABLE IF NOT EXISTS `alerts` (
@@ -444,17 +1018,22 @@ class Database:
             `certificate_id` INT NOT NULL,
             `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
             `updated_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-            INDEX `idx_alerts_certificate_id` (`certificate_id`),
+            INDEX `idx_alerts_certificate_status_type` (`certificate_id`, `status`, `type`, `created_at`),
             INDEX `idx_alerts_status` (`status`),
             INDEX `idx_alerts_type` (`type`),
             FOREIGN KEY (`certificate_id`) REFERENCES `certificates`(`id`) ON DELETE CASCADE
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
         ''')
 
+        # 监控历史记录表按created_at按月分区，过期数据整个分区删除；
+        # 分区表不支持外键，已删除证书的记录随分区过期清理
+        now = datetime.datetime.now()
+        months_ahead = int(os.getenv('MONITORING_HISTORY_PARTITIONS_AHEAD', 3))
+
         # 域名监控历史记录表
         self.execute('''
         CREATE TABLE IF NOT EXISTS `domain_monitoring_history` (
-            `id` INT AUTO_INCREMENT PRIMARY KEY,
+            `id` INT AUTO_INCREMENT,
             `certificate_id` INT NOT NULL,
             `check_type` VARCHAR(20) NOT NULL,
             `status` VARCHAR(20) NOT NULL,
@@ -462,13 +1041,13 @@ class Database:
             `details` TEXT,
             `error_message` TEXT,
             `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-            INDEX `idx_domain_monitoring_history_certificate_id` (`certificate_id`),
+            INDEX `idx_domain_monitoring_history_certificate_created` (`certificate_id`, `created_at`),
             INDEX `idx_domain_monitoring_history_check_type` (`check_type`),
             INDEX `idx_domain_monitoring_history_status` (`status`),
             INDEX `idx_domain_monitoring_history_created_at` (`created_at`),
-            FOREIGN KEY (`certificate_id`) REFERENCES `certificates`(`id`) ON DELETE CASCADE
+            PRIMARY KEY (`id`, `created_at`)
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-        ''')
+        ''' + build_partition_clause(now, months_ahead))
 
         # 域名监控配置表
         self.execute('''
@@ -495,7 +1074,7 @@ class Database:
         # 端口监控历史记录表
         self.execute('''
         CREATE TABLE IF NOT EXISTS `port_monitoring_history` (
-            `id` INT AUTO_INCREMENT PRIMARY KEY,
+            `id` INT AUTO_INCREMENT,
             `certificate_id` INT NOT NULL,
             `port` INT NOT NULL,
             `check_type` VARCHAR(20) NOT NULL,
@@ -507,15 +1086,19 @@ class Database:
             `details` TEXT,
             `error_message` TEXT,
             `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-            INDEX `idx_port_monitoring_history_certificate_id` (`certificate_id`),
+            INDEX `idx_port_monitoring_history_certificate_created` (`certificate_id`, `created_at`),
             INDEX `idx_port_monitoring_history_port` (`port`),
             INDEX `idx_port_monitoring_history_check_type` (`check_type`),
             INDEX `idx_port_monitoring_history_status` (`status`),
             INDEX `idx_port_monitoring_history_security_grade` (`security_grade`),
             INDEX `idx_port_monitoring_history_created_at` (`created_at`),
-            FOREIGN KEY (`certificate_id`) REFERENCES `certificates`(`id`) ON DELETE CASCADE
+            PRIMARY KEY (`id`, `created_at`)
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-        ''')
+        ''' + build_partition_clause(now, months_ahead))
+
+        # 监控历史小时/天汇总表，长时间范围的查询读取汇总
+        self.execute(build_rollup_table(HOURLY_ROLLUP_TABLE))
+        self.execute(build_rollup_table(DAILY_ROLLUP_TABLE))
 
         # SSL安全配置表
         self.execute('''
@@ -640,6 +1223,7 @@ class Database:
             INDEX `idx_certificate_deployments_certificate_id` (`certificate_id`),
             INDEX `idx_certificate_deployments_deploy_type` (`deploy_type`),
             INDEX `idx_certificate_deployments_status` (`status`),
+            UNIQUE KEY `uk_certificate_deployments_target` (`certificate_id`, `deploy_type`, `deploy_target`),
             FOREIGN KEY (`certificate_id`) REFERENCES `certificates`(`id`) ON DELETE CASCADE
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
         ''')
@@ -700,6 +1284,15 @@ class Database:
         ''')
 
         self.commit()
+
+        # 证书统计汇总表及维护触发器
+        install_statistics_summary(self)
+
+        # 域名/服务器名称子串搜索的ngram全文索引
+        install_domain_search(self)
+
+        # 列表和统计接口ETag使用的表变更版本及维护触发器
+        install_change_versions(self)
         logger.info("MySQL数据库表创建完成")
     
     def init_default_data(self):
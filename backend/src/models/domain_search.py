@@ -0,0 +1,159 @@
+"""
+域名搜索模块 - 基于反转域名索引的后缀查询和ngram全文索引的子串查询
+"""
+import re
+import logging
+from typing import Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 反转域名生成列及索引：'shop.example.com' -> 'moc.elpmaxe.pohs'，
+# 后缀查询变为前缀查询(domain_reversed LIKE 'moc.elpmaxe.%')，可以走索引范围扫描
+REVERSED_COLUMN = 'domain_reversed'
+REVERSED_INDEX = 'idx_certificates_domain_reversed'
+
+# ngram全文索引，子串查询用 MATCH ... AGAINST 代替 LIKE '%kw%'
+FULLTEXT_INDEXES = {
+    'certificates': ('ft_certificates_domain', ('domain',)),
+    'servers': ('ft_servers_name', ('name',)),
+}
+
+# 与MySQL默认的ngram_token_size一致，更短的关键词无法用全文索引查询
+NGRAM_TOKEN_SIZE = 2
+
+_TERM_SPLIT_RE = re.compile(r'[^\w]+')
+
+# 搜索模式：domain 按域名语义(后缀/通配符/子串)，fragment 按输入的域名片段(如 'api.exam')
+SEARCH_MODES = ('domain', 'fragment')
+
+
+def escape_like(value: str) -> str:
+    """转义LIKE模式中的通配符"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def reverse_domain(domain: str) -> str:
+    """反转域名(与生成列REVERSE(domain)一致)"""
+    return domain.lower()[::-1]
+
+
+def search_terms(keyword: str) -> List[str]:
+    """拆分关键词为全文检索词(按标点和空白切分)"""
+    return [term for term in _TERM_SPLIT_RE.split(keyword.lower()) if term]
+
+
+def substring_condition(columns: Tuple[str, ...], keyword: str, prefix: str = '') -> Tuple[str, List[Any]]:
+    """子串查询条件
+
+    所有检索词都不短于ngram长度时用全文索引筛选候选行，再用LIKE保证与子串语义一致；
+    否则退回LIKE扫描。
+    """
+    pattern = f"%{escape_like(keyword.strip())}%"
+    like = ' OR '.join(f"{prefix}{column} LIKE ?" for column in columns)
+    like_params = [pattern] * len(columns)
+    if len(columns) > 1:
+        like = f"({like})"
+
+    terms = search_terms(keyword)
+    if not terms or min(len(term) for term in terms) < NGRAM_TOKEN_SIZE:
+        return like, like_params
+
+    column_list = ', '.join(f"{prefix}{column}" for column in columns)
+    against = ' '.join(f'+"{term}"' for term in terms)
+    return f"(MATCH({column_list}) AGAINST(? IN BOOLEAN MODE) AND {like})", [against] + like_params
+
+
+def fragment_condition(keyword: str, prefix: str = '') -> Optional[Tuple[str, List[Any]]]:
+    """域名片段查询条件(只用ngram全文索引筛选候选行，LIKE校验子串)
+
+    短于ngram长度的检索词不参与全文匹配，只由LIKE校验；没有可用的检索词时返回None。
+    """
+    terms = [term for term in search_terms(keyword) if len(term) >= NGRAM_TOKEN_SIZE]
+    if not terms:
+        return None
+    column = f"{prefix}domain"
+    against = ' '.join(f'+"{term}"' for term in terms)
+    return (f"(MATCH({column}) AGAINST(? IN BOOLEAN MODE) AND {column} LIKE ?)",
+            [against, f"%{escape_like(keyword.strip().lower())}%"])
+
+
+def domain_search_condition(keyword: str, prefix: str = '', mode: str = 'domain') -> Tuple[str, List[Any]]:
+    """域名搜索条件
+
+    - '*.example.com' 或 '.example.com': example.com 下的所有子域名(包括 *.example.com 通配符证书)
+    - 'shop.example.com': 该域名本身、所有子域名以及覆盖它的通配符证书 *.example.com
+    - 不含点的关键词(如 'shop'): 域名子串查询(全文索引)
+    - mode='fragment': 关键词作为域名片段(如 'api.exam'、'example.co')按子串查询，只走全文索引
+    """
+    keyword = keyword.strip().lower()
+    column = f"{prefix}domain"
+    reversed_column = f"{prefix}{REVERSED_COLUMN}"
+
+    if mode == 'fragment':
+        fragment = fragment_condition(keyword, prefix)
+        if fragment is not None:
+            return fragment
+
+    if '.' not in keyword or any(char.isspace() for char in keyword):
+        return substring_condition(('domain',), keyword, prefix)
+
+    if keyword.startswith(('*.', '.')):
+        suffix = keyword.lstrip('*').lstrip('.')
+        return f"{reversed_column} LIKE ?", [escape_like(reverse_domain(suffix)) + '.%']
+
+    reversed_domain = reverse_domain(keyword)
+    conditions = [f"{reversed_column} = ?", f"{reversed_column} LIKE ?"]
+    params = [reversed_domain, escape_like(reversed_domain) + '.%']
+    # 通配符只覆盖一级子域名，顶级域名没有通配符证书
+    parent = keyword.split('.', 1)[1]
+    if '.' in parent:
+        conditions.append(f"{column} = ?")
+        params.append(f"*.{parent}")
+    return f"({' OR '.join(conditions)})", params
+
+
+def domain_matches(domain: str, keyword: str, mode: str = 'domain') -> bool:
+    """在内存中按与domain_search_condition相同的规则匹配域名"""
+    domain = (domain or '').lower()
+    keyword = keyword.strip().lower()
+    if mode == 'fragment' and fragment_condition(keyword) is not None:
+        return keyword in domain
+    if '.' not in keyword or any(char.isspace() for char in keyword):
+        return keyword in domain
+
+    if keyword.startswith(('*.', '.')):
+        return domain.endswith('.' + keyword.lstrip('*').lstrip('.'))
+
+    parent = keyword.split('.', 1)[1]
+    return (domain == keyword or domain.endswith('.' + keyword)
+            or ('.' in parent and domain == f"*.{parent}"))
+
+
+def install_domain_search(database) -> bool:
+    """创建缺少的ngram全文索引
+
+    InnoDB默认停用词表包含 'a'、'com' 等词，ngram索引会丢弃包含停用词的词元，
+    创建索引前在当前会话关闭停用词。账号没有权限或MySQL不支持时搜索退回LIKE扫描。
+    """
+    try:
+        database.execute("SET SESSION innodb_ft_enable_stopword = OFF")
+        for table, (index, columns) in FULLTEXT_INDEXES.items():
+            exists = database.fetchone(
+                "SELECT 1 AS found FROM INFORMATION_SCHEMA.STATISTICS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = ? AND INDEX_NAME = ? LIMIT 1",
+                (table, index)
+            )
+            if exists:
+                continue
+            column_list = ', '.join(f"`{column}`" for column in columns)
+            database.execute(f"ALTER TABLE `{table}` ADD FULLTEXT INDEX `{index}` ({column_list}) WITH PARSER ngram")
+            logger.info(f"已创建全文索引 {table}.{index}")
+        return True
+    except Exception as e:
+        logger.warning(f"域名全文索引创建失败，子串搜索将使用LIKE扫描: {e}")
+        return False
+    finally:
+        try:
+            database.execute("SET SESSION innodb_ft_enable_stopword = ON")
+        except Exception:
+            pass
@@ -0,0 +1,85 @@
+"""
+标识映射模块 - 请求/调度周期内按主键缓存已加载的模型对象
+"""
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from gevent.local import local as _ScopeLocal
+except ImportError:
+    from threading import local as _ScopeLocal
+
+
+class IdentityMap:
+    """请求级标识映射
+
+    在begin()/end()之间(一个HTTP请求或一次调度周期)，同一模型同一主键只加载一次，
+    重复查找直接返回内存中的同一个对象。未开启作用域时(如工作线程)不缓存。
+    """
+
+    def __init__(self):
+        self._scope = _ScopeLocal()
+
+    @property
+    def active(self) -> bool:
+        """当前线程/greenlet是否开启了作用域"""
+        return getattr(self._scope, 'entries', None) is not None
+
+    def begin(self) -> None:
+        """开启作用域(清空之前的缓存)"""
+        self._scope.entries = {}
+
+    def end(self) -> None:
+        """结束作用域并丢弃缓存的对象"""
+        self._scope.entries = None
+
+    @contextmanager
+    def scope(self):
+        """作用域上下文管理器，嵌套使用时复用外层作用域"""
+        if self.active:
+            yield self
+            return
+        self.begin()
+        try:
+            yield self
+        finally:
+            self.end()
+
+    def get(self, model: type, key: Any) -> Optional[Any]:
+        """获取已加载的对象，未命中返回None"""
+        entries = getattr(self._scope, 'entries', None)
+        if entries is None:
+            return None
+        return entries.get((model, key))
+
+    def get_many(self, model: type, keys: Iterable[Any]) -> Tuple[Dict[Any, Any], List[Any]]:
+        """批量查找，返回 (命中的 {主键: 对象}, 未命中的主键列表)，主键去重"""
+        found = {}
+        missing = []
+        entries = getattr(self._scope, 'entries', None)
+        for key in dict.fromkeys(keys):
+            if key is None:
+                continue
+            obj = entries.get((model, key)) if entries is not None else None
+            if obj is None:
+                missing.append(key)
+            else:
+                found[key] = obj
+        return found, missing
+
+    def add(self, model: type, key: Any, obj: Any) -> Any:
+        """登记对象；该主键已有对象时返回已有对象，保证同一主键只对应一个实例"""
+        entries = getattr(self._scope, 'entries', None)
+        if entries is None or key is None:
+            return obj
+        return entries.setdefault((model, key), obj)
+
+    def discard(self, model: type, key: Any) -> None:
+        """移除对象(删除记录后调用)"""
+        entries = getattr(self._scope, 'entries', None)
+        if entries is not None:
+            entries.pop((model, key), None)
+
+
+# 全局标识映射
+identity_map = IdentityMap()
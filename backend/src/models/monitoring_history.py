@@ -0,0 +1,361 @@
+"""
+监控历史模块 - 按月RANGE分区的检查记录、小时/天汇总表和按分区的数据保留
+"""
+import os
+import logging
+import datetime
+from typing import Dict, List, Any, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+HOURLY_ROLLUP_TABLE = 'monitoring_rollups_hourly'
+DAILY_ROLLUP_TABLE = 'monitoring_rollups_daily'
+MAXVALUE_PARTITION = 'pmax'
+MAINTENANCE_LOCK = 'ssl_manager_history_maintenance'
+
+# 查询范围不超过该时长时读取原始记录，超过时读取小时汇总，超过ROLLUP_HOURLY_MAX_RANGE时读取天汇总
+RAW_MAX_RANGE = datetime.timedelta(days=2)
+ROLLUP_HOURLY_MAX_RANGE = datetime.timedelta(days=31)
+
+
+class InvalidHistoryRangeError(ValueError):
+    """历史查询的时间范围或汇总粒度无效"""
+
+
+class HistorySource(NamedTuple):
+    """一类监控历史表的描述"""
+    name: str                      # 汇总表中的source取值
+    table: str                     # 原始记录表
+    port_column: Optional[str]     # 按端口汇总的列，没有时汇总到port=0
+    metric: str                    # 计算平均值和分位数的耗时列(毫秒)
+    success_statuses: Tuple[str, ...]
+
+
+HISTORY_SOURCES: Dict[str, HistorySource] = {
+    'domain': HistorySource('domain', 'domain_monitoring_history', None, 'response_time', ('healthy',)),
+    'port': HistorySource('port', 'port_monitoring_history', 'port', 'handshake_time', ('success', 'healthy')),
+}
+
+# 两类耗时列在汇总表中的列名
+_METRICS = ('response_time', 'handshake_time')
+
+
+class Granularity(NamedTuple):
+    """汇总粒度"""
+    name: str
+    table: str
+    step: datetime.timedelta
+    backfill: datetime.timedelta   # 没有汇总数据时向前补算的时长
+
+
+GRANULARITIES: Dict[str, Granularity] = {
+    'hour': Granularity('hour', HOURLY_ROLLUP_TABLE, datetime.timedelta(hours=1), datetime.timedelta(hours=48)),
+    'day': Granularity('day', DAILY_ROLLUP_TABLE, datetime.timedelta(days=1), datetime.timedelta(days=7)),
+}
+
+
+def month_start(moment: datetime.datetime) -> datetime.datetime:
+    """所在月份的第一天零点"""
+    return datetime.datetime(moment.year, moment.month, 1)
+
+
+def add_months(moment: datetime.datetime, months: int) -> datetime.datetime:
+    """月初时间加减若干个月"""
+    index = moment.year * 12 + moment.month - 1 + months
+    return datetime.datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime.datetime) -> str:
+    """月分区名称，例如 p202610 保存2026年10月的记录"""
+    return f"p{month.year:04d}{month.month:02d}"
+
+
+def _partition_definition(month: datetime.datetime) -> str:
+    """单个月分区的定义(上界为下个月第一天)"""
+    upper = add_months(month, 1).strftime('%Y-%m-%d %H:%M:%S')
+    return f"PARTITION {partition_name(month)} VALUES LESS THAN (UNIX_TIMESTAMP('{upper}'))"
+
+
+def build_partition_clause(now: datetime.datetime, months_ahead: int) -> str:
+    """建表用的分区子句：当前月份、之后months_ahead个月以及兜底的MAXVALUE分区
+
+    created_at为TIMESTAMP列，MySQL只允许按 UNIX_TIMESTAMP(created_at) 做RANGE分区。
+    """
+    current = month_start(now)
+    partitions = [_partition_definition(add_months(current, offset)) for offset in range(months_ahead + 1)]
+    partitions.append(f"PARTITION {MAXVALUE_PARTITION} VALUES LESS THAN MAXVALUE")
+    return "PARTITION BY RANGE (UNIX_TIMESTAMP(`created_at`)) (\n    " + ",\n    ".join(partitions) + "\n)"
+
+
+def build_rollup_table(table: str) -> str:
+    """汇总表建表语句，域名和端口检查共用同一结构(域名检查port=0)"""
+    metric_columns = ''.join(
+        f"    `{metric}_avg` INT NULL,\n    `{metric}_p50` INT NULL,\n    `{metric}_p95` INT NULL,\n"
+        for metric in _METRICS
+    )
+    return (
+        f"CREATE TABLE IF NOT EXISTS `{table}` (\n"
+        f"    `source` VARCHAR(10) NOT NULL,\n"
+        f"    `certificate_id` INT NOT NULL,\n"
+        f"    `port` INT NOT NULL DEFAULT 0,\n"
+        f"    `bucket_start` DATETIME NOT NULL,\n"
+        f"    `check_count` INT NOT NULL,\n"
+        f"    `success_count` INT NOT NULL,\n"
+        f"{metric_columns}"
+        f"    `updated_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,\n"
+        f"    PRIMARY KEY (`source`, `certificate_id`, `port`, `bucket_start`),\n"
+        f"    INDEX `idx_{table}_bucket_start` (`bucket_start`)\n"
+        f") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci"
+    )
+
+
+def build_rollup_query(source: HistorySource, granularity: Granularity) -> str:
+    """生成单个时间桶的汇总语句
+
+    参数: (桶开始时间, 桶开始时间, 桶结束时间)。所有证书在一条 INSERT ... SELECT 中汇总，
+    分位数用CUME_DIST()窗口函数按最近秩计算(耗时为NULL的记录单独分区，不参与分位数)，
+    created_at范围条件可以裁剪到单个月分区。重复执行同一个桶会覆盖之前的结果。
+    """
+    metric = source.metric
+    port = f"`{source.port_column}`" if source.port_column else '0'
+    statuses = ', '.join(f"'{status}'" for status in source.success_statuses)
+    return (
+        f"INSERT INTO `{granularity.table}` "
+        f"(`source`, `certificate_id`, `port`, `bucket_start`, `check_count`, `success_count`, "
+        f"`{metric}_avg`, `{metric}_p50`, `{metric}_p95`) "
+        f"SELECT * FROM ("
+        f"SELECT '{source.name}' AS source_name, certificate_id, port, ? AS bucket, "
+        f"COUNT(*) AS checks, SUM(status IN ({statuses})) AS successes, "
+        f"ROUND(AVG(metric)) AS metric_avg, "
+        f"MIN(CASE WHEN metric IS NOT NULL AND cume >= 0.5 THEN metric END) AS metric_p50, "
+        f"MIN(CASE WHEN metric IS NOT NULL AND cume >= 0.95 THEN metric END) AS metric_p95 "
+        f"FROM ("
+        f"SELECT certificate_id, {port} AS port, status, `{metric}` AS metric, "
+        f"CUME_DIST() OVER (PARTITION BY certificate_id, {port}, `{metric}` IS NULL ORDER BY `{metric}`) AS cume "
+        f"FROM `{source.table}` "
+        f"WHERE created_at >= ? AND created_at < ? AND status <> 'started'"
+        f") AS checks GROUP BY certificate_id, port"
+        f") AS agg "
+        f"ON DUPLICATE KEY UPDATE `check_count` = agg.checks, `success_count` = agg.successes, "
+        f"`{metric}_avg` = agg.metric_avg, `{metric}_p50` = agg.metric_p50, `{metric}_p95` = agg.metric_p95"
+    )
+
+
+def choose_granularity(start: datetime.datetime, end: datetime.datetime) -> str:
+    """根据查询范围选择读取原始记录(raw)、小时汇总(hour)还是天汇总(day)"""
+    span = end - start
+    if span <= RAW_MAX_RANGE:
+        return 'raw'
+    if span <= ROLLUP_HOURLY_MAX_RANGE:
+        return 'hour'
+    return 'day'
+
+
+def floor_bucket(moment: datetime.datetime, granularity: Granularity) -> datetime.datetime:
+    """时间所在桶的开始时间"""
+    if granularity.name == 'day':
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+class MonitoringHistory:
+    """监控历史维护和查询
+
+    - ensure_partitions(): 提前创建未来月份的分区(从MAXVALUE分区拆分)
+    - run_rollups(): 汇总已结束的小时/天，重复汇总最近一个桶以包含迟到的记录
+    - apply_retention(): 整个分区超过保留期时直接DROP PARTITION，未分区的表回退为分批DELETE
+    - run_maintenance(): 依次执行以上任务，多实例部署时通过GET_LOCK保证只有一个实例执行
+    """
+
+    def __init__(self, database):
+        self.database = database
+        self.retention_days = int(os.getenv('MONITORING_HISTORY_RETENTION_DAYS', 90))
+        self.months_ahead = int(os.getenv('MONITORING_HISTORY_PARTITIONS_AHEAD', 3))
+        self.hourly_retention_days = int(os.getenv('MONITORING_ROLLUP_HOURLY_RETENTION_DAYS', 365))
+        self.rollup_grace = datetime.timedelta(minutes=5)
+        self.delete_batch_size = 5000
+
+    def list_partitions(self, table: str) -> List[Dict[str, Any]]:
+        """列出表的分区(名称和上界UNIX时间戳，MAXVALUE分区上界为None)，未分区时返回空列表"""
+        rows = self.database.fetchall(
+            "SELECT PARTITION_NAME AS name, PARTITION_DESCRIPTION AS description "
+            "FROM INFORMATION_SCHEMA.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = ? AND PARTITION_NAME IS NOT NULL "
+            "ORDER BY PARTITION_ORDINAL_POSITION",
+            (table,)
+        )
+        partitions = []
+        for row in rows:
+            description = row['description']
+            upper = None if str(description).upper() == 'MAXVALUE' else int(description)
+            partitions.append({'name': row['name'], 'upper': upper})
+        return partitions
+
+    def ensure_partitions(self, table: str, now: datetime.datetime = None) -> List[str]:
+        """创建当前月份及之后months_ahead个月中缺少的分区，返回新建的分区名"""
+        now = now or datetime.datetime.now()
+        partitions = self.list_partitions(table)
+        if not partitions:
+            logger.warning(f"监控历史表 {table} 未分区，跳过分区维护(请执行迁移009)")
+            return []
+        if partitions[-1]['upper'] is not None:
+            logger.warning(f"监控历史表 {table} 缺少MAXVALUE分区，跳过分区维护")
+            return []
+
+        existing = {partition['name'] for partition in partitions}
+        highest = max((partition['upper'] for partition in partitions if partition['upper'] is not None), default=None)
+        current = month_start(now)
+        missing = []
+        for offset in range(self.months_ahead + 1):
+            month = add_months(current, offset)
+            if partition_name(month) in existing:
+                continue
+            # 只能在已有分区的上界之后追加分区
+            if highest is not None and add_months(month, 1).timestamp() <= highest:
+                continue
+            missing.append(month)
+
+        if not missing:
+            return []
+
+        definitions = [_partition_definition(month) for month in missing]
+        definitions.append(f"PARTITION {MAXVALUE_PARTITION} VALUES LESS THAN MAXVALUE")
+        self.database.execute(
+            f"ALTER TABLE `{table}` REORGANIZE PARTITION {MAXVALUE_PARTITION} INTO ({', '.join(definitions)})"
+        ).close()
+        created = [partition_name(month) for month in missing]
+        logger.info(f"监控历史表 {table} 新建分区: {', '.join(created)}")
+        return created
+
+    def drop_expired_partitions(self, table: str, now: datetime.datetime = None) -> List[str]:
+        """删除所有记录都早于保留期的月分区，返回删除的分区名；未分区的表分批DELETE"""
+        now = now or datetime.datetime.now()
+        cutoff = now - datetime.timedelta(days=self.retention_days)
+        partitions = self.list_partitions(table)
+        if not partitions:
+            self._delete_expired_rows(table, 'created_at', cutoff)
+            return []
+
+        expired = [
+            partition['name'] for partition in partitions[:-1]
+            if partition['upper'] is not None and partition['upper'] <= cutoff.timestamp()
+        ]
+        if expired:
+            self.database.execute(f"ALTER TABLE `{table}` DROP PARTITION {', '.join(expired)}").close()
+            logger.info(f"监控历史表 {table} 删除过期分区: {', '.join(expired)}")
+        return expired
+
+    def _delete_expired_rows(self, table: str, column: str, cutoff: datetime.datetime) -> int:
+        """分批删除过期记录，每批单独提交以免长事务"""
+        deleted = 0
+        while True:
+            cursor = self.database.execute(
+                f"DELETE FROM `{table}` WHERE `{column}` < ? LIMIT {self.delete_batch_size}", (cutoff,)
+            )
+            count = cursor.rowcount
+            cursor.close()
+            self.database.commit()
+            deleted += count
+            if count < self.delete_batch_size:
+                return deleted
+
+    def rollup_bucket(self, source: HistorySource, granularity: Granularity,
+                      bucket_start: datetime.datetime) -> int:
+        """汇总单个时间桶，返回写入的汇总行数(MySQL对更新的行计为2)"""
+        cursor = self.database.execute(
+            build_rollup_query(source, granularity),
+            (bucket_start, bucket_start, bucket_start + granularity.step)
+        )
+        count = cursor.rowcount
+        cursor.close()
+        return count
+
+    def run_rollups(self, now: datetime.datetime = None) -> Dict[str, int]:
+        """汇总所有已结束的时间桶，返回各粒度处理的桶数
+
+        从汇总表中最近的桶开始(重新汇总以包含迟到的记录)，最多向前补算granularity.backfill。
+        """
+        now = now or datetime.datetime.now()
+        processed = {}
+        for granularity in GRANULARITIES.values():
+            # 桶结束后留出宽限时间，等待缓冲中的检查记录写入
+            last_closed = floor_bucket(now - self.rollup_grace, granularity)
+            earliest = floor_bucket(now - granularity.backfill, granularity)
+            count = 0
+            for source in HISTORY_SOURCES.values():
+                latest = self.database.fetchone(
+                    f"SELECT MAX(bucket_start) AS latest FROM `{granularity.table}` WHERE source = ?",
+                    (source.name,)
+                )
+                bucket = max(latest['latest'], earliest) if latest and latest['latest'] else earliest
+                while bucket < last_closed:
+                    self.rollup_bucket(source, granularity, bucket)
+                    self.database.commit()
+                    bucket += granularity.step
+                    count += 1
+            processed[granularity.name] = count
+        return processed
+
+    def apply_retention(self, now: datetime.datetime = None) -> Dict[str, Any]:
+        """删除过期的原始记录分区和小时汇总"""
+        now = now or datetime.datetime.now()
+        dropped = {
+            source.table: self.drop_expired_partitions(source.table, now)
+            for source in HISTORY_SOURCES.values()
+        }
+        hourly_cutoff = now - datetime.timedelta(days=self.hourly_retention_days)
+        dropped[HOURLY_ROLLUP_TABLE] = self._delete_expired_rows(HOURLY_ROLLUP_TABLE, 'bucket_start', hourly_cutoff)
+        return dropped
+
+    def run_maintenance(self, now: datetime.datetime = None) -> Optional[Dict[str, Any]]:
+        """执行分区维护、汇总和保留任务；其他实例正在执行时返回None"""
+        now = now or datetime.datetime.now()
+        self.database.connect()
+        try:
+            lock = self.database.fetchone("SELECT GET_LOCK(?, 0) AS acquired", (MAINTENANCE_LOCK,))
+            if not lock or not lock['acquired']:
+                logger.debug("其他实例正在维护监控历史，跳过")
+                return None
+            try:
+                # 汇总先于保留执行，过期分区删除前对应的天汇总已经生成
+                result = {
+                    'partitions': {
+                        source.table: self.ensure_partitions(source.table, now)
+                        for source in HISTORY_SOURCES.values()
+                    },
+                    'rollups': self.run_rollups(now),
+                    'retention': self.apply_retention(now)
+                }
+                logger.info(f"监控历史维护完成: {result}")
+                return result
+            finally:
+                self.database.fetchone("SELECT RELEASE_LOCK(?) AS released", (MAINTENANCE_LOCK,))
+        finally:
+            self.database.close()
+
+    def query_rollups(self, source_name: str, certificate_id: int, start: datetime.datetime,
+                      end: datetime.datetime, granularity_name: str, port: int = None) -> List[Dict[str, Any]]:
+        """按时间范围读取汇总数据，附带成功率"""
+        source = HISTORY_SOURCES[source_name]
+        granularity = GRANULARITIES.get(granularity_name)
+        if granularity is None:
+            raise InvalidHistoryRangeError(f"不支持的汇总粒度: {granularity_name}")
+
+        metric = source.metric
+        conditions = ['source = ?', 'certificate_id = ?', 'bucket_start >= ?', 'bucket_start < ?']
+        params = [source.name, certificate_id, floor_bucket(start, granularity), end]
+        if port is not None:
+            conditions.append('port = ?')
+            params.append(port)
+
+        rows = self.database.fetchall(
+            f"SELECT port, bucket_start, check_count, success_count, "
+            f"`{metric}_avg` AS {metric}_avg, `{metric}_p50` AS {metric}_p50, `{metric}_p95` AS {metric}_p95 "
+            f"FROM `{granularity.table}` WHERE {' AND '.join(conditions)} "
+            f"ORDER BY bucket_start, port",
+            tuple(params)
+        )
+        for row in rows:
+            checks = row['check_count']
+            row['success_rate'] = round(row['success_count'] / checks, 4) if checks else None
+        return rows
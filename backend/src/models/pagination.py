@@ -0,0 +1,190 @@
+"""
+分页工具模块 - 基于排序键的游标(keyset)分页和计数缓存
+"""
+import json
+import time
+import base64
+import datetime
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+
+
+class InvalidCursorError(ValueError):
+    """分页游标无效异常"""
+    pass
+
+
+def _encode_value(value: Any) -> Any:
+    """将排序键的值转换为可JSON序列化的形式"""
+    if isinstance(value, datetime.datetime):
+        return {'$dt': value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {'$d': value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    """还原排序键的值"""
+    if isinstance(value, dict):
+        if '$dt' in value:
+            return datetime.datetime.fromisoformat(value['$dt'])
+        if '$d' in value:
+            return datetime.date.fromisoformat(value['$d'])
+    return value
+
+
+def encode_cursor(values: List[Any], direction: str = 'next') -> str:
+    """生成不透明的分页游标"""
+    payload = json.dumps({'v': [_encode_value(v) for v in values], 'd': direction},
+                         separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[List[Any], str]:
+    """解析分页游标，返回(排序键值, 方向)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        values = [_decode_value(v) for v in payload['v']]
+        direction = payload.get('d', 'next')
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError(f"无效的分页游标: {e}")
+
+    if direction not in ('next', 'prev'):
+        raise InvalidCursorError(f"无效的分页方向: {direction}")
+    return values, direction
+
+
+class KeysetPaginator:
+    """游标分页器
+
+    按排序键定位下一页起点(WHERE (k1, k2) > (?, ?))，替代 LIMIT/OFFSET，
+    翻页代价与页码深度无关。sort_columns 的最后一列必须唯一(通常为id)。
+    """
+
+    def __init__(self, sort_columns: List[Tuple[str, str]], descending: bool = False):
+        """
+        Args:
+            sort_columns: [(SQL列表达式, 结果字段名)]，如 [('c.expires_at', 'expires_at'), ('c.id', 'id')]
+            descending: 是否降序
+        """
+        self.sort_columns = sort_columns
+        self.descending = descending
+
+    def _seek_clause(self, operator: str, values: List[Any]) -> Tuple[str, List[Any]]:
+        """生成 (k1 > ?) OR (k1 = ? AND k2 > ?) 形式的定位条件"""
+        if len(values) != len(self.sort_columns):
+            raise InvalidCursorError("分页游标与排序字段不匹配")
+
+        clauses = []
+        params = []
+        for index, (expression, _) in enumerate(self.sort_columns):
+            parts = [f"{prev_expression} = ?" for prev_expression, _ in self.sort_columns[:index]]
+            parts.append(f"{expression} {operator} ?")
+            clauses.append('(' + ' AND '.join(parts) + ')')
+            params.extend(values[:index])
+            params.append(values[index])
+        return '(' + ' OR '.join(clauses) + ')', params
+
+    def _row_values(self, row: Dict[str, Any]) -> List[Any]:
+        """提取行的排序键值"""
+        return [row[key] for _, key in self.sort_columns]
+
+    def paginate(self, database, select_sql: str, conditions: List[str] = None,
+                 params: List[Any] = None, cursor: str = None,
+                 limit: int = 20) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """执行游标分页查询
+
+        Args:
+            database: Database实例(调用方负责connect/close)
+            select_sql: 不含WHERE/ORDER BY/LIMIT的SELECT语句
+            conditions: WHERE条件列表
+            params: 条件参数
+            cursor: 上一次返回的next_cursor或prev_cursor，为空时从第一页开始
+            limit: 每页数量
+
+        Returns:
+            (行数据列表, 分页信息)
+        """
+        conditions = list(conditions or [])
+        params = list(params or [])
+        values = None
+        direction = 'next'
+        if cursor:
+            values, direction = decode_cursor(cursor)
+
+        backwards = direction == 'prev'
+        ascending = self.descending == backwards
+        if values is not None:
+            clause, seek_params = self._seek_clause('>' if ascending else '<', values)
+            conditions.append(clause)
+            params.extend(seek_params)
+
+        where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+        order = 'ASC' if ascending else 'DESC'
+        order_clause = ', '.join([f"{expression} {order}" for expression, _ in self.sort_columns])
+
+        rows = database.fetchall(
+            f"{select_sql}{where_clause} ORDER BY {order_clause} LIMIT ?",
+            tuple(params + [limit + 1])
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if backwards:
+            rows.reverse()
+
+        has_next = has_more if not backwards else True
+        has_prev = values is not None if not backwards else has_more
+        page_info = {
+            'limit': limit,
+            'has_next': bool(rows) and has_next,
+            'has_prev': bool(rows) and has_prev,
+            'next_cursor': encode_cursor(self._row_values(rows[-1]), 'next') if rows and has_next else None,
+            'prev_cursor': encode_cursor(self._row_values(rows[0]), 'prev') if rows and has_prev else None
+        }
+        return rows, page_info
+
+
+class CountCache:
+    """列表总数缓存
+
+    深度分页时 COUNT(*) 需要扫描整个索引范围，游标分页只在需要时
+    返回缓存的(近似)总数，TTL内重复请求不再访问数据库。
+    """
+
+    def __init__(self, ttl: float = 60, maxsize: int = 256):
+        """初始化计数缓存"""
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: 'OrderedDict[Tuple[str, Tuple[Any, ...]], Tuple[float, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_count(self, database, count_sql: str, params: Tuple[Any, ...] = ()) -> int:
+        """获取计数，缓存过期时重新查询"""
+        key = (count_sql, tuple(params))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        result = database.fetchone(count_sql, tuple(params))
+        total = list(result.values())[0] if result else 0
+
+        with self._lock:
+            self._entries[key] = (now, total)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return total
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+
+# 全局计数缓存实例
+count_cache = CountCache()
@@ -0,0 +1,94 @@
+"""
+认证主体缓存模块 - 缓存已认证用户，认证装饰器不再每个请求查询用户表
+"""
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from .cache_version import VersionStamp
+
+logger = logging.getLogger(__name__)
+
+# settings表中的版本戳，任一用户变更时递增，其他worker据此清空缓存
+VERSION_KEY = 'principal_cache_version'
+
+
+class PrincipalCache:
+    """有界TTL的认证主体缓存
+
+    按用户ID缓存用户行(不含密码哈希)。跨worker的失效通过settings表中的版本戳实现：
+    每个worker最多每check_interval秒读取一次版本戳(主键查询)，版本变化时丢弃所有缓存条目，
+    其余请求不访问数据库。条目记录加载前看到的版本，加载期间发生的变更不会留下旧数据。
+    """
+
+    def __init__(self, ttl: float = None, maxsize: int = None, check_interval: float = None):
+        """初始化认证主体缓存"""
+        self.ttl = ttl if ttl is not None else float(os.getenv('PRINCIPAL_CACHE_TTL', 300))
+        self.maxsize = maxsize if maxsize is not None else int(os.getenv('PRINCIPAL_CACHE_SIZE', 1024))
+        if check_interval is None:
+            check_interval = float(os.getenv('PRINCIPAL_CACHE_VERSION_CHECK_INTERVAL', 2))
+        self.stamp = VersionStamp(VERSION_KEY, check_interval)
+        self._entries: 'OrderedDict[int, Tuple[float, Optional[str], Dict[str, Any]]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def _current_version(self, database) -> Optional[str]:
+        """返回当前版本戳，版本变化时清空缓存"""
+        version, changed = self.stamp.current(database)
+        if changed:
+            with self._lock:
+                self._entries.clear()
+        return version
+
+    def get(self, database, user_id: int, loader: Callable[[int], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """获取用户行，未缓存或已失效时调用loader加载(不存在的用户不缓存)"""
+        version = self._current_version(database)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > now and entry[1] == version:
+                self._entries.move_to_end(user_id)
+                self._hits += 1
+                return entry[2]
+            self._misses += 1
+
+        row = loader(user_id)
+        if row is None:
+            return None
+
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, version, row)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return row
+
+    def invalidate(self, database, user_id: int) -> None:
+        """用户变更后调用：丢弃本地条目并递增版本戳，其他worker在下次检查时清空缓存"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+        self.stamp.bump(database)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self._hits,
+                'misses': self._misses,
+                'version': self.stamp.version
+            }
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+        self.stamp.expire()
+
+
+# 全局认证主体缓存(进程内共享)
+principal_cache = PrincipalCache()
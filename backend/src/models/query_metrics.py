@@ -0,0 +1,216 @@
+"""
+查询指标模块 - SQL耗时直方图、慢查询日志和请求级查询计数
+"""
+import os
+import datetime
+import threading
+from typing import Dict, List, Any, Optional, Sequence
+
+from utils.logging_config import get_logger
+from .statement_cache import CompiledStatement, StatementCache, statement_cache
+
+try:
+    from gevent.local import local as _ScopeLocal
+except ImportError:
+    from threading import local as _ScopeLocal
+
+# 查询耗时分桶(秒)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# 单个请求的查询次数分桶
+REQUEST_QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_OPERATIONS = ('select', 'insert', 'update', 'delete', 'replace')
+
+
+class Histogram:
+    """累积直方图"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """记录一个观测值(调用方负责加锁)"""
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """获取累积分桶计数"""
+        cumulative = []
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            cumulative.append((bound, running))
+        return {'buckets': cumulative, 'sum': self.total, 'count': self.count}
+
+
+def describe_params(params: Any) -> Any:
+    """描述绑定参数的形状(类型和长度)，不记录参数值"""
+    if isinstance(params, dict):
+        return {key: describe_params(value) for key, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        if len(params) > 20:
+            shapes = sorted({describe_params(value) for value in params if not isinstance(value, (list, tuple, dict))})
+            return f"{type(params).__name__}[{len(params)}] of {', '.join(shapes)}"
+        return [describe_params(value) for value in params]
+    if isinstance(params, (str, bytes)):
+        return f"{type(params).__name__}({len(params)})"
+    if isinstance(params, (datetime.datetime, datetime.date)):
+        return type(params).__name__
+    return type(params).__name__
+
+
+class QueryMetrics:
+    """数据库查询指标
+
+    按语句类型记录耗时直方图，按指纹累计调用次数/耗时/行数(委托给语句缓存)，
+    记录连接获取耗时，并统计每个HTTP请求内的查询次数。
+    """
+
+    def __init__(self, cache: StatementCache, slow_query_threshold: float = 0.5,
+                 request_query_warning: int = 50):
+        """
+        Args:
+            cache: 按指纹累计统计的语句缓存
+            slow_query_threshold: 慢查询阈值(秒)，0表示不记录
+            request_query_warning: 单个请求查询次数告警阈值，0表示不告警
+        """
+        self.cache = cache
+        self.slow_query_threshold = slow_query_threshold
+        self.request_query_warning = request_query_warning
+        self._lock = threading.Lock()
+        self._latency = {operation: Histogram(LATENCY_BUCKETS) for operation in _OPERATIONS + ('other',)}
+        self._acquire = Histogram(LATENCY_BUCKETS)
+        self._request_queries = Histogram(REQUEST_QUERY_BUCKETS)
+        self._rows = 0
+        self._errors = 0
+        self._slow_queries = 0
+        self._request = _ScopeLocal()
+        self._slow_logger = get_logger('database.slow_query')
+
+    def record(self, statement: CompiledStatement, duration: float, rows: int = 0,
+               params: Any = None, error: bool = False) -> None:
+        """记录一次语句执行"""
+        self.cache.record(statement, duration, error=error, rows=rows)
+
+        operation = statement.normalized.split(' ', 1)[0]
+        if operation not in self._latency:
+            operation = 'other'
+        slow = self.slow_query_threshold > 0 and duration >= self.slow_query_threshold
+
+        with self._lock:
+            self._latency[operation].observe(duration)
+            self._rows += max(rows, 0)
+            if error:
+                self._errors += 1
+            if slow:
+                self._slow_queries += 1
+
+        if getattr(self._request, 'active', False):
+            self._request.queries += 1
+            self._request.duration += duration
+
+        if slow:
+            self._slow_logger.performance(
+                f"慢查询 {statement.fingerprint}",
+                duration,
+                fingerprint=statement.fingerprint,
+                statement=statement.normalized,
+                param_shapes=describe_params(params),
+                rows=rows,
+                error=error
+            )
+
+    def record_acquire(self, duration: float) -> None:
+        """记录一次连接获取耗时"""
+        with self._lock:
+            self._acquire.observe(duration)
+
+    def begin_request(self) -> None:
+        """开始统计当前请求的查询"""
+        self._request.active = True
+        self._request.queries = 0
+        self._request.duration = 0.0
+
+    def end_request(self) -> Optional[Dict[str, Any]]:
+        """结束当前请求的统计，返回查询次数和累计耗时"""
+        if not getattr(self._request, 'active', False):
+            return None
+        self._request.active = False
+        summary = {'queries': self._request.queries, 'duration': self._request.duration}
+        with self._lock:
+            self._request_queries.observe(summary['queries'])
+        return summary
+
+    def current_request(self) -> Optional[Dict[str, Any]]:
+        """获取当前请求到目前为止的查询统计"""
+        if not getattr(self._request, 'active', False):
+            return None
+        return {'queries': self._request.queries, 'duration': self._request.duration}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取汇总指标"""
+        with self._lock:
+            return {
+                'latency': {operation: histogram.snapshot() for operation, histogram in self._latency.items()},
+                'acquire': self._acquire.snapshot(),
+                'request_queries': self._request_queries.snapshot(),
+                'rows': self._rows,
+                'errors': self._errors,
+                'slow_queries': self._slow_queries,
+                'slow_query_threshold': self.slow_query_threshold
+            }
+
+    def render_prometheus(self, prefix: str = 'ssl_manager_db', top: int = 50) -> List[str]:
+        """导出Prometheus文本格式指标"""
+        stats = self.get_stats()
+        lines = []
+
+        def histogram(name: str, snapshot: Dict[str, Any], labels: str = '') -> None:
+            separator = ',' if labels else ''
+            for bound, count in snapshot['buckets']:
+                lines.append(f'{name}_bucket{{{labels}{separator}le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{{labels}{separator}le="+Inf"}} {snapshot["count"]}')
+            suffix = f'{{{labels}}}' if labels else ''
+            lines.append(f'{name}_sum{suffix} {snapshot["sum"]:.6f}')
+            lines.append(f'{name}_count{suffix} {snapshot["count"]}')
+
+        lines.append(f'# TYPE {prefix}_query_duration_seconds histogram')
+        for operation, snapshot in stats['latency'].items():
+            histogram(f'{prefix}_query_duration_seconds', snapshot, f'operation="{operation}"')
+
+        lines.append(f'# TYPE {prefix}_connection_acquire_seconds histogram')
+        histogram(f'{prefix}_connection_acquire_seconds', stats['acquire'])
+
+        lines.append(f'# TYPE {prefix}_queries_per_request histogram')
+        histogram(f'{prefix}_queries_per_request', stats['request_queries'])
+
+        lines.append(f'{prefix}_query_rows_total {stats["rows"]}')
+        lines.append(f'{prefix}_query_errors_total {stats["errors"]}')
+        lines.append(f'{prefix}_slow_queries_total {stats["slow_queries"]}')
+
+        # 按总耗时排序的热点语句
+        for query in self.cache.top_queries(top):
+            labels = f'fingerprint="{query["fingerprint"]}"'
+            lines.append(f'{prefix}_statement_calls_total{{{labels}}} {query["calls"]}')
+            lines.append(f'{prefix}_statement_seconds_total{{{labels}}} {query["total_time"]:.6f}')
+            lines.append(f'{prefix}_statement_rows_total{{{labels}}} {query["rows"]}')
+            lines.append(f'{prefix}_statement_errors_total{{{labels}}} {query["errors"]}')
+        return lines
+
+
+# 全局查询指标实例
+query_metrics = QueryMetrics(
+    statement_cache,
+    slow_query_threshold=float(os.getenv('MYSQL_SLOW_QUERY_THRESHOLD_MS', 500)) / 1000,
+    request_query_warning=int(os.getenv('MYSQL_REQUEST_QUERY_WARNING', 50))
+)
@@ -0,0 +1,28 @@
+"""
+行对象模块 - 为使用__slots__的模型生成由查询结果行直接填充属性的函数
+"""
+from typing import Any, Callable, Dict, Sequence, Tuple
+
+
+def compile_hydrator(fields: Sequence[Tuple[str, str, Any]],
+                     name: str = 'hydrate') -> Callable[[Any, Dict[str, Any]], None]:
+    """生成 hydrate(obj, row) 函数
+
+    逐列展开为直接的属性赋值，避免 cls(**row) 的关键字参数解析和逐列setattr循环。
+
+    Args:
+        fields: (属性名, 列名, 缺省值)列表，行中没有该列时使用缺省值
+        name: 生成的函数名(出现在异常堆栈中)
+    """
+    namespace: Dict[str, Any] = {}
+    lines = [f"def {name}(self, row):", "    get = row.get"]
+    for index, (attribute, column, default) in enumerate(fields):
+        if not attribute.isidentifier():
+            raise ValueError(f"无效的属性名: {attribute!r}")
+        namespace[f'_default_{index}'] = default
+        lines.append(f"    self.{attribute} = get({column!r}, _default_{index})")
+    if len(lines) == 2:
+        lines.append("    pass")
+
+    exec('\n'.join(lines), namespace)
+    return namespace[name]
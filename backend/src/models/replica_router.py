@@ -0,0 +1,182 @@
+"""
+只读副本路由模块 - 按复制延迟选择只读副本连接池
+"""
+import time
+import logging
+import threading
+from typing import Dict, List, Any, Optional
+
+import pymysql
+
+from .connection_pool import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# 缺少REPLICATION CLIENT/SUPER权限(ER_SPECIFIC_ACCESS_DENIED_ERROR、ER_TABLEACCESS_DENIED_ERROR)
+PRIVILEGE_ERRORS = (1227, 1142)
+# 语法错误(ER_PARSE_ERROR)：MySQL 8.0.22以前的版本不支持 SHOW REPLICA STATUS
+PARSE_ERROR = 1064
+
+
+def _error_code(error: Exception) -> Optional[int]:
+    """MySQL错误码，非服务端错误时返回None"""
+    if isinstance(error, pymysql.err.MySQLError) and error.args and isinstance(error.args[0], int):
+        return error.args[0]
+    return None
+
+
+class ReplicaState:
+    """单个只读副本的连接池和健康状态"""
+
+    def __init__(self, name: str, pool: ConnectionPool):
+        self.name = name
+        self.pool = pool
+        self.healthy = True
+        self.lag: Optional[float] = None
+        self.checked_at = 0.0
+        self.failures = 0
+        self.reads = 0
+        self.last_error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为统计字典"""
+        return {
+            'name': self.name,
+            'healthy': self.healthy,
+            'lag': self.lag,
+            'failures': self.failures,
+            'reads': self.reads,
+            'last_error': self.last_error,
+            'pool': self.pool.get_stats()
+        }
+
+
+class ReplicaRouter:
+    """只读副本路由器
+
+    轮询选择复制延迟不超过max_lag的副本，延迟按check_interval周期检查
+    (SHOW REPLICA STATUS)。没有可用副本时返回None，由调用方回退到主库。
+    """
+
+    def __init__(self, replicas: Dict[str, ConnectionPool], max_lag: float = 5,
+                 check_interval: float = 10):
+        """初始化副本路由器
+
+        Args:
+            replicas: {副本名称: 连接池}
+            max_lag: 允许的最大复制延迟(秒)
+            check_interval: 延迟检查间隔(秒)
+        """
+        self.replicas: List[ReplicaState] = [ReplicaState(name, pool) for name, pool in replicas.items()]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._next = 0
+        self.fallbacks = 0
+
+    def _measure_lag(self, replica: ReplicaState) -> Optional[float]:
+        """查询副本的复制延迟，无法获取复制状态时返回None"""
+        conn = replica.pool.checkout(timeout=1)
+        try:
+            status = self._replica_status(conn)
+        except Exception as e:
+            if _error_code(e) in PRIVILEGE_ERRORS:
+                # 缺少REPLICATION CLIENT权限时无法获取延迟，连接本身可用
+                replica.pool.checkin(conn)
+                logger.debug(f"只读副本 {replica.name} 无权限查询复制状态: {e}")
+                return None
+            # 超时、连接断开等其他错误视为检查失败
+            replica.pool.invalidate(conn)
+            raise
+        replica.pool.checkin(conn)
+
+        if not status:
+            # 非复制拓扑(如云数据库只读端点)或缺少REPLICATION CLIENT权限
+            return None
+        lag = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+        if lag is None:
+            # 复制线程已停止
+            return float('inf')
+        return float(lag)
+
+    @staticmethod
+    def _replica_status(conn) -> Optional[Dict[str, Any]]:
+        """查询复制状态，只在服务器不支持 SHOW REPLICA STATUS 语法时改用 SHOW SLAVE STATUS"""
+        cursor = conn.cursor()
+        try:
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except Exception as e:
+                if _error_code(e) != PARSE_ERROR:
+                    raise
+                # MySQL 8.0.22以前的版本(8.4起不再支持 SHOW SLAVE STATUS)
+                cursor.execute("SHOW SLAVE STATUS")
+            return cursor.fetchone()
+        finally:
+            cursor.close()
+
+    def _check(self, replica: ReplicaState) -> None:
+        """检查副本健康状态"""
+        replica.checked_at = time.monotonic()
+        try:
+            lag = self._measure_lag(replica)
+        except Exception as e:
+            replica.healthy = False
+            replica.failures += 1
+            replica.last_error = str(e)
+            logger.warning(f"只读副本 {replica.name} 不可用: {e}")
+            return
+
+        replica.lag = lag
+        replica.last_error = None
+        healthy = lag is None or lag <= self.max_lag
+        if replica.healthy and not healthy:
+            logger.warning(f"只读副本 {replica.name} 复制延迟 {lag}s 超过阈值 {self.max_lag}s，暂停读取")
+        elif not replica.healthy and healthy:
+            logger.info(f"只读副本 {replica.name} 已恢复")
+        replica.healthy = healthy
+
+    def choose(self) -> Optional[ReplicaState]:
+        """选择一个可用副本，没有可用副本时返回None"""
+        now = time.monotonic()
+        with self._lock:
+            due = [replica for replica in self.replicas if now - replica.checked_at >= self.check_interval]
+            for replica in due:
+                # 先更新检查时间，避免并发请求重复检查
+                replica.checked_at = now
+
+        for replica in due:
+            self._check(replica)
+
+        with self._lock:
+            for offset in range(len(self.replicas)):
+                replica = self.replicas[(self._next + offset) % len(self.replicas)]
+                if replica.healthy:
+                    self._next = (self._next + offset + 1) % len(self.replicas)
+                    replica.reads += 1
+                    return replica
+            self.fallbacks += 1
+            return None
+
+    def mark_failed(self, replica: ReplicaState, error: Exception) -> None:
+        """读取失败时暂停使用副本，直到下一次健康检查"""
+        with self._lock:
+            replica.healthy = False
+            replica.failures += 1
+            replica.last_error = str(error)
+            replica.checked_at = time.monotonic()
+        logger.warning(f"只读副本 {replica.name} 读取失败，回退主库: {error}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取副本路由统计"""
+        with self._lock:
+            return {
+                'max_lag': self.max_lag,
+                'fallbacks': self.fallbacks,
+                'replicas': [replica.to_dict() for replica in self.replicas]
+            }
+
+    def dispose(self) -> None:
+        """关闭所有副本的空闲连接"""
+        for replica in self.replicas:
+            replica.pool.dispose()
@@ -1,28 +1,43 @@
 """
 服务器模型模块，处理服务器相关的数据操作
 """
+import re
 import datetime
 import secrets
 import string
 from typing import Dict, List, Any, Optional, Tuple
 from .database import db
+from .pagination import KeysetPaginator, count_cache
+from .certificate import Certificate
+from .identity_map import identity_map
+from .domain_search import substring_condition, escape_like
+from .token_cache import server_token_cache, hash_token
+
+# 含点或冒号的数字/十六进制片段视为IP地址前缀
+_IP_FRAGMENT_RE = re.compile(r'^(?=.*[.:])[0-9a-fA-F.:]+$')
 
 class Server:
     """服务器模型类"""
     
+    # 列表按id倒序
+    _paginator = KeysetPaginator([('id', 'id')], descending=True)
+    
     def __init__(self, id: int = None, name: str = None, ip: str = None,
                  os_type: str = None, version: str = None, token: str = None,
                  auto_renew: bool = True, user_id: int = None,
                  server_type: str = None, description: str = None,
                  status: str = None, last_seen: str = None,
-                 created_at: str = None, updated_at: str = None):
+                 created_at: str = None, updated_at: str = None, token_hash: str = None):
         """初始化服务器对象"""
         self.id = id
         self.name = name
         self.ip = ip
         self.os_type = os_type
         self.version = version
+        # 明文令牌只在创建或重新生成后保留在内存中返回给调用方，数据库只保存摘要
         self.token = token
+        # 令牌的SHA-256摘要，客户端认证按摘要的唯一索引查询
+        self.token_hash = token_hash
         self.auto_renew = auto_renew
         self.user_id = user_id
         self.server_type = server_type or 'nginx'
@@ -40,7 +55,11 @@ class Server:
     
     @classmethod
     def get_by_id(cls, server_id: int) -> Optional['Server']:
-        """根据ID获取服务器"""
+        """根据ID获取服务器(同一请求内重复查找直接返回已加载的对象)"""
+        server = identity_map.get(cls, server_id)
+        if server is not None:
+            return server
+        
         db.connect()
         server_data = db.fetchone("SELECT * FROM servers WHERE id = ?", (server_id,))
         db.close()
@@ -48,19 +67,54 @@ class Server:
         if not server_data:
             return None
         
-        return cls(**server_data)
+        return identity_map.add(cls, server_data['id'], cls(**server_data))
     
     @classmethod
-    def get_by_token(cls, token: str) -> Optional['Server']:
-        """根据令牌获取服务器"""
+    def get_many(cls, server_ids: List[int], chunk_size: int = 500) -> Dict[int, 'Server']:
+        """按ID批量获取服务器，返回 {服务器ID: 服务器}，不存在的ID不出现在结果中"""
+        servers, missing = identity_map.get_many(cls, server_ids)
+        if not missing:
+            return servers
+        
         db.connect()
-        server_data = db.fetchone("SELECT * FROM servers WHERE token = ?", (token,))
-        db.close()
+        try:
+            for start in range(0, len(missing), chunk_size):
+                chunk = missing[start:start + chunk_size]
+                placeholders = ', '.join(['?'] * len(chunk))
+                for server_data in db.fetchall(
+                    f"SELECT * FROM servers WHERE id IN ({placeholders})", tuple(chunk)
+                ):
+                    servers[server_data['id']] = identity_map.add(cls, server_data['id'], cls(**server_data))
+        finally:
+            db.close()
         
+        return servers
+    
+    @classmethod
+    def get_by_token(cls, token: str) -> Optional['Server']:
+        """根据令牌获取服务器(按令牌摘要查询，令牌缓存命中时不访问数据库)"""
+        server_data = server_token_cache.get(db, hash_token(token), cls._load_by_token_hash)
         if not server_data:
             return None
         
-        return cls(**server_data)
+        return identity_map.add(cls, server_data['id'], cls(**server_data))
+    
+    @staticmethod
+    def _load_by_token_hash(digest: str) -> Optional[Dict[str, Any]]:
+        """按令牌摘要加载服务器行(uk_servers_token_hash)"""
+        db.connect()
+        try:
+            return db.fetchone("SELECT * FROM servers WHERE token_hash = ?", (digest,))
+        finally:
+            db.close()
+    
+    @staticmethod
+    def _keyword_condition(keyword: str) -> Tuple[str, List[Any]]:
+        """服务器关键词条件：IP片段按前缀走ip索引，其他关键词按名称子串走全文索引"""
+        keyword = keyword.strip()
+        if _IP_FRAGMENT_RE.match(keyword):
+            return "ip LIKE ?", [escape_like(keyword) + '%']
+        return substring_condition(('name',), keyword)
     
     @classmethod
     def get_all(cls, page: int = 1, limit: int = 20, keyword: str = None, 
@@ -73,8 +127,9 @@ class Server:
         params = []
         
         if keyword:
-            conditions.append("(name LIKE ? OR ip LIKE ?)")
-            params.extend([f"%{keyword}%", f"%{keyword}%"])
+            condition, keyword_params = cls._keyword_condition(keyword)
+            conditions.append(condition)
+            params.extend(keyword_params)
         
         if user_id:
             conditions.append("user_id = ?")
@@ -98,6 +153,48 @@ class Server:
         servers = [cls(**server_data) for server_data in servers_data]
         return servers, total
     
+    @classmethod
+    def count(cls) -> int:
+        """获取服务器总数"""
+        db.connect()
+        try:
+            result = db.fetchone("SELECT COUNT(*) as total FROM servers")
+        finally:
+            db.close()
+        return result['total'] if result else 0
+    
+    @classmethod
+    def get_page(cls, cursor: str = None, limit: int = 20, keyword: str = None,
+                 user_id: int = None, include_total: bool = False) -> Tuple[List['Server'], Dict[str, Any]]:
+        """按id游标分页获取服务器"""
+        conditions = []
+        params = []
+        
+        if keyword:
+            condition, keyword_params = cls._keyword_condition(keyword)
+            conditions.append(condition)
+            params.extend(keyword_params)
+        
+        if user_id:
+            conditions.append("user_id = ?")
+            params.append(user_id)
+        
+        db.connect()
+        try:
+            servers_data, page_info = cls._paginator.paginate(
+                db, "SELECT * FROM servers", conditions, params, cursor, limit
+            )
+            
+            if include_total:
+                where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+                page_info['total'] = count_cache.get_count(
+                    db, f"SELECT COUNT(*) as total FROM servers{where_clause}", tuple(params)
+                )
+        finally:
+            db.close()
+        
+        return [cls(**server_data) for server_data in servers_data], page_info
+    
     def save(self) -> int:
         """保存服务器信息"""
         db.connect()
@@ -120,17 +217,20 @@ class Server:
 
             db.update('servers', data, 'id = ?', (self.id,))
             server_id = self.id
+            # 令牌缓存中的服务器行已过期
+            server_token_cache.invalidate(db, self.token_hash)
         else:
             # 创建新服务器
             if not self.token:
                 self.token = self.generate_token()
+            self.token_hash = hash_token(self.token)
 
             data = {
                 'name': self.name,
                 'ip': self.ip if self.ip else '',
                 'os_type': self.os_type if self.os_type else '',
                 'version': self.version if self.version else '',
-                'token': self.token,
+                'token_hash': self.token_hash,
                 'auto_renew': self.auto_renew,
                 'user_id': self.user_id,
                 'server_type': self.server_type,
@@ -155,7 +255,9 @@ class Server:
         db.connect()
         result = db.delete('servers', 'id = ?', (self.id,))
         db.commit()
+        server_token_cache.invalidate(db, self.token_hash)
         db.close()
+        identity_map.discard(Server, self.id)
         
         return result > 0
     
@@ -167,7 +269,6 @@ class Server:
             'ip': self.ip,
             'os_type': self.os_type,
             'version': self.version,
-            'token': self.token,
             'auto_renew': self.auto_renew,
             'user_id': self.user_id,
             'server_type': self.server_type,
@@ -184,8 +285,9 @@ class Server:
             return []
         
         db.connect()
+        # 不查询证书内容和私钥
         certificates = db.fetchall(
-            "SELECT * FROM certificates WHERE server_id = ? ORDER BY expires_at ASC",
+            f"SELECT {Certificate.columns()} FROM certificates WHERE server_id = ? ORDER BY expires_at ASC",
             (self.id,)
         )
         db.close()
@@ -206,6 +308,45 @@ class Server:
         
         return result['count'] if result else 0
     
+    @classmethod
+    def get_certificate_counts(cls, server_ids: List[int]) -> Dict[int, int]:
+        """批量获取多个服务器的证书数量，返回 {服务器ID: 数量}"""
+        server_ids = list(dict.fromkeys(server_id for server_id in server_ids if server_id))
+        counts = {server_id: 0 for server_id in server_ids}
+        if not server_ids:
+            return counts
+        
+        placeholders = ', '.join(['?'] * len(server_ids))
+        db.connect()
+        try:
+            rows = db.fetchall(
+                f"""SELECT server_id, COUNT(*) as count FROM certificates
+                    WHERE server_id IN ({placeholders}) GROUP BY server_id""",
+                tuple(server_ids)
+            )
+        finally:
+            db.close()
+        
+        for row in rows:
+            counts[row['server_id']] = row['count']
+        return counts
+    
+    def regenerate_token(self) -> str:
+        """重新生成令牌，旧令牌立即失效，返回新令牌"""
+        old_hash = self.token_hash
+        self.token = self.generate_token()
+        self.token_hash = hash_token(self.token)
+        
+        db.connect()
+        try:
+            db.update('servers', {'token_hash': self.token_hash}, 'id = ?', (self.id,))
+            db.commit()
+            server_token_cache.invalidate(db, old_hash, self.token_hash)
+        finally:
+            db.close()
+        
+        return self.token
+    
     def update_heartbeat(self) -> None:
         """更新服务器心跳时间"""
         if not self.id:
@@ -0,0 +1,160 @@
+"""
+SQL语句缓存模块 - 缓存占位符转换结果并按指纹统计查询耗时
+"""
+import os
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, NamedTuple
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_RE = re.compile(r'%s|\?')
+_ROW_LIST_RE = re.compile(r'\(\s*\([?,\s]*\)(?:\s*,\s*\([?,\s]*\))*\s*\)')
+_IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_VALUES_RE = re.compile(r'(values\s*\([^()]*\))(?:\s*,\s*\([^()]*\))+')
+
+
+class CompiledStatement(NamedTuple):
+    """编译后的SQL语句"""
+    sql: str            # 转换为MySQL占位符的SQL
+    normalized: str     # 去除字面量后的规范化SQL
+    fingerprint: str    # 规范化SQL的摘要
+
+
+def translate_placeholders(sql: str) -> str:
+    """将SQLite风格的?占位符转换为MySQL的%s占位符(忽略引号内的?)"""
+    if '?' not in sql:
+        return sql
+
+    result = []
+    quote = None
+    escaped = False
+    for char in sql:
+        if quote:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == quote:
+                quote = None
+            result.append(char)
+        elif char in ("'", '"', '`'):
+            quote = char
+            result.append(char)
+        elif char == '?':
+            result.append('%s')
+        else:
+            result.append(char)
+    return ''.join(result)
+
+
+def normalize_sql(sql: str) -> str:
+    """规范化SQL：合并空白、替换字面量、折叠IN列表(含行构造器列表)和多行VALUES"""
+    normalized = _WHITESPACE_RE.sub(' ', sql).strip().lower()
+    normalized = _STRING_RE.sub('?', normalized)
+    normalized = _PLACEHOLDER_RE.sub('?', normalized)
+    normalized = _NUMBER_RE.sub('?', normalized)
+    normalized = _ROW_LIST_RE.sub('(...)', normalized)
+    normalized = _IN_LIST_RE.sub('(...)', normalized)
+    normalized = _VALUES_RE.sub(r'\1, ...', normalized)
+    return normalized
+
+
+class StatementCache:
+    """有界LRU语句缓存，并按指纹累计调用次数和耗时
+
+    指纹统计同样以maxsize为上限，超出时淘汰最久未执行的指纹。
+    """
+
+    def __init__(self, maxsize: int = 512):
+        """初始化语句缓存"""
+        self.maxsize = maxsize
+        self._statements: 'OrderedDict[str, CompiledStatement]' = OrderedDict()
+        self._stats: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def compile(self, sql: str) -> CompiledStatement:
+        """获取SQL对应的编译结果，未命中时编译并缓存"""
+        with self._lock:
+            statement = self._statements.get(sql)
+            if statement is not None:
+                self._statements.move_to_end(sql)
+                self._hits += 1
+                return statement
+            self._misses += 1
+
+        normalized = normalize_sql(sql)
+        statement = CompiledStatement(
+            sql=translate_placeholders(sql),
+            normalized=normalized,
+            fingerprint=hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+        )
+
+        with self._lock:
+            self._statements[sql] = statement
+            if len(self._statements) > self.maxsize:
+                self._statements.popitem(last=False)
+        return statement
+
+    def record(self, statement: CompiledStatement, duration: float, error: bool = False,
+               rows: int = 0) -> None:
+        """记录一次语句执行"""
+        with self._lock:
+            stats = self._stats.get(statement.fingerprint)
+            if stats is None:
+                stats = {
+                    'fingerprint': statement.fingerprint,
+                    'statement': statement.normalized,
+                    'calls': 0,
+                    'errors': 0,
+                    'rows': 0,
+                    'total_time': 0.0,
+                    'max_time': 0.0
+                }
+                self._stats[statement.fingerprint] = stats
+                if len(self._stats) > self.maxsize:
+                    self._stats.popitem(last=False)
+            else:
+                self._stats.move_to_end(statement.fingerprint)
+            stats['calls'] += 1
+            stats['rows'] += max(rows, 0)
+            stats['total_time'] += duration
+            if duration > stats['max_time']:
+                stats['max_time'] = duration
+            if error:
+                stats['errors'] += 1
+
+    def top_queries(self, limit: int = 20, order_by: str = 'total_time') -> List[Dict[str, Any]]:
+        """获取按指定字段排序的热点查询"""
+        with self._lock:
+            snapshot = [dict(stats) for stats in self._stats.values()]
+
+        for stats in snapshot:
+            stats['avg_time'] = stats['total_time'] / stats['calls'] if stats['calls'] else 0.0
+        snapshot.sort(key=lambda item: item.get(order_by, 0), reverse=True)
+        return snapshot[:limit]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存命中统计"""
+        with self._lock:
+            return {
+                'size': len(self._statements),
+                'maxsize': self.maxsize,
+                'hits': self._hits,
+                'misses': self._misses,
+                'fingerprints': len(self._stats)
+            }
+
+    def reset_stats(self) -> None:
+        """清空查询统计"""
+        with self._lock:
+            self._stats.clear()
+
+
+# 全局语句缓存实例
+statement_cache = StatementCache(maxsize=int(os.getenv('MYSQL_STATEMENT_CACHE_SIZE', 512)))
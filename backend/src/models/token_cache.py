@@ -0,0 +1,121 @@
+"""
+服务器令牌缓存模块 - 按令牌SHA-256摘要解析客户端令牌，命中时不访问数据库
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from .cache_version import VersionStamp
+
+logger = logging.getLogger(__name__)
+
+# settings表中的版本戳，令牌重新生成、服务器更新或删除时递增
+VERSION_KEY = 'server_token_cache_version'
+
+
+def hash_token(token: str) -> str:
+    """服务器令牌的SHA-256摘要(与MySQL的SHA2(token, 256)一致)"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class ServerTokenCache:
+    """服务器令牌LRU缓存
+
+    键为令牌摘要，进程内不保存令牌原文。有效令牌缓存服务器行，无效令牌单独缓存较短时间
+    (负缓存)，大量错误令牌不会挤出有效令牌的条目，也不会每次都查询数据库。
+    跨worker失效与认证主体缓存相同：按检查间隔读取settings表中的版本戳。
+    """
+
+    def __init__(self, ttl: float = None, negative_ttl: float = None, maxsize: int = None,
+                 negative_maxsize: int = None, check_interval: float = None):
+        """初始化服务器令牌缓存"""
+        self.ttl = ttl if ttl is not None else float(os.getenv('SERVER_TOKEN_CACHE_TTL', 300))
+        self.negative_ttl = (negative_ttl if negative_ttl is not None
+                             else float(os.getenv('SERVER_TOKEN_NEGATIVE_TTL', 30)))
+        self.maxsize = maxsize if maxsize is not None else int(os.getenv('SERVER_TOKEN_CACHE_SIZE', 10000))
+        self.negative_maxsize = negative_maxsize if negative_maxsize is not None else self.maxsize
+        if check_interval is None:
+            check_interval = float(os.getenv('SERVER_TOKEN_CACHE_VERSION_CHECK_INTERVAL', 2))
+        self.stamp = VersionStamp(VERSION_KEY, check_interval)
+        self._entries: 'OrderedDict[str, Tuple[float, Optional[str], Dict[str, Any]]]' = OrderedDict()
+        self._negative: 'OrderedDict[str, Tuple[float, Optional[str]]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._negative_hits = 0
+        self._misses = 0
+
+    def get(self, database, digest: str,
+            loader: Callable[[str], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """按令牌摘要获取服务器行，未缓存或已失效时调用loader加载"""
+        version, changed = self.stamp.current(database)
+        now = time.monotonic()
+        with self._lock:
+            if changed:
+                self._entries.clear()
+                self._negative.clear()
+
+            entry = self._entries.get(digest)
+            if entry and entry[0] > now and entry[1] == version:
+                self._entries.move_to_end(digest)
+                self._hits += 1
+                return entry[2]
+
+            negative = self._negative.get(digest)
+            if negative and negative[0] > now and negative[1] == version:
+                self._negative_hits += 1
+                return None
+            self._misses += 1
+
+        row = loader(digest)
+
+        with self._lock:
+            if row is None:
+                self._remember(self._negative, digest, (now + self.negative_ttl, version), self.negative_maxsize)
+            else:
+                self._negative.pop(digest, None)
+                self._remember(self._entries, digest, (now + self.ttl, version, row), self.maxsize)
+        return row
+
+    @staticmethod
+    def _remember(entries: OrderedDict, digest: str, entry: tuple, maxsize: int) -> None:
+        """写入条目，超出容量时淘汰最久未使用的条目(调用方持有锁)"""
+        entries[digest] = entry
+        entries.move_to_end(digest)
+        while len(entries) > maxsize:
+            entries.popitem(last=False)
+
+    def invalidate(self, database, *digests: str) -> None:
+        """令牌变更后调用：丢弃本地条目并递增版本戳，其他worker在下次检查时清空缓存"""
+        with self._lock:
+            for digest in digests:
+                if digest:
+                    self._entries.pop(digest, None)
+                    self._negative.pop(digest, None)
+        self.stamp.bump(database)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'negative_size': len(self._negative),
+                'maxsize': self.maxsize,
+                'hits': self._hits,
+                'negative_hits': self._negative_hits,
+                'misses': self._misses,
+                'version': self.stamp.version
+            }
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._negative.clear()
+        self.stamp.expire()
+
+
+# 全局服务器令牌缓存(进程内共享)
+server_token_cache = ServerTokenCache()
@@ -0,0 +1,79 @@
+"""
+触发器安装模块 - 触发器已是当前定义时不执行DDL，多个worker同时启动时只有一个实例安装
+"""
+import hashlib
+import logging
+from typing import Callable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 安装触发器的命名锁(所有触发器共用，安装过程很短)
+INSTALL_LOCK = 'ssl_manager_install_triggers'
+INSTALL_LOCK_TIMEOUT = 30
+
+
+def definition_signature(statements: Iterable[str]) -> str:
+    """触发器定义摘要，保存在settings表中，定义变化(升级)时重新安装"""
+    return hashlib.sha256('\n'.join(statements).encode('utf-8')).hexdigest()[:16]
+
+
+def signature_key(name: str) -> str:
+    """settings表中保存定义摘要的键"""
+    return f"{name}_trigger_signature"
+
+
+def triggers_current(database, name: str, trigger_names: List[str], signature: str) -> bool:
+    """所有触发器都存在且定义摘要与当前一致"""
+    placeholders = ', '.join(['?'] * len(trigger_names))
+    rows = database.fetchall(
+        f"""SELECT TRIGGER_NAME FROM information_schema.TRIGGERS
+           WHERE TRIGGER_SCHEMA = DATABASE() AND TRIGGER_NAME IN ({placeholders})""",
+        tuple(trigger_names)
+    )
+    if {row['TRIGGER_NAME'] for row in rows} != set(trigger_names):
+        return False
+    row = database.fetchone("SELECT `value` FROM `settings` WHERE `key` = ?", (signature_key(name),))
+    return bool(row) and row['value'] == signature
+
+
+def ensure_triggers(database, name: str, trigger_names: List[str], statements: List[str],
+                    after_install: Optional[Callable] = None) -> bool:
+    """触发器缺失或定义变化时安装
+
+    已是当前定义时只做两次元数据查询，不执行DDL(DDL隐式提交，删除和重建之间的写入不会触发)。
+    需要安装时持有命名锁，拿到锁后再检查一次，其他实例已安装完成时直接返回。
+    after_install 在触发器创建后、提交前调用，用于补偿删除和重建之间遗漏的写入。
+    其他实例长时间持有锁时返回False；创建失败时抛出异常，由调用方决定回退方式。
+    """
+    signature = definition_signature(statements)
+    database.connect()
+    try:
+        with database.use_primary():
+            if triggers_current(database, name, trigger_names, signature):
+                return True
+
+            lock = database.fetchone("SELECT GET_LOCK(?, ?) AS acquired", (INSTALL_LOCK, INSTALL_LOCK_TIMEOUT))
+            if not lock or not lock['acquired']:
+                logger.warning(f"等待触发器安装锁超时，跳过 {name} 触发器安装")
+                return False
+            try:
+                if triggers_current(database, name, trigger_names, signature):
+                    return True
+                for trigger in trigger_names:
+                    database.execute(f"DROP TRIGGER IF EXISTS `{trigger}`").close()
+                for statement in statements:
+                    database.execute(statement).close()
+                if after_install is not None:
+                    after_install(database)
+                database.execute(
+                    "INSERT INTO `settings` (`key`, `value`) VALUES (?, ?) AS new "
+                    "ON DUPLICATE KEY UPDATE `value` = new.`value`",
+                    (signature_key(name), signature)
+                ).close()
+                database.commit()
+                logger.info(f"{name} 触发器已安装(定义 {signature})")
+                return True
+            finally:
+                database.fetchone("SELECT RELEASE_LOCK(?) AS released", (INSTALL_LOCK,))
+    finally:
+        database.close()
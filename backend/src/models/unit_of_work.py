@@ -0,0 +1,114 @@
+"""
+工作单元模块 - 事务内缓冲插入、批量刷新和保存点
+"""
+from contextlib import contextmanager
+from typing import Any, Dict, List, Tuple
+
+
+class UnitOfWork:
+    """数据库工作单元
+
+    由Database.transaction()创建并绑定到当前线程/greenlet，在一个事务内:
+    - insert()缓冲不需要自增ID的插入，按(表, 列)分组后以多行INSERT批量写入;
+    - 其他语句执行前先刷新缓冲，已缓冲的插入总是先于之后的语句执行;
+    - savepoint()内出错只回滚到保存点(包括块内缓冲的插入)，事务继续;
+    - Database.insert/update/delete/bulk_upsert不再各自提交，最外层退出时统一提交一次。
+
+    缓冲的插入之间按表分组写入，不保证跨表的先后顺序，有外键依赖的行应使用Database.insert。
+    """
+
+    def __init__(self, database, chunk_size: int = 500):
+        self.database = database
+        self.chunk_size = chunk_size
+        self._pending: Dict[Tuple[str, Tuple[str, ...]], List[tuple]] = {}
+        self._pending_rows = 0
+        self._savepoints: List[str] = []
+        self._savepoint_seq = 0
+        self.flushed_rows = 0
+        self.flushed_statements = 0
+
+    @property
+    def pending(self) -> int:
+        """缓冲中尚未写入的行数"""
+        return self._pending_rows
+
+    def insert(self, table: str, data: Dict[str, Any]) -> None:
+        """缓冲一行插入，缓冲行数达到chunk_size时立即刷新"""
+        key = (table, tuple(data.keys()))
+        self._pending.setdefault(key, []).append(tuple(data.values()))
+        self._pending_rows += 1
+        if self._pending_rows >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> int:
+        """将缓冲的插入按(表, 列)分组写入，返回写入行数"""
+        if not self._pending:
+            return 0
+
+        # 先清空缓冲：刷新语句经过Database.execute时不会再次触发刷新
+        pending, self._pending, self._pending_rows = self._pending, {}, 0
+        flushed = 0
+        for (table, columns), rows in pending.items():
+            column_list = ', '.join([f"`{column}`" for column in columns])
+            row_placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+            for start in range(0, len(rows), self.chunk_size):
+                chunk = rows[start:start + self.chunk_size]
+                sql = (
+                    f"INSERT INTO `{table}` ({column_list}) "
+                    f"VALUES {', '.join([row_placeholder] * len(chunk))}"
+                )
+                cursor = self.database.execute(sql, tuple(value for row in chunk for value in row))
+                cursor.close()
+                flushed += len(chunk)
+                self.flushed_statements += 1
+
+        self.flushed_rows += flushed
+        return flushed
+
+    def discard(self) -> None:
+        """丢弃缓冲中尚未写入的插入"""
+        self._pending = {}
+        self._pending_rows = 0
+
+    def _run(self, sql: str) -> None:
+        """执行保存点语句"""
+        self.database.execute(sql).close()
+
+    @contextmanager
+    def savepoint(self):
+        """保存点上下文：块内出错时回滚到保存点并重新抛出异常，事务中之前的写入保留
+
+        用法:
+            with db.transaction() as unit:
+                for row in rows:
+                    try:
+                        with unit.savepoint():
+                            ...
+                    except Exception:
+                        # 跳过这一行，继续处理其余行
+                        continue
+        """
+        # 保存点之前缓冲的插入属于外层，先写入
+        self.flush()
+        self._savepoint_seq += 1
+        name = f"uow_sp_{self._savepoint_seq}"
+        self._run(f"SAVEPOINT {name}")
+        self._savepoints.append(name)
+        try:
+            yield self
+            self.flush()
+        except BaseException:
+            self._savepoints.remove(name)
+            self.discard()
+            self._run(f"ROLLBACK TO SAVEPOINT {name}")
+            raise
+        self._savepoints.remove(name)
+        self._run(f"RELEASE SAVEPOINT {name}")
+
+    def rollback(self) -> None:
+        """回滚当前范围：在保存点内回滚到最近的保存点，否则回滚整个事务"""
+        self.discard()
+        if self._savepoints:
+            self._run(f"ROLLBACK TO SAVEPOINT {self._savepoints[-1]}")
+        else:
+            self.database.conn.rollback()
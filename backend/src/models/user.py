@@ -5,6 +5,7 @@ import datetime
 import bcrypt
 from typing import Dict, List, Any, Optional
 from .database import db
+from .principal_cache import principal_cache
 
 class User:
     """用户模型类"""
@@ -45,6 +46,27 @@ class User:
         
         return cls(**user_data)
     
+    @classmethod
+    def get_principal(cls, user_id: int) -> Optional['User']:
+        """获取已认证请求的用户(认证主体缓存命中时不查询数据库，不含密码哈希)"""
+        user_data = principal_cache.get(db, user_id, cls._load_principal)
+        
+        if not user_data:
+            return None
+        
+        return cls(**user_data)
+    
+    @staticmethod
+    def _load_principal(user_id: int) -> Optional[Dict[str, Any]]:
+        """加载认证主体缓存的用户行"""
+        db.connect()
+        try:
+            return db.fetchone(
+                "SELECT id, username, email, role, created_at, updated_at FROM users WHERE id = ?", (user_id,)
+            )
+        finally:
+            db.close()
+    
     @classmethod
     def get_by_username(cls, username: str) -> Optional['User']:
         """根据用户名获取用户"""
@@ -100,6 +122,16 @@ class User:
         users = [cls(**user_data) for user_data in users_data]
         return users, total
     
+    @classmethod
+    def count(cls) -> int:
+        """获取用户总数"""
+        db.connect()
+        try:
+            result = db.fetchone("SELECT COUNT(*) as total FROM users")
+        finally:
+            db.close()
+        return result['total'] if result else 0
+    
     def save(self) -> int:
         """保存用户信息"""
         db.connect()
@@ -120,6 +152,8 @@ class User:
             
             db.update('users', data, 'id = ?', (self.id,))
             user_id = self.id
+            # 用户名/角色/密码变更后失效认证主体缓存
+            principal_cache.invalidate(db, user_id)
         else:
             # 创建新用户
             data = {
@@ -145,6 +179,7 @@ class User:
         db.connect()
         result = db.delete('users', 'id = ?', (self.id,))
         db.commit()
+        principal_cache.invalidate(db, self.id)
         db.close()
         
         return result > 0
@@ -4,6 +4,7 @@ ACME协议客户端实现
 """
 
 import os
+import ssl
 import json
 import time
 import logging
@@ -22,6 +23,7 @@ import requests
 import dns.resolver
 import dns.exception
 from .dns_providers import DNSManager
+from models.chain_store import split_pem_chain, blob_digest
 
 # 导入新的异常处理
 try:
@@ -618,15 +620,27 @@ class ACMEClient:
         )
     
     def _save_certificate(self, domain: str, certificate_pem: str, key_pem: bytes) -> Dict[str, Any]:
-        """保存证书和私钥"""
+        """保存证书和私钥
+
+        证书链中的每个证书按DER的SHA-256保存到 .blobs/<sha256>.pem(已存在时不重写)，
+        域名目录只保存叶子证书 cert.pem 和引用链的 chain.json，同一中间证书在磁盘上只保存一份。
+        """
         # 创建域名目录
         domain_path = os.path.join(self.storage_path, domain)
         os.makedirs(domain_path, exist_ok=True)
         
-        # 保存证书
+        ders = split_pem_chain(certificate_pem)
         cert_file = os.path.join(domain_path, 'cert.pem')
-        with open(cert_file, 'w') as f:
-            f.write(certificate_pem)
+        if ders:
+            digests = [self._store_blob(der) for der in ders]
+            with open(cert_file, 'w') as f:
+                f.write(ssl.DER_cert_to_PEM_cert(ders[0]))
+            with open(os.path.join(domain_path, 'chain.json'), 'w') as f:
+                json.dump({'chain': digests}, f)
+        else:
+            # 无法拆分的内容按原文保存
+            with open(cert_file, 'w') as f:
+                f.write(certificate_pem)
         
         # 保存私钥
         key_file = os.path.join(domain_path, 'privkey.pem')
@@ -645,6 +659,38 @@ class ACMEClient:
         
         return cert_info
     
+    def _store_blob(self, der: bytes) -> str:
+        """按内容摘要保存单个证书，返回摘要"""
+        digest = blob_digest(der)
+        blob_path = os.path.join(self.storage_path, '.blobs')
+        blob_file = os.path.join(blob_path, f"{digest}.pem")
+        if not os.path.exists(blob_file):
+            os.makedirs(blob_path, exist_ok=True)
+            temp_file = f"{blob_file}.{os.getpid()}.tmp"
+            with open(temp_file, 'w') as f:
+                f.write(ssl.DER_cert_to_PEM_cert(der))
+            os.replace(temp_file, blob_file)
+        return digest
+    
+    def load_fullchain(self, domain: str) -> Optional[str]:
+        """按 chain.json 拼接域名的完整证书链，没有链记录时返回 cert.pem 原文"""
+        domain_path = os.path.join(self.storage_path, domain)
+        chain_file = os.path.join(domain_path, 'chain.json')
+        if os.path.exists(chain_file):
+            with open(chain_file, 'r') as f:
+                digests = json.load(f).get('chain', [])
+            parts = []
+            for digest in digests:
+                with open(os.path.join(self.storage_path, '.blobs', f"{digest}.pem"), 'r') as f:
+                    parts.append(f.read())
+            return ''.join(parts)
+        
+        cert_file = os.path.join(domain_path, 'cert.pem')
+        if not os.path.exists(cert_file):
+            return None
+        with open(cert_file, 'r') as f:
+            return f.read()
+    
     def _parse_certificate_info(self, certificate_pem: str) -> Dict[str, Any]:
         """解析证书信息"""
         try:
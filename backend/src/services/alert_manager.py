@@ -16,9 +16,11 @@ import threading
 import time
 
 from .notification import notification_manager, NotificationTemplate
-from models.certificate import Certificate
 from models.server import Server
 from models.user import User
+from models.database import db
+from models.async_database import async_db
+from models.identity_map import identity_map
 
 logger = logging.getLogger(__name__)
 
@@ -93,6 +95,7 @@ class AlertManager:
         self.alert_history: List[Alert] = []
         self.monitoring_enabled = True
         self.scheduler_thread = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
         
         # 加载默认规则
         self._load_default_rules()
@@ -430,61 +433,138 @@ class AlertManager:
     
     def _run_scheduler(self):
         """运行调度器"""
-        while self.monitoring_enabled:
-            try:
-                schedule.run_pending()
-                time.sleep(60)  # 每分钟检查一次
-            except Exception as e:
-                logger.error(f"调度器运行异常: {e}")
-                time.sleep(60)
+        try:
+            while self.monitoring_enabled:
+                try:
+                    # 每轮调度复用同一个数据库会话和标识映射
+                    with db.session(), identity_map.scope():
+                        schedule.run_pending()
+                    time.sleep(60)  # 每分钟检查一次
+                except Exception as e:
+                    logger.error(f"调度器运行异常: {e}")
+                    time.sleep(60)
+        finally:
+            if self._loop is not None:
+                self._run_async(async_db.close())
+                self._loop.close()
+                self._loop = None
+    
+    def _run_async(self, coro):
+        """在调度线程的事件循环中运行协程
+
+        调度线程持有一个长期事件循环，异步连接池绑定在该循环上，各轮调度之间复用。
+        """
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(coro)
+    
+    async def _trigger_alerts(self, pending: List[tuple]) -> List[Optional[Alert]]:
+        """并发触发一批告警，通知发送期间不阻塞其他告警"""
+        if not pending:
+            return []
+        return await asyncio.gather(*(self.trigger_alert(rule, context) for rule, context in pending))
     
     def _check_certificate_expiry(self):
         """检查证书过期情况"""
         try:
             logger.debug("检查证书过期情况")
-            
-            # 获取所有证书
-            certificates = Certificate.get_all()
-            
-            for cert in certificates:
-                if not cert.expires_at:
-                    continue
-                
-                now = datetime.now()
-                days_until_expiry = (cert.expires_at - now).days
-                
-                # 检查各种过期规则
-                for rule in self.rules.values():
-                    if not rule.enabled:
-                        continue
-                    
-                    if rule.alert_type == AlertType.CERTIFICATE_EXPIRING:
-                        threshold = rule.conditions.get('days_before_expiry', 30)
-                        if 0 <= days_until_expiry <= threshold:
-                            context = {
-                                'resource_id': f"cert_{cert.id}",
-                                'domain': cert.domain,
-                                'expires_at': cert.expires_at.strftime('%Y-%m-%d %H:%M:%S'),
-                                'days_remaining': days_until_expiry,
-                                'server_name': cert.server.name if cert.server else 'Unknown',
-                                'ca_type': cert.ca_type or 'Unknown'
-                            }
-                            asyncio.create_task(self.trigger_alert(rule, context))
-                    
-                    elif rule.alert_type == AlertType.CERTIFICATE_EXPIRED:
-                        if days_until_expiry < 0:
-                            context = {
-                                'resource_id': f"cert_{cert.id}",
-                                'domain': cert.domain,
-                                'expires_at': cert.expires_at.strftime('%Y-%m-%d %H:%M:%S'),
-                                'days_expired': abs(days_until_expiry),
-                                'server_name': cert.server.name if cert.server else 'Unknown'
-                            }
-                            asyncio.create_task(self.trigger_alert(rule, context))
-                            
+            self._run_async(self.evaluate_certificate_expiry())
         except Exception as e:
             logger.error(f"检查证书过期异常: {e}")
     
+    async def evaluate_certificate_expiry(self, batch_size: int = 500) -> int:
+        """
+        异步评估证书过期规则
+        
+        通过异步数据库按主键分批读取到期时间在最大告警阈值内的证书(连同服务器名称)，
+        每批命中的告警并发触发。
+        
+        Args:
+            batch_size: 每批读取的证书数量
+            
+        Returns:
+            int: 触发的告警数量
+        """
+        expiry_rules = [
+            rule for rule in self.rules.values()
+            if rule.enabled and rule.alert_type in (AlertType.CERTIFICATE_EXPIRING, AlertType.CERTIFICATE_EXPIRED)
+        ]
+        if not expiry_rules:
+            return 0
+        max_days = max((rule.conditions.get('days_before_expiry', 30) for rule in expiry_rules
+                        if rule.alert_type == AlertType.CERTIFICATE_EXPIRING), default=0)
+        
+        # 到期时间超出最大阈值的证书不会命中任何规则，无需读取
+        horizon = datetime.now() + timedelta(days=max_days + 1)
+        triggered = 0
+        last_id = 0
+        while True:
+            rows = await async_db.fetchall(
+                """
+                SELECT c.id, c.domain, c.expires_at, c.ca_type, s.name AS server_name
+                FROM certificates c
+                LEFT JOIN servers s ON s.id = c.server_id
+                WHERE c.id > ? AND c.expires_at IS NOT NULL AND c.expires_at <= ?
+                ORDER BY c.id
+                LIMIT ?
+                """,
+                (last_id, horizon, batch_size)
+            )
+            if not rows:
+                break
+            
+            pending = []
+            for row in rows:
+                pending.extend(self._certificate_expiry_alerts(row))
+            alerts = await self._trigger_alerts(pending)
+            triggered += sum(1 for alert in alerts if alert is not None)
+            
+            if len(rows) < batch_size:
+                break
+            last_id = rows[-1]['id']
+        
+        return triggered
+    
+    def _certificate_expiry_alerts(self, cert: Dict[str, Any]) -> List[tuple]:
+        """返回单个证书命中的 (告警规则, 告警上下文) 列表"""
+        expires_at = cert.get('expires_at')
+        if not expires_at:
+            return []
+        
+        now = datetime.now()
+        days_until_expiry = (expires_at - now).days
+        server_name = cert.get('server_name') or 'Unknown'
+        pending = []
+        
+        # 检查各种过期规则
+        for rule in self.rules.values():
+            if not rule.enabled:
+                continue
+            
+            if rule.alert_type == AlertType.CERTIFICATE_EXPIRING:
+                threshold = rule.conditions.get('days_before_expiry', 30)
+                if 0 <= days_until_expiry <= threshold:
+                    pending.append((rule, {
+                        'resource_id': f"cert_{cert['id']}",
+                        'domain': cert['domain'],
+                        'expires_at': expires_at.strftime('%Y-%m-%d %H:%M:%S'),
+                        'days_remaining': days_until_expiry,
+                        'server_name': server_name,
+                        'ca_type': cert.get('ca_type') or 'Unknown'
+                    }))
+            
+            elif rule.alert_type == AlertType.CERTIFICATE_EXPIRED:
+                if days_until_expiry < 0:
+                    pending.append((rule, {
+                        'resource_id': f"cert_{cert['id']}",
+                        'domain': cert['domain'],
+                        'expires_at': expires_at.strftime('%Y-%m-%d %H:%M:%S'),
+                        'days_expired': abs(days_until_expiry),
+                        'server_name': server_name
+                    }))
+        
+        return pending
+    
     def _check_server_status(self):
         """检查服务器状态"""
         try:
@@ -492,6 +572,7 @@ class AlertManager:
             
             # 获取所有服务器
             servers = Server.get_all()
+            pending = []
             
             for server in servers:
                 if not server.last_heartbeat:
@@ -514,7 +595,9 @@ class AlertManager:
                             'last_heartbeat': server.last_heartbeat.strftime('%Y-%m-%d %H:%M:%S'),
                             'offline_minutes': int((datetime.now() - server.last_heartbeat).total_seconds() / 60)
                         }
-                        asyncio.create_task(self.trigger_alert(rule, context))
+                        pending.append((rule, context))
+            
+            self._run_async(self._trigger_alerts(pending))
                         
         except Exception as e:
             logger.error(f"检查服务器状态异常: {e}")
@@ -11,7 +11,8 @@ import pandas as pd
 import threading
 import time
 import uuid
-from typing import Dict, List, Any, Optional, Tuple
+import zlib
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import ipaddress
@@ -19,8 +20,10 @@ import socket
 import ssl
 
 from models.certificate import Certificate
-from models.database import Database
+from models.database import db
 from models.alert import Alert
+from models.domain_search import domain_search_condition
+from models.certificate_tags import ownership_conditions, normalize_tags
 from services.domain_monitoring_service import DomainMonitoringService
 from services.port_monitoring_service import PortMonitoringService
 
@@ -29,8 +32,23 @@ logger = logging.getLogger(__name__)
 class CertificateOperationsService:
     """证书操作服务"""
     
+    # 导出的证书列及CSV表头
+    EXPORT_COLUMNS = (
+        'id', 'domain', 'type', 'status', 'created_at', 'expires_at',
+        'ca_type', 'monitoring_enabled', 'dns_status', 'domain_reachable',
+        'tls_version', 'certificate_chain_valid', 'http_redirect_status',
+        'notes', 'owner', 'business_unit'
+    )
+    EXPORT_HEADERS = (
+        'ID', '域名', '类型', '状态', '创建时间', '到期时间',
+        'CA类型', '监控启用', 'DNS状态', '域名可达',
+        'TLS版本', '证书链完整', 'HTTP重定向',
+        '备注', '负责人', '业务单元'
+    )
+    
     def __init__(self):
-        self.db = Database()
+        # 与模型共用全局数据库实例，服务内的写入可以加入调用方的工作单元事务
+        self.db = db
         self.domain_service = DomainMonitoringService()
         self.port_service = PortMonitoringService()
         self.max_workers = 5
@@ -80,8 +98,8 @@ class CertificateOperationsService:
             
             # 在后台线程中执行检测
             thread = threading.Thread(
-                target=self._execute_manual_check,
-                args=(task_id, certificate_id, check_types)
+                target=db.run_scoped,
+                args=(self._execute_manual_check, task_id, certificate_id, check_types)
             )
             thread.daemon = True
             thread.start()
@@ -255,35 +273,38 @@ class CertificateOperationsService:
                 'errors': []
             }
             
-            for index, row in df.iterrows():
-                try:
-                    # 检查重复
-                    existing_cert = self._find_existing_certificate(row['domain'])
-                    if existing_cert:
-                        import_results['duplicate_count'] += 1
-                        import_results['errors'].append(f"行 {index + 1}: 域名 {row['domain']} 已存在")
-                        continue
-                    
-                    # 创建证书记录
-                    cert_data = self._prepare_certificate_data(row, user_id)
-                    certificate = Certificate.create(**cert_data)
-                    
-                    import_results['success_count'] += 1
-                    import_results['imported_certificates'].append({
-                        'id': certificate.id,
-                        'domain': certificate.domain
-                    })
-                    
-                except Exception as e:
-                    import_results['failed_count'] += 1
-                    import_results['errors'].append(f"行 {index + 1}: {str(e)}")
-            
-            # 记录导入操作
-            self._record_bulk_operation(
-                'csv_import',
-                f"导入 {import_results['success_count']} 个证书",
-                user_id
-            )
+            # 整个导入在一个工作单元事务中只提交一次，每行使用保存点，单行失败只回滚该行
+            with self.db.transaction() as unit:
+                for index, row in df.iterrows():
+                    try:
+                        # 检查重复(同一文件中先导入的行也可见)
+                        existing_cert = self._find_existing_certificate(row['domain'])
+                        if existing_cert:
+                            import_results['duplicate_count'] += 1
+                            import_results['errors'].append(f"行 {index + 1}: 域名 {row['domain']} 已存在")
+                            continue
+
+                        # 创建证书记录
+                        cert_data = self._prepare_certificate_data(row, user_id)
+                        with unit.savepoint():
+                            certificate = Certificate.create(**cert_data)
+
+                        import_results['success_count'] += 1
+                        import_results['imported_certificates'].append({
+                            'id': certificate.id,
+                            'domain': certificate.domain
+                        })
+
+                    except Exception as e:
+                        import_results['failed_count'] += 1
+                        import_results['errors'].append(f"行 {index + 1}: {str(e)}")
+
+                # 记录导入操作
+                self._record_bulk_operation(
+                    'csv_import',
+                    f"导入 {import_results['success_count']} 个证书",
+                    user_id
+                )
             
             return {
                 'success': True,
@@ -294,79 +315,103 @@ class CertificateOperationsService:
             logger.error(f"CSV导入失败: {str(e)}")
             return {'success': False, 'error': f'导入失败: {str(e)}'}
     
-    def export_certificates_to_csv(self, filters: Dict[str, Any] = None) -> Dict[str, Any]:
+    def _export_conditions(self, filters: Dict[str, Any] = None) -> Tuple[str, List[Any]]:
+        """构建导出查询条件"""
+        where_conditions = ['1=1']
+        params = []
+        
+        if filters:
+            if filters.get('status'):
+                where_conditions.append('status = ?')
+                params.append(filters['status'])
+            
+            if filters.get('expires_before'):
+                where_conditions.append('expires_at <= ?')
+                params.append(filters['expires_before'])
+            
+            if filters.get('domain_pattern'):
+                condition, pattern_params = domain_search_condition(filters['domain_pattern'])
+                where_conditions.append(condition)
+                params.extend(pattern_params)
+
+            # 标签/负责人/业务单元筛选走标签表和索引
+            ownership, ownership_params = ownership_conditions(
+                filters.get('tags'), filters.get('owner'), filters.get('business_unit')
+            )
+            where_conditions.extend(ownership)
+            params.extend(ownership_params)
+        
+        return ' AND '.join(where_conditions), params
+    
+    def iter_export_rows(self, filters: Dict[str, Any] = None) -> Iterator[Dict[str, Any]]:
+        """流式读取导出的证书行(服务端游标，按域名排序)"""
+        where_clause, params = self._export_conditions(filters)
+        return self.db.stream(
+            f"SELECT {', '.join(self.EXPORT_COLUMNS)} FROM certificates WHERE {where_clause} ORDER BY domain",
+            tuple(params)
+        )
+    
+    def export_certificates_to_csv(self, filters: Dict[str, Any] = None, compress: bool = False,
+                                   chunk_bytes: int = 64 * 1024) -> Iterator[bytes]:
         """
-        导出证书数据为CSV格式
+        流式导出证书数据为CSV格式
+        
+        服务端游标逐行读取，csv.writer写入小缓冲区，缓冲达到chunk_bytes时输出一块，
+        内存占用与导出行数无关。查询条件在调用时构建，出错时在发送响应前抛出。
         
         Args:
             filters: 过滤条件
+            compress: 是否输出gzip压缩的CSV
+            chunk_bytes: 每块的大小(压缩前)
         
         Returns:
-            导出结果
+            CSV(或gzip)数据块的迭代器，以UTF-8 BOM开头便于Excel识别编码
         """
-        try:
-            # 构建查询条件
-            where_conditions = ['1=1']
-            params = []
-            
-            if filters:
-                if filters.get('status'):
-                    where_conditions.append('status = ?')
-                    params.append(filters['status'])
-                
-                if filters.get('expires_before'):
-                    where_conditions.append('expires_at <= ?')
-                    params.append(filters['expires_before'])
-                
-                if filters.get('domain_pattern'):
-                    where_conditions.append('domain LIKE ?')
-                    params.append(f"%{filters['domain_pattern']}%")
-            
-            where_clause = ' AND '.join(where_conditions)
-            
-            # 查询证书数据
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute(f"""
-                SELECT 
-                    id, domain, type, status, created_at, expires_at,
-                    ca_type, monitoring_enabled, dns_status, domain_reachable,
-                    tls_version, certificate_chain_valid, http_redirect_status,
-                    notes, owner, business_unit
-                FROM certificates
-                WHERE {where_clause}
-                ORDER BY domain
-            """, params)
-            
-            certificates = cursor.fetchall()
-            conn.close()
-            
-            # 转换为DataFrame
-            columns = [
-                'ID', '域名', '类型', '状态', '创建时间', '到期时间',
-                'CA类型', '监控启用', 'DNS状态', '域名可达',
-                'TLS版本', '证书链完整', 'HTTP重定向',
-                '备注', '负责人', '业务单元'
-            ]
-            
-            df = pd.DataFrame(certificates, columns=columns)
+        rows = self.iter_export_rows(filters)
+        
+        def generate() -> Iterator[bytes]:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            # wbits=31: gzip格式(带文件头和校验)
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
             
-            # 转换为CSV
-            csv_buffer = io.StringIO()
-            df.to_csv(csv_buffer, index=False, encoding='utf-8-sig')
-            csv_content = csv_buffer.getvalue()
+            def drain() -> bytes:
+                data = buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+                return compressor.compress(data) if compressor else data
             
-            return {
-                'success': True,
-                'csv_content': csv_content,
-                'total_records': len(certificates),
-                'filename': f'certificates_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-            }
+            buffer.write('\ufeff')
+            writer.writerow(self.EXPORT_HEADERS)
+            total = 0
+            try:
+                for row in rows:
+                    writer.writerow([row[column] for column in self.EXPORT_COLUMNS])
+                    total += 1
+                    if buffer.tell() >= chunk_bytes:
+                        chunk = drain()
+                        if chunk:
+                            yield chunk
+            except Exception as e:
+                # 响应头已发送，中断传输让客户端得到不完整下载的错误
+                logger.error(f"CSV导出失败(已导出 {total} 行): {str(e)}")
+                raise
+            finally:
+                rows.close()
             
-        except Exception as e:
-            logger.error(f"CSV导出失败: {str(e)}")
-            return {'success': False, 'error': f'导出失败: {str(e)}'}
+            chunk = drain()
+            if compressor:
+                chunk += compressor.flush()
+            yield chunk
+            logger.info(f"CSV导出完成: {total} 行")
+        
+        return generate()
+    
+    @staticmethod
+    def export_filename(compress: bool = False) -> str:
+        """导出文件名"""
+        filename = f'certificates_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+        return f'{filename}.gz' if compress else filename
     
     def import_from_discovery(self, ip_ranges: List[str], ports: List[int] = None) -> Dict[str, Any]:
         """
@@ -408,8 +453,8 @@ class CertificateOperationsService:
             
             # 在后台线程中执行发现
             thread = threading.Thread(
-                target=self._execute_discovery_scan,
-                args=(task_id, target_ips, ports)
+                target=db.run_scoped,
+                args=(self._execute_discovery_scan, task_id, target_ips, ports)
             )
             thread.daemon = True
             thread.start()
@@ -618,8 +663,8 @@ class CertificateOperationsService:
 
             # 在后台线程中执行批量操作
             thread = threading.Thread(
-                target=self._execute_batch_operations,
-                args=(task_id, operation_type, certificate_ids, options)
+                target=db.run_scoped,
+                args=(self._execute_batch_operations, task_id, operation_type, certificate_ids, options)
             )
             thread.daemon = True
             thread.start()
@@ -862,41 +907,31 @@ class CertificateOperationsService:
 
     def _record_operation_history(self, certificate_id: int, operation_type: str,
                                  status: str, details: str, user_id: int = None) -> None:
-        """记录操作历史"""
+        """记录操作历史(在工作单元内时缓冲到提交前批量写入)"""
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                INSERT INTO certificate_operations
-                (certificate_id, operation_type, status, details, user_id, created_at)
-                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            """, (certificate_id, operation_type, status, details, user_id))
-
-            conn.commit()
-            conn.close()
-
+            self._record_operation(certificate_id, operation_type, status, details, user_id)
         except Exception as e:
             logger.error(f"记录操作历史失败: {str(e)}")
 
     def _record_bulk_operation(self, operation_type: str, details: str, user_id: int) -> None:
         """记录批量操作"""
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                INSERT INTO certificate_operations
-                (certificate_id, operation_type, status, details, user_id, created_at)
-                VALUES (NULL, ?, 'completed', ?, ?, CURRENT_TIMESTAMP)
-            """, (operation_type, details, user_id))
-
-            conn.commit()
-            conn.close()
-
+            self._record_operation(None, operation_type, 'completed', details, user_id)
         except Exception as e:
             logger.error(f"记录批量操作失败: {str(e)}")
 
+    def _record_operation(self, certificate_id: Optional[int], operation_type: str,
+                          status: str, details: str, user_id: Optional[int]) -> None:
+        """写入一条操作记录，所有操作记录使用相同的列以便合并为多行INSERT"""
+        self.db.insert_deferred('certificate_operations', {
+            'certificate_id': certificate_id,
+            'operation_type': operation_type,
+            'status': status,
+            'details': details,
+            'user_id': user_id,
+            'created_at': datetime.now()
+        })
+
     def _validate_import_data(self, df: pd.DataFrame) -> Dict[str, Any]:
         """验证导入数据"""
         invalid_rows = []
@@ -943,16 +978,7 @@ class CertificateOperationsService:
     def _find_existing_certificate(self, domain: str) -> Optional[Dict[str, Any]]:
         """查找已存在的证书"""
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-
-            cursor.execute("SELECT id, domain FROM certificates WHERE domain = ?", (domain,))
-            result = cursor.fetchone()
-            conn.close()
-
-            if result:
-                return {'id': result[0], 'domain': result[1]}
-            return None
+            return self.db.fetchone("SELECT id, domain FROM certificates WHERE domain = ?", (domain,))
 
         except Exception as e:
             logger.error(f"查找证书失败: {str(e)}")
@@ -971,6 +997,7 @@ class CertificateOperationsService:
             'notes': str(row.get('notes', '')).strip(),
             'owner': str(row.get('owner', '')).strip(),
             'business_unit': str(row.get('business_unit', '')).strip(),
+            'tags': json.dumps(normalize_tags(row.get('tags')) if pd.notna(row.get('tags')) else []),
             'monitoring_enabled': bool(row.get('monitoring_enabled', True))
         }
 
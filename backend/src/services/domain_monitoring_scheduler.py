@@ -13,6 +13,7 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from .domain_monitoring_service import DomainMonitoringService
 from models.certificate import Certificate
 from models.database import db
+from models.monitoring_history import MonitoringHistory
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +26,10 @@ class DomainMonitoringScheduler:
         self.scheduler_thread = None
         self.max_concurrent_checks = 5
         self.check_interval = 60  # 检查间隔(秒)
+        self.batch_size = 50  # 每个周期最多领取的证书数
+        self.history = MonitoringHistory(db)
+        self.maintenance_interval = 3600  # 监控历史分区/汇总/保留维护间隔(秒)
+        self._last_maintenance = 0.0
         
     def start(self) -> None:
         """启动调度器"""
@@ -61,6 +66,8 @@ class DomainMonitoringScheduler:
                     
                     # 执行批量检查
                     self._execute_batch_checks(certificates_to_check)
+
+                self._run_history_maintenance()
                 
                 # 等待下一次检查
                 time.sleep(self.check_interval)
@@ -69,34 +76,24 @@ class DomainMonitoringScheduler:
                 logger.error(f"域名监控调度器执行失败: {str(e)}")
                 time.sleep(self.check_interval)
     
-    def _get_certificates_to_check(self) -> List[Dict[str, Any]]:
-        """获取需要检查的证书列表"""
+    def _run_history_maintenance(self) -> None:
+        """按维护间隔执行监控历史的分区维护、汇总和过期分区删除"""
+        if time.time() - self._last_maintenance < self.maintenance_interval:
+            return
+        self._last_maintenance = time.time()
         try:
-            db.connect()
-
-            # 查询启用监控且需要检查的证书
-            certificates = db.fetchall("""
-                SELECT
-                    id, domain, monitoring_frequency, last_dns_check, last_reachability_check
-                FROM certificates
-                WHERE monitoring_enabled = 1
-                AND (
-                    last_dns_check IS NULL
-                    OR datetime(last_dns_check, '+' || monitoring_frequency || ' seconds') <= datetime('now')
-                )
-                ORDER BY
-                    CASE WHEN last_dns_check IS NULL THEN 0 ELSE 1 END,
-                    last_dns_check ASC
-                LIMIT 50
-            """)
+            self.history.run_maintenance()
+        except Exception as e:
+            logger.error(f"监控历史维护失败: {str(e)}")
 
-            return certificates or []
+    def _get_certificates_to_check(self) -> List[Dict[str, Any]]:
+        """领取需要检查的证书列表(按next_check_at索引取到期证书)"""
+        try:
+            return Certificate.claim_due_for_check(self.batch_size)
 
         except Exception as e:
             logger.error(f"获取待检查证书列表失败: {str(e)}")
             return []
-        finally:
-            db.close()
     
     def _execute_batch_checks(self, certificates: List[Dict[str, Any]]) -> None:
         """执行批量域名检查"""
@@ -133,7 +130,7 @@ class DomainMonitoringScheduler:
             with ThreadPoolExecutor(max_workers=self.max_concurrent_checks) as executor:
                 # 提交检查任务
                 future_to_cert = {
-                    executor.submit(self._check_single_certificate, cert['id']): cert
+                    executor.submit(db.run_scoped, self._check_single_certificate, cert['id']): cert
                     for cert in certificates
                 }
                 
@@ -161,90 +158,67 @@ class DomainMonitoringScheduler:
     
     def _check_single_certificate(self, certificate_id: int) -> Dict[str, Any]:
         """检查单个证书"""
-        try:
-            # 记录检查历史
-            self._record_check_start(certificate_id)
-            
-            # 执行域名检查
-            result = self.domain_service.perform_comprehensive_domain_check(certificate_id)
-            
-            # 记录检查结果
-            self._record_check_result(certificate_id, result)
-            
-            return result
-            
-        except Exception as e:
-            logger.error(f"检查证书 {certificate_id} 失败: {str(e)}")
-            self._record_check_error(certificate_id, str(e))
-            return {'success': False, 'error': str(e)}
-    
-    def _record_check_start(self, certificate_id: int) -> None:
-        """记录检查开始"""
-        try:
-            db.connect()
+        # DNS/TLS/HTTP检查在事务外执行，网络等待期间不占用事务和行锁
+        probe = self.domain_service.probe_domain(certificate_id)
 
-            db.execute("""
-                INSERT INTO domain_monitoring_history
-                (certificate_id, check_type, status, created_at)
-                VALUES (?, 'comprehensive', 'started', CURRENT_TIMESTAMP)
-            """, (certificate_id,))
+        # 每个工作线程使用独立的工作单元事务：状态更新、告警和检查历史一次提交
+        with db.transaction():
+            try:
+                # 写入检查结果
+                result = self.domain_service.apply_domain_check(probe)
 
-            db.commit()
+                # 记录检查结果
+                self._record_check_result(certificate_id, result)
 
-        except Exception as e:
-            logger.error(f"记录检查开始失败 {certificate_id}: {str(e)}")
-        finally:
-            db.close()
+                return result
+
+            except Exception as e:
+                logger.error(f"检查证书 {certificate_id} 失败: {str(e)}")
+                self._record_check_error(certificate_id, str(e))
+                return {'success': False, 'error': str(e)}
     
+    def _record_history(self, certificate_id: int, status: str, details: Dict[str, Any] = None,
+                        error_message: str = None, response_time: int = None) -> None:
+        """记录一条检查历史
+
+        在检查的工作单元内缓冲，与同一事务的其他历史记录合并为一条多行INSERT随事务提交。
+        所有历史记录使用相同的列，保证可以合并。
+        """
+        db.insert_deferred('domain_monitoring_history', {
+            'certificate_id': certificate_id,
+            'check_type': 'comprehensive',
+            'status': status,
+            'details': json.dumps(details) if details is not None else None,
+            'error_message': error_message,
+            'response_time': response_time,
+            'created_at': datetime.now()
+        })
+
     def _record_check_result(self, certificate_id: int, result: Dict[str, Any]) -> None:
-        """记录检查结果"""
-        try:
-            db.connect()
+        """记录检查结果
 
+        成功的检查只在状态变化或到达采样间隔时记录(由域名监控服务判断)，失败总是记录。
+        """
+        try:
             if result.get('success'):
-                status = result.get('overall_status', 'unknown')
-                details = {
+                if not result.get('record_history', True):
+                    return
+                self._record_history(certificate_id, result.get('overall_status', 'unknown'), details={
                     'dns_check': result.get('dns_check', {}),
                     'reachability_check': result.get('reachability_check', {}),
                     'dns_validation': result.get('dns_validation', {})
-                }
-
-                db.execute("""
-                    INSERT INTO domain_monitoring_history
-                    (certificate_id, check_type, status, details, created_at)
-                    VALUES (?, 'comprehensive', ?, ?, CURRENT_TIMESTAMP)
-                """, (certificate_id, status, json.dumps(details)))
+                }, response_time=result.get('reachability_check', {}).get('response_time'))
             else:
-                db.execute("""
-                    INSERT INTO domain_monitoring_history
-                    (certificate_id, check_type, status, error_message, created_at)
-                    VALUES (?, 'comprehensive', 'failed', ?, CURRENT_TIMESTAMP)
-                """, (certificate_id, result.get('error', '未知错误')))
-
-            db.commit()
-
+                self._record_history(certificate_id, 'failed', error_message=result.get('error', '未知错误'))
         except Exception as e:
             logger.error(f"记录检查结果失败 {certificate_id}: {str(e)}")
-        finally:
-            db.close()
     
     def _record_check_error(self, certificate_id: int, error_message: str) -> None:
         """记录检查错误"""
         try:
-            db.connect()
-
-            db.execute("""
-                INSERT INTO domain_monitoring_history
-                (certificate_id, check_type, status, error_message, created_at)
-                VALUES (?, 'comprehensive', 'error', ?, CURRENT_TIMESTAMP)
-            """, (certificate_id, error_message))
-
-            db.commit()
-
+            self._record_history(certificate_id, 'error', error_message=error_message)
         except Exception as e:
             logger.error(f"记录检查错误失败 {certificate_id}: {str(e)}")
-        finally:
-            db.close()
     
     def get_scheduler_status(self) -> Dict[str, Any]:
         """获取调度器状态"""
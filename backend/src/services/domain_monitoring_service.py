@@ -10,13 +10,15 @@ import time
 import logging
 import asyncio
 import aiohttp
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from models.certificate import Certificate
-from models.database import Database
+from models.certificate import Certificate, certificate_statistics
+from models.database import db
 from models.alert import Alert
+from models.domain_search import domain_matches
+from .result_coalescing import state_digest, changed_columns, HistorySampler
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +26,10 @@ class DomainMonitoringService:
     """域名监控服务"""
     
     def __init__(self):
-        self.db = Database()
+        # 与模型共用全局数据库实例，服务内的写入可以加入调用方的工作单元事务
+        self.db = db
+        # 检查历史采样：状态不变时按采样间隔记录
+        self.history_sampler = HistorySampler()
         # DNS服务器列表
         self.dns_servers = [
             '8.8.8.8',      # Google DNS
@@ -288,6 +293,18 @@ class DomainMonitoringService:
         Returns:
             综合检查结果
         """
+        return self.apply_domain_check(self.probe_domain(certificate_id))
+
+    def probe_domain(self, certificate_id: int) -> Dict[str, Any]:
+        """
+        执行域名的DNS解析、DNS配置验证和可达性检查(只有网络请求，不写数据库)
+
+        Args:
+            certificate_id: 证书ID
+
+        Returns:
+            检查数据，交给 apply_domain_check 写入
+        """
         try:
             # 获取证书信息
             certificate = Certificate.get_by_id(certificate_id)
@@ -295,39 +312,63 @@ class DomainMonitoringService:
                 return {'success': False, 'error': '证书不存在'}
 
             domain = certificate.domain
+            return {
+                'success': True,
+                'certificate': certificate,
+                # 执行DNS解析检查
+                'dns_check': self.check_domain_resolution(domain),
+                # 执行DNS配置验证
+                'dns_validation': self.validate_dns_configuration(domain),
+                # 执行可达性检查
+                'reachability_check': self.check_domain_reachability(domain)
+            }
 
-            # 执行DNS解析检查
-            dns_result = self.check_domain_resolution(domain)
+        except Exception as e:
+            logger.error(f"域名综合检查失败 {certificate_id}: {str(e)}")
+            return {'success': False, 'error': f'检查失败: {str(e)}'}
 
-            # 执行DNS配置验证
-            dns_validation = self.validate_dns_configuration(domain)
+    def apply_domain_check(self, probe: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        写入域名检查结果：更新证书状态并创建告警
 
-            # 执行可达性检查
-            reachability_result = self.check_domain_reachability(domain)
+        Args:
+            probe: probe_domain 返回的检查数据
 
-            # 更新数据库
-            self._update_certificate_domain_status(certificate_id, dns_result, reachability_result)
+        Returns:
+            综合检查结果
+        """
+        if not probe.get('success'):
+            return probe
+
+        certificate = probe['certificate']
+        dns_result = probe['dns_check']
+        reachability_result = probe['reachability_check']
+        try:
+            # 更新数据库(结果不变时只更新检查时间)
+            coalescing = self._update_certificate_domain_status(certificate, dns_result, reachability_result)
 
             # 检查并创建告警
-            self._check_and_create_alerts(certificate_id, dns_result, reachability_result)
+            self._check_and_create_alerts(certificate.id, dns_result, reachability_result)
 
             # 综合结果
             result = {
                 'success': True,
-                'certificate_id': certificate_id,
-                'domain': domain,
+                'certificate_id': certificate.id,
+                'domain': certificate.domain,
                 'dns_check': dns_result,
-                'dns_validation': dns_validation,
+                'dns_validation': probe['dns_validation'],
                 'reachability_check': reachability_result,
                 'overall_status': self._determine_overall_status(dns_result, reachability_result),
+                'state_changed': coalescing['state_changed'],
+                'record_history': coalescing['record_history'],
                 'timestamp': datetime.now().isoformat()
             }
 
-            logger.info(f"域名综合检查完成: {domain} - {result['overall_status']}")
+            logger.info(f"域名综合检查完成: {certificate.domain} - {result['overall_status']}")
             return result
 
         except Exception as e:
-            logger.error(f"域名综合检查失败 {certificate_id}: {str(e)}")
+            logger.error(f"域名综合检查失败 {certificate.id}: {str(e)}")
             return {'success': False, 'error': f'检查失败: {str(e)}'}
 
     def batch_check_domains(self, certificate_ids: List[int], max_concurrent: int = 5) -> Dict[str, Any]:
@@ -355,7 +396,7 @@ class DomainMonitoringService:
             with ThreadPoolExecutor(max_workers=min(max_concurrent, self.max_workers)) as executor:
                 # 提交所有任务
                 future_to_cert_id = {
-                    executor.submit(self.perform_comprehensive_domain_check, cert_id): cert_id
+                    executor.submit(db.run_scoped, self.perform_comprehensive_domain_check, cert_id): cert_id
                     for cert_id in certificate_ids
                 }
 
@@ -390,115 +431,70 @@ class DomainMonitoringService:
     def get_domain_monitoring_statistics(self) -> Dict[str, Any]:
         """获取域名监控统计信息"""
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-
-            # 统计DNS状态
-            cursor.execute("""
-                SELECT
-                    dns_status,
-                    COUNT(*) as count
-                FROM certificates
-                WHERE dns_status IS NOT NULL
-                GROUP BY dns_status
-            """)
-            dns_stats = {row[0]: row[1] for row in cursor.fetchall()}
-
-            # 统计可达性状态
-            cursor.execute("""
-                SELECT
-                    domain_reachable,
-                    COUNT(*) as count
-                FROM certificates
-                WHERE domain_reachable IS NOT NULL
-                GROUP BY domain_reachable
-            """)
-            reachability_stats = cursor.fetchall()
-
-            # 统计平均响应时间
-            cursor.execute("""
-                SELECT
-                    AVG(dns_response_time) as avg_dns_time,
-                    AVG(CASE WHEN http_status_code BETWEEN 200 AND 299 THEN dns_response_time END) as avg_success_time
-                FROM certificates
-                WHERE dns_response_time IS NOT NULL
-            """)
-            timing_stats = cursor.fetchone()
-
-            # 统计最近检查时间
-            cursor.execute("""
-                SELECT
-                    COUNT(CASE WHEN last_dns_check > datetime('now', '-1 hour') THEN 1 END) as recent_dns_checks,
-                    COUNT(CASE WHEN last_reachability_check > datetime('now', '-1 hour') THEN 1 END) as recent_reachability_checks
-                FROM certificates
-            """)
-            recent_stats = cursor.fetchone()
-
             return {
                 'success': True,
-                'statistics': {
-                    'dns_status_distribution': dns_stats,
-                    'reachability_distribution': {
-                        'reachable': sum(1 for row in reachability_stats if row[0] == 1),
-                        'unreachable': sum(1 for row in reachability_stats if row[0] == 0)
-                    },
-                    'average_dns_response_time': round(timing_stats[0] or 0, 2),
-                    'average_success_response_time': round(timing_stats[1] or 0, 2),
-                    'recent_checks': {
-                        'dns_checks_last_hour': recent_stats[0],
-                        'reachability_checks_last_hour': recent_stats[1]
-                    }
-                }
+                'statistics': certificate_statistics.domain_monitoring_statistics()
             }
 
         except Exception as e:
             logger.error(f"获取域名监控统计失败: {str(e)}")
             return {'success': False, 'error': f'获取统计失败: {str(e)}'}
-        finally:
-            if 'conn' in locals():
-                conn.close()
 
-    def _update_certificate_domain_status(self, certificate_id: int, dns_result: Dict[str, Any],
-                                         reachability_result: Dict[str, Any]) -> None:
-        """更新证书的域名状态信息"""
-        try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
+    def _update_certificate_domain_status(self, certificate: Certificate, dns_result: Dict[str, Any],
+                                         reachability_result: Dict[str, Any]) -> Dict[str, bool]:
+        """更新证书的域名状态信息(在调用方的工作单元内时作为保存点，随调用方一起提交)
 
-            # 确定HTTP状态码
-            http_status_code = None
-            if 'http_checks' in reachability_result:
-                for protocol, check in reachability_result['http_checks'].items():
-                    if 'status_code' in check:
-                        http_status_code = check['status_code']
-                        break
+        检查状态(解析状态、解析记录、可达性、HTTP状态码)的摘要与上次相同时只更新检查时间和
+        next_check_at；状态变化时只写变化的列。DNS响应时间每次都不同，只在状态变化或
+        历史采样时写入。
 
-            cursor.execute("""
-                UPDATE certificates SET
-                    dns_status = ?,
-                    dns_response_time = ?,
-                    domain_reachable = ?,
-                    http_status_code = ?,
-                    last_dns_check = CURRENT_TIMESTAMP,
-                    last_reachability_check = CURRENT_TIMESTAMP
-                WHERE id = ?
-            """, (
-                dns_result['status'],
-                dns_result['response_time'],
-                reachability_result['reachable'],
-                http_status_code,
-                certificate_id
-            ))
+        Returns:
+            {'state_changed': 状态是否变化, 'record_history': 是否需要记录检查历史}
+        """
+        # 确定HTTP状态码
+        http_status_code = None
+        if 'http_checks' in reachability_result:
+            for protocol, check in reachability_result['http_checks'].items():
+                if 'status_code' in check:
+                    http_status_code = check['status_code']
+                    break
+
+        status = {
+            'dns_status': dns_result['status'],
+            'domain_reachable': reachability_result['reachable'],
+            'http_status_code': http_status_code
+        }
+        # 解析记录的顺序随DNS轮询变化，排序后计算摘要
+        records = {record_type: sorted(values) for record_type, values in dns_result.get('records', {}).items()}
+        digest = state_digest(dict(status, records=records))
+        state_changed = digest != certificate.domain_state_digest
+        record_history = self.history_sampler.should_record(certificate.id, state_changed)
+
+        values = changed_columns(certificate, status)
+        if state_changed:
+            values['domain_state_digest'] = digest
+        if record_history:
+            values['dns_response_time'] = dns_result['response_time']
+        set_clause = ''.join(f"{column} = ?, " for column in values)
 
-            conn.commit()
+        try:
+            with self.db.transaction():
+                # 检查完成后按监控频率排定下次检查时间
+                self.db.execute(f"""
+                    UPDATE certificates SET
+                        {set_clause}last_dns_check = CURRENT_TIMESTAMP,
+                        last_reachability_check = CURRENT_TIMESTAMP,
+                        next_check_at = CURRENT_TIMESTAMP + INTERVAL COALESCE(monitoring_frequency, 3600) SECOND
+                    WHERE id = ?
+                """, tuple(values.values()) + (certificate.id,)).close()
+
+            for column, value in values.items():
+                setattr(certificate, column, value)
 
         except Exception as e:
-            logger.error(f"更新证书域名状态失败 {certificate_id}: {str(e)}")
-            if 'conn' in locals():
-                conn.rollback()
-        finally:
-            if 'conn' in locals():
-                conn.close()
+            logger.error(f"更新证书域名状态失败 {certificate.id}: {str(e)}")
+
+        return {'state_changed': state_changed, 'record_history': record_history}
 
     def _determine_overall_status(self, dns_result: Dict[str, Any],
                                  reachability_result: Dict[str, Any]) -> str:
@@ -712,7 +708,7 @@ class DomainMonitoringService:
             filtered_data = mock_data
             if keyword:
                 filtered_data = [item for item in filtered_data
-                               if keyword.lower() in item['domain'].lower()]
+                               if domain_matches(item['domain'], keyword)]
             if status:
                 filtered_data = [item for item in filtered_data
                                if item['status'] == status]
@@ -950,6 +946,14 @@ class DomainMonitoringService:
                 'error': f'获取监控历史失败: {str(e)}'
             }
 
+    def iter_monitoring_history(self, monitoring_id: int) -> Iterator[Dict[str, Any]]:
+        """流式读取监控配置的全部检查历史(服务端游标，按检查时间倒序)"""
+        return self.db.stream(
+            "SELECT id, check_time, status, days_left, response_time, ssl_version, message "
+            "FROM monitoring_history WHERE monitoring_id = ? ORDER BY check_time DESC, id DESC",
+            (monitoring_id,)
+        )
+
     def _validate_domain_format(self, domain: str) -> bool:
         """验证域名格式"""
         import re
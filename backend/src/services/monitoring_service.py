@@ -8,7 +8,7 @@ import logging
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
-from models.certificate import Certificate
+from models.certificate import Certificate, certificate_statistics
 from models.database import Database
 
 logger = logging.getLogger(__name__)
@@ -111,52 +111,14 @@ class MonitoringService:
     def get_monitoring_statistics(self) -> Dict[str, Any]:
         """获取监控统计信息"""
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            
-            # 统计监控状态
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) as total_certificates,
-                    SUM(CASE WHEN monitoring_enabled = 1 THEN 1 ELSE 0 END) as monitoring_enabled_count,
-                    SUM(CASE WHEN alert_enabled = 1 THEN 1 ELSE 0 END) as alert_enabled_count,
-                    AVG(monitoring_frequency) as avg_frequency
-                FROM certificates
-            """)
-            
-            stats = cursor.fetchone()
-            
-            # 统计不同频率的分布
-            cursor.execute("""
-                SELECT monitoring_frequency, COUNT(*) as count
-                FROM certificates
-                WHERE monitoring_enabled = 1
-                GROUP BY monitoring_frequency
-                ORDER BY monitoring_frequency
-            """)
-            
-            frequency_distribution = cursor.fetchall()
-            
             return {
                 'success': True,
-                'statistics': {
-                    'total_certificates': stats[0] or 0,
-                    'monitoring_enabled_count': stats[1] or 0,
-                    'alert_enabled_count': stats[2] or 0,
-                    'average_frequency': round(stats[3] or 3600, 2),
-                    'frequency_distribution': [
-                        {'frequency': row[0], 'count': row[1]} 
-                        for row in frequency_distribution
-                    ]
-                }
+                'statistics': certificate_statistics.monitoring_statistics()
             }
             
         except Exception as e:
             logger.error(f"获取监控统计失败: {str(e)}")
             return {'success': False, 'error': f'获取统计失败: {str(e)}'}
-        finally:
-            if 'conn' in locals():
-                conn.close()
     
     def get_certificates_by_monitoring_status(self, enabled: bool = True) -> Dict[str, Any]:
         """根据监控状态获取证书列表"""
@@ -824,6 +824,7 @@ class NotificationManager:
             'failed': []
         }
 
+        sends = []
         for provider_name in providers:
             provider = self.providers.get(provider_name)
             if not provider:
@@ -833,24 +834,20 @@ class NotificationManager:
                     'error': '提供商不可用'
                 })
                 continue
+            sends.append(self._send_with_provider(provider_name, provider, template_name, context))
 
-            try:
-                # 渲染模板
-                message = NotificationTemplate.render(template_name, provider_name, context)
-
-                # 发送通知
-                result = await provider.send(message)
-                results['results'].append(result)
-
-                if not result['success']:
-                    results['failed'].append(result)
-
-            except Exception as e:
-                logger.error(f"发送通知失败 {provider_name}: {e}")
+        # 各提供商并发发送，总耗时取决于最慢的提供商而不是所有提供商之和
+        for provider_name, result, error in await asyncio.gather(*sends):
+            if error is not None:
                 results['failed'].append({
                     'provider': provider_name,
-                    'error': str(e)
+                    'error': error
                 })
+                continue
+
+            results['results'].append(result)
+            if not result['success']:
+                results['failed'].append(result)
 
         # 如果所有提供商都失败，则整体失败
         if len(results['failed']) == len(providers):
@@ -858,6 +855,20 @@ class NotificationManager:
 
         return results
 
+    async def _send_with_provider(self, provider_name: str, provider: NotificationProvider,
+                                  template_name: str, context: Dict[str, Any]) -> tuple:
+        """渲染模板并通过单个提供商发送，返回 (提供商名称, 发送结果, 错误信息)"""
+        try:
+            # 渲染模板
+            message = NotificationTemplate.render(template_name, provider_name, context)
+
+            # 发送通知
+            return provider_name, await provider.send(message), None
+
+        except Exception as e:
+            logger.error(f"发送通知失败 {provider_name}: {e}")
+            return provider_name, None, str(e)
+
     def get_available_providers(self) -> List[str]:
         """获取可用的通知提供商列表"""
         return list(self.providers.keys())
@@ -17,9 +17,10 @@ from cryptography.hazmat.backends import default_backend
 from cryptography.x509.oid import NameOID
 import requests
 
-from models.certificate import Certificate
-from models.database import Database
+from models.certificate import Certificate, certificate_statistics
+from models.database import db
 from models.alert import Alert
+from .result_coalescing import state_digest, changed_columns, HistorySampler
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +28,10 @@ class PortMonitoringService:
     """端口监控服务"""
     
     def __init__(self):
-        self.db = Database()
+        # 与模型共用全局数据库实例，服务内的写入可以加入调用方的工作单元事务
+        self.db = db
+        # 检查历史采样：状态不变时按采样间隔记录
+        self.history_sampler = HistorySampler()
         # 默认监控端口
         self.default_ports = [80, 443]
         # SSL/TLS配置
@@ -433,8 +437,8 @@ class PortMonitoringService:
             # 检查HTTP重定向
             http_redirect_result = self.check_http_redirect(domain, 80)
 
-            # 更新数据库
-            self._update_certificate_port_status(certificate_id, ssl_results, http_redirect_result)
+            # 更新数据库(结果不变时只更新检查时间)
+            coalescing = self._update_certificate_port_status(certificate, ssl_results, http_redirect_result)
 
             # 检查并创建告警
             self._check_and_create_port_alerts(certificate_id, ssl_results, http_redirect_result)
@@ -448,6 +452,8 @@ class PortMonitoringService:
                 'http_redirect_check': http_redirect_result,
                 'monitored_ports': monitored_ports,
                 'overall_security_grade': self._calculate_overall_security_grade(ssl_results),
+                'state_changed': coalescing['state_changed'],
+                'record_history': coalescing['record_history'],
                 'timestamp': datetime.now().isoformat()
             }
 
@@ -558,7 +564,7 @@ class PortMonitoringService:
             with ThreadPoolExecutor(max_workers=min(max_concurrent, self.max_workers)) as executor:
                 # 提交所有任务
                 future_to_cert_id = {
-                    executor.submit(self.perform_comprehensive_port_check, cert_id): cert_id
+                    executor.submit(db.run_scoped, self.perform_comprehensive_port_check, cert_id): cert_id
                     for cert_id in certificate_ids
                 }
 
@@ -608,43 +614,56 @@ class PortMonitoringService:
                 return grade
         return 'F'
 
-    def _update_certificate_port_status(self, certificate_id: int, ssl_results: Dict[int, Dict[str, Any]],
-                                       http_redirect_result: Dict[str, Any]) -> None:
-        """更新证书的端口状态信息"""
-        try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
+    def _update_certificate_port_status(self, certificate: Certificate, ssl_results: Dict[int, Dict[str, Any]],
+                                       http_redirect_result: Dict[str, Any]) -> Dict[str, bool]:
+        """更新证书的端口状态信息(在调用方的工作单元内时作为保存点，随调用方一起提交)
 
-            # 提取主要SSL端口(443)的信息
-            main_ssl_result = ssl_results.get(443, {})
+        所有端口的TLS版本、加密套件、证书链和安全等级以及HTTP重定向状态的摘要与上次相同时
+        只更新检查时间；状态变化时只写变化的列。握手时间只在状态变化或历史采样时写入。
 
-            cursor.execute("""
-                UPDATE certificates SET
-                    ssl_handshake_time = ?,
-                    tls_version = ?,
-                    cipher_suite = ?,
-                    certificate_chain_valid = ?,
-                    http_redirect_status = ?,
-                    last_port_check = CURRENT_TIMESTAMP
-                WHERE id = ?
-            """, (
-                main_ssl_result.get('handshake_time'),
-                main_ssl_result.get('tls_version'),
-                main_ssl_result.get('cipher_suite'),
-                main_ssl_result.get('certificate_chain_valid'),
-                'enabled' if http_redirect_result.get('redirect_enabled') else 'disabled',
-                certificate_id
-            ))
+        Returns:
+            {'state_changed': 状态是否变化, 'record_history': 是否需要记录检查历史}
+        """
+        # 提取主要SSL端口(443)的信息
+        main_ssl_result = ssl_results.get(443, {})
+
+        status = {
+            'tls_version': main_ssl_result.get('tls_version'),
+            'cipher_suite': main_ssl_result.get('cipher_suite'),
+            'certificate_chain_valid': main_ssl_result.get('certificate_chain_valid'),
+            'http_redirect_status': 'enabled' if http_redirect_result.get('redirect_enabled') else 'disabled'
+        }
+        ports = {
+            str(port): [result.get('ssl_enabled'), result.get('tls_version'), result.get('cipher_suite'),
+                        result.get('certificate_chain_valid'), result.get('security_grade')]
+            for port, result in ssl_results.items()
+        }
+        digest = state_digest(dict(status, ports=ports))
+        state_changed = digest != certificate.port_state_digest
+        record_history = self.history_sampler.should_record(certificate.id, state_changed)
 
-            conn.commit()
+        values = changed_columns(certificate, status)
+        if state_changed:
+            values['port_state_digest'] = digest
+        if record_history:
+            values['ssl_handshake_time'] = main_ssl_result.get('handshake_time')
+        set_clause = ''.join(f"{column} = ?, " for column in values)
+
+        try:
+            with self.db.transaction():
+                self.db.execute(f"""
+                    UPDATE certificates SET
+                        {set_clause}last_port_check = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """, tuple(values.values()) + (certificate.id,)).close()
+
+            for column, value in values.items():
+                setattr(certificate, column, value)
 
         except Exception as e:
-            logger.error(f"更新证书端口状态失败 {certificate_id}: {str(e)}")
-            if 'conn' in locals():
-                conn.rollback()
-        finally:
-            if 'conn' in locals():
-                conn.close()
+            logger.error(f"更新证书端口状态失败 {certificate.id}: {str(e)}")
+
+        return {'state_changed': state_changed, 'record_history': record_history}
 
     def _check_and_create_port_alerts(self, certificate_id: int, ssl_results: Dict[int, Dict[str, Any]],
                                      http_redirect_result: Dict[str, Any]) -> None:
@@ -811,70 +830,14 @@ class PortMonitoringService:
     def get_port_monitoring_statistics(self) -> Dict[str, Any]:
         """获取端口监控统计信息"""
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-
-            # 统计TLS版本分布
-            cursor.execute("""
-                SELECT
-                    tls_version,
-                    COUNT(*) as count
-                FROM certificates
-                WHERE tls_version IS NOT NULL
-                GROUP BY tls_version
-            """)
-            tls_stats = {row[0]: row[1] for row in cursor.fetchall()}
-
-            # 统计安全等级分布
-            cursor.execute("""
-                SELECT
-                    certificate_chain_valid,
-                    COUNT(*) as count
-                FROM certificates
-                WHERE certificate_chain_valid IS NOT NULL
-                GROUP BY certificate_chain_valid
-            """)
-            chain_stats = cursor.fetchall()
-
-            # 统计平均握手时间
-            cursor.execute("""
-                SELECT
-                    AVG(ssl_handshake_time) as avg_handshake_time,
-                    COUNT(CASE WHEN ssl_handshake_time > 1000 THEN 1 END) as slow_handshakes
-                FROM certificates
-                WHERE ssl_handshake_time IS NOT NULL
-            """)
-            timing_stats = cursor.fetchone()
-
-            # 统计HTTP重定向状态
-            cursor.execute("""
-                SELECT
-                    http_redirect_status,
-                    COUNT(*) as count
-                FROM certificates
-                WHERE http_redirect_status IS NOT NULL
-                GROUP BY http_redirect_status
-            """)
-            redirect_stats = {row[0]: row[1] for row in cursor.fetchall()}
-
             return {
                 'success': True,
-                'statistics': {
-                    'tls_version_distribution': tls_stats,
-                    'certificate_chain_valid_count': sum(1 for row in chain_stats if row[0] == 1),
-                    'certificate_chain_invalid_count': sum(1 for row in chain_stats if row[0] == 0),
-                    'average_handshake_time': round(timing_stats[0] or 0, 2),
-                    'slow_handshakes_count': timing_stats[1] or 0,
-                    'http_redirect_distribution': redirect_stats
-                }
+                'statistics': certificate_statistics.port_monitoring_statistics()
             }
 
         except Exception as e:
             logger.error(f"获取端口监控统计失败: {str(e)}")
             return {'success': False, 'error': f'获取统计失败: {str(e)}'}
-        finally:
-            if 'conn' in locals():
-                conn.close()
 
     def generate_security_report(self, certificate_id: int = None) -> Dict[str, Any]:
         """生成安全评估报告"""
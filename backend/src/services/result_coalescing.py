@@ -0,0 +1,63 @@
+"""
+监控结果合并写入 - 状态摘要比较、变化列更新和历史采样
+连续检查结果不变时只更新心跳时间，避免每次检查重写整行证书记录
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, Any, Optional
+
+# 状态摘要长度(十六进制字符)，与certificates表的摘要列一致
+DIGEST_LENGTH = 16
+
+
+def state_digest(state: Dict[str, Any]) -> str:
+    """计算检查状态的紧凑摘要(键排序后的JSON做blake2b)"""
+    payload = json.dumps(state, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=DIGEST_LENGTH // 2).hexdigest()
+
+
+def changed_columns(certificate, values: Dict[str, Any]) -> Dict[str, Any]:
+    """返回与证书当前值不同的列"""
+    changed = {}
+    for column, value in values.items():
+        current = getattr(certificate, column, None)
+        # MySQL布尔列读出为0/1，与True/False比较前统一类型
+        if isinstance(value, bool) and current is not None:
+            current = bool(current)
+        if current != value:
+            changed[column] = value
+    return changed
+
+
+class HistorySampler:
+    """监控历史采样
+
+    状态变化时总是记录；状态不变时每个证书每隔interval秒最多记录一次。
+    采样时间保存在进程内，多实例部署时每个实例各自采样(最多多记录几条)。
+    interval为0时每次检查都记录。
+    """
+
+    def __init__(self, interval: int = None):
+        if interval is None:
+            interval = int(os.getenv('MONITORING_HISTORY_SAMPLE_INTERVAL', 3600))
+        self.interval = interval
+        self._last_recorded: Dict[Any, float] = {}
+        self._lock = threading.Lock()
+
+    def should_record(self, key: Any, changed: bool, now: Optional[float] = None) -> bool:
+        """判断本次检查结果是否需要写入历史，需要时记下采样时间"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            last = self._last_recorded.get(key)
+            if changed or last is None or now - last >= self.interval:
+                self._last_recorded[key] = now
+                return True
+            return False
+
+    def forget(self, key: Any) -> None:
+        """移除证书的采样记录"""
+        with self._lock:
+            self._last_recorded.pop(key, None)
@@ -0,0 +1,72 @@
+"""
+HTTP条件请求模块
+按表变更版本生成弱ETag，If-None-Match命中时直接返回304，不执行查询和序列化
+"""
+import os
+import time
+import hashlib
+from functools import wraps
+from typing import Callable, Optional, Tuple
+from flask import request, g, make_response, current_app
+from utils.logging_config import get_logger
+from utils.streaming import wants_ndjson
+
+logger = get_logger(__name__)
+
+# ETag包含的时间分桶(秒)：即将过期数量、最近检查次数等随时间变化的字段在分桶切换时刷新
+ETAG_TIME_BUCKET = int(os.getenv('ETAG_TIME_BUCKET', 60))
+# nginx微缓存时间(秒)，通过X-Accel-Expires传递，0表示不缓存
+MICROCACHE_SECONDS = int(os.getenv('API_MICROCACHE_SECONDS', 5))
+
+
+def representation() -> str:
+    """响应表示：Accept要求NDJSON时为ndjson，否则为json(stream参数已包含在查询参数中)"""
+    return 'ndjson' if wants_ndjson() else 'json'
+
+
+def make_etag(versions: Tuple[int, ...], user_key: str, now: Optional[float] = None) -> str:
+    """由表版本、请求路径、查询参数、响应表示、用户和时间分桶生成ETag值(不含引号)"""
+    now = time.time() if now is None else now
+    bucket = int(now // ETAG_TIME_BUCKET) if ETAG_TIME_BUCKET > 0 else 0
+    query = '&'.join(f"{key}={value}" for key, value in sorted(request.args.items(multi=True)))
+    source = f"{request.path}?{query}|{representation()}|{user_key}|{'.'.join(map(str, versions))}|{bucket}"
+    return hashlib.blake2b(source.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def _cache_headers(response) -> None:
+    """浏览器每次用ETag重新验证；nginx按用户(Authorization)和响应表示(Accept)短时间缓存"""
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Authorization')
+    response.vary.add('Accept')
+    if MICROCACHE_SECONDS > 0:
+        response.headers['X-Accel-Expires'] = str(MICROCACHE_SECONDS)
+
+
+def conditional_get(change_versions, *tables: str) -> Callable:
+    """条件GET装饰器(放在认证装饰器之后)
+
+    change_versions 提供 get(tables)，返回None时(版本不可用)直接执行接口，不生成ETag。
+    响应因用户而异，ETag包含当前用户ID和角色。
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            versions = change_versions.get(tables)
+            if versions is None:
+                return f(*args, **kwargs)
+
+            user = getattr(g, 'user', None)
+            user_key = f"{user.id}:{user.role}" if user is not None else ''
+            etag = make_etag(versions, user_key)
+
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            _cache_headers(response)
+            return response
+        return decorated_function
+    return decorator
@@ -71,7 +71,9 @@ class StructuredLogger:
         # 提取标准字段
         for key, value in kwargs.items():
             if key in ['user_id', 'request_id', 'operation', 'resource_type', 
-                      'resource_id', 'error_code', 'duration', 'status_code']:
+                      'resource_id', 'error_code', 'duration', 'status_code',
+                      'performance', 'fingerprint', 'statement', 'param_shapes',
+                      'rows', 'error', 'queries', 'endpoint']:
                 extra_fields[key] = value
         
         # 创建LogRecord并添加额外字段
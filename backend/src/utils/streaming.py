@@ -0,0 +1,91 @@
+"""
+流式响应模块
+逐条序列化并分块输出JSON数组或NDJSON，大结果集不在内存中构建完整列表和响应体
+"""
+import os
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+from flask import request, current_app, stream_with_context
+from utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+# 输出缓冲达到该字节数时发送一个分块
+STREAM_CHUNK_BYTES = int(os.getenv('API_STREAM_CHUNK_BYTES', 64 * 1024))
+
+
+def wants_ndjson() -> bool:
+    """Accept头是否优先要求NDJSON(application/x-ndjson)"""
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def streaming_requested() -> bool:
+    """请求是否使用流式输出(stream=true 或 Accept要求NDJSON)"""
+    return request.args.get('stream', 'false').lower() in ('true', '1') or wants_ndjson()
+
+
+def _chunked(pieces: Iterable[str], chunk_bytes: int) -> Iterator[str]:
+    """合并小片段，按块大小输出"""
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_bytes:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_json(items: Iterable[Any], key: str = 'items', meta: Optional[Dict[str, Any]] = None,
+                serialize: Callable[[Any], Any] = None, chunk_bytes: int = None):
+    """以分块传输输出列表
+
+    默认输出与jsonify相同的外层结构 {"code":200,"message":"success","data":{...meta, key:[...]}}，
+    Accept要求NDJSON时每行一条记录(不含外层结构和meta)。
+    响应头发送后无法再修改状态码：迭代出错时数组以 "error" 字段结束，NDJSON追加一行 {"error": ...}。
+    """
+    dumps = partial(current_app.json.dumps, separators=(',', ':'))
+    serialize = serialize or (lambda item: item)
+    ndjson = wants_ndjson()
+
+    def pieces() -> Iterator[str]:
+        error = None
+        if not ndjson:
+            fields = ''.join(f"{dumps(name)}:{dumps(value)}," for name, value in (meta or {}).items())
+            yield f'{{"code":200,"message":"success","data":{{{fields}{dumps(key)}:['
+        try:
+            separator = ''
+            for item in items:
+                if ndjson:
+                    yield dumps(serialize(item)) + '\n'
+                else:
+                    yield separator + dumps(serialize(item))
+                    separator = ','
+        except Exception as e:
+            logger.error(f"流式输出 {request.path} 中断: {e}")
+            error = '数据读取失败，输出不完整'
+        finally:
+            # 客户端断开时关闭数据源(归还或丢弃流式查询连接)
+            close = getattr(items, 'close', None)
+            if close is not None:
+                close()
+
+        if ndjson:
+            if error:
+                yield dumps({'error': error}) + '\n'
+        elif error:
+            yield f'],"error":{dumps(error)}}}}}'
+        else:
+            yield ']}}'
+
+    response = current_app.response_class(
+        stream_with_context(_chunked(pieces(), chunk_bytes or STREAM_CHUNK_BYTES)),
+        mimetype=NDJSON_MIMETYPE if ndjson else 'application/json'
+    )
+    # nginx不缓冲，逐块转发给客户端
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
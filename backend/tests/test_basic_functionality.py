@@ -6,10 +6,14 @@ SSL证书管理器基础功能测试
 import unittest
 import sys
 import os
+import tempfile
 
 # 添加项目根目录到Python路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
+# ACME账户私钥等运行时文件写入临时目录，不写入工作区
+os.environ.setdefault('CERT_STORAGE_PATH', tempfile.mkdtemp(prefix='ssl_manager_certs_'))
+
 class TestBasicFunctionality(unittest.TestCase):
     """基础功能测试类"""
     
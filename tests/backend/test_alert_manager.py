@@ -397,27 +397,33 @@ class TestAlertManager:
         assert len(history) == 3
         assert all(isinstance(alert, Alert) for alert in history)
     
-    @patch('services.alert_manager.Certificate')
-    def test_check_certificate_expiry(self, mock_cert_class, alert_manager):
+    @patch('services.alert_manager.async_db')
+    def test_check_certificate_expiry(self, mock_async_db, alert_manager):
         """测试检查证书过期"""
-        # 模拟证书数据
-        mock_cert = MagicMock()
-        mock_cert.id = 1
-        mock_cert.domain = 'example.com'
-        mock_cert.expires_at = datetime.now() + timedelta(days=5)  # 5天后过期
-        mock_cert.server.name = 'test-server'
-        mock_cert.ca_type = 'letsencrypt'
-        
-        mock_cert_class.get_all.return_value = [mock_cert]
+        # 模拟异步数据库返回的证书行(已关联服务器名称)
+        mock_async_db.fetchall = AsyncMock(return_value=[{
+            'id': 1,
+            'domain': 'example.com',
+            'expires_at': datetime.now() + timedelta(days=5),  # 5天后过期
+            'ca_type': 'letsencrypt',
+            'server_name': 'test-server'
+        }])
         
         with patch.object(alert_manager, 'trigger_alert', new_callable=AsyncMock) as mock_trigger:
             alert_manager._check_certificate_expiry()
             
             # 应该触发7天内过期的告警
-            mock_trigger.assert_called()
+            mock_trigger.assert_awaited()
             call_args = mock_trigger.call_args
             assert call_args[0][0].alert_type == AlertType.CERTIFICATE_EXPIRING
             assert call_args[0][1]['domain'] == 'example.com'
+            assert call_args[0][1]['server_name'] == 'test-server'
+        
+        # 不足一批时只查询一次，且只读取最大告警阈值内的证书
+        mock_async_db.fetchall.assert_awaited_once()
+        sql, params = mock_async_db.fetchall.call_args[0]
+        assert 'c.expires_at <= ?' in sql
+        assert params[0] == 0
     
     @patch('services.alert_manager.Server')
     def test_check_server_status(self, mock_server_class, alert_manager):
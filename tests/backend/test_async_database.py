@@ -0,0 +1,201 @@
+"""
+异步数据库测试
+测试异步数据库的查询接口、连接池创建和归还，以及通知并发发送
+"""
+import pytest
+import sys
+import os
+import asyncio
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'src'))
+
+from models.async_database import AsyncDatabase
+from services.notification import NotificationManager, NotificationProvider
+
+
+class FakeCursor:
+    """模拟aiomysql的DictCursor"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+        self.lastrowid = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql, params=()):
+        self.conn.statements.append((sql, params))
+        await asyncio.sleep(0)
+        if sql.startswith('INSERT'):
+            self.rowcount, self.lastrowid = 1, 42
+        elif sql.startswith(('UPDATE', 'DELETE')):
+            self.rowcount = 3
+        else:
+            self.rowcount = len(self.conn.rows)
+
+    async def fetchone(self):
+        return self.conn.rows[0] if self.conn.rows else None
+
+    async def fetchall(self):
+        return tuple(self.conn.rows)
+
+
+class FakeConnection:
+    """模拟连接"""
+
+    def __init__(self, statements, rows):
+        self.statements = statements
+        self.rows = rows
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+class FakePool:
+    """模拟aiomysql连接池，记录同时借出的连接数"""
+
+    def __init__(self, rows=()):
+        self.statements = []
+        self.rows = list(rows)
+        self.in_use = 0
+        self.peak = 0
+        self.closed = False
+
+    async def acquire(self):
+        self.in_use += 1
+        self.peak = max(self.peak, self.in_use)
+        return FakeConnection(self.statements, self.rows)
+
+    def release(self, conn):
+        self.in_use -= 1
+
+    def close(self):
+        self.closed = True
+
+    async def wait_closed(self):
+        pass
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """注入模拟连接池的异步数据库"""
+    database = AsyncDatabase()
+    database.created = []
+
+    async def create_pool():
+        await asyncio.sleep(0)
+        pool = FakePool(rows=[{'id': 1, 'domain': 'example.com'}])
+        database.created.append(pool)
+        return pool
+
+    monkeypatch.setattr(database, '_create_pool', create_pool)
+    return database
+
+
+class TestAsyncDatabase:
+    """异步数据库测试"""
+
+    def test_fetch_and_write_helpers(self, database):
+        """测试查询和写入接口与同步数据库一致"""
+        async def run():
+            row = await database.fetchone("SELECT id, domain FROM certificates WHERE id = ?", (1,))
+            rows = await database.fetchall("SELECT id, domain FROM certificates")
+            insert_id = await database.insert('alerts', {'title': 't'})
+            updated = await database.update('certificates', {'status': 'valid'}, 'id = ?', (1,))
+            deleted = await database.delete('certificates', 'id = ?', (1,))
+            return row, rows, insert_id, updated, deleted
+
+        row, rows, insert_id, updated, deleted = asyncio.run(run())
+
+        assert row == {'id': 1, 'domain': 'example.com'}
+        assert rows == [row]
+        assert (insert_id, updated, deleted) == (42, 3, 3)
+
+        pool = database.created[0]
+        assert pool.in_use == 0
+        assert pool.statements[0] == ("SELECT id, domain FROM certificates WHERE id = %s", (1,))
+        assert pool.statements[3] == ("UPDATE `certificates` SET `status` = %s WHERE id = %s", ('valid', 1))
+
+    def test_concurrent_queries_share_one_pool(self, database):
+        """测试并发查询只创建一个连接池，并同时借出多个连接"""
+        async def run():
+            return await asyncio.gather(*(
+                database.fetchone("SELECT id FROM certificates WHERE id = ?", (i,)) for i in range(20)
+            ))
+
+        results = asyncio.run(run())
+
+        assert len(results) == 20
+        assert len(database.created) == 1
+        assert database.created[0].peak > 1
+        assert database._pool is database.created[0]
+
+    def test_pool_recreated_for_new_loop(self, database):
+        """测试在新事件循环中使用时重新创建连接池"""
+        asyncio.run(database.fetchone("SELECT 1"))
+        asyncio.run(database.fetchone("SELECT 1"))
+
+        assert len(database.created) == 2
+        assert database.created[0].closed
+
+    def test_close(self, database):
+        """测试关闭连接池"""
+        async def run():
+            await database.fetchone("SELECT 1")
+            await database.close()
+
+        asyncio.run(run())
+        assert database.created[0].closed
+        assert database.get_pool_stats() == {'created': False, 'minsize': database.minsize,
+                                             'maxsize': database.maxsize}
+
+
+class SlowProvider(NotificationProvider):
+    """等待固定时间后返回的通知提供商"""
+
+    def __init__(self, name, delay, success=True):
+        super().__init__({})
+        self.name = name
+        self.delay = delay
+        self.success = success
+
+    def validate_config(self):
+        return True
+
+    async def send(self, message):
+        await asyncio.sleep(self.delay)
+        return {'success': self.success, 'provider': self.name}
+
+
+class TestNotificationFanOut:
+    """通知并发发送测试"""
+
+    def test_providers_sent_concurrently(self, monkeypatch):
+        """测试各提供商并发发送，结果结构不变"""
+        manager = NotificationManager()
+        manager.providers = {
+            'email': SlowProvider('email', 0.2),
+            'slack': SlowProvider('slack', 0.2, success=False),
+        }
+        monkeypatch.setattr('services.notification.NotificationTemplate.render',
+                            lambda template, provider, context: {'text': provider})
+
+        loop = asyncio.new_event_loop()
+        try:
+            started = loop.time()
+            result = loop.run_until_complete(
+                manager.send_notification('certificate_expiring', {}, providers=['email', 'slack', 'sms'])
+            )
+            elapsed = loop.time() - started
+        finally:
+            loop.close()
+
+        assert elapsed < 0.35
+        assert result['success'] is True
+        assert [item['provider'] for item in result['results']] == ['email', 'slack']
+        assert {item['provider'] for item in result['failed']} == {'sms', 'slack'}
@@ -0,0 +1,120 @@
+"""
+证书内容延迟加载测试
+测试列表/详情查询的列投影以及证书内容和私钥的按需加载
+"""
+import pytest
+import sys
+import os
+from contextlib import contextmanager
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'src'))
+
+import models.certificate as certificate_module
+from models.certificate import Certificate
+
+
+class ProjectionDatabase:
+    """按查询列返回数据的模拟数据库"""
+
+    def __init__(self):
+        self.row = {column: None for column in Certificate.SUMMARY_COLUMNS}
+        self.row.update({'id': 1, 'domain': 'example.com', 'server_id': 2})
+        self.content = {'private_key': 'KEY', 'certificate': 'CHAIN'}
+        self.queries = []
+        self.updates = []
+        self.statements = []
+
+    def connect(self):
+        pass
+
+    def close(self):
+        pass
+
+    def commit(self):
+        pass
+
+    @contextmanager
+    def transaction(self):
+        yield self
+
+    def execute(self, sql, params=()):
+        # 保存时同步标签表的语句
+        self.statements.append(sql)
+
+        class Cursor:
+            def close(self):
+                pass
+        return Cursor()
+
+    def fetchone(self, sql, params=()):
+        self.queries.append(sql)
+        columns = sql.split('SELECT', 1)[1].split('FROM', 1)[0]
+        if columns.strip() == 'private_key, certificate':
+            return dict(self.content)
+        row = dict(self.row)
+        if 'private_key' in columns:
+            row.update(self.content)
+        return row
+
+    def update(self, table, data, condition, params=()):
+        self.updates.append(data)
+        return 1
+
+
+@pytest.fixture
+def projection_db(monkeypatch):
+    """替换证书模型使用的全局数据库"""
+    database = ProjectionDatabase()
+    monkeypatch.setattr(certificate_module, 'db', database)
+    return database
+
+
+class TestCertificateContentLoading:
+    """证书内容延迟加载测试"""
+
+    def test_summary_projection(self):
+        """测试默认投影不包含证书内容和私钥"""
+        columns = Certificate.columns('c.').split(', ')
+        assert 'c.private_key' not in columns
+        assert 'c.certificate' not in columns
+        assert Certificate.columns('c.').startswith('c.id, c.domain')
+        assert Certificate.columns(with_content=True).endswith('private_key, certificate')
+
+    def test_lazy_load_on_access(self, projection_db):
+        """测试首次访问时加载内容，之后不再查询"""
+        cert = Certificate.get_by_id(1)
+        assert 'private_key' not in projection_db.queries[0]
+        assert not cert.content_loaded
+        assert 'private_key' not in cert.to_dict()
+
+        assert cert.certificate == 'CHAIN'
+        assert cert.private_key == 'KEY'
+        assert cert.content_loaded
+        assert len(projection_db.queries) == 2
+
+    def test_with_content(self, projection_db):
+        """测试显式加载内容"""
+        cert = Certificate.get_by_id(1, with_content=True)
+        assert cert.content_loaded
+        assert cert.to_dict(include_content=True)['certificate'] == 'CHAIN'
+        assert len(projection_db.queries) == 1
+
+    def test_save_keeps_unloaded_content(self, projection_db):
+        """测试保存时不加载也不覆盖未加载的内容"""
+        cert = Certificate.get_by_id(1)
+        cert.save()
+        assert 'private_key' not in projection_db.updates[0]
+        assert 'certificate' not in projection_db.updates[0]
+        assert len(projection_db.queries) == 1
+
+        cert.certificate = 'RENEWED'
+        cert.save()
+        assert projection_db.updates[1]['certificate'] == 'RENEWED'
+        assert 'private_key' not in projection_db.updates[1]
+
+    def test_new_certificate_without_content(self, projection_db):
+        """测试未保存的证书访问内容时不查询数据库"""
+        cert = Certificate(domain='new.example.com')
+        assert cert.private_key is None
+        assert projection_db.queries == []
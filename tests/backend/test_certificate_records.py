@@ -0,0 +1,81 @@
+"""
+证书行对象测试
+测试槽位模型、查询结果行直接填充和字典序列化
+"""
+import pytest
+import sys
+import os
+import datetime
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'src'))
+
+from models.certificate import Certificate
+from models.records import compile_hydrator
+
+
+@pytest.fixture
+def row():
+    """列表查询返回的证书行"""
+    data = {column: None for column in Certificate.SUMMARY_COLUMNS}
+    data.update({
+        'id': 9,
+        'domain': 'example.com',
+        'status': 'valid',
+        'expires_at': datetime.datetime.now() + datetime.timedelta(days=10, hours=1),
+        'monitoring_enabled': 0,
+        'server_name': 'web-1'
+    })
+    return data
+
+
+class TestCertificateRecords:
+    """证书行对象测试"""
+
+    def test_from_row_matches_keyword_init(self, row):
+        """测试直接填充与关键字参数构造结果一致"""
+        fields = {key: value for key, value in row.items() if key != 'server_name'}
+        expected = Certificate(**fields).to_dict()
+        cert = Certificate.from_row(row)
+
+        assert cert.server_name == 'web-1'
+        assert cert.monitoring_enabled == 0
+        assert {key: value for key, value in cert.to_dict().items() if key != 'server_name'} == expected
+        assert cert.to_dict()['days_left'] == 10
+
+    def test_to_dict_excludes_internal_columns(self, row):
+        """测试字典序列化不包含调度和结果合并使用的内部列"""
+        row.update({'next_check_at': datetime.datetime.now(), 'domain_state_digest': 'a' * 16,
+                    'port_state_digest': 'b' * 16})
+        cert_dict = Certificate.from_row(row).to_dict()
+        assert not set(Certificate.INTERNAL_COLUMNS) & set(cert_dict)
+        assert cert_dict['domain'] == 'example.com'
+
+    def test_missing_columns_use_defaults(self):
+        """测试部分列查询时使用构造函数的缺省值"""
+        cert = Certificate.from_row({'id': 1, 'domain': 'partial.example.com'})
+        assert cert.monitoring_frequency == 3600
+        assert cert.alert_enabled is True
+        assert cert.owner is None
+        assert not hasattr(cert, 'server_name')
+        assert not cert.content_loaded
+
+    def test_slots(self, row):
+        """测试证书对象没有实例字典"""
+        cert = Certificate.from_row(row)
+        assert not hasattr(cert, '__dict__')
+        with pytest.raises(AttributeError):
+            cert.unknown_field = 1
+
+    def test_compile_hydrator(self):
+        """测试生成的填充函数"""
+        class Record:
+            __slots__ = ('name', 'size')
+
+        hydrate = compile_hydrator([('name', 'name', None), ('size', 'size_bytes', 0)])
+        record = Record()
+        hydrate(record, {'name': 'chain.pem'})
+        assert (record.name, record.size) == ('chain.pem', 0)
+
+        with pytest.raises(ValueError):
+            compile_hydrator([('bad name', 'x', None)])
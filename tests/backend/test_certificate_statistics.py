@@ -0,0 +1,192 @@
+"""
+证书统计引擎测试
+测试单次扫描聚合结果折叠、汇总表读取和触发器生成
+"""
+import pytest
+import sys
+import os
+import datetime
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'src'))
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'migrations')
+
+from models.certificate_statistics import (
+    CertificateStatistics, CONTRIBUTIONS, VOLATILE_CONTRIBUTIONS, build_live_query, build_rebuild_statements,
+    build_trigger_statements, fold_live_rows
+)
+from models.trigger_install import definition_signature, signature_key
+
+
+def contribution_index(dimension):
+    """获取维度在定义中的序号"""
+    return [contribution.dimension for contribution in CONTRIBUTIONS].index(dimension)
+
+
+def live_row(group_count, expiring=0, **values):
+    """构造一条分组结果，未指定的列为空"""
+    row = {'group_count': group_count, 'expiring': expiring}
+    for index, contribution in enumerate(CONTRIBUTIONS):
+        if contribution.bucket == "''":
+            row[f'c{index}'] = 0
+            row[f'v{index}'] = 0
+        else:
+            row[f'b{index}'] = None
+    for key, value in values.items():
+        kind, dimension = key.split('_', 1)
+        row[f'{kind}{contribution_index(dimension)}'] = value
+    return row
+
+
+class FakeDatabase:
+    """返回预设结果的数据库"""
+
+    def __init__(self, live_rows=None, summary_rows=None, triggers=0, volatile_row=None):
+        self.live_rows = live_rows or []
+        self.summary_rows = summary_rows or []
+        self.triggers = triggers
+        self.volatile_row = volatile_row or {}
+        self.queries = []
+
+    def connect(self):
+        pass
+
+    def close(self):
+        pass
+
+    def fetchall(self, sql, params=()):
+        self.queries.append(sql)
+        if 'certificate_statistics_summary' in sql:
+            return self.summary_rows
+        return self.live_rows
+
+    def fetchone(self, sql, params=()):
+        self.queries.append(sql)
+        if 'information_schema' in sql:
+            return {'count': self.triggers}
+        if sql.startswith('SELECT SUM('):
+            return self.volatile_row
+        return {'recent_dns_checks': 2, 'recent_reachability_checks': 1}
+
+
+class TestLiveStatistics:
+    """实时统计测试"""
+
+    def test_single_statement(self):
+        """测试实时统计只生成一条按维度分组的查询"""
+        sql = build_live_query()
+        assert sql.count('SELECT') == 1
+        assert sql.count('?') == 1
+        assert 'GROUP BY' in sql
+
+    def test_fold_groups(self):
+        """测试分组结果折叠为各维度分布和平均值"""
+        rows = [
+            live_row(3, expiring=1, b_status='valid', b_type='single', c_total=3,
+                     c_monitoring_frequency=3, v_monitoring_frequency=3 * 3600,
+                     b_monitoring_frequency_distribution=3600, b_tls_version='TLSv1.3',
+                     c_ssl_handshake_time=2, v_ssl_handshake_time=300, c_slow_handshake=0),
+            live_row(1, b_status='expired', b_type='wildcard', c_total=1,
+                     c_monitoring_frequency=1, v_monitoring_frequency=600,
+                     b_monitoring_frequency_distribution=600, b_domain_reachable=0,
+                     c_ssl_handshake_time=1, v_ssl_handshake_time=1500, c_slow_handshake=1),
+        ]
+        snapshot = fold_live_rows(rows)
+        engine = CertificateStatistics(FakeDatabase())
+
+        stats = engine.certificate_statistics(snapshot)
+        assert stats['total'] == 4
+        assert stats['valid'] == 3
+        assert stats['expired'] == 1
+        assert stats['expiring'] == 1
+        assert {'type': 'wildcard', 'count': 1} in stats['type_distribution']
+
+        monitoring = engine.monitoring_statistics(snapshot)
+        assert monitoring['average_frequency'] == 2850.0
+        assert monitoring['frequency_distribution'] == [
+            {'frequency': 600, 'count': 1}, {'frequency': 3600, 'count': 3}
+        ]
+
+        port = engine.port_monitoring_statistics(snapshot)
+        assert port['tls_version_distribution'] == {'TLSv1.3': 3}
+        assert port['average_handshake_time'] == 600.0
+        assert port['slow_handshakes_count'] == 1
+
+    def test_falls_back_without_triggers(self):
+        """测试未安装触发器时使用实时统计"""
+        database = FakeDatabase(live_rows=[live_row(2, c_total=2, b_status='valid', b_type='single')])
+        stats = CertificateStatistics(database).certificate_statistics()
+        assert stats['total'] == 2
+        assert not any('certificate_statistics_summary' in sql for sql in database.queries)
+
+
+class TestSummaryStatistics:
+    """汇总表统计测试"""
+
+    def test_read_summary(self):
+        """测试汇总表可用时只读取汇总表"""
+        today = datetime.date.today()
+        summary_rows = [
+            {'dimension': 'total', 'bucket': '', 'cert_count': 5, 'value_sum': 0},
+            {'dimension': 'status', 'bucket': 'valid', 'cert_count': 4, 'value_sum': 0},
+            {'dimension': 'domain_reachable', 'bucket': '1', 'cert_count': 3, 'value_sum': 0},
+            {'dimension': 'valid_expiry_date', 'bucket': (today + datetime.timedelta(days=3)).isoformat(),
+             'cert_count': 2, 'value_sum': 0},
+            {'dimension': 'valid_expiry_date', 'bucket': (today + datetime.timedelta(days=60)).isoformat(),
+             'cert_count': 2, 'value_sum': 0},
+        ]
+        volatile_index = [contribution.dimension for contribution in VOLATILE_CONTRIBUTIONS].index('dns_response_time')
+        database = FakeDatabase(summary_rows=summary_rows, triggers=3,
+                                volatile_row={f'c{volatile_index}': 2, f'v{volatile_index}': 90})
+        engine = CertificateStatistics(database)
+
+        stats = engine.certificate_statistics()
+        assert stats['total'] == 5
+        assert stats['valid'] == 4
+        assert stats['expiring'] == 2
+        assert not any(sql.startswith('SELECT SUM(') for sql in database.queries)
+
+        domain = engine.domain_monitoring_statistics()
+        assert domain['reachability_distribution'] == {'reachable': 3, 'unreachable': 0}
+        assert domain['average_dns_response_time'] == 45.0
+        assert domain['recent_checks']['dns_checks_last_hour'] == 2
+        assert not any('FROM certificates GROUP BY' in sql for sql in database.queries)
+        assert not any('GROUP BY' in sql for sql in database.queries if sql.startswith('SELECT SUM('))
+
+        # 易变维度在缓存时间内只聚合一次
+        engine.port_monitoring_statistics()
+        assert sum(sql.startswith('SELECT SUM(') for sql in database.queries) == 1
+
+
+class TestTriggers:
+    """触发器生成测试"""
+
+    def test_update_trigger_guards_changed_columns(self):
+        """测试更新触发器只在相关列变化时调整计数"""
+        insert_trigger, update_trigger, delete_trigger = build_trigger_statements()
+
+        assert "AFTER INSERT ON `certificates`" in insert_trigger
+        assert "('total', '', 1, 0)" in insert_trigger
+        assert "('total', '', -1, 0)" in delete_trigger
+        assert "'total'" not in update_trigger
+        assert "IF NOT (OLD.`status` <=> NEW.`status`) THEN" in update_trigger
+        assert "-OLD.monitoring_frequency" in update_trigger
+
+    def test_volatile_dimensions_not_in_triggers(self):
+        """测试响应时间/握手时间不由触发器维护(避免监控写入竞争同一汇总行)"""
+        statements = build_trigger_statements() + build_rebuild_statements()
+        for contribution in VOLATILE_CONTRIBUTIONS:
+            assert not any(f"'{contribution.dimension}'" in statement for statement in statements)
+        assert not any('dns_response_time' in statement or 'ssl_handshake_time' in statement
+                       for statement in statements)
+
+    def test_migration_matches_builder(self):
+        """测试迁移脚本中的触发器、重建语句和定义摘要与代码生成的一致"""
+        with open(os.path.join(MIGRATIONS_DIR, '006_add_certificate_statistics_summary.sql'), encoding='utf-8') as f:
+            migration = f.read()
+        statements = build_trigger_statements()
+        for statement in statements:
+            assert statement + ' //' in migration
+        for statement in build_rebuild_statements():
+            assert statement + ';' in migration
+        assert f"('{signature_key('certificate_statistics')}', '{definition_signature(statements)}')" in migration
@@ -0,0 +1,96 @@
+"""
+证书标签测试
+测试标签规范化、标签表同步以及标签/负责人/业务单元筛选条件
+"""
+import pytest
+import sys
+import os
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'src'))
+
+from models.certificate_tags import normalize_tags, sync_tags, ownership_conditions, parse_tag_args
+from models.certificate import Certificate
+
+
+class FakeCursor:
+    def close(self):
+        pass
+
+
+class FakeDatabase:
+    """记录语句的模拟数据库"""
+
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, sql, params=()):
+        self.statements.append((sql, params))
+        return FakeCursor()
+
+
+class TestNormalizeTags:
+    """标签规范化测试"""
+
+    @pytest.mark.parametrize('value, expected', [
+        ('["PCI", " prod ", "pci"]', ['pci', 'prod']),
+        ('pci, prod', ['pci', 'prod']),
+        (['Team-A', ''], ['team-a']),
+        ('"single"', ['single']),
+        (None, []),
+        ('', []),
+    ])
+    def test_normalize(self, value, expected):
+        """测试JSON数组、逗号分隔字符串和列表都规范化为小写去重列表"""
+        assert normalize_tags(value) == expected
+
+    def test_parse_tag_args(self):
+        """测试重复参数和逗号分隔的标签合并去重"""
+        assert parse_tag_args(['pci,prod', 'PCI', 'edge']) == ['pci', 'prod', 'edge']
+
+
+class TestSyncTags:
+    """标签表同步测试"""
+
+    def test_sync_replaces_rows(self):
+        """测试删除旧标签后用一条多行INSERT写入新标签"""
+        database = FakeDatabase()
+        assert sync_tags(database, 5, '["pci", "prod"]') == ['pci', 'prod']
+        assert database.statements == [
+            ("DELETE FROM `certificate_tags` WHERE certificate_id = ?", (5,)),
+            ("INSERT INTO `certificate_tags` (`tag`, `certificate_id`) VALUES (?, ?), (?, ?)",
+             ('pci', 5, 'prod', 5)),
+        ]
+
+    def test_sync_without_tags_only_deletes(self):
+        """测试没有标签时只清除旧记录"""
+        database = FakeDatabase()
+        sync_tags(database, 5, None)
+        assert len(database.statements) == 1
+
+
+class TestOwnershipConditions:
+    """筛选条件测试"""
+
+    def test_single_tag_semijoin(self):
+        """测试单个标签使用标签表子查询"""
+        conditions, params = ownership_conditions(['PCI'], owner='team-x', prefix='c.')
+        assert conditions == [
+            "c.id IN (SELECT certificate_id FROM `certificate_tags` WHERE tag = ?)",
+            "c.owner = ?",
+        ]
+        assert params == ['pci', 'team-x']
+
+    def test_multiple_tags_require_all(self):
+        """测试多个标签要求同时具备"""
+        conditions, params = ownership_conditions(['pci', 'prod'], business_unit='payments')
+        assert conditions[0].endswith("WHERE tag IN (?, ?) GROUP BY certificate_id HAVING COUNT(*) = ?)")
+        assert conditions[1] == "business_unit = ?"
+        assert params == ['pci', 'prod', 2, 'payments']
+
+    def test_certificate_filters_include_ownership(self):
+        """测试证书列表筛选包含标签和负责人条件"""
+        conditions, params = Certificate._build_filters(status='valid', prefix='c.', tags=['pci'], owner='team-x')
+        assert conditions[0] == "c.status = ?"
+        assert len(conditions) == 3
+        assert params == ['valid', 'pci', 'team-x']
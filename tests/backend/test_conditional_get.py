@@ -0,0 +1,224 @@
+"""
+条件请求测试
+测试表变更版本触发器、版本读取缓存以及ETag/If-None-Match处理
+"""
+import pytest
+import sys
+import os
+from contextlib import contextmanager
+from types import SimpleNamespace
+from flask import Flask, g, jsonify
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'src'))
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'migrations')
+
+from models.change_versions import ChangeVersions, build_trigger_statements, install_change_versions, trigger_names
+from models.trigger_install import definition_signature, signature_key
+from utils.http_cache import conditional_get
+
+
+class VersionDatabase:
+    """返回表版本的模拟数据库"""
+
+    def __init__(self, versions=None):
+        self.versions = versions if versions is not None else {'certificates': 3, 'servers': 7}
+        self.reads = 0
+
+    def connect(self):
+        pass
+
+    def close(self):
+        pass
+
+    def fetchall(self, sql, params=()):
+        self.reads += 1
+        return [{'table_name': name, 'version': version} for name, version in self.versions.items()]
+
+
+class TestChangeVersions:
+    """表变更版本测试"""
+
+    def test_triggers_bump_version(self):
+        """测试每张表的三个触发器都递增当前连接对应的版本行"""
+        statements = build_trigger_statements(('servers',))
+        assert len(statements) == 3
+        assert statements[1].startswith(
+            "CREATE TRIGGER `trg_change_version_servers_update` AFTER UPDATE ON `servers`")
+        assert "CONCAT('servers#', CONNECTION_ID() % 64)" in statements[0]
+        assert statements[0].endswith("ON DUPLICATE KEY UPDATE `version` = `version` + 1")
+
+    def test_update_ignores_heartbeat_columns(self):
+        """测试心跳和调度列变化不递增版本"""
+        servers_update = build_trigger_statements(('servers',))[1]
+        certificates_update = build_trigger_statements(('certificates',))[1]
+        assert 'OLD.`status` <=> NEW.`status`' in servers_update
+        for column in ('last_seen', 'updated_at'):
+            assert f'`{column}`' not in servers_update
+        assert 'OLD.`expires_at` <=> NEW.`expires_at`' in certificates_update
+        for column in ('next_check_at', 'domain_state_digest', 'port_state_digest', 'last_dns_check',
+                       'last_port_check', 'dns_response_time', 'updated_at'):
+            assert f'`{column}`' not in certificates_update
+
+    def test_migration_matches_builder(self):
+        """测试迁移脚本中的触发器和定义摘要与代码生成的一致"""
+        with open(os.path.join(MIGRATIONS_DIR, '015_add_table_change_versions.sql'), encoding='utf-8') as f:
+            migration = f.read()
+        statements = build_trigger_statements()
+        for statement in statements:
+            assert statement + ' //' in migration
+        assert f"('{signature_key('change_version')}', '{definition_signature(statements)}')" in migration
+
+    def test_shard_rows_summed(self):
+        """测试分片版本行按表求和"""
+        database = VersionDatabase({'certificates': 1, 'certificates#3': 4, 'servers': 1, 'servers#60': 2})
+        versions = ChangeVersions(database, check_interval=60)
+        assert versions.get(('certificates', 'servers')) == (5, 3)
+
+    def test_versions_cached_within_interval(self):
+        """测试检查间隔内不重复读取版本"""
+        database = VersionDatabase()
+        versions = ChangeVersions(database, check_interval=60)
+        assert versions.get(('certificates', 'servers')) == (3, 7)
+        database.versions['servers'] = 8
+        assert versions.get(('certificates', 'servers')) == (3, 7)
+        assert database.reads == 1
+
+        versions.expire()
+        assert versions.get(('servers',)) == (8,)
+
+    def test_missing_version_disables_etag(self):
+        """测试没有版本行(触发器未安装)时返回None"""
+        versions = ChangeVersions(VersionDatabase({}), check_interval=60)
+        assert versions.get(('certificates',)) is None
+
+
+class InstallDatabase:
+    """记录触发器安装语句的模拟数据库"""
+
+    def __init__(self, installed=(), signature=None):
+        self.installed = set(installed)
+        self.settings = {}
+        if signature:
+            self.settings[signature_key('change_version')] = signature
+        self.statements = []
+        self.commits = 0
+
+    def connect(self):
+        pass
+
+    def close(self):
+        pass
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    @contextmanager
+    def use_primary(self):
+        yield self
+
+    def execute(self, sql, params=()):
+        self.statements.append(sql)
+        if sql.startswith('CREATE TRIGGER'):
+            self.installed.add(sql.split('`')[1])
+        elif 'INTO `settings`' in sql:
+            self.settings[params[0]] = params[1]
+        return SimpleNamespace(close=lambda: None)
+
+    def fetchall(self, sql, params=()):
+        return [{'TRIGGER_NAME': name} for name in params if name in self.installed]
+
+    def fetchone(self, sql, params=()):
+        if 'GET_LOCK' in sql or 'RELEASE_LOCK' in sql:
+            return {'acquired': 1, 'released': 1}
+        value = self.settings.get(params[0])
+        return {'value': value} if value is not None else None
+
+
+class TestTriggerInstall:
+    """触发器安装测试"""
+
+    def test_current_triggers_not_rebuilt(self):
+        """测试触发器已是当前定义时不执行DDL"""
+        signature = definition_signature(build_trigger_statements())
+        database = InstallDatabase(trigger_names(), signature)
+        assert install_change_versions(database)
+        assert not any(sql.startswith(('DROP', 'CREATE TRIGGER')) for sql in database.statements)
+
+    def test_changed_definition_reinstalled_and_bumped(self):
+        """测试定义变化时重建触发器、递增版本并记录新的定义摘要"""
+        database = InstallDatabase(trigger_names(), 'outdated')
+        assert install_change_versions(database)
+        creates = [sql for sql in database.statements if sql.startswith('CREATE TRIGGER')]
+        assert len(creates) == 6
+        assert any('`version` + 1' in sql and 'AS new' in sql for sql in database.statements)
+        assert database.settings[signature_key('change_version')] == definition_signature(build_trigger_statements())
+        assert database.commits == 1
+
+
+@pytest.fixture
+def client():
+    """注册带条件请求的测试接口"""
+    database = VersionDatabase()
+    versions = ChangeVersions(database, check_interval=0)
+    app = Flask(__name__)
+    app.calls = 0
+
+    @app.route('/items')
+    @conditional_get(versions, 'certificates', 'servers')
+    def items():
+        app.calls += 1
+        return jsonify({'items': [1, 2]})
+
+    @app.before_request
+    def set_user():
+        g.user = SimpleNamespace(id=1, role='admin')
+
+    test_client = app.test_client()
+    test_client.app = app
+    test_client.database = database
+    return test_client
+
+
+class TestConditionalGet:
+    """ETag/If-None-Match测试"""
+
+    def test_not_modified(self, client):
+        """测试ETag匹配时返回304且不执行接口"""
+        response = client.get('/items?page=1')
+        etag = response.headers['ETag']
+        assert etag.startswith('W/"')
+        assert response.headers['Cache-Control'] == 'private, no-cache'
+        assert 'Authorization' in response.headers['Vary']
+
+        response = client.get('/items?page=1', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+        assert client.app.calls == 1
+
+    def test_version_change_refreshes(self, client):
+        """测试表版本变化后返回新数据"""
+        etag = client.get('/items').headers['ETag']
+        client.database.versions['certificates'] += 1
+        response = client.get('/items', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+    def test_etag_varies_by_query(self, client):
+        """测试不同查询参数的ETag不同"""
+        assert client.get('/items?page=1').headers['ETag'] != client.get('/items?page=2').headers['ETag']
+
+    def test_etag_varies_by_representation(self, client):
+        """测试JSON和NDJSON表示的ETag不同，响应按Accept区分缓存"""
+        json_response = client.get('/items', headers={'Accept': 'application/json'})
+        ndjson_response = client.get('/items', headers={'Accept': 'application/x-ndjson'})
+        assert 'Accept' in json_response.headers['Vary']
+        assert json_response.headers['ETag'] != ndjson_response.headers['ETag']
+        assert client.get('/items').headers['ETag'] == json_response.headers['ETag']
+
+        response = client.get('/items', headers={'Accept': 'application/x-ndjson',
+                                                 'If-None-Match': json_response.headers['ETag']})
+        assert response.status_code == 200
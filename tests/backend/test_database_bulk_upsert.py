@@ -0,0 +1,250 @@
+"""
+批量写入测试
+验证bulk_upsert的分批SQL生成、插入/更新计数和事务行为
+"""
+import contextlib
+import pytest
+import sys
+import os
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'src'))
+
+from models.connection_pool import ConnectionPool
+from models.database import Database
+
+
+class RecordingCursor:
+    """记录执行语句的模拟游标"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = 0
+        self.lastrowid = None
+        self._results = []
+
+    def execute(self, sql, params=()):
+        self.connection.statements.append((sql, params))
+        self._results = []
+        if sql.startswith('INSERT'):
+            # 按ON DUPLICATE KEY UPDATE的规则返回影响行数：插入计1，更新计2
+            self.rowcount = self.connection.affected_rows.pop(0)
+
+    def fetchall(self):
+        return self._results
+
+    def fetchone(self):
+        return self._results[0] if self._results else None
+
+    def close(self):
+        pass
+
+
+class RecordingConnection:
+    """记录语句和事务操作的模拟连接"""
+
+    def __init__(self, **kwargs):
+        self.open = True
+        self.statements = []
+        self.affected_rows = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return RecordingCursor(self)
+
+    def ping(self, reconnect=False):
+        pass
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.open = False
+
+
+@pytest.fixture
+def database():
+    """使用模拟连接的Database实例"""
+    database = Database()
+    database._pool = ConnectionPool({}, pool_size=1, max_overflow=0, creator=RecordingConnection)
+    return database
+
+
+class TestBulkUpsert:
+    """批量写入测试"""
+
+    def test_chunked_statements_and_counts(self, database):
+        """测试分批生成多行语句并按影响行数统计插入/更新数量"""
+        database.connect()
+        conn = database.conn
+        # 第一批a已存在(更新计2)、b插入(计1)；第二批c插入
+        conn.affected_rows = [3, 1]
+
+        rows = [
+            {'server_id': 1, 'domain': f'{name}.example.com', 'status': 'valid'}
+            for name in ('a', 'b', 'c')
+        ]
+        result = database.bulk_upsert('certificates', rows, ['server_id', 'domain'],
+                                      ['status'], chunk_size=2)
+
+        inserts = [sql for sql, _ in conn.statements if sql.startswith('INSERT')]
+        assert len(inserts) == 2
+        assert inserts[0].count('(%s, %s, %s)') == 2
+        assert 'ON DUPLICATE KEY UPDATE `status` = new.`status`' in inserts[0]
+        # 不再预查询已存在的唯一键
+        assert not [sql for sql, _ in conn.statements if sql.startswith('SELECT')]
+        assert result == {'inserted': 2, 'updated': 1}
+        assert conn.commits == 1
+        database.close()
+
+    def test_duplicate_keys_collapsed(self, database):
+        """测试同一批次中的重复唯一键只保留最后一条"""
+        database.connect()
+        conn = database.conn
+        conn.affected_rows = [1]
+        rows = [
+            {'server_id': 1, 'domain': 'a.example.com', 'status': 'expired'},
+            {'server_id': 1, 'domain': 'a.example.com', 'status': 'valid'}
+        ]
+        result = database.bulk_upsert('certificates', rows, ['server_id', 'domain'], ['status'])
+
+        sql, params = [item for item in conn.statements if item[0].startswith('INSERT')][0]
+        assert params == (1, 'a.example.com', 'valid')
+        assert result == {'inserted': 1, 'updated': 0}
+        database.close()
+
+    def test_existing_rows_skipped_without_update_columns(self, database):
+        """测试没有更新列时已存在的行(影响行数0)既不计插入也不计更新"""
+        database.connect()
+        conn = database.conn
+        conn.affected_rows = [1]
+        rows = [{'server_id': 1, 'domain': f'{name}.example.com'} for name in ('a', 'b')]
+        result = database.bulk_upsert('certificates', rows, ['server_id', 'domain'], [])
+
+        assert result == {'inserted': 1, 'updated': 0}
+        database.close()
+
+    def test_no_commit_inside_caller_transaction(self, database):
+        """测试commit=False时由调用方提交"""
+        database.connect()
+        conn = database.conn
+        conn.affected_rows = [1]
+        database.bulk_upsert('certificates', [{'server_id': 1, 'domain': 'a.example.com'}],
+                             ['server_id', 'domain'], [], commit=False)
+
+        assert conn.commits == 0
+        assert database.conn is conn
+        database.close()
+
+    def test_empty_rows(self, database):
+        """测试空数据不访问数据库"""
+        assert database.bulk_upsert('certificates', [], ['id'], ['status']) == {'inserted': 0, 'updated': 0}
+        assert database.get_pool_stats()['checkouts'] == 0
+
+
+class DeploymentDatabase:
+    """按 (certificate_id, deploy_type, deploy_target) 唯一键模拟部署记录写入"""
+
+    def __init__(self):
+        self.rows = {}
+        self.statements = []
+
+    def connect(self):
+        pass
+
+    def close(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def execute(self, sql, params=()):
+        self.statements.append(sql)
+        certificate_id, deploy_type, deploy_target, status, created_at, updated_at = params
+        key = (certificate_id, deploy_type, deploy_target)
+        row = self.rows.get(key)
+        if row is None:
+            if 'ON DUPLICATE KEY UPDATE' not in sql:
+                raise AssertionError('重复部署目标会违反唯一键')
+            row = {'id': len(self.rows) + 1, 'status': status, 'created_at': created_at}
+            self.rows[key] = row
+        else:
+            row['status'] = status
+        row['updated_at'] = updated_at
+
+        class Cursor:
+            lastrowid = row['id']
+
+            def close(self):
+                pass
+        return Cursor()
+
+
+class TestAddDeployment:
+    """证书部署记录写入测试"""
+
+    def test_same_target_twice_updates(self, monkeypatch):
+        """测试同一证书重复部署到同一目标(续期)时更新已有记录而不是违反唯一键"""
+        import models.certificate as certificate_module
+        from models.certificate import Certificate
+
+        database = DeploymentDatabase()
+        monkeypatch.setattr(certificate_module, 'db', database)
+        cert = Certificate(id=7, domain='example.com')
+
+        first = cert.add_deployment('nginx', '/etc/nginx/ssl/example.com')
+        second = cert.add_deployment('nginx', '/etc/nginx/ssl/example.com', status='failed')
+        other = cert.add_deployment('nginx', '/etc/nginx/ssl/other')
+
+        assert first == second == 1
+        assert other == 2
+        assert len(database.rows) == 2
+        assert database.rows[(7, 'nginx', '/etc/nginx/ssl/example.com')]['status'] == 'failed'
+        assert 'LAST_INSERT_ID(id)' in database.statements[0]
+
+
+class SyncDatabase:
+    """记录bulk_upsert写入行的模拟数据库"""
+
+    def __init__(self):
+        self.upserts = []
+
+    @contextlib.contextmanager
+    def transaction(self):
+        yield
+
+    def bulk_upsert(self, table, rows, key_columns, update_columns, chunk_size=500):
+        self.upserts.append((table, rows, update_columns))
+        return {'inserted': len(rows), 'updated': 0}
+
+
+class TestSyncFromClient:
+    """客户端证书批量同步测试"""
+
+    def test_new_rows_use_create_defaults(self, monkeypatch):
+        """测试批量同步插入的新证书与create使用相同的缺省值"""
+        import models.certificate as certificate_module
+        from models.certificate import Certificate
+
+        database = SyncDatabase()
+        monkeypatch.setattr(certificate_module, 'db', database)
+        monkeypatch.setattr(certificate_module.chain_store, 'store_many',
+                            lambda database, pems, chunk_size=500: [None for _ in pems])
+        monkeypatch.setattr(Certificate, '_fetch_rows_by_domains',
+                            classmethod(lambda cls, *args, **kwargs: {}))
+
+        result = Certificate.sync_from_client(3, [{'domain': 'a.example.com', 'type': 'single'}])
+
+        table, rows, update_columns = database.upserts[0]
+        assert table == 'certificates'
+        row = rows[0]
+        for column, default in Certificate.INSERT_DEFAULTS.items():
+            assert row[column] == default
+        assert (row['server_id'], row['status'], row['ca_type']) == (3, 'valid', 'letsencrypt')
+        # 已存在的证书只更新上报的字段，不覆盖监控和续期设置
+        assert 'renewal_status' not in update_columns
+        assert result == {'synced': 1, 'new': 1, 'updated': 0}
@@ -0,0 +1,239 @@
+"""
+数据库连接池测试
+使用模拟连接验证借出/归还、溢出、预检查、回收和超时行为
+"""
+import pytest
+import sys
+import os
+import gc
+import threading
+import time
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'src'))
+
+from models.connection_pool import ConnectionPool, PoolTimeoutError
+from models.database import Database
+
+
+class FakeConnection:
+    """模拟pymysql连接"""
+
+    def __init__(self, **kwargs):
+        self.open = True
+        self.alive = True
+        self.rollbacks = 0
+
+    def ping(self, reconnect=False):
+        if not self.alive:
+            raise ConnectionError("lost connection")
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.open = False
+
+    def cursor(self):
+        return FakeCursor()
+
+
+class FakeCursor:
+    """返回单行结果的模拟游标"""
+    rowcount = 1
+
+    def execute(self, sql, params=()):
+        pass
+
+    def fetchone(self):
+        return {'value': 1}
+
+    def close(self):
+        pass
+
+
+def make_pool(**kwargs):
+    """创建使用模拟连接的连接池"""
+    options = {'pool_size': 2, 'max_overflow': 1, 'pool_timeout': 1, 'pool_recycle': 3600}
+    options.update(kwargs)
+    return ConnectionPool({}, creator=FakeConnection, **options)
+
+
+class TestConnectionPool:
+    """连接池测试"""
+
+    def test_checkout_reuses_idle_connection(self):
+        """测试归还后的连接被复用"""
+        pool = make_pool()
+        conn = pool.checkout()
+        pool.checkin(conn)
+
+        assert pool.checkout() is conn
+        stats = pool.get_stats()
+        assert stats['connects'] == 1
+        assert stats['checkouts'] == 2
+        assert stats['in_use'] == 1
+        assert conn.rollbacks == 1
+
+    def test_overflow_connection_closed_on_checkin(self):
+        """测试溢出连接归还时被关闭"""
+        pool = make_pool()
+        conns = [pool.checkout() for _ in range(3)]
+        assert pool.get_stats()['overflow'] == 1
+
+        for conn in conns:
+            pool.checkin(conn)
+
+        stats = pool.get_stats()
+        assert stats['idle'] == 2
+        assert stats['total'] == 2
+        assert stats['in_use'] == 0
+        assert sum(1 for conn in conns if not conn.open) == 1
+
+    def test_checkout_timeout(self):
+        """测试连接池耗尽时超时"""
+        pool = make_pool(pool_size=1, max_overflow=0)
+        pool.checkout()
+
+        with pytest.raises(PoolTimeoutError):
+            pool.checkout(timeout=0.05)
+
+        stats = pool.get_stats()
+        assert stats['waits'] == 1
+        assert stats['timeouts'] == 1
+        assert stats['wait_time_total'] > 0
+
+    def test_waiter_receives_returned_connection(self):
+        """测试等待者获得归还的连接"""
+        pool = make_pool(pool_size=1, max_overflow=0)
+        conn = pool.checkout()
+        result = {}
+
+        def waiter():
+            result['conn'] = pool.checkout(timeout=2)
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        time.sleep(0.05)
+        pool.checkin(conn)
+        thread.join()
+
+        assert result['conn'] is conn
+        assert pool.get_stats()['waits'] == 1
+
+    def test_pre_ping_replaces_dead_connection(self):
+        """测试预检查失败时重建连接"""
+        pool = make_pool()
+        conn = pool.checkout()
+        pool.checkin(conn)
+        conn.alive = False
+
+        new_conn = pool.checkout()
+        assert new_conn is not conn
+        assert not conn.open
+        assert pool.get_stats()['invalidated'] == 1
+
+    def test_recycle_replaces_old_connection(self):
+        """测试超过回收时间的连接被重建"""
+        pool = make_pool(pool_recycle=1)
+        conn = pool.checkout()
+        pool.checkin(conn)
+        pool._created_at[id(conn)] -= 5
+
+        new_conn = pool.checkout()
+        assert new_conn is not conn
+        assert pool.get_stats()['recycled'] == 1
+
+    def test_creator_failure_releases_slot(self):
+        """测试创建连接失败时释放名额"""
+        def failing_creator(**kwargs):
+            raise ConnectionError("refused")
+
+        pool = ConnectionPool({}, pool_size=1, max_overflow=0, creator=failing_creator)
+        with pytest.raises(ConnectionError):
+            pool.checkout()
+
+        stats = pool.get_stats()
+        assert stats['total'] == 0
+        assert stats['in_use'] == 0
+
+
+def make_database(**kwargs):
+    """创建使用模拟连接池的Database实例"""
+    database = Database()
+    database._pool = make_pool(**kwargs)
+    return database
+
+
+class TestDatabaseSession:
+    """数据库作用域会话测试"""
+
+    def test_nested_connect_shares_connection(self):
+        """测试嵌套connect()/close()共享同一个连接"""
+        database = make_database()
+        outer = database.connect()
+        inner = database.connect()
+        assert inner is outer
+
+        database.close()
+        assert database.conn is outer
+        database.close()
+        assert database.conn is None
+        assert database.get_pool_stats()['in_use'] == 0
+
+    def test_threads_get_separate_connections(self):
+        """测试不同线程获得各自的连接"""
+        database = make_database()
+        main_conn = database.connect()
+        result = {}
+
+        def worker():
+            result['conn'] = database.connect()
+            database.close()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+
+        assert result['conn'] is not main_conn
+        assert database.conn is main_conn
+        database.close()
+
+    def test_session_releases_unpaired_connect(self):
+        """测试最外层会话退出时归还未配对的连接"""
+        database = make_database()
+        with database.session():
+            database.connect()
+            database.connect()
+            assert database.get_pool_stats()['in_use'] == 1
+
+        assert database.conn is None
+        assert database.get_pool_stats()['in_use'] == 0
+
+    def test_exited_thread_returns_implicit_connection(self):
+        """测试未调用close()的线程结束后隐式获取的连接归还连接池"""
+        database = make_database(pool_size=1, max_overflow=0)
+
+        for _ in range(3):
+            thread = threading.Thread(target=database.fetchone, args=("SELECT 1 AS value",))
+            thread.start()
+            thread.join()
+            gc.collect()
+
+            stats = database.get_pool_stats()
+            assert stats['in_use'] == 0
+            assert stats['total'] == 1
+
+    def test_run_scoped_releases_after_task(self):
+        """测试线程池任务结束时归还连接，任务开始前不获取连接"""
+        database = make_database()
+        seen = []
+
+        def task():
+            seen.append(database.get_pool_stats()['in_use'])
+            return database.fetchone("SELECT 1 AS value")
+
+        assert database.run_scoped(task) == {'value': 1}
+        assert seen == [0]
+        assert database.conn is None
+        assert database.get_pool_stats()['in_use'] == 0
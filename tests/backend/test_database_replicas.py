@@ -0,0 +1,170 @@
+"""
+读写分离测试
+验证查询路由到只读副本、写后读主库、延迟回退和副本故障回退
+"""
+import pytest
+import sys
+import os
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'src'))
+
+import pymysql
+from models.connection_pool import ConnectionPool
+from models.database import Database
+from models.replica_router import ReplicaRouter
+
+
+class RoutedCursor:
+    """记录语句所在连接的模拟游标"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = 1
+        self.lastrowid = 1
+        self._result = None
+
+    def execute(self, sql, params=()):
+        if self.connection.broken:
+            raise pymysql.err.OperationalError(2013, 'Lost connection to MySQL server during query')
+        if self.connection.status_error is not None and sql.startswith('SHOW REPLICA STATUS'):
+            self.connection.statements.append(sql)
+            raise self.connection.status_error
+        if self.connection.denied and sql.startswith('SHOW'):
+            raise pymysql.err.OperationalError(
+                1227, 'Access denied; you need (at least one of) the SUPER, REPLICATION CLIENT privilege(s) '
+                      'for this operation')
+        self.connection.statements.append(sql)
+        if sql.startswith('SHOW REPLICA STATUS'):
+            self._result = {'Seconds_Behind_Source': self.connection.lag}
+        elif sql.startswith('SHOW SLAVE STATUS'):
+            self._result = {'Seconds_Behind_Master': self.connection.lag}
+        else:
+            self._result = {'source': self.connection.role}
+
+    def fetchone(self):
+        return self._result
+
+    def fetchall(self):
+        return [self._result]
+
+    def close(self):
+        pass
+
+
+class RoutedConnection:
+    """带角色标识的模拟连接"""
+
+    def __init__(self, role, lag=0):
+        self.role = role
+        self.lag = lag
+        self.broken = False
+        self.denied = False
+        self.status_error = None
+        self.open = True
+        self.statements = []
+
+    def cursor(self):
+        return RoutedCursor(self)
+
+    def ping(self, reconnect=False):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.open = False
+
+
+@pytest.fixture
+def replica_connection():
+    """副本使用的单个模拟连接"""
+    return RoutedConnection('replica')
+
+
+@pytest.fixture
+def database(replica_connection):
+    """配置一个只读副本的Database实例"""
+    database = Database()
+    database.config.replica_hosts = [('replica', 3306)]
+    database._pool = ConnectionPool({}, pool_size=1, max_overflow=0,
+                                    creator=lambda **kwargs: RoutedConnection('primary'))
+    replica_pool = ConnectionPool({}, pool_size=1, max_overflow=0, creator=lambda **kwargs: replica_connection)
+    database._router = ReplicaRouter({'replica:3306': replica_pool}, max_lag=5, check_interval=60)
+    yield database
+    database.end_request()
+
+
+class TestReplicaRouting:
+    """读写分离路由测试"""
+
+    def test_reads_use_replica(self, database):
+        """测试普通查询路由到副本"""
+        assert database.fetchone("SELECT * FROM certificates WHERE id = ?", (1,))['source'] == 'replica'
+        assert database.fetchall("SELECT * FROM certificates")[0]['source'] == 'replica'
+
+    def test_read_your_writes(self, database):
+        """测试写入后本请求内的读取走主库，请求结束后恢复副本读取"""
+        database.execute("UPDATE certificates SET status = ? WHERE id = ?", ('valid', 1))
+        assert database.fetchone("SELECT * FROM certificates WHERE id = ?", (1,))['source'] == 'primary'
+
+        database.end_request()
+        assert database.fetchone("SELECT * FROM certificates WHERE id = ?", (1,))['source'] == 'replica'
+
+    def test_forced_primary_reads(self, database):
+        """测试加锁读取和use_primary()读主库"""
+        assert database.fetchone("SELECT * FROM certificates WHERE id = ? FOR UPDATE", (1,))['source'] == 'primary'
+        with database.use_primary():
+            assert database.fetchone("SELECT * FROM certificates")['source'] == 'primary'
+        assert database.fetchone("SELECT * FROM certificates")['source'] == 'replica'
+
+    def test_lagging_replica_falls_back(self, database, replica_connection):
+        """测试复制延迟超过阈值时回退主库"""
+        replica_connection.lag = 30
+        assert database.fetchone("SELECT * FROM certificates")['source'] == 'primary'
+
+        stats = database.get_pool_stats()['replicas']
+        assert stats['fallbacks'] == 1
+        assert stats['replicas'][0]['healthy'] is False
+        assert stats['replicas'][0]['lag'] == 30
+
+    def test_broken_replica_falls_back(self, database, replica_connection):
+        """测试副本查询失败时回退主库并暂停使用副本"""
+        database.fetchone("SELECT 1")
+        replica_connection.broken = True
+
+        assert database.fetchone("SELECT * FROM certificates")['source'] == 'primary'
+        assert database.router.replicas[0].healthy is False
+        assert database.fetchone("SELECT * FROM certificates")['source'] == 'primary'
+
+    def test_replica_status_privilege_denied(self, database, replica_connection):
+        """测试缺少REPLICATION CLIENT权限时延迟未知，副本仍可读取"""
+        replica_connection.denied = True
+
+        assert database.fetchone("SELECT * FROM certificates")['source'] == 'replica'
+        replica = database.router.replicas[0]
+        assert replica.healthy is True
+        assert replica.lag is None
+        assert replica_connection.open
+
+    def test_legacy_server_uses_slave_status(self, database, replica_connection):
+        """测试服务器不支持SHOW REPLICA STATUS语法时改用SHOW SLAVE STATUS"""
+        replica_connection.status_error = pymysql.err.ProgrammingError(
+            1064, "You have an error in your SQL syntax; check the manual near 'REPLICA STATUS'")
+
+        assert database.fetchone("SELECT * FROM certificates")['source'] == 'replica'
+        assert 'SHOW SLAVE STATUS' in replica_connection.statements
+        assert database.router.replicas[0].lag == 0
+
+    def test_status_timeout_not_retried_with_slave_status(self, database, replica_connection):
+        """测试复制状态查询超时时不改用SHOW SLAVE STATUS，副本标记为不可用"""
+        replica_connection.status_error = pymysql.err.OperationalError(
+            2013, 'Lost connection to MySQL server during query')
+
+        assert database.fetchone("SELECT * FROM certificates")['source'] == 'primary'
+        assert 'SHOW SLAVE STATUS' not in replica_connection.statements
+        assert database.router.replicas[0].healthy is False
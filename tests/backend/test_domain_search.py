@@ -0,0 +1,113 @@
+"""
+域名搜索测试
+测试后缀查询、通配符覆盖查询、全文子串查询条件以及内存匹配规则
+"""
+import pytest
+import sys
+import os
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'src'))
+
+from models.domain_search import (
+    domain_search_condition, substring_condition, domain_matches, reverse_domain, escape_like
+)
+from models.certificate import Certificate
+from models.server import Server
+
+
+class TestDomainSearchCondition:
+    """域名搜索条件测试"""
+
+    def test_suffix_query(self):
+        """测试*.前缀的关键词按反转域名前缀查询子域名"""
+        condition, params = domain_search_condition('*.Shop.Example.com', prefix='c.')
+        assert condition == "c.domain_reversed LIKE ?"
+        assert params == ['moc.elpmaxe.pohs.%']
+
+    def test_domain_query_includes_apex_and_wildcard(self):
+        """测试完整域名匹配自身、子域名和覆盖它的通配符证书"""
+        condition, params = domain_search_condition('shop.example.com')
+        assert condition == "(domain_reversed = ? OR domain_reversed LIKE ? OR domain = ?)"
+        assert params == ['moc.elpmaxe.pohs', 'moc.elpmaxe.pohs.%', '*.example.com']
+
+    def test_apex_query_has_no_tld_wildcard(self):
+        """测试顶级域名下不查询通配符证书"""
+        condition, params = domain_search_condition('example.com')
+        assert condition == "(domain_reversed = ? OR domain_reversed LIKE ?)"
+        assert params == ['moc.elpmaxe', 'moc.elpmaxe.%']
+
+    def test_substring_query_uses_fulltext(self):
+        """测试不含点的关键词使用全文索引筛选并用LIKE校验"""
+        condition, params = domain_search_condition('shop-api', prefix='c.')
+        assert condition == "(MATCH(c.domain) AGAINST(? IN BOOLEAN MODE) AND c.domain LIKE ?)"
+        assert params == ['+"shop" +"api"', '%shop-api%']
+
+    @pytest.mark.parametrize('keyword, against', [
+        ('api.exam', '+"api" +"exam"'),
+        ('example.co', '+"example" +"co"'),
+        ('shop.example', '+"shop" +"example"'),
+    ])
+    def test_fragment_mode_uses_fulltext_only(self, keyword, against):
+        """测试片段模式的含点关键词只用全文索引筛选，不与反转域名条件混合"""
+        condition, params = domain_search_condition(keyword, prefix='c.', mode='fragment')
+        assert condition == "(MATCH(c.domain) AGAINST(? IN BOOLEAN MODE) AND c.domain LIKE ?)"
+        assert params == [against, f'%{keyword}%']
+
+    def test_fragment_mode_without_terms_uses_domain_query(self):
+        """测试片段中没有可用的检索词时退回域名查询"""
+        assert domain_search_condition('a.b', mode='fragment') == domain_search_condition('a.b')
+
+    def test_short_keyword_falls_back_to_like(self):
+        """测试短于ngram长度的关键词退回LIKE"""
+        assert substring_condition(('domain',), 'a') == ("domain LIKE ?", ['%a%'])
+
+    def test_like_wildcards_escaped(self):
+        """测试LIKE通配符被转义"""
+        assert escape_like('a_b%') == 'a\\_b\\%'
+        assert reverse_domain('A.B') == 'b.a'
+
+
+class TestDomainMatches:
+    """内存匹配测试"""
+
+    @pytest.mark.parametrize('domain, keyword, expected', [
+        ('api.example.com', 'example.com', True),
+        ('example.com', 'example.com', True),
+        ('myexample.com', 'example.com', False),
+        ('*.example.com', 'shop.example.com', True),
+        ('example.com', '*.example.com', False),
+        ('a.example.com', '.example.com', True),
+        ('api.example.com', 'api', True),
+    ])
+    def test_domain_matches(self, domain, keyword, expected):
+        """测试与SQL条件一致的匹配规则"""
+        assert domain_matches(domain, keyword) is expected
+
+    def test_fragment_matches(self):
+        """测试片段模式按子串匹配"""
+        assert domain_matches('api.example.com', 'api.exam', mode='fragment')
+        assert not domain_matches('api.example.com', 'api.exam')
+
+
+class TestSearchRouting:
+    """搜索接口条件测试"""
+
+    def test_certificate_filters(self):
+        """测试证书列表关键词使用域名搜索条件"""
+        conditions, params = Certificate._build_filters('*.example.com', 'valid', prefix='c.')
+        assert conditions == ["c.domain_reversed LIKE ?", "c.status = ?"]
+        assert params == ['moc.elpmaxe.%', 'valid']
+
+    def test_certificate_fragment_filter(self):
+        """测试证书列表片段模式"""
+        conditions, params = Certificate._build_filters('example.co', prefix='c.', search_mode='fragment')
+        assert conditions == ["(MATCH(c.domain) AGAINST(? IN BOOLEAN MODE) AND c.domain LIKE ?)"]
+        assert params == ['+"example" +"co"', '%example.co%']
+
+    def test_server_keyword(self):
+        """测试服务器关键词：IP片段按前缀查询，其他按名称全文查询"""
+        assert Server._keyword_condition('10.0.') == ("ip LIKE ?", ['10.0.%'])
+        condition, params = Server._keyword_condition('web')
+        assert condition.startswith("(MATCH(name) AGAINST(? IN BOOLEAN MODE)")
+        assert params == ['+"web"', '%web%']
@@ -0,0 +1,147 @@
+"""
+批量加载和标识映射测试
+测试按主键批量查询、同一作用域内重复查找命中内存以及服务器证书数量批量统计
+"""
+import pytest
+import sys
+import os
+import re
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'src'))
+
+import models.certificate as certificate_module
+import models.server as server_module
+from models.certificate import Certificate
+from models.server import Server
+from models.identity_map import IdentityMap, identity_map
+
+
+class TableDatabase:
+    """按表和主键返回内存数据的模拟数据库"""
+
+    def __init__(self):
+        self.tables = {
+            'certificates': {
+                cert_id: {'id': cert_id, 'domain': f'host{cert_id}.example.com', 'server_id': cert_id % 2 + 1,
+                          'private_key': f'KEY{cert_id}', 'certificate': f'CHAIN{cert_id}'}
+                for cert_id in range(1, 8)
+            },
+            'servers': {server_id: {'id': server_id, 'name': f'web-{server_id}'} for server_id in (1, 2)}
+        }
+        self.queries = []
+
+    def connect(self):
+        pass
+
+    def close(self):
+        pass
+
+    def _table(self, sql):
+        return re.search(r'FROM (\w+)', sql).group(1)
+
+    def _project(self, sql, row):
+        columns = sql.split('SELECT', 1)[1].split('FROM', 1)[0]
+        if columns.strip() == '*':
+            return dict(row)
+        names = [name.strip() for name in columns.split(',')]
+        return {name: row[name] for name in names if name in row}
+
+    def fetchone(self, sql, params=()):
+        self.queries.append((sql, params))
+        row = self.tables[self._table(sql)].get(params[0])
+        return self._project(sql, row) if row else None
+
+    def fetchall(self, sql, params=()):
+        self.queries.append((sql, params))
+        table = self.tables[self._table(sql)]
+        if 'GROUP BY server_id' in sql:
+            counts = {}
+            for row in table.values():
+                if row['server_id'] in params:
+                    counts[row['server_id']] = counts.get(row['server_id'], 0) + 1
+            return [{'server_id': server_id, 'count': count} for server_id, count in counts.items()]
+        if 'domain IN' in sql:
+            server_id, domains = params[0], {domain.lower() for domain in params[1:]}
+            return [self._project(sql, row) for row in table.values()
+                    if row['server_id'] == server_id and row['domain'] in domains]
+        return [self._project(sql, table[key]) for key in params if key in table]
+
+
+@pytest.fixture
+def table_db(monkeypatch):
+    """替换模型使用的全局数据库，并开启标识映射作用域"""
+    database = TableDatabase()
+    monkeypatch.setattr(certificate_module, 'db', database)
+    monkeypatch.setattr(server_module, 'db', database)
+    with identity_map.scope():
+        yield database
+
+
+class TestIdentityMap:
+    """标识映射测试"""
+
+    def test_inactive_scope_does_not_cache(self):
+        """测试未开启作用域时不缓存"""
+        mapping = IdentityMap()
+        assert mapping.add(Server, 1, 'server') == 'server'
+        assert mapping.get(Server, 1) is None
+
+    def test_add_keeps_first_instance(self):
+        """测试同一主键只保留一个实例，嵌套作用域复用外层"""
+        mapping = IdentityMap()
+        with mapping.scope():
+            first = object()
+            assert mapping.add(Server, 1, first) is first
+            assert mapping.add(Server, 1, object()) is first
+            with mapping.scope():
+                assert mapping.get(Server, 1) is first
+            found, missing = mapping.get_many(Server, [1, 2, 2, None])
+            assert found == {1: first}
+            assert missing == [2]
+        assert not mapping.active
+
+
+class TestBatchLoaders:
+    """批量加载测试"""
+
+    def test_repeated_get_by_id_hits_memory(self, table_db):
+        """测试同一作用域内重复查找只查询一次"""
+        first = Certificate.get_by_id(3)
+        assert Certificate.get_by_id(3) is first
+        assert Server.get_by_id(1) is Server.get_by_id(1)
+        assert len(table_db.queries) == 2
+
+    def test_get_many_uses_in_query_and_map(self, table_db):
+        """测试批量查询只查未缓存的主键，并分批生成IN查询"""
+        cached = Certificate.get_by_id(1)
+        certificates = Certificate.get_many([1, 2, 3, 4, 5, 99], chunk_size=2)
+
+        assert certificates[1] is cached
+        assert sorted(certificates) == [1, 2, 3, 4, 5]
+        in_queries = [params for sql, params in table_db.queries if 'IN (' in sql]
+        assert in_queries == [(2, 3), (4, 5), (99,)]
+        assert 'private_key' not in table_db.queries[-1][0]
+
+    def test_get_many_with_content(self, table_db):
+        """测试批量加载内容时已缓存对象的内容也通过一次IN查询补齐"""
+        cached = Certificate.get_by_id(1)
+        certificates = Certificate.get_many([1, 2], with_content=True)
+
+        assert certificates[2].certificate == 'CHAIN2'
+        assert cached.private_key == 'KEY1'
+        assert len(table_db.queries) == 3
+
+    def test_get_by_domains(self, table_db):
+        """测试按域名批量查询并登记到标识映射"""
+        certificates = Certificate.get_by_domains(2, ['HOST1.example.com', 'host3.example.com', 'missing.example.com'])
+        assert sorted(certificates) == ['host1.example.com', 'host3.example.com']
+        assert Certificate.get_by_id(3) is certificates['host3.example.com']
+        assert len(table_db.queries) == 1
+
+    def test_server_get_many_and_counts(self, table_db):
+        """测试服务器批量加载和证书数量分组统计"""
+        servers = Server.get_many([2, 1, 2])
+        assert {server_id: server.name for server_id, server in servers.items()} == {1: 'web-1', 2: 'web-2'}
+        assert Server.get_certificate_counts([1, 2, 3]) == {1: 3, 2: 4, 3: 0}
+        assert Server.get_certificate_counts([]) == {}
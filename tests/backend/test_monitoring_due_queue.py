@@ -0,0 +1,100 @@
+"""
+域名监控到期队列测试
+测试next_check_at计算和调度器领取到期证书
+"""
+import pytest
+import sys
+import os
+import datetime
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'src'))
+
+import models.certificate as certificate_module
+from models.certificate import Certificate
+
+
+class ClaimDatabase:
+    """记录语句的模拟数据库"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+        self.committed = False
+        self.rolled_back = False
+
+    def connect(self):
+        pass
+
+    def close(self):
+        pass
+
+    def fetchall(self, sql, params=()):
+        self.statements.append((' '.join(sql.split()), params))
+        return self.rows[:params[-1]]
+
+    def execute(self, sql, params=()):
+        self.statements.append((' '.join(sql.split()), params))
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+@pytest.fixture
+def claim_db(monkeypatch):
+    """替换证书模型使用的全局数据库"""
+    database = ClaimDatabase([
+        {'id': 3, 'domain': 'new.example.com', 'last_dns_check': None},
+        {'id': 7, 'domain': 'old.example.com', 'last_dns_check': datetime.datetime(2025, 1, 1)},
+    ])
+    monkeypatch.setattr(certificate_module, 'db', database)
+    return database
+
+
+class TestNextCheckAt:
+    """下次检查时间计算测试"""
+
+    def test_never_checked_is_due(self):
+        """测试未检查过的证书立即到期"""
+        assert Certificate(monitoring_frequency=600).compute_next_check_at() is None
+
+    def test_last_check_plus_frequency(self):
+        """测试按上次检查时间加监控频率计算"""
+        last_check = datetime.datetime(2025, 1, 1, 12, 0, 0)
+        certificate = Certificate(last_dns_check=last_check, monitoring_frequency=900)
+        assert certificate.compute_next_check_at() == last_check + datetime.timedelta(seconds=900)
+
+    def test_iso_string_and_default_frequency(self):
+        """测试ISO字符串时间和缺省监控频率"""
+        certificate = Certificate(last_dns_check='2025-01-01T12:00:00', monitoring_frequency=None)
+        assert certificate.compute_next_check_at() == datetime.datetime(2025, 1, 1, 13, 0, 0)
+
+
+class TestClaimDueForCheck:
+    """领取到期证书测试"""
+
+    def test_claim_uses_next_check_at_and_reschedules(self, claim_db):
+        """测试按next_check_at领取并推迟已领取证书的下次检查时间"""
+        rows = Certificate.claim_due_for_check(limit=50)
+
+        assert [row['id'] for row in rows] == [3, 7]
+        select_sql, select_params = claim_db.statements[0]
+        assert 'next_check_at IS NULL OR next_check_at <= CURRENT_TIMESTAMP' in select_sql
+        assert 'ORDER BY next_check_at ASC' in select_sql
+        assert 'datetime(' not in select_sql
+        assert select_sql.endswith('FOR UPDATE SKIP LOCKED')
+        assert select_params == (50,)
+
+        update_sql, update_params = claim_db.statements[1]
+        assert update_sql.startswith('UPDATE certificates SET next_check_at = CURRENT_TIMESTAMP + INTERVAL')
+        assert update_params == (3, 7)
+        assert claim_db.committed
+
+    def test_nothing_due(self, claim_db):
+        """测试没有到期证书时不执行更新"""
+        claim_db.rows = []
+        assert Certificate.claim_due_for_check() == []
+        assert len(claim_db.statements) == 1
@@ -0,0 +1,198 @@
+"""
+监控历史测试
+测试月分区子句、分区维护、过期分区删除、汇总语句和查询粒度选择
+"""
+import pytest
+import sys
+import os
+import datetime
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'src'))
+
+from models.monitoring_history import (
+    MonitoringHistory, HISTORY_SOURCES, GRANULARITIES, InvalidHistoryRangeError,
+    build_partition_clause, build_rollup_query, choose_granularity, partition_name, add_months
+)
+
+
+def upper_bound(year, month):
+    """月分区上界(下个月第一天)的UNIX时间戳"""
+    return int(add_months(datetime.datetime(year, month, 1), 1).timestamp())
+
+
+class FakeCursor:
+    def __init__(self, rowcount=0):
+        self.rowcount = rowcount
+
+    def close(self):
+        pass
+
+
+class FakeDatabase:
+    """记录语句的模拟数据库，INFORMATION_SCHEMA查询返回预设分区"""
+
+    def __init__(self, partitions=(), latest=None):
+        self.partitions = list(partitions)
+        self.latest = latest
+        self.statements = []
+        self.commits = 0
+
+    def connect(self):
+        pass
+
+    def close(self):
+        pass
+
+    def commit(self):
+        self.commits += 1
+
+    def execute(self, sql, params=()):
+        self.statements.append((sql, params))
+        return FakeCursor()
+
+    def fetchone(self, sql, params=()):
+        self.statements.append((sql, params))
+        if 'GET_LOCK' in sql:
+            return {'acquired': 1}
+        if 'MAX(bucket_start)' in sql:
+            return {'latest': self.latest}
+        return None
+
+    def fetchall(self, sql, params=()):
+        self.statements.append((sql, params))
+        if 'INFORMATION_SCHEMA.PARTITIONS' in sql:
+            return [{'name': name, 'description': description} for name, description in self.partitions]
+        return [{'port': 0, 'bucket_start': datetime.datetime(2026, 10, 1), 'check_count': 4,
+                 'success_count': 3, 'response_time_avg': 120, 'response_time_p50': 100,
+                 'response_time_p95': 300}]
+
+
+class TestPartitions:
+    """分区维护测试"""
+
+    def test_partition_clause(self):
+        """测试建表分区子句包含当前月份、之后的月份和MAXVALUE分区"""
+        clause = build_partition_clause(datetime.datetime(2026, 11, 20), months_ahead=2)
+
+        assert clause.startswith("PARTITION BY RANGE (UNIX_TIMESTAMP(`created_at`))")
+        assert "PARTITION p202611 VALUES LESS THAN (UNIX_TIMESTAMP('2026-12-01 00:00:00'))" in clause
+        assert "PARTITION p202701 VALUES LESS THAN (UNIX_TIMESTAMP('2027-02-01 00:00:00'))" in clause
+        assert clause.count('PARTITION p') == 4
+        assert clause.rstrip(')\n').endswith('pmax VALUES LESS THAN MAXVALUE')
+        assert partition_name(datetime.datetime(2027, 1, 1)) == 'p202701'
+
+    def test_ensure_partitions_reorganizes_maxvalue(self, monkeypatch):
+        """测试缺少的未来月份从MAXVALUE分区拆分"""
+        database = FakeDatabase(partitions=[
+            ('p202610', str(upper_bound(2026, 10))),
+            ('pmax', 'MAXVALUE'),
+        ])
+        history = MonitoringHistory(database)
+        history.months_ahead = 2
+
+        created = history.ensure_partitions('domain_monitoring_history', datetime.datetime(2026, 10, 17))
+
+        assert created == ['p202611', 'p202612']
+        sql = database.statements[-1][0]
+        assert sql.startswith("ALTER TABLE `domain_monitoring_history` REORGANIZE PARTITION pmax INTO (")
+        assert sql.endswith("PARTITION pmax VALUES LESS THAN MAXVALUE)")
+
+    def test_ensure_partitions_skips_unpartitioned_table(self):
+        """测试未执行分区迁移的表不做分区维护"""
+        database = FakeDatabase()
+        assert MonitoringHistory(database).ensure_partitions('domain_monitoring_history') == []
+        assert not any(sql.startswith('ALTER') for sql, _ in database.statements)
+
+    def test_drop_expired_partitions(self):
+        """测试只删除上界早于保留期的分区，MAXVALUE分区保留"""
+        database = FakeDatabase(partitions=[
+            ('p_history', str(upper_bound(2026, 6))),
+            ('p202607', str(upper_bound(2026, 7))),
+            ('p202608', str(upper_bound(2026, 8))),
+            ('pmax', 'MAXVALUE'),
+        ])
+        history = MonitoringHistory(database)
+        history.retention_days = 60
+
+        dropped = history.drop_expired_partitions('port_monitoring_history', datetime.datetime(2026, 10, 17))
+
+        assert dropped == ['p_history', 'p202607']
+        assert database.statements[-1][0] == "ALTER TABLE `port_monitoring_history` DROP PARTITION p_history, p202607"
+
+    def test_unpartitioned_table_falls_back_to_delete(self):
+        """测试未分区的表按批DELETE过期记录"""
+        database = FakeDatabase()
+        history = MonitoringHistory(database)
+        history.retention_days = 30
+
+        assert history.drop_expired_partitions('domain_monitoring_history', datetime.datetime(2026, 10, 17)) == []
+        sql, params = database.statements[-1]
+        assert sql.startswith("DELETE FROM `domain_monitoring_history` WHERE `created_at` < ? LIMIT")
+        assert params == (datetime.datetime(2026, 9, 17),)
+        assert database.commits == 1
+
+
+class TestRollups:
+    """汇总测试"""
+
+    def test_rollup_query(self):
+        """测试汇总语句按桶范围过滤、排除started记录并按端口分组"""
+        sql = build_rollup_query(HISTORY_SOURCES['port'], GRANULARITIES['hour'])
+
+        assert sql.startswith("INSERT INTO `monitoring_rollups_hourly`")
+        assert "`handshake_time_p95`" in sql
+        assert "`port` AS port" in sql
+        assert "WHERE created_at >= ? AND created_at < ? AND status <> 'started'" in sql
+        assert "status IN ('success', 'healthy')" in sql
+        assert sql.count('?') == 3
+        assert "ON DUPLICATE KEY UPDATE" in sql
+
+        domain_sql = build_rollup_query(HISTORY_SOURCES['domain'], GRANULARITIES['day'])
+        assert "0 AS port" in domain_sql
+        assert "`response_time_avg`" in domain_sql
+
+    def test_run_rollups_resumes_from_latest_bucket(self):
+        """测试从最近的汇总桶继续，重新汇总该桶并跳过未结束的桶"""
+        now = datetime.datetime(2026, 10, 17, 15, 3)
+        database = FakeDatabase(latest=datetime.datetime(2026, 10, 17, 12))
+        history = MonitoringHistory(database)
+
+        processed = history.run_rollups(now)
+
+        hourly = [params for sql, params in database.statements
+                  if sql.startswith('INSERT INTO `monitoring_rollups_hourly`')]
+        # 15:03在宽限时间内，14点的桶尚未汇总
+        assert [params[0].hour for params in hourly] == [12, 13] * 2
+        assert hourly[0][2] == datetime.datetime(2026, 10, 17, 13)
+        assert processed['hour'] == 4
+
+    def test_run_rollups_backfill_limit(self):
+        """测试没有汇总数据时最多补算backfill范围"""
+        database = FakeDatabase()
+        processed = MonitoringHistory(database).run_rollups(datetime.datetime(2026, 10, 17, 15, 30))
+
+        assert processed == {'hour': 48 * 2, 'day': 7 * 2}
+
+    def test_query_rollups_success_rate(self):
+        """测试汇总查询计算成功率"""
+        database = FakeDatabase()
+        rows = MonitoringHistory(database).query_rollups(
+            'domain', 7, datetime.datetime(2026, 9, 1, 8), datetime.datetime(2026, 10, 1), 'day'
+        )
+
+        assert rows[0]['success_rate'] == 0.75
+        sql, params = database.statements[-1]
+        assert 'FROM `monitoring_rollups_daily`' in sql
+        assert params == ('domain', 7, datetime.datetime(2026, 9, 1), datetime.datetime(2026, 10, 1))
+
+        with pytest.raises(InvalidHistoryRangeError):
+            MonitoringHistory(database).query_rollups('domain', 7, datetime.datetime(2026, 9, 1),
+                                                      datetime.datetime(2026, 10, 1), 'minute')
+
+    def test_choose_granularity(self):
+        """测试按查询范围选择原始记录、小时汇总或天汇总"""
+        end = datetime.datetime(2026, 10, 17)
+        assert choose_granularity(end - datetime.timedelta(hours=12), end) == 'raw'
+        assert choose_granularity(end - datetime.timedelta(days=7), end) == 'hour'
+        assert choose_granularity(end - datetime.timedelta(days=90), end) == 'day'
@@ -0,0 +1,137 @@
+"""
+游标分页测试
+测试游标编解码、定位条件生成、前后翻页和计数缓存
+"""
+import pytest
+import sys
+import os
+import datetime
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'src'))
+
+from models.pagination import (
+    KeysetPaginator, CountCache, InvalidCursorError, encode_cursor, decode_cursor
+)
+
+
+class ListDatabase:
+    """基于内存列表模拟按(created_at, id)排序查询的数据库"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def fetchall(self, sql, params=()):
+        self.queries.append((sql, params))
+        limit = params[-1]
+        descending = 'DESC' in sql.split('ORDER BY')[1]
+        rows = sorted(self.rows, key=lambda row: (row['created_at'], row['id']), reverse=descending)
+        if ' OR ' in sql:
+            # 定位条件参数: k1, k1, k2, limit
+            seek = (params[-4], params[-2])
+            if ' < ' in sql:
+                rows = [row for row in rows if (row['created_at'], row['id']) < seek]
+            else:
+                rows = [row for row in rows if (row['created_at'], row['id']) > seek]
+        return [dict(row) for row in rows[:limit]]
+
+    def fetchone(self, sql, params=()):
+        self.queries.append((sql, params))
+        return {'total': len(self.rows)}
+
+
+@pytest.fixture
+def rows():
+    """同一时间戳下存在多条记录的测试数据"""
+    base = datetime.datetime(2025, 1, 1, 12, 0, 0)
+    return [
+        {'id': index, 'created_at': base + datetime.timedelta(minutes=index // 2)}
+        for index in range(1, 8)
+    ]
+
+
+class TestCursor:
+    """游标编解码测试"""
+
+    def test_round_trip(self):
+        """测试日期时间值编码后可还原"""
+        value = datetime.datetime(2025, 3, 1, 8, 30, 15)
+        values, direction = decode_cursor(encode_cursor([value, 42], 'prev'))
+        assert values == [value, 42]
+        assert direction == 'prev'
+
+    def test_invalid_cursor(self):
+        """测试无效游标抛出异常"""
+        with pytest.raises(InvalidCursorError):
+            decode_cursor('not-a-cursor')
+        with pytest.raises(InvalidCursorError):
+            decode_cursor(encode_cursor([1], 'sideways'))
+
+
+class TestKeysetPaginator:
+    """游标分页器测试"""
+
+    def test_seek_clause(self):
+        """测试生成展开的OR定位条件"""
+        paginator = KeysetPaginator([('c.expires_at', 'expires_at'), ('c.id', 'id')])
+        clause, params = paginator._seek_clause('>', ['2025-01-01', 5])
+        assert clause == '((c.expires_at > ?) OR (c.expires_at = ? AND c.id > ?))'
+        assert params == ['2025-01-01', '2025-01-01', 5]
+
+    def test_cursor_length_mismatch(self):
+        """测试游标与排序字段数量不一致"""
+        paginator = KeysetPaginator([('created_at', 'created_at'), ('id', 'id')])
+        with pytest.raises(InvalidCursorError):
+            paginator.paginate(ListDatabase([]), "SELECT * FROM t", cursor=encode_cursor([1]))
+
+    def test_next_and_prev_pages(self, rows):
+        """测试降序分页的前后翻页结果连续且不重复"""
+        database = ListDatabase(rows)
+        paginator = KeysetPaginator([('created_at', 'created_at'), ('id', 'id')], descending=True)
+
+        first, info = paginator.paginate(database, "SELECT * FROM t", limit=3)
+        assert [row['id'] for row in first] == [7, 6, 5]
+        assert info['has_next'] and not info['has_prev']
+        assert info['prev_cursor'] is None
+
+        second, info = paginator.paginate(database, "SELECT * FROM t", cursor=info['next_cursor'], limit=3)
+        assert [row['id'] for row in second] == [4, 3, 2]
+        assert info['has_next'] and info['has_prev']
+
+        last, last_info = paginator.paginate(database, "SELECT * FROM t", cursor=info['next_cursor'], limit=3)
+        assert [row['id'] for row in last] == [1]
+        assert not last_info['has_next']
+        assert last_info['next_cursor'] is None
+
+        back, back_info = paginator.paginate(database, "SELECT * FROM t", cursor=info['prev_cursor'], limit=3)
+        assert [row['id'] for row in back] == [7, 6, 5]
+        assert not back_info['has_prev']
+
+        # 查询不包含OFFSET
+        assert all('OFFSET' not in sql for sql, _ in database.queries)
+
+
+class TestCountCache:
+    """计数缓存测试"""
+
+    def test_cached_within_ttl(self):
+        """测试TTL内重复计数不访问数据库"""
+        database = ListDatabase([{'id': 1}, {'id': 2}])
+        cache = CountCache(ttl=60)
+
+        assert cache.get_count(database, "SELECT COUNT(*) as total FROM t", ()) == 2
+        assert cache.get_count(database, "SELECT COUNT(*) as total FROM t", ()) == 2
+        assert len(database.queries) == 1
+
+        cache.clear()
+        cache.get_count(database, "SELECT COUNT(*) as total FROM t", ())
+        assert len(database.queries) == 2
+
+    def test_expired_entry_requeried(self):
+        """测试过期计数重新查询"""
+        database = ListDatabase([])
+        cache = CountCache(ttl=0)
+        cache.get_count(database, "SELECT COUNT(*) as total FROM t", ())
+        cache.get_count(database, "SELECT COUNT(*) as total FROM t", ())
+        assert len(database.queries) == 2
@@ -0,0 +1,141 @@
+"""
+认证主体缓存测试
+测试用户行缓存命中、TTL过期、版本戳跨worker失效以及用户变更时的失效
+"""
+import pytest
+import sys
+import os
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'src'))
+
+import models.user as user_module
+from models.user import User
+from models.principal_cache import PrincipalCache, VERSION_KEY
+
+
+class Cursor:
+    def close(self):
+        pass
+
+
+class SettingsDatabase:
+    """保存版本戳并记录查询的模拟数据库(多个缓存实例共享时模拟多个worker)"""
+
+    def __init__(self):
+        self.version = None
+        self.version_reads = 0
+        self.users = {1: {'id': 1, 'username': 'admin', 'email': 'admin@example.com', 'role': 'admin',
+                          'created_at': None, 'updated_at': None}}
+        self.user_reads = 0
+
+    def connect(self):
+        pass
+
+    def close(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def execute(self, sql, params=()):
+        if 'INTO `settings`' in sql:
+            self.version = str(int(self.version or 0) + 1)
+        return Cursor()
+
+    def fetchone(self, sql, params=()):
+        if 'FROM `settings`' in sql:
+            assert params == (VERSION_KEY,)
+            self.version_reads += 1
+            return {'value': self.version} if self.version else None
+        self.user_reads += 1
+        row = self.users.get(params[0])
+        return dict(row) if row else None
+
+    def load(self, user_id):
+        return self.fetchone("SELECT * FROM users WHERE id = ?", (user_id,))
+
+
+class TestPrincipalCache:
+    """认证主体缓存测试"""
+
+    def test_hit_without_queries(self):
+        """测试检查间隔内的重复认证不访问数据库"""
+        database = SettingsDatabase()
+        cache = PrincipalCache(ttl=60, maxsize=8, check_interval=60)
+        for _ in range(10):
+            assert cache.get(database, 1, database.load)['role'] == 'admin'
+        assert database.user_reads == 1
+        assert database.version_reads == 1
+        assert cache.get_stats()['hits'] == 9
+
+    def test_ttl_expiry(self):
+        """测试条目过期后重新加载"""
+        database = SettingsDatabase()
+        cache = PrincipalCache(ttl=0, maxsize=8, check_interval=60)
+        cache.get(database, 1, database.load)
+        cache.get(database, 1, database.load)
+        assert database.user_reads == 2
+
+    def test_missing_user_not_cached(self):
+        """测试不存在的用户不缓存"""
+        database = SettingsDatabase()
+        cache = PrincipalCache(ttl=60, maxsize=8, check_interval=60)
+        assert cache.get(database, 2, database.load) is None
+        assert cache.get_stats()['size'] == 0
+
+    def test_version_stamp_invalidates_other_workers(self):
+        """测试一个worker失效后，其他worker检查版本戳时丢弃旧条目"""
+        database = SettingsDatabase()
+        worker_a = PrincipalCache(ttl=60, maxsize=8, check_interval=0)
+        worker_b = PrincipalCache(ttl=60, maxsize=8, check_interval=0)
+        worker_a.get(database, 1, database.load)
+        worker_b.get(database, 1, database.load)
+
+        database.users[1]['role'] = 'user'
+        worker_a.invalidate(database, 1)
+
+        assert worker_b.get(database, 1, database.load)['role'] == 'user'
+        assert worker_a.get(database, 1, database.load)['role'] == 'user'
+
+    def test_lru_bound(self):
+        """测试超出容量时淘汰最久未使用的条目"""
+        database = SettingsDatabase()
+        database.users[2] = dict(database.users[1], id=2)
+        cache = PrincipalCache(ttl=60, maxsize=1, check_interval=60)
+        cache.get(database, 1, database.load)
+        cache.get(database, 2, database.load)
+        assert cache.get_stats()['size'] == 1
+
+
+class TestUserPrincipal:
+    """用户模型认证主体测试"""
+
+    @pytest.fixture
+    def user_db(self, monkeypatch):
+        database = SettingsDatabase()
+        database.update = lambda table, data, condition, params=(): 1
+        database.delete = lambda table, condition, params=(): 1
+        monkeypatch.setattr(user_module, 'db', database)
+        monkeypatch.setattr(user_module, 'principal_cache',
+                            PrincipalCache(ttl=60, maxsize=8, check_interval=60))
+        return database
+
+    def test_get_principal_cached(self, user_db):
+        """测试重复获取认证用户只查询一次"""
+        assert User.get_principal(1).is_admin()
+        assert User.get_principal(1).username == 'admin'
+        assert user_db.user_reads == 1
+
+    def test_save_and_delete_invalidate(self, user_db):
+        """测试更新和删除用户后重新加载"""
+        user = User.get_principal(1)
+        user.role = 'user'
+        user.save()
+        assert user_db.version == '1'
+        user_db.users[1]['role'] = 'user'
+        assert not User.get_principal(1).is_admin()
+
+        user.delete()
+        del user_db.users[1]
+        assert User.get_principal(1) is None
@@ -0,0 +1,95 @@
+"""
+查询指标测试
+测试耗时直方图、慢查询日志、参数形状和请求级查询计数
+"""
+import pytest
+import sys
+import os
+import logging
+import datetime
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'src'))
+
+from models.statement_cache import StatementCache
+from models.query_metrics import QueryMetrics, Histogram, describe_params
+
+
+@pytest.fixture
+def metrics():
+    """独立的查询指标实例"""
+    return QueryMetrics(StatementCache(), slow_query_threshold=0.1, request_query_warning=5)
+
+
+class TestQueryMetrics:
+    """查询指标测试"""
+
+    def test_histogram_cumulative_buckets(self):
+        """测试直方图累积分桶"""
+        histogram = Histogram((0.01, 0.1))
+        for value in (0.005, 0.05, 0.05, 3):
+            histogram.observe(value)
+
+        snapshot = histogram.snapshot()
+        assert snapshot['buckets'] == [(0.01, 1), (0.1, 3)]
+        assert snapshot['count'] == 4
+
+    def test_record_by_operation_and_fingerprint(self, metrics):
+        """测试按语句类型和指纹累计"""
+        select = metrics.cache.compile("SELECT * FROM certificates WHERE id = ?")
+        update = metrics.cache.compile("UPDATE certificates SET status = ? WHERE id = ?")
+        metrics.record(select, 0.002, rows=1, params=(1,))
+        metrics.record(select, 0.003, rows=1, params=(2,))
+        metrics.record(update, 0.004, rows=1, params=('valid', 1), error=True)
+
+        stats = metrics.get_stats()
+        assert stats['latency']['select']['count'] == 2
+        assert stats['latency']['update']['count'] == 1
+        assert stats['rows'] == 3
+        assert stats['errors'] == 1
+
+        top = {query['fingerprint']: query for query in metrics.cache.top_queries()}
+        assert top[select.fingerprint]['rows'] == 2
+
+    def test_slow_query_logged_without_values(self, metrics, caplog):
+        """测试慢查询记录指纹和参数形状，不记录参数值"""
+        statement = metrics.cache.compile("SELECT * FROM users WHERE username = ? AND created_at > ?")
+        with caplog.at_level(logging.INFO, logger='database.slow_query'):
+            metrics.record(statement, 0.2, rows=0, params=('secret-name', datetime.datetime(2025, 1, 1)))
+
+        assert metrics.get_stats()['slow_queries'] == 1
+        record = caplog.records[-1]
+        assert record.extra_fields['fingerprint'] == statement.fingerprint
+        assert record.extra_fields['param_shapes'] == ['str(11)', 'datetime']
+        assert 'secret-name' not in caplog.text
+
+    def test_describe_large_params(self):
+        """测试大量参数时只记录数量和类型"""
+        assert describe_params(tuple(range(100))) == 'tuple[100] of int'
+        assert describe_params({'id': None}) == {'id': 'NoneType'}
+
+    def test_request_query_count(self, metrics):
+        """测试请求级查询计数"""
+        statement = metrics.cache.compile("SELECT 1")
+        metrics.record(statement, 0.001)
+        assert metrics.current_request() is None
+
+        metrics.begin_request()
+        for _ in range(3):
+            metrics.record(statement, 0.001)
+        assert metrics.current_request()['queries'] == 3
+
+        summary = metrics.end_request()
+        assert summary['queries'] == 3
+        assert metrics.get_stats()['request_queries']['count'] == 1
+
+    def test_render_prometheus(self, metrics):
+        """测试导出Prometheus格式"""
+        statement = metrics.cache.compile("DELETE FROM alerts WHERE id = ?")
+        metrics.record(statement, 0.02, rows=1)
+        metrics.record_acquire(0.0005)
+
+        lines = metrics.render_prometheus()
+        assert 'ssl_manager_db_query_duration_seconds_count{operation="delete"} 1' in lines
+        assert 'ssl_manager_db_connection_acquire_seconds_bucket{le="0.001"} 1' in lines
+        assert f'ssl_manager_db_statement_rows_total{{fingerprint="{statement.fingerprint}"}} 1' in lines
@@ -0,0 +1,214 @@
+"""
+监控结果合并写入测试
+测试状态摘要、变化列比较、历史采样，以及检查结果不变时只更新心跳时间
+"""
+import pytest
+import sys
+import os
+from contextlib import contextmanager
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'src'))
+
+from models.certificate import Certificate
+from services.result_coalescing import state_digest, changed_columns, HistorySampler
+from services.domain_monitoring_service import DomainMonitoringService
+from services.port_monitoring_service import PortMonitoringService
+from services import domain_monitoring_scheduler
+from services.domain_monitoring_scheduler import DomainMonitoringScheduler
+
+
+class FakeCursor:
+    def close(self):
+        pass
+
+
+class FakeDatabase:
+    """记录UPDATE语句的模拟数据库"""
+
+    def __init__(self):
+        self.statements = []
+
+    @contextmanager
+    def transaction(self):
+        yield self
+
+    def execute(self, sql, params=()):
+        self.statements.append((' '.join(sql.split()), params))
+        return FakeCursor()
+
+
+def dns_result(status='resolved', records=None, response_time=25):
+    return {'status': status, 'records': records or {'A': ['10.0.0.2', '10.0.0.1']},
+            'response_time': response_time}
+
+
+def reachability_result(reachable=True, status_code=200):
+    return {'reachable': reachable, 'http_checks': {'https': {'status_code': status_code}}}
+
+
+@pytest.fixture
+def domain_service():
+    service = DomainMonitoringService()
+    service.db = FakeDatabase()
+    service.history_sampler = HistorySampler(interval=3600)
+    return service
+
+
+class TestCoalescingHelpers:
+    """摘要和采样测试"""
+
+    def test_state_digest(self):
+        """测试摘要长度固定且与键顺序无关"""
+        digest = state_digest({'a': 1, 'b': [1, 2]})
+        assert len(digest) == 16
+        assert digest == state_digest({'b': [1, 2], 'a': 1})
+        assert digest != state_digest({'a': 2, 'b': [1, 2]})
+
+    def test_changed_columns(self):
+        """测试只返回变化的列，MySQL的0/1与布尔值按相同处理"""
+        certificate = Certificate(id=1, dns_status='resolved', domain_reachable=1, http_status_code=200)
+        changed = changed_columns(certificate, {
+            'dns_status': 'resolved', 'domain_reachable': True, 'http_status_code': 503
+        })
+        assert changed == {'http_status_code': 503}
+
+    def test_history_sampler(self):
+        """测试状态变化总是记录，状态不变时按间隔采样"""
+        sampler = HistorySampler(interval=60)
+        assert sampler.should_record(1, changed=False, now=0)
+        assert not sampler.should_record(1, changed=False, now=30)
+        assert sampler.should_record(1, changed=True, now=40)
+        assert not sampler.should_record(1, changed=False, now=90)
+        assert sampler.should_record(1, changed=False, now=100)
+        assert HistorySampler(interval=0).should_record(1, changed=False, now=0)
+
+
+class TestDomainStatusCoalescing:
+    """域名状态合并写入测试"""
+
+    def test_first_check_writes_state(self, domain_service):
+        """测试首次检查写入变化的状态列、摘要和响应时间"""
+        certificate = Certificate(id=7)
+        result = domain_service._update_certificate_domain_status(
+            certificate, dns_result(), reachability_result()
+        )
+
+        assert result == {'state_changed': True, 'record_history': True}
+        sql, params = domain_service.db.statements[0]
+        assert sql.startswith("UPDATE certificates SET dns_status = ?, domain_reachable = ?, "
+                              "http_status_code = ?, domain_state_digest = ?, dns_response_time = ?, "
+                              "last_dns_check = CURRENT_TIMESTAMP")
+        assert params[:3] == ('resolved', True, 200)
+        assert params[-1] == 7
+        assert certificate.domain_state_digest == params[3]
+
+    def test_unchanged_result_only_updates_heartbeat(self, domain_service):
+        """测试结果不变(解析记录顺序不同)时只更新检查时间和下次检查时间"""
+        certificate = Certificate(id=7)
+        domain_service._update_certificate_domain_status(certificate, dns_result(), reachability_result())
+
+        result = domain_service._update_certificate_domain_status(
+            certificate, dns_result(records={'A': ['10.0.0.1', '10.0.0.2']}, response_time=40),
+            reachability_result()
+        )
+
+        assert result == {'state_changed': False, 'record_history': False}
+        sql, params = domain_service.db.statements[-1]
+        assert sql.startswith("UPDATE certificates SET last_dns_check = CURRENT_TIMESTAMP,")
+        assert params == (7,)
+
+    def test_transition_writes_changed_columns_only(self, domain_service):
+        """测试状态变化时只写变化的列"""
+        certificate = Certificate(id=7)
+        domain_service._update_certificate_domain_status(certificate, dns_result(), reachability_result())
+
+        result = domain_service._update_certificate_domain_status(
+            certificate, dns_result(), reachability_result(reachable=False, status_code=503)
+        )
+
+        assert result == {'state_changed': True, 'record_history': True}
+        sql, params = domain_service.db.statements[-1]
+        assert sql.startswith("UPDATE certificates SET domain_reachable = ?, http_status_code = ?, "
+                              "domain_state_digest = ?, dns_response_time = ?,")
+        assert params[:2] == (False, 503)
+
+
+class TransactionTracker:
+    """记录当前是否处于事务中的模拟数据库"""
+
+    def __init__(self):
+        self.in_transaction = False
+        self.transactions = 0
+
+    @contextmanager
+    def transaction(self):
+        self.in_transaction = True
+        self.transactions += 1
+        try:
+            yield self
+        finally:
+            self.in_transaction = False
+
+    def insert_deferred(self, table, data):
+        pass
+
+
+class TestSchedulerUnitOfWork:
+    """调度器检查事务范围测试"""
+
+    def test_network_checks_outside_transaction(self, domain_service, monkeypatch):
+        """测试DNS/可达性检查在事务外执行，只有结果写入在事务内"""
+        tracker = TransactionTracker()
+        monkeypatch.setattr(domain_monitoring_scheduler, 'db', tracker)
+        monkeypatch.setattr(Certificate, 'get_by_id', staticmethod(lambda certificate_id: Certificate(
+            id=certificate_id, domain='example.com')))
+        calls = []
+
+        def network(name, value):
+            def check(domain):
+                calls.append((name, tracker.in_transaction))
+                return value
+            return check
+
+        domain_service.check_domain_resolution = network('dns', dns_result())
+        domain_service.validate_dns_configuration = network('validation', {})
+        domain_service.check_domain_reachability = network('reachability', reachability_result())
+        original_update = domain_service._update_certificate_domain_status
+
+        def update(*args):
+            calls.append(('update', tracker.in_transaction))
+            return original_update(*args)
+
+        domain_service._update_certificate_domain_status = update
+        domain_service._check_and_create_alerts = lambda *args: None
+
+        scheduler = DomainMonitoringScheduler.__new__(DomainMonitoringScheduler)
+        scheduler.domain_service = domain_service
+        result = scheduler._check_single_certificate(7)
+
+        assert result['success']
+        assert calls == [('dns', False), ('validation', False), ('reachability', False), ('update', True)]
+        assert tracker.transactions == 1
+
+
+class TestPortStatusCoalescing:
+    """端口状态合并写入测试"""
+
+    def test_unchanged_ports_only_update_heartbeat(self):
+        """测试端口检查结果不变时只更新端口检查时间"""
+        service = PortMonitoringService()
+        service.db = FakeDatabase()
+        service.history_sampler = HistorySampler(interval=3600)
+        certificate = Certificate(id=3)
+        ssl_results = {443: {'ssl_enabled': True, 'tls_version': 'TLSv1.3', 'cipher_suite': 'TLS_AES_256_GCM_SHA384',
+                             'certificate_chain_valid': True, 'security_grade': 'A', 'handshake_time': 80}}
+
+        first = service._update_certificate_port_status(certificate, ssl_results, {'redirect_enabled': True})
+        ssl_results[443]['handshake_time'] = 95
+        second = service._update_certificate_port_status(certificate, ssl_results, {'redirect_enabled': True})
+
+        assert first['state_changed'] and not second['state_changed']
+        assert service.db.statements[-1] == (
+            "UPDATE certificates SET last_port_check = CURRENT_TIMESTAMP WHERE id = ?", (3,)
+        )
@@ -0,0 +1,141 @@
+"""
+服务器令牌缓存测试
+测试令牌摘要、有效/无效令牌缓存、令牌重新生成和服务器删除时的失效
+"""
+import pytest
+import sys
+import os
+import hashlib
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'src'))
+
+import models.server as server_module
+from models.server import Server
+from models.token_cache import ServerTokenCache, hash_token
+
+
+class Cursor:
+    def close(self):
+        pass
+
+
+class TokenDatabase:
+    """按令牌摘要返回服务器行的模拟数据库"""
+
+    def __init__(self):
+        self.version = None
+        self.servers = {}
+        self.lookups = 0
+        self.updates = []
+
+    def add(self, server_id, token):
+        self.servers[server_id] = {'id': server_id, 'name': f'server-{server_id}', 'token': None,
+                                   'token_hash': hash_token(token), 'user_id': 1}
+
+    def connect(self):
+        pass
+
+    def close(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def execute(self, sql, params=()):
+        if 'INTO `settings`' in sql:
+            self.version = str(int(self.version or 0) + 1)
+        return Cursor()
+
+    def fetchone(self, sql, params=()):
+        if 'FROM `settings`' in sql:
+            return {'value': self.version} if self.version else None
+        self.lookups += 1
+        assert 'token_hash = ?' in sql
+        for row in self.servers.values():
+            if row['token_hash'] == params[0]:
+                return dict(row)
+        return None
+
+    def insert(self, table, data):
+        server_id = len(self.servers) + 1
+        self.servers[server_id] = {'id': server_id, **data}
+        return server_id
+
+    def update(self, table, data, condition, params=()):
+        self.updates.append(data)
+        self.servers[params[0]].update(data)
+        return 1
+
+    def delete(self, table, condition, params=()):
+        return 1 if self.servers.pop(params[0], None) else 0
+
+
+@pytest.fixture
+def token_db(monkeypatch):
+    """替换服务器模型使用的数据库和令牌缓存"""
+    database = TokenDatabase()
+    database.add(1, 'agent-token')
+    monkeypatch.setattr(server_module, 'db', database)
+    monkeypatch.setattr(server_module, 'server_token_cache',
+                        ServerTokenCache(ttl=60, negative_ttl=60, maxsize=8, check_interval=60))
+    return database
+
+
+class TestServerTokenCache:
+    """服务器令牌缓存测试"""
+
+    def test_hash_matches_mysql_sha2(self):
+        """测试摘要为小写十六进制SHA-256"""
+        assert hash_token('abc') == hashlib.sha256(b'abc').hexdigest()
+
+    def test_valid_token_cached(self, token_db):
+        """测试有效令牌只查询一次"""
+        for _ in range(5):
+            assert Server.get_by_token('agent-token').id == 1
+        assert token_db.lookups == 1
+
+    def test_invalid_token_negative_cached(self, token_db):
+        """测试无效令牌被负缓存"""
+        assert Server.get_by_token('bad-token') is None
+        assert Server.get_by_token('bad-token') is None
+        assert token_db.lookups == 1
+        assert server_module.server_token_cache.get_stats()['negative_hits'] == 1
+
+    def test_negative_entries_do_not_evict_valid_tokens(self, token_db):
+        """测试无效令牌单独计数，不挤出有效令牌"""
+        cache = ServerTokenCache(ttl=60, negative_ttl=60, maxsize=1, negative_maxsize=1, check_interval=60)
+        load = lambda digest: token_db.fetchone("SELECT * FROM servers WHERE token_hash = ?", (digest,))
+        cache.get(token_db, hash_token('agent-token'), load)
+        for index in range(3):
+            cache.get(token_db, hash_token(f'bad-{index}'), load)
+        stats = cache.get_stats()
+        assert stats['size'] == 1
+        assert stats['negative_size'] == 1
+
+    def test_regenerate_invalidates_old_token(self, token_db):
+        """测试重新生成令牌后旧令牌失效、新令牌可用"""
+        server = Server.get_by_token('agent-token')
+        new_token = server.regenerate_token()
+        assert token_db.updates[-1] == {'token_hash': hash_token(new_token)}
+        assert token_db.version == '1'
+
+        assert Server.get_by_token('agent-token') is None
+        assert Server.get_by_token(new_token).id == 1
+
+    def test_create_stores_only_token_hash(self, token_db):
+        """测试创建服务器时数据库只保存令牌摘要，明文令牌只返回给调用方"""
+        server = Server.create(name='web-01', user_id=1)
+        row = token_db.servers[server.id]
+
+        assert 'token' not in row
+        assert row['token_hash'] == hash_token(server.token)
+        assert 'token' not in server.to_dict()
+        assert Server.get_by_token(server.token).id == server.id
+
+    def test_delete_invalidates(self, token_db):
+        """测试删除服务器后令牌失效"""
+        server = Server.get_by_token('agent-token')
+        server.delete()
+        assert Server.get_by_token('agent-token') is None
+        assert token_db.lookups == 2
@@ -0,0 +1,94 @@
+"""
+SQL语句缓存测试
+测试占位符转换、SQL规范化、LRU淘汰和指纹统计
+"""
+import pytest
+import sys
+import os
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'src'))
+
+from models.statement_cache import StatementCache, translate_placeholders, normalize_sql
+
+
+class TestStatementCache:
+    """语句缓存测试"""
+
+    def test_translate_placeholders(self):
+        """测试?占位符转换(忽略引号内内容)"""
+        assert translate_placeholders("SELECT * FROM t WHERE a = ? AND b = ?") == \
+            "SELECT * FROM t WHERE a = %s AND b = %s"
+        assert translate_placeholders("SELECT '?' FROM t WHERE a = ?") == \
+            "SELECT '?' FROM t WHERE a = %s"
+        assert translate_placeholders("SELECT 1") == "SELECT 1"
+
+    def test_normalize_sql_collapses_literals(self):
+        """测试规范化后字面量和IN列表被折叠"""
+        first = normalize_sql("SELECT *  FROM certificates\n WHERE id IN (1, 2, 3) AND status = 'valid'")
+        second = normalize_sql("select * from certificates where id in (?, ?) and status = ?")
+        assert first == second
+        assert 'in (...)' in first
+
+    def test_normalize_multi_row_values(self):
+        """测试多行VALUES被折叠为同一指纹"""
+        two_rows = normalize_sql("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)")
+        three_rows = normalize_sql("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s), (%s, %s)")
+        assert two_rows == three_rows
+
+    def test_compile_is_cached(self):
+        """测试相同SQL只编译一次"""
+        cache = StatementCache(maxsize=10)
+        first = cache.compile("SELECT * FROM users WHERE id = ?")
+        second = cache.compile("SELECT * FROM users WHERE id = ?")
+
+        assert first is second
+        assert first.sql == "SELECT * FROM users WHERE id = %s"
+        stats = cache.get_stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+
+    def test_lru_eviction(self):
+        """测试超过容量时淘汰最久未使用的语句"""
+        cache = StatementCache(maxsize=2)
+        cache.compile("SELECT 1")
+        cache.compile("SELECT 2")
+        cache.compile("SELECT 1")
+        cache.compile("SELECT 3")
+
+        assert "SELECT 1" in cache._statements
+        assert "SELECT 2" not in cache._statements
+        assert cache.get_stats()['size'] == 2
+
+    def test_top_queries(self):
+        """测试按指纹聚合调用次数和耗时"""
+        cache = StatementCache()
+        fast = cache.compile("SELECT * FROM users WHERE id = ?")
+        slow = cache.compile("SELECT * FROM certificates WHERE status = ?")
+        cache.record(fast, 0.001)
+        cache.record(fast, 0.001)
+        cache.record(slow, 0.5, error=True)
+
+        top = cache.top_queries(limit=1)
+        assert top[0]['fingerprint'] == slow.fingerprint
+        assert top[0]['errors'] == 1
+
+        by_calls = cache.top_queries(order_by='calls')
+        assert by_calls[0]['fingerprint'] == fast.fingerprint
+        assert by_calls[0]['calls'] == 2
+        assert by_calls[0]['avg_time'] == pytest.approx(0.001)
+
+    def test_fingerprint_stats_bounded(self):
+        """测试指纹统计超过容量时淘汰最久未执行的指纹"""
+        cache = StatementCache(maxsize=2)
+        first = cache.compile("SELECT * FROM users")
+        second = cache.compile("SELECT * FROM servers")
+        third = cache.compile("SELECT * FROM alerts")
+        cache.record(first, 0.001)
+        cache.record(second, 0.001)
+        cache.record(first, 0.001)
+        cache.record(third, 0.001)
+
+        fingerprints = {stats['fingerprint'] for stats in cache.top_queries()}
+        assert fingerprints == {first.fingerprint, third.fingerprint}
+        assert cache.get_stats()['fingerprints'] == 2
@@ -0,0 +1,214 @@
+"""
+流式响应测试
+测试服务端游标流式查询的连接管理、分块JSON数组/NDJSON输出以及CSV流式导出
+"""
+import pytest
+import sys
+import os
+import csv
+import gzip
+import json
+import datetime
+from flask import Flask
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'src'))
+
+from pymysql.cursors import SSDictCursor
+from models.database import Database
+from utils.streaming import stream_json
+from services.certificate_operations_service import CertificateOperationsService
+
+
+class StreamCursor:
+    """按批返回行的模拟游标"""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.fetches = 0
+        self.closed = False
+
+    def execute(self, sql, params=()):
+        self.sql = sql
+
+    def fetchmany(self, size):
+        self.fetches += 1
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    def close(self):
+        self.closed = True
+
+
+class StreamConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.cursor_classes = []
+        self.stream_cursor = None
+
+    def cursor(self, cursor_class=None):
+        self.cursor_classes.append(cursor_class)
+        if cursor_class is SSDictCursor:
+            self.stream_cursor = StreamCursor(self.rows)
+            return self.stream_cursor
+        return StreamCursor([])
+
+
+class StreamPool:
+    def __init__(self, conn):
+        self.conn = conn
+        self.checked_in = []
+        self.invalidated = []
+
+    def checkout(self, timeout=None):
+        return self.conn
+
+    def checkin(self, conn):
+        self.checked_in.append(conn)
+
+    def invalidate(self, conn):
+        self.invalidated.append(conn)
+
+
+@pytest.fixture
+def stream_db():
+    """使用模拟连接池的数据库实例"""
+    database = Database()
+    database.config.replica_hosts = []
+    conn = StreamConnection([{'id': index} for index in range(7)])
+    database._pool = StreamPool(conn)
+    return database
+
+
+class TestDatabaseStream:
+    """服务端游标流式查询测试"""
+
+    def test_reads_in_batches_and_returns_connection(self, stream_db):
+        """测试通过SSDictCursor分批读取，读完后归还连接"""
+        rows = list(stream_db.stream("SELECT id FROM certificates WHERE status = ?", ('valid',), batch_size=3))
+        conn = stream_db._pool.conn
+        assert [row['id'] for row in rows] == list(range(7))
+        assert SSDictCursor in conn.cursor_classes
+        assert conn.stream_cursor.fetches == 4
+        assert '%s' in conn.stream_cursor.sql
+        assert stream_db._pool.checked_in == [conn]
+        assert stream_db.conn is None
+
+    def test_early_close_discards_connection(self, stream_db):
+        """测试提前停止迭代时丢弃连接，不读取剩余的行"""
+        rows = stream_db.stream("SELECT id FROM certificates", batch_size=2)
+        assert next(rows) == {'id': 0}
+        rows.close()
+        assert stream_db._pool.invalidated == [stream_db._pool.conn]
+        assert stream_db._pool.checked_in == []
+
+
+@pytest.fixture
+def app():
+    return Flask(__name__)
+
+
+def broken_rows():
+    yield {'id': 1}
+    raise RuntimeError('connection lost')
+
+
+class TestStreamJson:
+    """分块JSON输出测试"""
+
+    def test_array_matches_jsonify_envelope(self, app):
+        """测试默认输出与jsonify相同的外层结构"""
+        with app.test_request_context('/items?stream=true'):
+            rows = [{'id': index, 'created_at': datetime.datetime(2025, 1, 1)} for index in range(5)]
+            response = stream_json(iter(rows), meta={'limit': 5}, chunk_bytes=16)
+            assert response.mimetype == 'application/json'
+            assert response.headers['X-Accel-Buffering'] == 'no'
+            chunks = list(response.response)
+            body = json.loads(''.join(chunks))
+            expected = json.loads(app.json.dumps({'items': rows}))['items']
+
+        assert len(chunks) > 1
+        assert body == {'code': 200, 'message': 'success', 'data': {'limit': 5, 'items': expected}}
+
+    def test_ndjson_lines(self, app):
+        """测试Accept要求NDJSON时每行一条记录"""
+        with app.test_request_context('/items', headers={'Accept': 'application/x-ndjson'}):
+            response = stream_json(iter([{'id': 1}, {'id': 2}]), serialize=lambda row: {'value': row['id']})
+            assert response.mimetype == 'application/x-ndjson'
+            lines = ''.join(response.response).splitlines()
+
+        assert [json.loads(line) for line in lines] == [{'value': 1}, {'value': 2}]
+
+    def test_error_terminates_document(self, app):
+        """测试读取出错时输出仍是完整JSON并带error字段"""
+        with app.test_request_context('/items?stream=1'):
+            body = json.loads(''.join(stream_json(broken_rows()).response))
+
+        assert body['data']['items'] == [{'id': 1}]
+        assert 'error' in body['data']
+
+
+class ExportDatabase:
+    """流式返回导出行的模拟数据库"""
+
+    def __init__(self, count):
+        self.count = count
+        self.closed = False
+        self.sql = None
+
+    def stream(self, sql, params=()):
+        self.sql = sql
+        try:
+            for index in range(self.count):
+                yield {
+                    'id': index, 'domain': f'site-{index}.example.com', 'type': 'single', 'status': 'valid',
+                    'created_at': datetime.datetime(2025, 1, 1, 8, 0), 'expires_at': None,
+                    'ca_type': 'letsencrypt', 'monitoring_enabled': 1, 'dns_status': 'resolved',
+                    'domain_reachable': 1, 'tls_version': 'TLSv1.3', 'certificate_chain_valid': 1,
+                    'http_redirect_status': None, 'notes': '备注, 含逗号', 'owner': 'ops',
+                    'business_unit': 'web'
+                }
+        finally:
+            self.closed = True
+
+
+def export_service(count):
+    service = CertificateOperationsService.__new__(CertificateOperationsService)
+    service.db = ExportDatabase(count)
+    return service
+
+
+class TestCsvExport:
+    """CSV流式导出测试"""
+
+    def test_chunks_parse_as_csv(self):
+        """测试分块输出拼接后是完整CSV，以BOM开头"""
+        service = export_service(200)
+        chunks = list(service.export_certificates_to_csv({'status': 'valid'}, chunk_bytes=1024))
+        text = b''.join(chunks).decode('utf-8')
+        rows = list(csv.reader(text.lstrip('\ufeff').splitlines()))
+
+        assert len(chunks) > 1
+        assert text.startswith('\ufeff')
+        assert rows[0] == list(CertificateOperationsService.EXPORT_HEADERS)
+        assert len(rows) == 201
+        assert rows[1][1] == 'site-0.example.com'
+        assert rows[1][4] == '2025-01-01 08:00:00'
+        assert rows[1][13] == '备注, 含逗号'
+        assert 'status = ?' in service.db.sql
+        assert service.db.closed
+
+    def test_gzip(self):
+        """测试gzip输出可解压为相同的CSV"""
+        plain = b''.join(export_service(50).export_certificates_to_csv())
+        compressed = b''.join(export_service(50).export_certificates_to_csv(compress=True))
+        assert gzip.decompress(compressed) == plain
+        assert len(compressed) < len(plain)
+
+    def test_close_releases_rows(self):
+        """测试客户端断开(生成器关闭)时关闭数据源"""
+        service = export_service(10000)
+        chunks = service.export_certificates_to_csv(chunk_bytes=1024)
+        next(chunks)
+        chunks.close()
+        assert service.db.closed
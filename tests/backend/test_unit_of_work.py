@@ -0,0 +1,195 @@
+"""
+工作单元事务测试
+验证事务内只提交一次、缓冲插入合并为多行语句、保存点回滚和嵌套事务行为
+"""
+import pytest
+import sys
+import os
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'src'))
+
+from models.connection_pool import ConnectionPool
+from models.database import Database
+
+
+class RecordingCursor:
+    """记录执行语句的模拟游标，插入'bad'值时抛出异常"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = 1
+        self.lastrowid = None
+
+    def execute(self, sql, params=()):
+        if 'bad' in (params or ()):
+            raise ValueError("Data too long")
+        self.connection.statements.append((sql, params))
+        self.connection.last_id += 1
+        self.lastrowid = self.connection.last_id
+
+    def fetchall(self):
+        return []
+
+    def fetchone(self):
+        return None
+
+    def close(self):
+        pass
+
+
+class RecordingConnection:
+    """记录语句和事务操作的模拟连接"""
+
+    def __init__(self, **kwargs):
+        self.open = True
+        self.statements = []
+        self.last_id = 0
+        self.begins = 0
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return RecordingCursor(self)
+
+    def ping(self, reconnect=False):
+        pass
+
+    def begin(self):
+        self.begins += 1
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.open = False
+
+
+@pytest.fixture
+def database():
+    """使用模拟连接的Database实例"""
+    database = Database()
+    database._pool = ConnectionPool({}, pool_size=1, max_overflow=0, creator=RecordingConnection)
+    return database
+
+
+def connection_of(database):
+    """取出连接池中唯一的连接(归还时连接池会回滚一次，rollbacks只比较事务内的次数)"""
+    database.release()
+    conn = database.pool.checkout()
+    database.pool.checkin(conn)
+    return conn
+
+
+class TestUnitOfWork:
+    """工作单元事务测试"""
+
+    def test_single_commit_for_many_writes(self, database):
+        """测试事务内的insert/update/delete不单独提交，退出时只提交一次"""
+        with database.transaction():
+            database.insert('certificates', {'domain': 'a.example.com'})
+            database.update('certificates', {'status': 'valid'}, 'id = ?', (1,))
+            database.delete('alerts', 'id = ?', (2,))
+            database.commit()
+
+        conn = connection_of(database)
+        assert (conn.begins, conn.commits) == (1, 1)
+        assert len(conn.statements) == 3
+        assert database.unit is None
+        assert database.conn is None
+
+    def test_deferred_inserts_batched(self, database):
+        """测试缓冲插入合并为多行INSERT，并在后续语句之前写入"""
+        with database.transaction(chunk_size=3) as unit:
+            for index in range(4):
+                database.insert_deferred('domain_monitoring_history', {'certificate_id': index, 'status': 'ok'})
+            assert unit.pending == 1
+            database.update('certificates', {'status': 'valid'}, 'id = ?', (1,))
+
+        conn = connection_of(database)
+        sqls = [sql for sql, _ in conn.statements]
+        assert sqls[0] == ("INSERT INTO `domain_monitoring_history` (`certificate_id`, `status`) "
+                           "VALUES (%s, %s), (%s, %s), (%s, %s)")
+        assert sqls[1].endswith("VALUES (%s, %s)")
+        assert sqls[2].startswith("UPDATE `certificates`")
+        assert conn.commits == 1
+
+    def test_deferred_insert_outside_transaction(self, database):
+        """测试不在工作单元内时立即插入并提交"""
+        database.insert_deferred('certificate_operations', {'operation_type': 'check'})
+        conn = connection_of(database)
+        assert len(conn.statements) == 1
+        assert conn.commits == 1
+
+    def test_savepoint_skips_bad_row(self, database):
+        """测试保存点内出错只回滚该行，事务继续并提交"""
+        imported = []
+        with database.transaction() as unit:
+            for value in ('one', 'bad', 'two'):
+                try:
+                    with unit.savepoint():
+                        database.insert('certificates', {'domain': value})
+                        imported.append(value)
+                except ValueError:
+                    continue
+
+        conn = connection_of(database)
+        sqls = [sql for sql, _ in conn.statements]
+        assert imported == ['one', 'two']
+        assert sqls.count('SAVEPOINT uow_sp_2') == 1
+        assert 'ROLLBACK TO SAVEPOINT uow_sp_2' in sqls
+        assert 'RELEASE SAVEPOINT uow_sp_1' in sqls
+        assert conn.commits == 1
+        assert 'ROLLBACK TO SAVEPOINT uow_sp_1' not in sqls
+
+    def test_savepoint_discards_buffered_rows(self, database):
+        """测试保存点回滚时丢弃块内缓冲的插入，保留块外的"""
+        with database.transaction() as unit:
+            database.insert_deferred('certificate_operations', {'details': 'outer'})
+            with pytest.raises(RuntimeError):
+                with unit.savepoint():
+                    database.insert_deferred('certificate_operations', {'details': 'inner'})
+                    raise RuntimeError("skip")
+
+        conn = connection_of(database)
+        params = [params for sql, params in conn.statements if sql.startswith('INSERT')]
+        assert params == [('outer',)]
+
+    def test_nested_transaction_uses_savepoint(self, database):
+        """测试嵌套transaction()创建保存点，内层失败不影响外层提交"""
+        with database.transaction():
+            database.insert('certificates', {'domain': 'kept'})
+            try:
+                with database.transaction():
+                    database.update('certificates', {'domain': 'bad'}, 'id = ?', (1,))
+            except ValueError:
+                pass
+
+        conn = connection_of(database)
+        sqls = [sql for sql, _ in conn.statements]
+        assert 'ROLLBACK TO SAVEPOINT uow_sp_1' in sqls
+        assert (conn.begins, conn.commits) == (1, 1)
+
+    def test_error_rolls_back_whole_transaction(self, database):
+        """测试事务内未捕获的异常回滚整个事务且不提交"""
+        with pytest.raises(ValueError):
+            with database.transaction():
+                database.insert('certificates', {'domain': 'a'})
+                database.insert('certificates', {'domain': 'bad'})
+
+        conn = connection_of(database)
+        assert conn.commits == 0
+        assert conn.rollbacks >= 1
+        assert database.unit is None
+
+    def test_bulk_upsert_commits_with_unit(self, database):
+        """测试bulk_upsert在工作单元内不单独提交"""
+        with database.transaction():
+            database.bulk_upsert('certificates', [{'server_id': 1, 'domain': 'a'}],
+                                 key_columns=['server_id', 'domain'], update_columns=[])
+            database.insert('alerts', {'title': 't'})
+
+        assert connection_of(database).commits == 1